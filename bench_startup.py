@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+xhs-ops 启动开销基准
+
+对每个场景各启动 N 次新的解释器取中位数，减去空解释器（python3 -c pass）的基线：
+  - xhs-ops --help、各子命令 --help：只应付出 argparse 的开销
+  - import requests：旧脚本每次调用都要付出的开销（对照）
+并检查 --help 之后 requests / urllib3 没有被导入。
+
+超出预算（默认 60ms，可用 --budget-ms 调整）或导入了重依赖时返回 1，可放进 CI。
+
+用法：
+  python3 bench_startup.py
+  python3 bench_startup.py --runs 20 --budget-ms 40
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+HEAVY_MODULES = ("requests", "urllib3", "psycopg2", "cryptography")
+SUBCOMMANDS = ("deploy", "check", "redeploy", "stop", "logs", "trace", "bluegreen")
+
+
+def measure(args, runs):
+    env = dict(os.environ, PYTHONPATH=ROOT_DIR)
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=ROOT_DIR, env=env,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def heavy_imports_after(argv):
+    """在同一进程里解析参数（--help 会 SystemExit），返回被导入的重依赖"""
+    code = (
+        "import sys\n"
+        "from xhs_ops.cli import main\n"
+        "try:\n"
+        f"    main({argv!r})\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"print('HEAVY:' + ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR, capture_output=True, text=True,
+                          env=dict(os.environ, PYTHONPATH=ROOT_DIR))
+    marker = next((line for line in proc.stdout.splitlines() if line.startswith("HEAVY:")), "HEAVY:")
+    return [m for m in marker[6:].split(",") if m]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="xhs-ops 启动开销基准")
+    parser.add_argument("--runs", type=int, default=10, help="每个场景启动次数（默认 10）")
+    parser.add_argument("--budget-ms", type=float, default=60.0, help="相对空解释器的启动预算（毫秒，默认 60）")
+    args = parser.parse_args(argv)
+
+    # 预热一次，生成 .pyc，避免把编译时间算进第一个场景
+    measure(["-m", "xhs_ops", "--help"], 1)
+
+    baseline = measure(["-c", "pass"], args.runs)
+    print(f"⏱️  空解释器基线: {baseline:.1f}ms（{args.runs} 次中位数）\n")
+
+    scenarios = [("xhs-ops --help", ["-m", "xhs_ops", "--help"], ["--help"])]
+    scenarios += [(f"xhs-ops {c} --help", ["-m", "xhs_ops", c, "--help"], [c, "--help"]) for c in SUBCOMMANDS]
+
+    failed = False
+    for label, cmd, cli_argv in scenarios:
+        extra = measure(cmd, args.runs) - baseline
+        heavy = heavy_imports_after(cli_argv)
+        ok = extra <= args.budget_ms and not heavy
+        failed |= not ok
+        note = f"  ⚠️ 导入了 {', '.join(heavy)}" if heavy else ""
+        print(f"   {'✅' if ok else '❌'} {label:<26} +{extra:6.1f}ms{note}")
+
+    if subprocess.run([sys.executable, "-c", "import requests"], capture_output=True).returncode == 0:
+        legacy = measure(["-c", "import requests"], args.runs) - baseline
+        print(f"\n   📎 对照 import requests       +{legacy:6.1f}ms（旧脚本每次调用的固定开销）")
+    print(f"\n预算: +{args.budget_ms:.0f}ms")
+    if failed:
+        print("❌ 超出启动预算或在分发前导入了重依赖")
+        return 1
+    print("✅ 启动开销在预算内")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""
+构建上下文分析：算出 Dockerfile 的 COPY 和 next build 真正需要哪些文件，生成精简的忽略列表与打包清单
+
+create_deploy_package.sh 原来按一组固定的 --exclude 打包，web 2/.dockerignore 靠手工维护，
+README、一次性脚本、工具配置、macOS 元数据都会跟着上传并进入构建上下文。本工具：
+
+  - 解析 web 2/Dockerfile：COPY/ADD 的源路径；遇到 COPY . . 时再按 next build 的需求展开
+  - next build 需要：package.json / lockfile、next/ts/postcss/tailwind 配置、prisma/、public/，
+    以及从 app 路由入口（page/layout/route/...）、middleware 出发按 import 可达的源码
+  - 列出当前打包 / 构建上下文里最大的无用文件，顺带检查现有 .dockerignore 有没有误排除需要的文件
+  - 对比前后的上传字节数、构建上下文字节数与预计传输时间
+
+用法：
+  python3 build_context.py                          # 报告（默认）
+  python3 build_context.py report --top 20 --uplink-mbps 10
+  python3 build_context.py ignore                   # 打印生成的 .dockerignore；--write 写入 web 2/.dockerignore
+  python3 build_context.py manifest --output deploy_manifest.txt   # 打包清单（create_deploy_package.sh 自动调用）
+"""
+
+import argparse
+import fnmatch
+import gzip
+import io
+import json
+import os
+import re
+import sys
+import tarfile
+import time
+
+from image_promote import _pattern_regex, context_files, load_dockerignore
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+CONTEXT_DIR = os.path.join(ROOT_DIR, "web 2")
+PACKAGE_FILE = os.path.join(ROOT_DIR, "deploy.tar.gz")
+# create_deploy_package.sh 原来的 --exclude 列表（tar 语义：匹配路径中的任意一段）
+LEGACY_PACKAGE_EXCLUDES = (
+    ".git", "node_modules", ".next", "*.db", "*.db-journal", ".env*", "*.log", ".DS_Store",
+    "*.tar.gz", ".vscode", ".idea", "coverage", "dist", "build",
+)
+# next build 读取的顶层配置
+BUILD_CONFIG_PATTERNS = (
+    "package.json", "package-lock.json", "npm-shrinkwrap.json", ".npmrc",
+    "next.config.*", "tsconfig.json", "jsconfig.json", "postcss.config.*", "tailwind.config.*",
+    "next-env.d.ts", ".babelrc", "babel.config.*",
+    # next build 自带 lint 步骤（装了 eslint 时），缺了配置会静默跳过，镜像内外构建行为不一致
+    "eslint.config.*", ".eslintrc*",
+)
+# 整个目录都需要：public 原样对外提供，prisma 在运行阶段从 builder 复制（迁移、引擎）
+BUILD_DIRS = ("public", "prisma")
+# 平台读取、但不进镜像的文件：只进上传包
+PLATFORM_FILES = ("Dockerfile", ".dockerignore", "zeabur.json")
+# 放行目录里也要排除的杂项
+JUNK_PATTERNS = ("**/.DS_Store", "**/._*", "**/*.log", "**/*.tsbuildinfo")
+# app router 的特殊文件与元数据文件，各自是独立的构建入口
+APP_ENTRY_NAMES = (
+    "page", "layout", "route", "loading", "error", "global-error", "not-found", "template", "default",
+    "forbidden", "unauthorized", "icon", "apple-icon", "opengraph-image", "twitter-image",
+    "robots", "sitemap", "manifest",
+)
+ROOT_ENTRY_NAMES = ("middleware", "proxy", "instrumentation", "instrumentation-client")
+SOURCE_EXTS = (".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs", ".mts", ".css", ".json")
+IMPORT_RE = re.compile(
+    r"""(?:\bimport\s+(?:type\s+)?(?:[\w*{}\s,$]+?\s+from\s+)?|\bexport\s+[\w*{}\s,$]*?\s+from\s+"""
+    r"""|\bimport\s*\(\s*|\brequire\s*\(\s*|@import\s+(?:url\()?)["']([^"']+)["']""")
+DEFAULT_UPLINK_MBPS = 20
+
+
+# ---------------------------------------------------------------------------
+# 文件清单
+# ---------------------------------------------------------------------------
+
+def walk_files(base, skip=(".git",)):
+    """base 下全部文件 → {相对路径: 字节数}；skip 中的目录名整个跳过"""
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(base):
+        dirnames[:] = [d for d in dirnames if d not in skip]
+        rel_dir = os.path.relpath(dirpath, base).replace(os.sep, "/")
+        prefix = "" if rel_dir == "." else rel_dir + "/"
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if os.path.isfile(path) and not os.path.islink(path):
+                files[prefix + name] = os.path.getsize(path)
+    return files
+
+
+def legacy_package_files(files):
+    """create_deploy_package.sh 旧逻辑打进包里的文件"""
+    return sorted(rel for rel in files
+                  if not any(fnmatch.fnmatch(part, pat) for part in rel.split("/") for pat in LEGACY_PACKAGE_EXCLUDES))
+
+
+# ---------------------------------------------------------------------------
+# Dockerfile
+# ---------------------------------------------------------------------------
+
+def dockerfile_copy_sources(context_dir=CONTEXT_DIR):
+    """从构建上下文复制的源路径（跳过 COPY --from=<阶段>）"""
+    path = os.path.join(context_dir, "Dockerfile")
+    with open(path, "r", encoding="utf-8") as f:
+        text = re.sub(r"\\\r?\n", " ", f.read())
+    sources = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = line.split(None, 1)
+        if parts[0].upper() not in ("COPY", "ADD") or len(parts) < 2:
+            continue
+        rest = parts[1].strip()
+        flags = re.findall(r"--([\w-]+)(?:=\S+)?\s*", rest)
+        if "from" in flags:
+            continue
+        rest = re.sub(r"--[\w-]+(?:=\S+)?\s*", "", rest)
+        args = json.loads(rest) if rest.startswith("[") else rest.split()
+        sources.extend(os.path.normpath(a).replace(os.sep, "/").lstrip("/") for a in args[:-1])
+    return sources
+
+
+def match_source(source, files):
+    """COPY 源路径（可含通配符）匹配到的文件；目录取其下全部文件"""
+    if source in (".", ""):
+        return set(files)
+    regex = _pattern_regex(source)
+    matched = set()
+    for rel in files:
+        parts = rel.split("/")
+        if any(regex.match("/".join(parts[:i])) for i in range(1, len(parts) + 1)):
+            matched.add(rel)
+    return matched
+
+
+# ---------------------------------------------------------------------------
+# next build 的依赖
+# ---------------------------------------------------------------------------
+
+def _path_aliases(context_dir):
+    """tsconfig.json 的 paths：[(前缀, [目标前缀])]，只处理 "xxx/*" 这种形式"""
+    try:
+        with open(os.path.join(context_dir, "tsconfig.json"), "r", encoding="utf-8") as f:
+            options = json.load(f).get("compilerOptions", {})
+    except (OSError, ValueError):
+        return []
+    base = options.get("baseUrl", ".")
+    aliases = []
+    for key, targets in (options.get("paths") or {}).items():
+        if key.endswith("*"):
+            prefixes = [os.path.normpath(os.path.join(base, t.rstrip("*"))).replace(os.sep, "/") + "/"
+                        for t in targets if t.endswith("*")]
+            aliases.append((key[:-1], prefixes))
+    return aliases
+
+
+def _resolve(spec, importer, files, aliases):
+    """import 说明符 → 上下文里的文件；外部包返回 None"""
+    if spec.startswith("."):
+        bases = [os.path.normpath(os.path.join(os.path.dirname(importer), spec)).replace(os.sep, "/")]
+    else:
+        bases = [target + spec[len(prefix):] for prefix, targets in aliases if spec.startswith(prefix)
+                 for target in targets]
+    for base in bases:
+        candidates = [base] + [base + ext for ext in SOURCE_EXTS] + [f"{base}/index{ext}" for ext in SOURCE_EXTS]
+        for candidate in candidates:
+            if candidate in files:
+                return candidate
+    return None
+
+
+def _app_entries(files):
+    entries = []
+    for rel in files:
+        parts = rel.split("/")
+        stem = os.path.splitext(parts[-1])[0]
+        in_app = "app" in parts[:-1] and parts[0] in ("app", "src") and parts.index("app") <= 1
+        in_pages = parts[0] == "pages" or parts[:2] == ["src", "pages"]
+        root_level = len(parts) == 1 or (len(parts) == 2 and parts[0] == "src")
+        if (in_app and (stem in APP_ENTRY_NAMES or parts[-1] == "favicon.ico")) or in_pages:
+            entries.append(rel)
+        elif root_level and stem in ROOT_ENTRY_NAMES and rel.endswith(SOURCE_EXTS):
+            entries.append(rel)
+    return entries
+
+
+def reachable_sources(context_dir, files):
+    """从路由入口按 import 可达的源码 → {相对路径: 引入它的文件}"""
+    aliases = _path_aliases(context_dir)
+    reached = {rel: "入口" for rel in _app_entries(files)}
+    queue = list(reached)
+    while queue:
+        rel = queue.pop()
+        if not rel.endswith(SOURCE_EXTS):
+            continue
+        with open(os.path.join(context_dir, rel), "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        for spec in IMPORT_RE.findall(text):
+            target = _resolve(spec, rel, files, aliases)
+            if target and target not in reached:
+                reached[target] = rel
+                queue.append(target)
+    return reached
+
+
+def build_needs(context_dir=CONTEXT_DIR, files=None):
+    """
+    构建真正需要的文件 → {相对路径: 原因}。
+    COPY 的具体源路径原样保留；COPY . . 按 next build 的需求展开，而不是整个上下文。
+    """
+    if files is None:
+        files = walk_files(context_dir)
+    needs = {}
+    whole_context = False
+    for source in dockerfile_copy_sources(context_dir):
+        if source in (".", ""):
+            whole_context = True
+            continue
+        for rel in match_source(source, files):
+            needs.setdefault(rel, f"COPY {source}")
+    if whole_context:
+        for rel in files:
+            parts = rel.split("/")
+            if len(parts) == 1 and any(fnmatch.fnmatch(rel, p) for p in BUILD_CONFIG_PATTERNS):
+                needs.setdefault(rel, "next build 配置")
+            elif parts[0] in BUILD_DIRS:
+                needs.setdefault(rel, f"{parts[0]}/ 整体进入镜像")
+        for rel, via in reachable_sources(context_dir, files).items():
+            needs.setdefault(rel, "路由入口" if via == "入口" else f"被 {via} 引用")
+    junk = [_pattern_regex(p) for p in JUNK_PATTERNS]
+    return {rel: why for rel, why in needs.items() if not any(r.match(rel) for r in junk)}
+
+
+def why_unneeded(rel):
+    """不需要的文件归类，用于报告"""
+    parts = rel.split("/")
+    name = parts[-1]
+    if parts[0] in ("node_modules", ".next", "out", "coverage", "build", "dist"):
+        return "依赖/构建产物（镜像内重新生成）"
+    if name == ".DS_Store" or name.startswith("._"):
+        return "macOS 元数据"
+    if name.startswith(".env"):
+        return "本地环境变量（不应进镜像）"
+    if name.endswith((".tar.gz", ".tgz", ".zip")):
+        return "打包产物"
+    if name.lower().endswith((".md", ".txt")):
+        return "文档"
+    if parts[0] == "src":
+        return "源码：没有任何路由入口引用"
+    if len(parts) == 1 and name.endswith((".js", ".ts", ".mjs", ".sh", ".py")) and "config" not in name:
+        return "一次性脚本（不被构建引用）"
+    if len(parts) == 1 and any(fnmatch.fnmatch(name, p) for p in BUILD_CONFIG_PATTERNS):
+        return "next build 配置（Dockerfile 没有 COPY 进镜像）"
+    if len(parts) == 1 and (name.startswith(".") or "config" in name):
+        return "工具配置（next build 不读取）"
+    return "构建不需要"
+
+
+# ---------------------------------------------------------------------------
+# 生成结果
+# ---------------------------------------------------------------------------
+
+def generate_dockerignore(context_dir=CONTEXT_DIR, needs=None):
+    """
+    白名单式 .dockerignore：先排除全部，再按顶层条目放行构建需要的文件/目录。
+    目录整体放行（新增源码不用改这里），未引用的源码只在报告里提示，不写进忽略列表，
+    免得以后有人 import 它时构建报找不到模块。
+    """
+    if needs is None:
+        needs = build_needs(context_dir)
+    tops = sorted({rel.split("/")[0] + ("/" if "/" in rel else "") for rel in needs})
+    lines = [
+        "# 由 build_context.py 生成：默认排除全部，只放行 Dockerfile COPY 与 next build 需要的文件",
+        "# 新增顶层配置文件或目录后重新生成：python3 build_context.py ignore --write",
+        "*",
+    ]
+    lines += [f"!{top.rstrip('/')}" for top in tops]
+    lines.append("")
+    lines.append("# 放行目录里的杂项")
+    lines += list(JUNK_PATTERNS)
+    return "\n".join(lines) + "\n"
+
+
+def rules_from_text(text):
+    rules = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        line = line.lstrip("!").strip().lstrip("/")
+        rules.append((_pattern_regex(line), negate))
+    return rules
+
+
+def package_manifest(context_dir=CONTEXT_DIR, files=None, needs=None):
+    """上传包的文件清单：构建需要的文件 + 平台读取的 Dockerfile / zeabur.json 等"""
+    if files is None:
+        files = walk_files(context_dir)
+    if needs is None:
+        needs = build_needs(context_dir, files)
+    return sorted(set(needs) | {f for f in PLATFORM_FILES if f in files})
+
+
+def measure_tar(base, rels, compress):
+    """在内存里打 tar（可选 gzip），返回 (字节数, 耗时秒)"""
+    started = time.perf_counter()
+    buf = io.BytesIO()
+    target = gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=6, mtime=0) if compress else buf
+    with tarfile.open(fileobj=target, mode="w") as tar:
+        for rel in rels:
+            tar.add(os.path.join(base, rel), arcname=rel, recursive=False)
+    if compress:
+        target.close()
+    return buf.tell(), time.perf_counter() - started
+
+
+def archive_stats(path):
+    """已有 tar.gz 的 (成员数, 其中 macOS ._ 元数据数, 文件字节)"""
+    with tarfile.open(path, "r:gz") as tar:
+        members = tar.getmembers()
+    apple = sum(1 for m in members if os.path.basename(m.name).startswith("._"))
+    return len(members), apple, os.path.getsize(path)
+
+
+def _repo_label(key):
+    name = key.rstrip("/")
+    if name.endswith((".tar.gz", ".tgz", ".zip")):
+        return "打包产物（create_deploy_package.sh 生成，不必入库）"
+    if name.lower().endswith((".md", ".txt")):
+        return "文档"
+    if name in ("package.json", "package-lock.json"):
+        return "根目录依赖清单（web 2 构建不使用）"
+    return "运维脚本/资料（不进构建）"
+
+
+def _fmt(size):
+    if size >= 1 << 20:
+        return f"{size / (1 << 20):.1f} MB"
+    return f"{size / 1024:.1f} KB"
+
+
+def _transfer_seconds(size, mbps):
+    return size * 8 / (mbps * 1_000_000)
+
+
+# ---------------------------------------------------------------------------
+# 子命令
+# ---------------------------------------------------------------------------
+
+def cmd_report(args):
+    context_dir = args.context
+    files = walk_files(context_dir)
+    needs = build_needs(context_dir, files)
+    reachable = reachable_sources(context_dir, files)
+
+    before_pkg = legacy_package_files(files)
+    after_pkg = package_manifest(context_dir, files, needs)
+    before_ctx = context_files(context_dir)
+    after_ctx = context_files(context_dir, rules_from_text(generate_dockerignore(context_dir, needs)))
+
+    print(f"📂 {os.path.relpath(context_dir, ROOT_DIR)}：{len(files)} 个文件 {_fmt(sum(files.values()))}；"
+          f"构建需要 {len(needs)} 个 {_fmt(sum(files[r] for r in needs))}")
+
+    missing = sorted(r for r in needs if r not in set(before_ctx))
+    if missing:
+        print(f"❌ 现有 .dockerignore 排除了构建需要的文件: {missing[:5]}")
+    missing = sorted(r for r in needs if r not in set(after_ctx))
+    if missing:
+        print(f"❌ 生成的忽略列表漏掉了: {missing[:5]}")
+        return 1
+
+    extra = sorted(((files[r], r) for r in before_pkg if r not in needs and r not in PLATFORM_FILES), reverse=True)
+    if extra:
+        print(f"\n🗑️  打包/上下文里不需要的文件（前 {args.top}，共 {len(extra)} 个 {_fmt(sum(s for s, _ in extra))}）:")
+        for size, rel in extra[:args.top]:
+            print(f"   {_fmt(size):>10}  {rel:<44} {why_unneeded(rel)}")
+
+    dead = sorted(r for r in files if r.startswith("src/") and r.endswith(SOURCE_EXTS) and r not in reachable)
+    if dead:
+        print(f"\n🪦 没有任何路由入口引用的源码（可考虑删除，忽略列表不排除它们）: {', '.join(dead)}")
+
+    print(f"\n📊 前后对比（上行按 {args.uplink_mbps} Mbit/s 估算）:")
+    print(f"   {'':<22}{'文件数':>8}{'字节':>12}{'打包耗时':>10}{'预计传输':>10}")
+    rows = (
+        ("上传包 tar.gz · 原来", context_dir, before_pkg, True),
+        ("上传包 tar.gz · 精简", context_dir, after_pkg, True),
+        ("构建上下文 · 原来", context_dir, before_ctx, False),
+        ("构建上下文 · 精简", context_dir, after_ctx, False),
+    )
+    sizes = []
+    for label, base, rels, compress in rows:
+        size, seconds = measure_tar(base, rels, compress)
+        sizes.append(size)
+        print(f"   {label:<20}{len(rels):>8}{_fmt(size):>12}{seconds * 1000:>8.0f}ms"
+              f"{_transfer_seconds(size, args.uplink_mbps):>9.2f}s")
+    if os.path.exists(PACKAGE_FILE):
+        count, apple, size = archive_stats(PACKAGE_FILE)
+        print(f"   {'现有 deploy.tar.gz':<20}{count:>8}{_fmt(size):>12}{'':>10}"
+              f"{_transfer_seconds(size, args.uplink_mbps):>9.2f}s  （其中 {apple} 个 macOS ._ 元数据）")
+    for label, before, after in (("上传包", sizes[0], sizes[1]), ("构建上下文", sizes[2], sizes[3])):
+        if before:
+            print(f"   {label}减少 {(1 - after / before) * 100:.0f}%（{_fmt(before)} → {_fmt(after)}）")
+
+    repo = walk_files(ROOT_DIR, skip=(".git", "__pycache__", os.path.basename(context_dir), ".registry"))
+    if repo:
+        groups = {}
+        for rel, size in repo.items():
+            name = rel.split("/")[0]
+            key = name + "/" if "/" in rel else name
+            groups[key] = groups.get(key, 0) + size
+        ranked = sorted(groups.items(), key=lambda kv: kv[1], reverse=True)[:args.top]
+        print(f"\n🏗️  仓库根目录（Git 部署会拉取整个仓库，构建只用 {os.path.basename(context_dir)}/），最大的条目:")
+        for key, size in ranked:
+            print(f"   {_fmt(size):>10}  {key:<44} {_repo_label(key)}")
+    return 0
+
+
+def cmd_ignore(args):
+    text = generate_dockerignore(args.context)
+    if not args.write:
+        sys.stdout.write(text)
+        return 0
+    path = os.path.join(args.context, ".dockerignore")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    kept = context_files(args.context, load_dockerignore(args.context))
+    print(f"✅ 已写入 {os.path.relpath(path, ROOT_DIR)}（构建上下文 {len(kept)} 个文件）")
+    return 0
+
+
+def cmd_manifest(args):
+    rels = package_manifest(args.context)
+    text = "".join(rel + "\n" for rel in rels)
+    if not args.output:
+        sys.stdout.write(text)
+        return 0
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(text)
+    size = sum(os.path.getsize(os.path.join(args.context, r)) for r in rels)
+    print(f"✅ 打包清单 {args.output}：{len(rels)} 个文件 {_fmt(size)}", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="分析构建上下文，生成精简的 .dockerignore 与打包清单")
+    parser.add_argument("--context", default=CONTEXT_DIR, help="构建上下文目录（默认 web 2）")
+    parser.set_defaults(func=cmd_report, top=15, uplink_mbps=DEFAULT_UPLINK_MBPS)
+    sub = parser.add_subparsers(dest="command")
+
+    p = sub.add_parser("report", help="报告不需要的文件与前后对比（默认）")
+    p.add_argument("--top", type=int, default=15, help="列出最大的前 N 项")
+    p.add_argument("--uplink-mbps", type=float, default=DEFAULT_UPLINK_MBPS, help="估算传输时间用的上行带宽")
+    p.set_defaults(func=cmd_report)
+
+    p = sub.add_parser("ignore", help="生成 .dockerignore")
+    p.add_argument("--write", action="store_true", help="写入 <context>/.dockerignore")
+    p.set_defaults(func=cmd_ignore)
+
+    p = sub.add_parser("manifest", help="生成上传包的文件清单（每行一个，相对 context）")
+    p.add_argument("--output", "-o", help="写入文件（默认打印）")
+    p.set_defaults(func=cmd_manifest)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
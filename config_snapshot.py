@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+SystemConfig 配置快照发布工具
+
+把数据库 SystemConfig 表的全部 key 渲染成一份带版本号的快照，部署时作为环境变量
+SYSTEM_CONFIG_SNAPSHOT / SYSTEM_CONFIG_VERSION 与其它环境变量一起推送；
+应用（web 2/src/lib/system-config.ts）启动时直接读取快照，同一版本只加载一次。
+
+用法：
+  export DATABASE_URL='postgresql://...'
+  python3 config_snapshot.py render                     # 生成 config_snapshot.json
+  python3 config_snapshot.py diff config_snapshot.json  # 对比快照与线上数据库
+  python3 config_snapshot.py env config_snapshot.json   # 输出可直接粘贴到控制台的环境变量
+
+依赖：pip install psycopg2-binary（仅 render / diff 需要）
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+DEFAULT_SNAPSHOT_FILE = "config_snapshot.json"
+SENSITIVE_MARKERS = ("KEY", "SECRET", "PASSWORD", "TOKEN", "CREDENTIALS")
+
+
+def compute_version(values):
+    """与 system-config.ts 的 computeConfigVersion 一致：按 key 排序的紧凑 JSON 取 sha256 前 12 位"""
+    canonical = json.dumps(values, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:12]
+
+
+def fetch_live_config(database_url):
+    """一次查询读出整张 SystemConfig 表"""
+    try:
+        import psycopg2
+    except ImportError:
+        print("❌ 缺少依赖 psycopg2，请先执行: pip install psycopg2-binary")
+        sys.exit(1)
+
+    from db_pool import libpq_url
+    conn = psycopg2.connect(libpq_url(database_url))
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT "key", "value" FROM "SystemConfig" ORDER BY "key"')
+            return {k: v for k, v in cur.fetchall()}
+    finally:
+        conn.close()
+
+
+def build_snapshot(values):
+    return {
+        "version": compute_version(values),
+        "generatedAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "values": values,
+    }
+
+
+def load_snapshot(path):
+    with open(path, "r", encoding="utf-8") as f:
+        snap = json.load(f)
+    if not isinstance(snap.get("values"), dict):
+        raise ValueError(f"{path} 不是有效的配置快照（缺少 values）")
+    expected = compute_version(snap["values"])
+    if snap.get("version") != expected:
+        raise ValueError(f"{path} 版本号与内容不符（记录 {snap.get('version')}，实际 {expected}），文件可能被手动修改")
+    return snap
+
+
+def snapshot_env_vars(path=DEFAULT_SNAPSHOT_FILE):
+    """部署脚本用：把快照文件转成 Zeabur replaceVariables 所需的环境变量列表"""
+    snap = load_snapshot(path)
+    payload = json.dumps({"version": snap["version"], "values": snap["values"]},
+                         ensure_ascii=False, separators=(",", ":"))
+    return [
+        {"name": "SYSTEM_CONFIG_SNAPSHOT", "value": base64.b64encode(payload.encode("utf-8")).decode("ascii")},
+        {"name": "SYSTEM_CONFIG_VERSION", "value": snap["version"]},
+    ]
+
+
+def _is_sensitive(key):
+    upper = key.upper()
+    return any(m in upper for m in SENSITIVE_MARKERS)
+
+
+def _preview(key, value):
+    if value is None:
+        return "(无)"
+    if _is_sensitive(key):
+        digest = hashlib.sha256(value.encode("utf-8")).hexdigest()[:8]
+        return f"<{len(value)} 字符, sha256:{digest}>"
+    flat = value.replace("\n", "\\n")
+    return flat if len(flat) <= 60 else flat[:57] + "..."
+
+
+def diff_values(snapshot_values, live_values):
+    """返回 (新增, 删除, 变更) 三个 key 列表：以线上为准，相对快照的变化"""
+    added = sorted(set(live_values) - set(snapshot_values))
+    removed = sorted(set(snapshot_values) - set(live_values))
+    changed = sorted(k for k in set(live_values) & set(snapshot_values) if live_values[k] != snapshot_values[k])
+    return added, removed, changed
+
+
+def _database_url(args):
+    url = args.database_url or os.getenv("DATABASE_URL")
+    if not url:
+        print("❌ 缺少 DATABASE_URL（可用 --database-url 指定，或从 PostgreSQL 服务复制后导出）")
+        sys.exit(1)
+    return url
+
+
+def cmd_render(args):
+    print("📋 读取 SystemConfig...")
+    values = fetch_live_config(_database_url(args))
+    snap = build_snapshot(values)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(snap, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    print(f"✅ 快照已生成: {args.output}")
+    print(f"   版本: {snap['version']}   配置项: {len(values)}")
+    return 0
+
+
+def cmd_diff(args):
+    snap = load_snapshot(args.snapshot)
+    live = fetch_live_config(_database_url(args))
+    live_version = compute_version(live)
+    print(f"📦 快照版本: {snap['version']}（{snap.get('generatedAt', 'unknown')}）")
+    print(f"🗄️  线上版本: {live_version}")
+
+    added, removed, changed = diff_values(snap["values"], live)
+    if not (added or removed or changed):
+        print("✅ 快照与线上数据库一致")
+        return 0
+
+    print(f"\n⚠️  存在差异: 新增 {len(added)} / 删除 {len(removed)} / 变更 {len(changed)}")
+    for k in added:
+        print(f"   + {k} = {_preview(k, live[k])}")
+    for k in removed:
+        print(f"   - {k} = {_preview(k, snap['values'][k])}")
+    for k in changed:
+        print(f"   ~ {k}: {_preview(k, snap['values'][k])} → {_preview(k, live[k])}")
+    print("\n💡 重新执行 render 并部署即可让应用加载最新版本")
+    return 1
+
+
+def cmd_env(args):
+    for env in snapshot_env_vars(args.snapshot):
+        print(f"{env['name']}={env['value']}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SystemConfig 配置快照发布工具")
+    parser.add_argument("--database-url", help="缺省读取环境变量 DATABASE_URL")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("render", help="从数据库生成快照文件")
+    p.add_argument("-o", "--output", default=DEFAULT_SNAPSHOT_FILE)
+    p.set_defaults(func=cmd_render)
+
+    p = sub.add_parser("diff", help="对比快照与线上数据库（有差异时退出码为 1）")
+    p.add_argument("snapshot", nargs="?", default=DEFAULT_SNAPSHOT_FILE)
+    p.set_defaults(func=cmd_diff)
+
+    p = sub.add_parser("env", help="输出快照对应的环境变量")
+    p.add_argument("snapshot", nargs="?", default=DEFAULT_SNAPSHOT_FILE)
+    p.set_defaults(func=cmd_env)
+
+    args = parser.parse_args(argv)
+    try:
+        return args.func(args)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
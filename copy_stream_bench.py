@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+文案接口流式 vs 整包 的感知延迟压测
+
+/api/generate/copy 默认并行生成两篇文案、两篇都写完才一次性返回 JSON；带 stream=true
+（或 Accept: text/event-stream）时改为 SSE，每篇的 token 一到就推给浏览器。本脚本对两种模式
+分别测量：
+
+  - TTFB：收到响应首字节的时间
+  - 首字（TTFT）：每篇文案第一个字出现在页面上的时间（整包模式 = 整个请求结束）
+  - 完成：每篇文案最终结构（option）到达的时间
+  - 总耗时：整个响应结束
+
+上游用 stub_vendors 的桩服务模拟大模型：--ttft 为首 token 延迟，--tokens-per-s 为吐字速度，
+输出是能通过校验的真实长度文案。
+
+用法：
+  python3 copy_stream_bench.py bench                       # 离线：桩服务 + 路由的 Python 等价实现
+  python3 copy_stream_bench.py bench --ttft 1.2 --tokens-per-s 25 --runs 10 --concurrency 4
+
+  python3 copy_stream_bench.py stub --port 8900            # 只起带吐字节奏的桩服务，给本地 Next 实例用
+      → web 2 启动前设置 COPY_ENGINE_BASE_URL=http://127.0.0.1:8900/volc/api/v3
+        COPY_ENGINE_VENDOR=volc VOLC_API_KEY=sk-stub（后台"API管理中心"配置的 BASE_URL 优先，需先清空）
+  python3 copy_stream_bench.py run --url http://127.0.0.1:3000   # 压测本地实例
+"""
+
+import argparse
+import http.client
+import json
+import sys
+import threading
+import time
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from credential_smoke import percentile
+
+COPY_PATH = "/api/generate/copy"
+STUB_API_KEY = "sk-stub"
+SAMPLE_REQUEST = {"productName": "便携保温杯", "description": "24 小时保温，300ml 轻巧好携带，一键开盖"}
+MODES = ("buffered", "stream")
+MODE_LABEL = {"buffered": "整包 JSON", "stream": "流式 SSE"}
+
+
+# ---------- 客户端：测量 ----------
+
+def _open(url, mode, timeout):
+    parsed = urlparse(url)
+    conn_cls = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+    conn = conn_cls(parsed.hostname, parsed.port, timeout=timeout)
+    body = dict(SAMPLE_REQUEST)
+    headers = {"Content-Type": "application/json"}
+    if mode == "stream":
+        body["stream"] = True
+        headers["Accept"] = "text/event-stream"
+    conn.request("POST", (parsed.path.rstrip("/") or "") + COPY_PATH,
+                 body=json.dumps(body, ensure_ascii=False).encode("utf-8"), headers=headers)
+    return conn
+
+
+def read_sse(resp):
+    """逐个产出 (event, data)，忽略注释帧（: 开头）"""
+    event, data = "message", []
+    while True:
+        line = resp.readline()
+        if not line:
+            return
+        line = line.decode("utf-8").rstrip("\r\n")
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith(":"):
+            continue
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].lstrip())
+
+
+def measure(url, mode, timeout=180):
+    """发一次请求，返回各时间点（秒，相对请求发出）；失败时带 error"""
+    started = time.perf_counter()
+    elapsed = lambda: time.perf_counter() - started  # noqa: E731
+    result = {"mode": mode, "ttft": [None, None], "done": [None, None]}
+    conn = _open(url, mode, timeout)
+    try:
+        resp = conn.getresponse()
+        # 状态行 + 响应头到达即视为首字节（整包模式下头和正文几乎同时到）
+        result["ttfb"] = elapsed()
+        is_sse = "text/event-stream" in (resp.getheader("Content-Type") or "")
+        if resp.status != 200:
+            result["error"] = f"HTTP {resp.status}: {resp.read()[:200].decode('utf-8', 'replace')}"
+            return result
+        if not is_sse:
+            payload = json.loads(resp.read().decode("utf-8"))
+            result["total"] = elapsed()
+            if mode == "stream":
+                result["error"] = "服务端没有返回 text/event-stream（未部署流式版本？）"
+            elif not isinstance(payload.get("options"), list):
+                result["error"] = payload.get("error") or "响应缺少 options"
+            # 整包模式：两篇的首字和完成都等于整个请求结束
+            result["ttft"] = [result["total"]] * 2
+            result["done"] = [result["total"]] * 2
+            return result
+        for event, data in read_sse(resp):
+            if event in ("delta", "retry", "option"):
+                idx = 1 if data.get("variant") == 2 else 0
+                if event == "delta" and result["ttft"][idx] is None:
+                    result["ttft"][idx] = elapsed()
+                elif event == "retry":
+                    result["retries"] = result.get("retries", 0) + 1
+                elif event == "option":
+                    result["done"][idx] = elapsed()
+            elif event == "done":
+                result["total"] = elapsed()
+            elif event == "error":
+                result["error"] = data.get("error") or "流式生成失败"
+        if "total" not in result and "error" not in result:
+            result["error"] = "流在 done 事件前结束"
+        return result
+    except (OSError, ValueError, http.client.HTTPException) as e:
+        result["error"] = str(e)
+        return result
+    finally:
+        conn.close()
+
+
+def run_load(url, modes, runs, concurrency, timeout):
+    results = {}
+    for mode in modes:
+        # 先预热一次（Next dev 首次请求要编译路由），不计入统计
+        measure(url, mode, timeout)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results[mode] = list(pool.map(lambda _: measure(url, mode, timeout), range(runs)))
+    return results
+
+
+def _fmt(values):
+    p50, p95 = percentile(values, 50), percentile(values, 95)
+    if p50 is None:
+        return f"{'-':>15}"
+    return f"{p50:6.2f}s/{p95:6.2f}s"
+
+
+def report(results):
+    ok = {mode: [r for r in rows if "error" not in r] for mode, rows in results.items()}
+    for mode, rows in results.items():
+        failed = [r for r in rows if "error" in r]
+        if failed:
+            print(f"⚠️  {MODE_LABEL[mode]}：{len(failed)}/{len(rows)} 次失败，例如 {failed[0]['error']}")
+
+    print(f"\n{'模式':<10}{'TTFB':>15}{'文案1 首字':>15}{'文案2 首字':>15}"
+          f"{'文案1 完成':>15}{'文案2 完成':>15}{'总耗时':>15}   (p50/p95)")
+    for mode, rows in ok.items():
+        if not rows:
+            continue
+        cols = [[r["ttfb"] for r in rows]]
+        cols += [[r["ttft"][i] for r in rows if r["ttft"][i] is not None] for i in (0, 1)]
+        cols += [[r["done"][i] for r in rows if r["done"][i] is not None] for i in (0, 1)]
+        cols.append([r["total"] for r in rows])
+        print(f"{MODE_LABEL[mode]:<10}" + "".join(f"{_fmt(c):>15}" for c in cols))
+    retries = sum(r.get("retries", 0) for rows in ok.values() for r in rows)
+    if retries:
+        print(f"   （流式中有 {retries} 次校验重试，重试走非流式，计入该篇完成时间）")
+
+    if not ok.get("buffered") or not ok.get("stream"):
+        return
+    # 感知延迟：页面上第一次出现文字的时间
+    first_buffered = percentile([min(r["ttft"]) for r in ok["buffered"]], 50)
+    first_stream = percentile([min(t for t in r["ttft"] if t is not None) for r in ok["stream"]
+                               if any(t is not None for t in r["ttft"])], 50)
+    total_buffered = percentile([r["total"] for r in ok["buffered"]], 50)
+    total_stream = percentile([r["total"] for r in ok["stream"]], 50)
+    if first_stream is None:
+        return
+    saved = first_buffered - first_stream
+    print(f"\n⏱️  首字可见 p50：整包 {first_buffered:.2f}s → 流式 {first_stream:.2f}s，"
+          f"提前 {saved:.2f}s（-{saved / first_buffered:.0%}）")
+    print(f"   总耗时 p50：整包 {total_buffered:.2f}s / 流式 {total_stream:.2f}s"
+          f"（差 {total_stream - total_buffered:+.2f}s，流式不让模型更快，只是不再让用户干等）")
+
+
+# ---------- 离线：路由的 Python 等价实现 ----------
+
+class CopyRouteHandler(BaseHTTPRequestHandler):
+    """按 /api/generate/copy 的两种模式转发到桩服务：整包并行两篇 / SSE 逐 token 推送"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _upstream(self, variant, stream):
+        parsed = urlparse(self.server.upstream)
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=180)
+        # 桩服务按提示词里的"理性/感性"返回两篇不同风格的文案，与路由的 prompt1/prompt2 对应
+        style = "理性分析" if variant == 1 else "感性种草"
+        body = {"model": "doubao-seed-1-6-lite-251015", "temperature": 0.9, "max_tokens": 4096, "stream": stream,
+                "messages": [{"role": "user", "content": f"请生成 1 篇小红书爆款文案，正文风格：{style}"}]}
+        if stream:
+            body["stream_options"] = {"include_usage": True}
+        conn.request("POST", parsed.path + "/chat/completions", body=json.dumps(body, ensure_ascii=False).encode("utf-8"),
+                     headers={"Content-Type": "application/json", "Authorization": f"Bearer {STUB_API_KEY}"})
+        return conn, conn.getresponse()
+
+    def _complete(self, variant):
+        conn, resp = self._upstream(variant, False)
+        with closing(conn):
+            payload = json.loads(resp.read().decode("utf-8"))
+        return json.loads(payload["choices"][0]["message"]["content"])
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length).decode("utf-8")) if length else {}
+        if body.get("stream") is True or "text/event-stream" in self.headers.get("Accept", ""):
+            self._stream()
+            return
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            options = list(pool.map(self._complete, (1, 2)))
+        data = json.dumps({"options": options}, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self):
+        lock = threading.Lock()
+
+        def write(payload):
+            data = payload.encode("utf-8")
+            with lock:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+        def send(event, data):
+            write(f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n")
+
+        def run_variant(variant):
+            conn, resp = self._upstream(variant, True)
+            raw = ""
+            with closing(conn):
+                for line in iter(resp.readline, b""):
+                    line = line.decode("utf-8").strip()
+                    if not line.startswith("data:") or line == "data: [DONE]":
+                        continue
+                    choices = json.loads(line[5:]).get("choices") or [{}]  # 最后的 usage 块没有 choices
+                    text = (choices[0].get("delta") or {}).get("content") or ""
+                    if text:
+                        raw += text
+                        send("delta", {"variant": variant, "text": text})
+            option = json.loads(raw)
+            send("option", {"variant": variant, "option": option})
+            return option
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache, no-transform")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        write(": stream-open\n\n")
+        try:
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                options = list(pool.map(run_variant, (1, 2)))
+            send("done", {"options": options})
+        except (OSError, ValueError, KeyError) as e:
+            send("error", {"error": str(e)})
+        with lock:
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+
+def start_route(upstream, port=0, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, port), CopyRouteHandler)
+    server.daemon_threads = True
+    server.upstream = upstream
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def _stub_config(args):
+    from stub_vendors import StubConfig
+    return StubConfig(latency={"volc": args.ttft, "google": args.ttft}, jitter=args.jitter, seed=args.seed,
+                      tokens_per_s=args.tokens_per_s, chars_per_token=args.chars_per_token)
+
+
+def _modes(args):
+    return MODES if args.mode == "both" else (args.mode,)
+
+
+# ---------- 子命令 ----------
+
+def cmd_bench(args):
+    from stub_vendors import start_stub_server, stub_base_urls
+
+    stub, stub_url = start_stub_server(config=_stub_config(args))
+    route, route_url = start_route(stub_base_urls(stub_url)["volc"])
+    print(f"🧪 离线压测：桩服务首 token ~{args.ttft}s，{args.tokens_per_s:g} token/s，"
+          f"{args.runs} 次 × 并发 {args.concurrency}")
+    try:
+        results = run_load(route_url, _modes(args), args.runs, args.concurrency, args.timeout)
+    finally:
+        route.shutdown()
+        stub.shutdown()
+    report(results)
+    return 0
+
+
+def cmd_stub(args):
+    from stub_vendors import start_stub_server, stub_base_urls
+
+    stub, stub_url = start_stub_server(port=args.port, config=_stub_config(args), host=args.host)
+    urls = stub_base_urls(stub_url)
+    print(f"🧪 带吐字节奏的桩服务已启动: {stub_url}（首 token ~{args.ttft}s，{args.tokens_per_s:g} token/s）")
+    print("   web 2 启动前设置：")
+    print(f"     COPY_ENGINE_BASE_URL={urls['volc']}")
+    print(f"     COPY_ENGINE_VENDOR=volc VOLC_API_KEY={STUB_API_KEY}")
+    print("   然后：python3 copy_stream_bench.py run --url http://127.0.0.1:3000")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("\n👋 已停止")
+    stub.shutdown()
+    return 0
+
+
+def cmd_run(args):
+    print(f"🚀 压测 {args.url}{COPY_PATH}：{args.runs} 次 × 并发 {args.concurrency}")
+    results = run_load(args.url, _modes(args), args.runs, args.concurrency, args.timeout)
+    report(results)
+    return 0 if all("error" not in r for rows in results.values() for r in rows) else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="文案接口流式 vs 整包的 TTFB / 首字 / 总耗时压测")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_stub_args(p):
+        p.add_argument("--ttft", type=float, default=0.8, help="桩服务首 token 延迟秒数（默认 0.8）")
+        p.add_argument("--tokens-per-s", type=float, default=40.0, help="桩服务吐字速度（默认 40 token/s）")
+        p.add_argument("--chars-per-token", type=int, default=2, help="每个 token 折合字符数（默认 2）")
+        p.add_argument("--jitter", type=float, default=0.2, help="延迟抖动比例（默认 ±20%%）")
+        p.add_argument("--seed", type=int, default=1, help="随机种子")
+
+    def add_load_args(p):
+        p.add_argument("--runs", type=int, default=5, help="每种模式的请求次数（默认 5）")
+        p.add_argument("--concurrency", type=int, default=1, help="并发数（默认 1）")
+        p.add_argument("--mode", choices=("both",) + MODES, default="both", help="只测某一种模式")
+        p.add_argument("--timeout", type=int, default=180, help="单次请求超时秒数")
+
+    p = sub.add_parser("bench", help="离线：桩服务 + 路由等价实现")
+    add_stub_args(p)
+    add_load_args(p)
+    p.set_defaults(func=cmd_bench)
+
+    p = sub.add_parser("stub", help="只启动带吐字节奏的桩服务（给本地 Next 实例用）")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8900)
+    add_stub_args(p)
+    p.set_defaults(func=cmd_stub)
+
+    p = sub.add_parser("run", help="压测一个运行中的实例")
+    p.add_argument("--url", default="http://127.0.0.1:3000", help="应用地址（默认 http://127.0.0.1:3000）")
+    add_load_args(p)
+    p.set_defaults(func=cmd_run)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,7 +4,8 @@
 
 set -e
 
-PROJECT_DIR="/Users/percy/xhs/xiaohongshu-content-generator"
+# 默认取脚本所在目录（可用 PROJECT_DIR 覆盖），便于发布流水线在任意机器上调用
+PROJECT_DIR="${PROJECT_DIR:-$(cd "$(dirname "$0")" && pwd)}"
 WEB_DIR="web 2"  # 实际的项目目录
 DEPLOY_FILE="deploy.tar.gz"
 
@@ -18,10 +19,21 @@ if [ -f "$DEPLOY_FILE" ]; then
     rm "$DEPLOY_FILE"
 fi
 
+# macOS 的 tar 不要为每个文件附带 ._ 元数据
+export COPYFILE_DISABLE=1
+
 # 创建新的部署包（从 web 2 目录）
 echo "📦 打包项目文件（从 $WEB_DIR 目录）..."
-cd "$WEB_DIR"
-tar -czf "../$DEPLOY_FILE" \
+MANIFEST="$(mktemp)"
+trap 'rm -f "$MANIFEST"' EXIT
+if command -v python3 >/dev/null 2>&1 && python3 build_context.py --context "$WEB_DIR" manifest --output "$MANIFEST"; then
+  # 只打包构建真正需要的文件（Dockerfile COPY + next build 可达的源码），清单每次现算
+  cd "$WEB_DIR"
+  tar -czf "../$DEPLOY_FILE" --no-recursion -T "$MANIFEST"
+else
+  echo "⚠️  未能生成打包清单，退回固定排除列表"
+  cd "$WEB_DIR"
+  tar -czf "../$DEPLOY_FILE" \
   --exclude='.git' \
   --exclude='node_modules' \
   --exclude='.next' \
@@ -37,6 +49,7 @@ tar -czf "../$DEPLOY_FILE" \
   --exclude='dist' \
   --exclude='build' \
   .
+fi
 
 cd ..
 
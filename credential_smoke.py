@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+凭证冒烟测试：并发探测所有供应商 profile 并按延迟排序
+
+凭证来源（可叠加）：
+  - 环境变量：VOLC_API_KEY[_<PROFILE>]、DASHSCOPE_API_KEY[_<PROFILE>]、GOOGLE_API_KEY[_<PROFILE>]、
+    ALIBABA_CLOUD_ACCESS_KEY_ID/SECRET[_<PROFILE>]（规则同 web 2/src/lib/credentials.ts）
+  - API管理中心：SystemConfig 中的 API_CREDENTIALS_JSON（--store 指向 config_snapshot.json
+    或导出的 JSON 数组；--from-db 直接读库），需 CRED_MASTER_KEY（或 JWT_SECRET）解密
+
+每个 profile 发一个最小请求（文案：max_tokens=1 的 chat；百炼：查询一个不存在的任务；
+抠图：签名后的 RPC 调用），只验证连通性与鉴权，并记录延迟。
+
+用法：
+  python3 credential_smoke.py --list
+  python3 credential_smoke.py --rounds 5 --json smoke.json
+  python3 credential_smoke.py --stub                 # 离线：启动本地桩服务并把所有供应商指向它
+  python3 credential_smoke.py --base-url volc=http://127.0.0.1:8900/volc/api/v3
+  python3 credential_smoke.py --copy-vendor google   # 文案引擎用 Google 时按 google 推荐 profile
+
+依赖：解密 API管理中心凭证需要 pip install cryptography（只用环境变量时无需任何三方依赖）
+"""
+
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import re
+import statistics
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib import error as urlerror
+from urllib import request as urlrequest
+from urllib.parse import quote, urlencode
+
+DEFAULT_BASE_URLS = {
+    "volc": "https://ark.cn-beijing.volces.com/api/v3",
+    "openai": "https://api.openai.com/v1",
+    "google": "https://gitaigc.com/v1",
+    "dashscope": "https://dashscope.aliyuncs.com/api/v1",
+    "aliyun-imageseg": "https://imageseg.cn-shanghai.aliyuncs.com",
+}
+
+DEFAULT_TEXT_MODELS = {
+    "volc": "doubao-seed-1-6-lite-251015",
+    "openai": "gpt-4o-mini",
+    "google": "gemini-1.5-pro",
+}
+
+# 后台配置项 → (探测类型, 读取它的 vendor)。同一个 profile 名在不同 vendor 下对应不同密钥，
+# 只能推荐应用实际会用来取密钥的 vendor：
+#   COPY_ENGINE_CRED_PROFILE  文案按 COPY_ENGINE_VENDOR 取（默认 volc）
+#   IMAGE_ENGINE_CRED_PROFILE generate/images 用 dashscope，generate/image/one 用 google
+#   IMAGESEG_CRED_PROFILE     阿里云抠图
+CONFIG_KEYS = {
+    "COPY_ENGINE_CRED_PROFILE": ("text", None),
+    "IMAGE_ENGINE_CRED_PROFILE": ("image", ("dashscope", "google")),
+    "IMAGESEG_CRED_PROFILE": ("imageseg", ("aliyun-imageseg",)),
+}
+DEFAULT_COPY_VENDOR = "volc"
+
+ALIYUN_AUTH_ERRORS = ("InvalidAccessKeyId", "SignatureDoesNotMatch", "Forbidden", "InvalidApi.NotPurchase",
+                      "NoPermission", "Unauthorized")
+
+
+class Target:
+    """一个待探测的凭证：type + vendor + profile"""
+
+    def __init__(self, type_, vendor, profile, secret, base_url=None, source="env"):
+        self.type = type_
+        self.vendor = vendor
+        self.profile = profile or "default"
+        self.secret = secret
+        self.base_url = (base_url or "").strip().rstrip("/")
+        self.source = source
+
+    @property
+    def name(self):
+        return f"{self.type}/{self.vendor}/{self.profile}"
+
+
+# ---------------- 凭证收集 ----------------
+
+def _master_key():
+    raw = os.getenv("CRED_MASTER_KEY") or os.getenv("JWT_SECRET") or "dev-unsafe-master-key"
+    return hashlib.sha256(raw.encode("utf-8")).digest()
+
+
+def decrypt_secret(payload):
+    """与 web 2/src/lib/crypto.ts 的 decryptSecret 对应：v1:iv:tag:cipher（AES-256-GCM）"""
+    if not payload:
+        return ""
+    parts = payload.split(":")
+    if len(parts) != 4 or parts[0] != "v1":
+        raise ValueError("Invalid secret payload")
+    try:
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    except ImportError:
+        print("❌ 解密 API管理中心凭证需要 cryptography，请先执行: pip install cryptography")
+        sys.exit(1)
+    iv, tag, ciphertext = (base64.b64decode(p) for p in parts[1:])
+    return AESGCM(_master_key()).decrypt(iv, ciphertext + tag, None).decode("utf-8")
+
+
+def collect_env_targets(env=None):
+    env = os.environ if env is None else env
+    targets = []
+
+    def profiles(prefix):
+        found = {"default"}
+        for k in env:
+            m = re.match(rf"^{prefix}_(.+)$", k)
+            if m:
+                found.add(m.group(1))
+        return sorted(found)
+
+    def pick(profile, named, *fallbacks):
+        if profile != "default" and env.get(f"{named}_{profile}"):
+            return env[f"{named}_{profile}"]
+        for name in (named,) + fallbacks:
+            if env.get(name):
+                return env[name]
+        return ""
+
+    for p in profiles("VOLC_API_KEY"):
+        key = pick(p, "VOLC_API_KEY", "AI_API_KEY", "TEXT_API_KEY")
+        if key:
+            base = env.get("VOLC_BASE_URL") or env.get("AI_BASE_URL") or env.get("TEXT_BASE_URL")
+            targets.append(Target("text", "volc", p, key, base))
+    for p in profiles("DASHSCOPE_API_KEY"):
+        key = pick(p, "DASHSCOPE_API_KEY", "IMAGE_API_KEY")
+        if key:
+            base = env.get("DASHSCOPE_BASE_URL") or env.get("IMAGE_BASE_URL")
+            targets.append(Target("image", "dashscope", p, key, base))
+    for p in profiles("GOOGLE_API_KEY"):
+        key = pick(p, "GOOGLE_API_KEY")
+        if key:
+            # Google 既可做文案也可做配图，两种用途分别探测
+            targets.append(Target("text", "google", p, key, env.get("GOOGLE_BASE_URL")))
+            targets.append(Target("image", "google", p, key, env.get("GOOGLE_BASE_URL")))
+    for p in profiles("ALIBABA_CLOUD_ACCESS_KEY_ID"):
+        ak = pick(p, "ALIBABA_CLOUD_ACCESS_KEY_ID", "ALIYUN_ACCESS_KEY", "ALIYUN_ACCESS_KEY_ID")
+        sk = pick(p, "ALIBABA_CLOUD_ACCESS_KEY_SECRET", "ALIYUN_SECRET_KEY", "ALIYUN_ACCESS_KEY_SECRET")
+        if ak and sk:
+            targets.append(Target("imageseg", "aliyun-imageseg", p, {"accessKeyId": ak, "accessKeySecret": sk}))
+    return targets
+
+
+def _store_list_from_file(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        # config_snapshot.json 或 {key: value} 导出
+        values = data.get("values", data)
+        raw = values.get("API_CREDENTIALS_JSON")
+        data = json.loads(raw) if raw else []
+    if not isinstance(data, list):
+        raise ValueError(f"{path} 中没有可识别的 API_CREDENTIALS_JSON")
+    return data
+
+
+def collect_store_targets(items):
+    targets = []
+    for c in items:
+        try:
+            plain = decrypt_secret(c.get("secretEnc", ""))
+        except Exception as e:
+            print(f"⚠️  跳过 {c.get('type')}/{c.get('vendor')}/{c.get('profile')}: 解密失败 ({type(e).__name__})")
+            continue
+        secret = plain
+        if c.get("type") == "imageseg":
+            try:
+                secret = json.loads(plain)
+            except ValueError:
+                print(f"⚠️  跳过 imageseg/{c.get('vendor')}/{c.get('profile')}: 凭证不是 JSON")
+                continue
+        targets.append(Target(c.get("type"), c.get("vendor"), c.get("profile"), secret, c.get("baseURL"), "store"))
+    return targets
+
+
+def dedupe(targets):
+    """同一 type/vendor/profile 以 API管理中心为准（与应用的解析顺序一致）"""
+    chosen = {}
+    for t in targets:
+        prev = chosen.get(t.name)
+        if prev is None or (prev.source == "env" and t.source == "store"):
+            chosen[t.name] = t
+    return sorted(chosen.values(), key=lambda t: t.name)
+
+
+# ---------------- 探测 ----------------
+
+def _http(method, url, headers=None, body=None, timeout=20):
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urlrequest.Request(url, data=data, method=method, headers=headers or {})
+    if data is not None:
+        req.add_header("Content-Type", "application/json")
+    try:
+        with urlrequest.urlopen(req, timeout=timeout) as resp:
+            return resp.status, resp.read()
+    except urlerror.HTTPError as e:
+        return e.code, e.read()
+
+
+def _json(raw):
+    try:
+        return json.loads(raw.decode("utf-8"))
+    except (ValueError, UnicodeDecodeError):
+        return {}
+
+
+def aliyun_rpc_url(base_url, access_key_id, access_key_secret, action, params=None, version="2019-12-30"):
+    """阿里云 RPC 签名（HMAC-SHA1，SignatureVersion 1.0），只依赖标准库"""
+    query = {
+        "Format": "JSON",
+        "Version": version,
+        "AccessKeyId": access_key_id,
+        "SignatureMethod": "HMAC-SHA1",
+        "Timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "SignatureVersion": "1.0",
+        "SignatureNonce": uuid.uuid4().hex,
+        "Action": action,
+    }
+    query.update(params or {})
+
+    def enc(s):
+        return quote(str(s), safe="~")
+
+    canonical = "&".join(f"{enc(k)}={enc(query[k])}" for k in sorted(query))
+    string_to_sign = "GET&%2F&" + enc(canonical)
+    digest = hmac.new((access_key_secret + "&").encode("utf-8"), string_to_sign.encode("utf-8"), hashlib.sha1).digest()
+    query["Signature"] = base64.b64encode(digest).decode("ascii")
+    return f"{base_url}/?{urlencode(query)}"
+
+
+def probe_once(target, base_url, model, timeout):
+    """发一次最小请求，返回 (是否健康, 延迟秒, 说明)"""
+    start = time.perf_counter()
+    try:
+        if target.type == "imageseg":
+            url = aliyun_rpc_url(base_url, target.secret["accessKeyId"], target.secret["accessKeySecret"],
+                                 "GetAsyncJobResult", {"JobId": f"probe-{uuid.uuid4().hex[:8]}"})
+            status, raw = _http("GET", url, timeout=timeout)
+            code = str(_json(raw).get("Code", ""))
+            ok = status < 500 and not code.startswith(ALIYUN_AUTH_ERRORS)
+            note = code or str(status)
+        elif target.vendor == "dashscope":
+            status, raw = _http("GET", f"{base_url}/tasks/probe-{uuid.uuid4().hex[:8]}",
+                                {"Authorization": f"Bearer {target.secret}"}, timeout=timeout)
+            ok = status not in (401, 403) and status < 500
+            note = str(_json(raw).get("code") or status)
+        elif target.type == "text":
+            status, raw = _http("POST", f"{base_url}/chat/completions",
+                                {"Authorization": f"Bearer {target.secret}"},
+                                {"model": model, "messages": [{"role": "user", "content": "ping"}], "max_tokens": 1},
+                                timeout=timeout)
+            ok = status == 200
+            note = str(status) if ok else _error_message(raw, status)
+        else:
+            status, raw = _http("GET", f"{base_url}/models", {"Authorization": f"Bearer {target.secret}"},
+                                timeout=timeout)
+            ok = status == 200
+            note = str(status) if ok else _error_message(raw, status)
+    except Exception as e:
+        return False, time.perf_counter() - start, f"{type(e).__name__}: {str(e)[:80]}"
+    return ok, time.perf_counter() - start, note
+
+
+def _error_message(raw, status):
+    data = _json(raw)
+    err = data.get("error")
+    msg = err.get("message") if isinstance(err, dict) else data.get("message")
+    return f"{status} {msg or ''}".strip()[:100]
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[idx]
+
+
+def run_probes(targets, base_overrides, model_overrides, rounds, concurrency, timeout):
+    jobs = []
+    for t in targets:
+        base = base_overrides.get(t.vendor) or t.base_url or DEFAULT_BASE_URLS.get(t.vendor, "")
+        model = model_overrides.get(t.vendor) or DEFAULT_TEXT_MODELS.get(t.vendor, "")
+        for _ in range(rounds):
+            jobs.append((t, base, model))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(lambda j: (j[0], probe_once(j[0], j[1], j[2], timeout)), jobs))
+
+    results = {}
+    for t, (ok, latency, note) in outcomes:
+        r = results.setdefault(t.name, {"target": t, "ok": 0, "fail": 0, "latencies": [], "notes": []})
+        if ok:
+            r["ok"] += 1
+            r["latencies"].append(latency)
+        else:
+            r["fail"] += 1
+            r["notes"].append(note)
+    rows = []
+    for r in results.values():
+        t = r["target"]
+        lat = r["latencies"]
+        rows.append({
+            "type": t.type,
+            "vendor": t.vendor,
+            "profile": t.profile,
+            "source": t.source,
+            "healthy": r["ok"] > 0 and r["ok"] >= r["fail"],
+            "ok": r["ok"],
+            "fail": r["fail"],
+            "p50_ms": round(statistics.median(lat) * 1000) if lat else None,
+            "p95_ms": round(percentile(lat, 95) * 1000) if lat else None,
+            "min_ms": round(min(lat) * 1000) if lat else None,
+            "error": r["notes"][0] if r["notes"] else "",
+        })
+    return rank(rows)
+
+
+def rank(rows):
+    """按类型分组：健康的在前，按 p50 延迟升序，失败次数少的优先"""
+    return sorted(rows, key=lambda r: (r["type"], not r["healthy"], r["p50_ms"] if r["p50_ms"] is not None else 1e12,
+                                       r["fail"], r["vendor"], r["profile"]))
+
+
+def config_vendors(copy_vendor=DEFAULT_COPY_VENDOR):
+    """配置项 → (类型, 读取它的 vendor 列表)"""
+    return {key: (type_, vendors or (copy_vendor,)) for key, (type_, vendors) in CONFIG_KEYS.items()}
+
+
+def recommendations(rows, copy_vendor=DEFAULT_COPY_VENDOR):
+    """
+    按 (type, vendor) 分组后为每个配置项挑 profile：必须在读取该配置项的所有 vendor 下都健康，
+    取其中最慢 vendor 的 p50 最低者。返回 {配置项: [各 vendor 的行]}，挑不出的配置项不在结果中
+    """
+    healthy = {}
+    for r in rows:
+        if r["healthy"]:
+            healthy.setdefault((r["type"], r["vendor"]), {})[r["profile"]] = r
+    best = {}
+    for key, (type_, vendors) in config_vendors(copy_vendor).items():
+        pools = [healthy.get((type_, v), {}) for v in vendors]
+        common = set(pools[0]).intersection(*pools[1:])
+        if common:
+            profile = min(common, key=lambda p: (max(pool[p]["p50_ms"] for pool in pools), p))
+            best[key] = [pool[profile] for pool in pools]
+    return best
+
+
+def print_report(rows, rounds, copy_vendor=DEFAULT_COPY_VENDOR):
+    print("=" * 72)
+    print(f"🔍 凭证冒烟测试结果（每个 profile {rounds} 次）")
+    print("=" * 72)
+    current = None
+    for r in rows:
+        if r["type"] != current:
+            current = r["type"]
+            print(f"\n📦 {current}")
+        icon = "🟢" if r["healthy"] else "🔴"
+        lat = f"p50 {r['p50_ms']}ms / p95 {r['p95_ms']}ms" if r["p50_ms"] is not None else "无成功请求"
+        print(f"   {icon} {r['vendor']:<16} {r['profile']:<12} {lat:<26} 成功 {r['ok']}/{r['ok'] + r['fail']}"
+              f"  [{r['source']}]")
+        if r["error"]:
+            print(f"      ↳ {r['error']}")
+
+    best = recommendations(rows, copy_vendor)
+    print("\n💡 推荐配置（最快的健康 profile）:")
+    for key, (_, vendors) in config_vendors(copy_vendor).items():
+        picked = best.get(key)
+        if picked:
+            lat = ", ".join(f"{r['vendor']} p50 {r['p50_ms']}ms" for r in picked)
+            print(f"   {key} = {picked[0]['profile']}   （{lat}）")
+        elif len(vendors) == 1:
+            print(f"   {key}: 没有 {vendors[0]} 的健康 profile")
+        else:
+            print(f"   {key}: 没有在 {'/'.join(vendors)} 下都健康的 profile")
+    print()
+
+
+def _parse_pairs(items, label):
+    out = {}
+    for item in items or []:
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise SystemExit(f"❌ {label} 格式应为 vendor=value: {item}")
+        out[name] = value.rstrip("/")
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="并发探测所有凭证 profile 并按延迟排序")
+    parser.add_argument("--store", help="API_CREDENTIALS_JSON 来源文件（config_snapshot.json 或 JSON 数组）")
+    parser.add_argument("--from-db", action="store_true", help="直接从 DATABASE_URL 读取 API_CREDENTIALS_JSON")
+    parser.add_argument("--no-env", action="store_true", help="不读取环境变量里的凭证")
+    parser.add_argument("--base-url", action="append", metavar="VENDOR=URL", help="覆盖某个供应商的 base URL")
+    parser.add_argument("--model", action="append", metavar="VENDOR=MODEL", help="覆盖文案探测使用的模型")
+    parser.add_argument("--stub", action="store_true", help="启动本地桩服务并把所有供应商指向它（离线）")
+    parser.add_argument("--rounds", type=int, default=3, help="每个 profile 探测次数")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=20.0)
+    parser.add_argument("--copy-vendor", default=os.getenv("COPY_ENGINE_VENDOR") or DEFAULT_COPY_VENDOR,
+                        help="文案引擎 vendor，决定 COPY_ENGINE_CRED_PROFILE 推荐哪个 vendor 的 profile"
+                             "（默认取 COPY_ENGINE_VENDOR，否则 volc）")
+    parser.add_argument("--list", action="store_true", help="只列出 profile，不探测")
+    parser.add_argument("--json", metavar="PATH", help="把结果写成 JSON")
+    args = parser.parse_args(argv)
+
+    targets = [] if args.no_env else collect_env_targets()
+    try:
+        if args.store:
+            targets += collect_store_targets(_store_list_from_file(args.store))
+        if args.from_db:
+            from config_snapshot import fetch_live_config
+            url = os.getenv("DATABASE_URL")
+            if not url:
+                print("❌ --from-db 需要环境变量 DATABASE_URL")
+                return 1
+            raw = fetch_live_config(url).get("API_CREDENTIALS_JSON")
+            targets += collect_store_targets(json.loads(raw) if raw else [])
+    except (OSError, ValueError) as e:
+        print(f"❌ 读取凭证失败: {e}")
+        return 1
+    targets = dedupe(targets)
+
+    if not targets:
+        print("❌ 没有找到任何凭证（检查环境变量或 --store / --from-db）")
+        return 1
+
+    if args.list:
+        print(f"📋 共 {len(targets)} 个 profile:")
+        for t in targets:
+            print(f"   - {t.name}  [{t.source}]")
+        return 0
+
+    base_overrides = _parse_pairs(args.base_url, "--base-url")
+    if args.stub:
+        from stub_vendors import start_stub_server, stub_base_urls
+        server, stub_url = start_stub_server()
+        urls = stub_base_urls(stub_url)
+        urls["openai"] = urls["volc"]
+        base_overrides = {**urls, **base_overrides}
+        print(f"🧪 使用本地桩服务: {stub_url}")
+
+    print(f"🚀 并发探测 {len(targets)} 个 profile（{args.rounds} 轮，并发 {args.concurrency}）...")
+    started = time.perf_counter()
+    rows = run_probes(targets, base_overrides, _parse_pairs(args.model, "--model"),
+                      args.rounds, args.concurrency, args.timeout)
+    print(f"⏱️  总耗时 {time.perf_counter() - started:.2f}s\n")
+    print_report(rows, args.rounds, args.copy_vendor)
+
+    if args.json:
+        best = recommendations(rows, args.copy_vendor)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "rows": rows,
+                "recommended": {key: picked[0]["profile"] for key, picked in best.items()},
+            }, f, ensure_ascii=False, indent=2)
+        print(f"📝 结果已写入: {args.json}")
+    return 0 if any(r["healthy"] for r in rows) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,557 @@
+#!/usr/bin/env python3
+"""
+商品抠图缓存服务（阿里云 SegmentCommodity 前置缓存）
+
+同一张产品图在“重新生成”和逐张生成（/api/generate/image/one）时会被反复抠图，每次都要
+上传临时图片 → 调阿里云 → 下载结果。本服务把抠图结果按图片哈希存到磁盘：
+
+  - 精确命中：原图字节 sha256 相同
+  - 近似命中：感知哈希（64 位 dHash）汉明距离 ≤ --max-distance，宽高比与粗粒度颜色一致，
+    覆盖同一张图被重新压缩、缩放后再上传的情况；命中后记一条别名，下次直接精确命中
+  - 未命中：服务自己托管原图（GET /src/<sha>），调阿里云抠图，下载透明底 PNG，
+    同时生成与 lib/image.ts createMask 一致的黑白蒙版，一起落盘
+  - 同一张图的并发请求只抠一次
+  - 指标：GET /__metrics，命中率、节省的抠图耗时（命中条目当初的抠图耗时之和）、未命中延迟分位数
+
+接口：
+  POST /cutout  {"imageBase64": "...", "profile": "default", "mask": true}
+    → {"cutoutBase64", "maskBase64", "cache": "exact|phash|miss|inflight", "distance", "id"}
+
+应用侧设置 CUTOUT_SERVICE_URL=http://<服务地址>:8790 后，lib/aliyun.ts 优先走本服务，服务不可用时退回直连阿里云。
+阿里云需要能访问到原图，所以服务要有公网地址（--public-url / CUTOUT_PUBLIC_URL）。
+因为公网可达，/cutout 与 /__metrics 要求 Authorization: Bearer <CUTOUT_SERVICE_TOKEN>（应用与本服务设置同一个值），
+否则任何人都能触发计费的抠图调用；只有阿里云下载原图的 /src/<sha> 不需要令牌。
+
+依赖 Pillow（pip install pillow）。
+
+用法：
+  CUTOUT_SERVICE_TOKEN=<随机串> python3 cutout_service.py --public-url https://cutout.example.com
+  python3 cutout_service.py --bench       # 离线：桩服务上演示精确 / 近似 / 未命中与节省的耗时
+"""
+
+import argparse
+import base64
+import hashlib
+import hmac
+import io
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from credential_smoke import (DEFAULT_BASE_URLS, _http, _json, _store_list_from_file, aliyun_rpc_url,
+                              collect_env_targets, collect_store_targets, dedupe, percentile)
+
+DEFAULT_PORT = 8790
+DEFAULT_CACHE_DIR = ".cutout_cache"
+BANDS = 4  # 64 位哈希切成 4 段 16 位：距离 ≤ 3 时至少有一段完全相同
+
+
+def _require_pillow():
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        print("❌ 抠图缓存服务需要 Pillow，请先执行: pip install pillow")
+        sys.exit(1)
+    return Image, ImageOps
+
+
+def fingerprint(image_bytes):
+    """返回 (64 位差值哈希, 4x4 RGB 色彩签名, 宽, 高)
+
+    dHash 只看灰度结构，同款不同色的商品哈希几乎一样，所以再比一次粗粒度颜色，避免返回错色的抠图。
+    """
+    Image, _ = _require_pillow()
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        width, height = img.size
+        rgb = img.convert("RGB")
+        gray = rgb.convert("L").resize((9, 8), Image.LANCZOS).tobytes()
+        color = list(rgb.resize((4, 4), Image.BOX).tobytes())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (gray[row * 9 + col] > gray[row * 9 + col + 1])
+    return value, color, width, height
+
+
+def make_mask(cutout_png):
+    """与 lib/image.ts createMask 相同：主体（不透明）→ 黑，背景（透明）→ 白"""
+    Image, ImageOps = _require_pillow()
+    with Image.open(io.BytesIO(cutout_png)) as img:
+        alpha = img.convert("RGBA").getchannel("A")
+        out = io.BytesIO()
+        ImageOps.invert(alpha).save(out, format="PNG")
+    return out.getvalue()
+
+
+def _bands(value):
+    return [(i, (value >> (16 * i)) & 0xFFFF) for i in range(BANDS)]
+
+
+class CutoutStore:
+    """磁盘缓存：objects/<id[:2]>/<id>.png 与 .mask.png，index.jsonl 追加写入条目与别名"""
+
+    def __init__(self, directory, max_distance=3, aspect_tolerance=0.02, color_tolerance=12):
+        self.directory = directory
+        self.max_distance = max_distance
+        self.aspect_tolerance = aspect_tolerance
+        self.color_tolerance = color_tolerance
+        self.entries = {}
+        self.exact = {}
+        self.bands = [{} for _ in range(BANDS)]
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        self.index_path = os.path.join(directory, "index.jsonl")
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if "alias" in record:
+                    if record["id"] in self.entries:
+                        self.exact[record["alias"]] = record["id"]
+                elif os.path.exists(self._path(record["id"])):
+                    self._index(record)
+
+    def _index(self, entry):
+        self.entries[entry["id"]] = entry
+        self.exact[entry["id"]] = entry["id"]
+        for i, band in _bands(entry["phash"]):
+            self.bands[i].setdefault(band, set()).add(entry["id"])
+
+    def _append(self, record):
+        with self.write_lock, open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def _path(self, entry_id, suffix=".png"):
+        return os.path.join(self.directory, "objects", entry_id[:2], entry_id + suffix)
+
+    def _similar(self, entry, color, width, height):
+        a, b = entry["w"] / entry["h"], width / height
+        if abs(a - b) > self.aspect_tolerance * b:
+            return False
+        diff = sum(abs(x - y) for x, y in zip(entry["color"], color)) / len(color)
+        return diff <= self.color_tolerance
+
+    def lookup(self, sha, phash=None, color=None, width=None, height=None):
+        """返回 (条目, "exact" | "phash", 汉明距离)；未命中返回 (None, None, None)"""
+        with self.lock:
+            entry_id = self.exact.get(sha)
+            if entry_id:
+                return self.entries[entry_id], "exact", 0
+            if phash is None:
+                return None, None, None
+            if self.max_distance <= BANDS - 1:
+                candidates = set()
+                for i, band in _bands(phash):
+                    candidates |= self.bands[i].get(band, set())
+            else:
+                candidates = self.entries.keys()
+            best, best_distance = None, None
+            for cid in candidates:
+                entry = self.entries[cid]
+                distance = bin(entry["phash"] ^ phash).count("1")
+                if distance <= self.max_distance and self._similar(entry, color, width, height):
+                    if best is None or distance < best_distance:
+                        best, best_distance = entry, distance
+            if best is None:
+                return None, None, None
+            self.exact[sha] = best["id"]
+        self._append({"alias": sha, "id": best["id"]})
+        return best, "phash", best_distance
+
+    def add(self, sha, phash, color, width, height, cutout, mask, seg_ms):
+        entry = {"id": sha, "phash": phash, "color": color, "w": width, "h": height, "seg_ms": round(seg_ms, 1),
+                 "created": time.time()}
+        path = self._path(sha)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        for target, data in ((path, cutout), (self._path(sha, ".mask.png"), mask)):
+            tmp = f"{target}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, target)
+        with self.lock:
+            self._index(entry)
+        self._append(entry)
+        return entry
+
+    def read(self, entry):
+        with open(self._path(entry["id"]), "rb") as f:
+            cutout = f.read()
+        mask_path = self._path(entry["id"], ".mask.png")
+        if os.path.exists(mask_path):
+            with open(mask_path, "rb") as f:
+                mask = f.read()
+        else:
+            mask = make_mask(cutout)
+        return cutout, mask
+
+    def stats(self):
+        total = 0
+        for root, _, names in os.walk(os.path.join(self.directory, "objects")):
+            for name in names:
+                total += os.path.getsize(os.path.join(root, name))
+        with self.lock:
+            return {"entries": len(self.entries), "aliases": len(self.exact) - len(self.entries), "bytes": total}
+
+
+class SegmentError(Exception):
+    pass
+
+
+class Segmenter:
+    """调阿里云 SegmentCommodity：原图由本服务托管在 /src/<sha>，结果 URL 下载后返回 PNG 字节"""
+
+    def __init__(self, creds, public_url, base_url=None, timeout=60):
+        self.creds = creds
+        self.public_url = (public_url or "").rstrip("/")
+        self.base_url = (base_url or DEFAULT_BASE_URLS["aliyun-imageseg"]).rstrip("/")
+        self.timeout = timeout
+        self.sources = {}
+        self.lock = threading.Lock()
+
+    def source(self, sha):
+        with self.lock:
+            return self.sources.get(sha)
+
+    def segment(self, sha, image_bytes, profile):
+        if not self.public_url:
+            raise SegmentError("未配置 --public-url（CUTOUT_PUBLIC_URL），阿里云无法访问原图")
+        secret = self.creds.get(profile or "default") or self.creds.get("default")
+        if not secret:
+            raise SegmentError(f"没有 imageseg 凭证 profile: {profile or 'default'}")
+        with self.lock:
+            self.sources[sha] = image_bytes
+        try:
+            url = aliyun_rpc_url(self.base_url, secret["accessKeyId"], secret["accessKeySecret"],
+                                 "SegmentCommodity", {"ImageURL": f"{self.public_url}/src/{sha}"})
+            status, raw = _http("GET", url, timeout=self.timeout)
+        finally:
+            with self.lock:
+                self.sources.pop(sha, None)
+        data = _json(raw)
+        result_url = (data.get("Data") or {}).get("ImageURL")
+        if status != 200 or not result_url:
+            raise SegmentError(f"阿里云抠图失败: {data.get('Code') or status} {data.get('Message') or ''}".strip())
+        if result_url.startswith("http://") and "aliyuncs.com" in result_url:
+            result_url = "https://" + result_url[len("http://"):]
+        status, png = _http("GET", result_url, timeout=self.timeout)
+        if status != 200:
+            raise SegmentError(f"下载抠图结果失败: {status}")
+        return png
+
+
+class CutoutService:
+    def __init__(self, store, segmenter):
+        self.store = store
+        self.segmenter = segmenter
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.counters = {"lookups": 0, "exact": 0, "phash": 0, "miss": 0, "inflight": 0, "errors": 0}
+        self.saved_ms = 0.0
+        self.latency = {"hit": [], "miss": []}
+
+    def _record(self, outcome, ms, saved=0.0):
+        with self.lock:
+            self.counters["lookups"] += 1
+            self.counters[outcome] += 1
+            self.saved_ms += saved
+            bucket = self.latency["miss" if outcome == "miss" else "hit"]
+            bucket.append(ms)
+            if len(bucket) > 2000:
+                del bucket[:1000]
+
+    def cutout(self, image_bytes, profile=None):
+        """返回 (cutout_png, mask_png, 命中类型, 汉明距离, 条目 id)"""
+        started = time.perf_counter()
+        sha = hashlib.sha256(image_bytes).hexdigest()
+        entry, kind, distance = self.store.lookup(sha)
+        if entry is None:
+            phash, color, width, height = fingerprint(image_bytes)
+            entry, kind, distance = self.store.lookup(sha, phash, color, width, height)
+        if entry is not None:
+            cutout, mask = self.store.read(entry)
+            self._record(kind, (time.perf_counter() - started) * 1000, entry["seg_ms"])
+            return cutout, mask, kind, distance, entry["id"]
+
+        with self.lock:
+            waiter = self.inflight.get(sha)
+            leader = waiter is None
+            if leader:
+                waiter = self.inflight[sha] = {"event": threading.Event(), "entry": None, "error": None}
+        if not leader:
+            waiter["event"].wait(self.segmenter.timeout * 2)
+            if waiter["entry"] is None:
+                raise SegmentError(waiter["error"] or "抠图超时")
+            cutout, mask = self.store.read(waiter["entry"])
+            self._record("inflight", (time.perf_counter() - started) * 1000, waiter["entry"]["seg_ms"])
+            return cutout, mask, "inflight", 0, waiter["entry"]["id"]
+
+        try:
+            seg_started = time.perf_counter()
+            cutout = self.segmenter.segment(sha, image_bytes, profile)
+            seg_ms = (time.perf_counter() - seg_started) * 1000
+            mask = make_mask(cutout)
+            waiter["entry"] = self.store.add(sha, phash, color, width, height, cutout, mask, seg_ms)
+        except Exception as e:
+            waiter["error"] = str(e)
+            with self.lock:
+                self.counters["errors"] += 1
+            raise
+        finally:
+            waiter["event"].set()
+            with self.lock:
+                self.inflight.pop(sha, None)
+        self._record("miss", (time.perf_counter() - started) * 1000)
+        return cutout, mask, "miss", None, sha
+
+    def metrics(self):
+        with self.lock:
+            hits = self.counters["exact"] + self.counters["phash"] + self.counters["inflight"]
+            lookups = self.counters["lookups"]
+            snap = {
+                "counters": dict(self.counters),
+                "hit_ratio": round(hits / lookups, 4) if lookups else None,
+                "saved_ms": round(self.saved_ms, 1),
+                "latency_ms": {name: {"p50": percentile(v, 50), "p95": percentile(v, 95), "count": len(v)}
+                               for name, v in self.latency.items()},
+            }
+        snap["store"] = self.store.stats()
+        return snap
+
+
+class CutoutHandler(BaseHTTPRequestHandler):
+    server_version = "xhs-cutout/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            sys.stderr.write("[cutout] " + (fmt % args) + "\n")
+
+    def _send(self, status, body, content_type="application/json; charset=utf-8"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, obj):
+        self._send(status, json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+
+    def _authorized(self):
+        """校验共享令牌；未通过时已回 401"""
+        token = self.server.token
+        auth = self.headers.get("Authorization", "")
+        given = auth[7:].strip() if auth.startswith("Bearer ") else ""
+        if token and hmac.compare_digest(given.encode("utf-8"), token.encode("utf-8")):
+            return True
+        self._send_json(401, {"error": "unauthorized"})
+        return False
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/__metrics":
+            if self._authorized():
+                self._send_json(200, self.service.metrics())
+            return
+        if path.startswith("/src/"):
+            data = self.service.segmenter.source(path[len("/src/"):])
+            if data is None:
+                self._send_json(404, {"error": "not found"})
+                return
+            self._send(200, data, "application/octet-stream")
+            return
+        self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path.split("?")[0] != "/cutout":
+            self._send_json(404, {"error": "not found"})
+            return
+        if not self._authorized():
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length).decode("utf-8")) if length else {}
+            raw = body.get("imageBase64") or ""
+            image_bytes = base64.b64decode(raw.split("base64,", 1)[-1], validate=False)
+        except (ValueError, UnicodeDecodeError, AttributeError):
+            self._send_json(400, {"error": "imageBase64 无效"})
+            return
+        if not image_bytes:
+            self._send_json(400, {"error": "缺少 imageBase64"})
+            return
+        try:
+            cutout, mask, kind, distance, entry_id = self.service.cutout(image_bytes, body.get("profile"))
+        except SegmentError as e:
+            self._send_json(502, {"error": str(e)})
+            return
+        except OSError as e:
+            self._send_json(400 if "cannot identify image" in str(e) else 500, {"error": str(e)})
+            return
+        result = {"cutoutBase64": base64.b64encode(cutout).decode("ascii"), "cache": kind,
+                  "distance": distance, "id": entry_id}
+        if body.get("mask", True):
+            result["maskBase64"] = base64.b64encode(mask).decode("ascii")
+        self._send_json(200, result)
+
+
+def start_service(service, token, port=0, host="127.0.0.1", verbose=False):
+    """后台线程启动服务，返回 (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), CutoutHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.token = token
+    server.verbose = verbose
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def collect_creds(store_path=None):
+    targets = collect_env_targets()
+    if store_path:
+        targets += collect_store_targets(_store_list_from_file(store_path))
+    return {t.profile: t.secret for t in dedupe(targets) if t.type == "imageseg"}
+
+
+def bench(args):
+    """桩服务上依次请求：新图（未命中）→ 同一张（精确）→ 重新压缩 / 缩放（近似）→ 另一件商品（未命中）"""
+    import tempfile
+    from urllib import request as urlrequest
+    from stub_vendors import StubConfig, start_stub_server, stub_base_urls
+
+    Image, _ = _require_pillow()
+
+    def product(color, box, lid):
+        img = Image.new("RGB", (800, 1000), (235, 232, 225))
+        img.paste((215, 210, 200), (0, 760, 800, 1000))
+        img.paste(color, box)
+        img.paste((40, 40, 40), lid)
+        return img
+
+    def encode(img, fmt="JPEG", quality=92, scale=1.0):
+        if scale != 1.0:
+            img = img.resize((int(img.width * scale), int(img.height * scale)), Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, format=fmt, quality=quality)
+        return out.getvalue()
+
+    cup = product((30, 90, 160), (300, 200, 500, 850), (320, 130, 480, 200))
+    red_cup = product((170, 50, 50), (300, 200, 500, 850), (320, 130, 480, 200))
+    bag = product((180, 140, 90), (120, 380, 680, 880), (300, 300, 500, 380))
+    cases = [
+        ("保温杯原图（首次）", encode(cup)),
+        ("保温杯原图（重新生成）", encode(cup)),
+        ("保温杯重新压缩 q=75", encode(cup, quality=75)),
+        ("保温杯缩放 0.6 倍", encode(cup, scale=0.6)),
+        ("保温杯 PNG", encode(cup, fmt="PNG")),
+        ("保温杯红色款（同款不同色）", encode(red_cup)),
+        ("托特包（另一件商品）", encode(bag)),
+        ("托特包（逐张生成 ×1）", encode(bag)),
+    ]
+
+    stub, stub_url = start_stub_server(config=StubConfig(latency={"aliyun-imageseg": args.seg_latency}, seed=1))
+    creds = {"default": {"accessKeyId": "bench-ak", "accessKeySecret": "bench-sk"}}
+    with tempfile.TemporaryDirectory() as tmp:
+        segmenter = Segmenter(creds, "http://placeholder", stub_base_urls(stub_url)["aliyun-imageseg"])
+        service = CutoutService(CutoutStore(tmp, args.max_distance), segmenter)
+        token = "bench-token"
+        server, base_url = start_service(service, token)
+        segmenter.public_url = base_url
+        print(f"🧪 桩服务抠图延迟 ~{args.seg_latency}s，近似命中阈值 {args.max_distance}\n")
+        for label, data in cases:
+            payload = json.dumps({"imageBase64": base64.b64encode(data).decode("ascii")}).encode("utf-8")
+            req = urlrequest.Request(f"{base_url}/cutout", data=payload, method="POST",
+                                     headers={"Content-Type": "application/json",
+                                              "Authorization": f"Bearer {token}"})
+            started = time.perf_counter()
+            with urlrequest.urlopen(req, timeout=60) as resp:
+                result = json.loads(resp.read().decode("utf-8"))
+            ms = (time.perf_counter() - started) * 1000
+            distance = "" if result["distance"] is None else f"  距离 {result['distance']}"
+            print(f"   {label:<18} {result['cache']:<6} {ms:8.1f}ms{distance}")
+        snap = service.metrics()
+        server.shutdown()
+    stub.shutdown()
+    print(f"\n   命中率 {snap['hit_ratio']:.0%}   节省抠图耗时 {snap['saved_ms'] / 1000:.1f}s   "
+          f"阿里云调用 {snap['counters']['miss']} 次 / 请求 {snap['counters']['lookups']} 次")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="商品抠图缓存服务（感知哈希 + 精确哈希）")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", DEFAULT_PORT)))
+    parser.add_argument("--public-url", default=os.getenv("CUTOUT_PUBLIC_URL", ""),
+                        help="本服务的公网地址，阿里云通过它下载原图")
+    parser.add_argument("--token", default=os.getenv("CUTOUT_SERVICE_TOKEN", ""),
+                        help="/cutout 与 /__metrics 的共享令牌（默认 CUTOUT_SERVICE_TOKEN，应用用同一个值）")
+    parser.add_argument("--cache-dir", default=os.getenv("CUTOUT_CACHE_DIR", DEFAULT_CACHE_DIR))
+    parser.add_argument("--max-distance", type=int, default=3, help="近似命中的最大汉明距离（默认 3，0 表示只做精确匹配）")
+    parser.add_argument("--store", help="API_CREDENTIALS_JSON 来源文件（读取 imageseg 凭证）")
+    parser.add_argument("--base-url", default=os.getenv("IMAGESEG_BASE_URL"), help="覆盖阿里云 imageseg 地址")
+    parser.add_argument("--stub", action="store_true", help="把阿里云指向本地桩服务（离线联调）")
+    parser.add_argument("--timeout", type=int, default=60)
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--bench", action="store_true", help="离线演示命中情况与节省的耗时")
+    parser.add_argument("--seg-latency", type=float, default=1.5, help="--bench 桩服务抠图延迟秒数")
+    args = parser.parse_args(argv)
+
+    _require_pillow()
+    if args.bench:
+        return bench(args)
+
+    try:
+        creds = collect_creds(args.store)
+    except (OSError, ValueError) as e:
+        print(f"❌ 读取凭证失败: {e}")
+        return 1
+    base_url = args.base_url
+    if args.stub:
+        from stub_vendors import start_stub_server, stub_base_urls
+        _, stub_url = start_stub_server()
+        base_url = stub_base_urls(stub_url)["aliyun-imageseg"]
+        creds = creds or {"default": {"accessKeyId": "stub-ak", "accessKeySecret": "stub-sk"}}
+        print(f"🧪 使用本地桩服务: {stub_url}")
+    if not creds:
+        print("❌ 没有 imageseg 凭证（ALIBABA_CLOUD_ACCESS_KEY_ID / _SECRET 或 --store）")
+        return 1
+    if not args.token:
+        print("❌ 缺少共享令牌：设置 CUTOUT_SERVICE_TOKEN（或 --token），应用服务也要设置同一个值")
+        return 1
+
+    segmenter = Segmenter(creds, args.public_url, base_url, args.timeout)
+    service = CutoutService(CutoutStore(args.cache_dir, args.max_distance), segmenter)
+    server = ThreadingHTTPServer((args.host, args.port), CutoutHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.token = args.token
+    server.verbose = args.verbose
+    if not segmenter.public_url:
+        segmenter.public_url = f"http://127.0.0.1:{server.server_address[1]}" if args.stub else ""
+    print(f"✂️  抠图缓存服务已启动: http://{args.host}:{server.server_address[1]}")
+    print(f"   缓存目录: {args.cache_dir}（{service.store.stats()['entries']} 条）  profile: {', '.join(sorted(creds))}")
+    if not segmenter.public_url:
+        print("   ⚠️  未设置 --public-url，只能返回缓存命中，未命中的请求会失败")
+    print(f"   指标: http://{args.host}:{server.server_address[1]}/__metrics（需带令牌）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 已停止")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,573 @@
+#!/usr/bin/env python3
+"""
+数据库克隆：把线上 Postgres 的 User / Generation / SystemConfig 复制到预发或压测库
+
+  python3 db_clone.py --target-url postgresql://...staging --truncate
+  python3 db_clone.py --target-url ... --mask-phones --image-urls drop --sample 10
+  python3 db_clone.py bench                     # 离线：测压缩 imageUrls 路径的吞吐与内存
+
+源库默认读 DATABASE_URL，也可用 --from-zeabur 从 Zeabur 的 PostgreSQL 服务发现。
+每张表按主键区间切成 --jobs 段，每段一条 COPY ... TO STDOUT (FORMAT binary) 流，
+经内存中的有界管道直接灌进目标库的 COPY ... FROM STDIN，不落盘；内存占用约为 流数 × 管道容量。
+
+脱敏与抽样在源库的 SELECT 里完成，字节流原样转发；只有 --image-urls compress 需要在本地
+解析二进制 COPY 元组，把 data URL 图片重新编码成小缩略图。
+
+目标库需已执行迁移（python3 db_migrate.py --database-url 目标库）。先并行导入 User 与 SystemConfig，
+再导入依赖它们的 Generation，保证外键成立。抽样按用户 id 的哈希取，生成记录跟随其用户。
+
+依赖：pip install psycopg2-binary（--image-urls compress 另需 Pillow）
+"""
+
+import argparse
+import base64
+import io
+import json
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from db_pool import libpq_url, redact
+
+COPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+PIPE_CHUNK = 256 * 1024
+PIPE_DEPTH = 16
+SENSITIVE_MARKERS = ("KEY", "SECRET", "PASSWORD", "TOKEN", "CREDENTIALS")
+
+# 表 → 列（顺序即 COPY 的列顺序）；phase 小的先导入
+TABLES = {
+    "User": {"phase": 0, "columns": ["id", "phone", "password", "createdAt", "freeUsage", "tokenBalance"]},
+    "SystemConfig": {"phase": 0, "columns": ["id", "key", "value", "description", "updatedAt"]},
+    "Generation": {"phase": 1, "columns": ["id", "userId", "productName", "description", "copyResult",
+                                           "imageUrls", "createdAt"]},
+}
+# 清空目标库时一并清掉依赖这些表的数据（GenerationJob 引用 Generation）
+TRUNCATE_SQL = 'TRUNCATE "Generation", "User", "SystemConfig" CASCADE'
+
+THUMB_SIZE = 256
+THUMB_QUALITY = 60
+
+
+class CloneError(Exception):
+    """克隆失败（会中止所有流）"""
+
+
+# ---------------- SQL 生成 ----------------
+
+def _bucket(column):
+    """uuid 文本前 8 位十六进制 → 0..99 的稳定桶号，用于抽样"""
+    return f"((('x' || substr(md5({column}), 1, 8))::bit(32)::int & 2147483647) % 100)"
+
+
+def key_ranges(jobs):
+    """把 uuid 主键按前两位十六进制切成 jobs 段：[(下界, 上界)]，None 表示不限"""
+    jobs = max(1, min(jobs, 256))
+    bounds = [None] + [f"{round(256 * i / jobs):02x}" for i in range(1, jobs)] + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def select_sql(table, opts, key_range=(None, None)):
+    """源库的 SELECT：列表达式负责脱敏/丢弃，WHERE 负责分段与抽样"""
+    exprs = []
+    for col in TABLES[table]["columns"]:
+        expr = f'"{col}"'
+        if table == "User" and col == "phone" and opts.mask_phones:
+            # 保留号段，其余换成哈希：仍然唯一，且同一号码每次脱敏结果相同
+            expr = f"""left("phone", 3) || 'x' || substr(md5({_quote(opts.mask_salt)} || "phone"), 1, 12)"""
+        elif table == "User" and col == "password" and opts.mask_phones:
+            expr = "NULL::text"
+        elif table == "Generation" and col == "imageUrls" and opts.image_urls == "drop":
+            expr = "'[]'::text"
+        elif table == "SystemConfig" and col == "value" and opts.scrub_secrets:
+            sensitive = " OR ".join(f"upper(\"key\") LIKE '%{m}%'" for m in SENSITIVE_MARKERS)
+            expr = f"""CASE WHEN {sensitive} THEN '' ELSE "value" END"""
+        exprs.append(f"{expr} AS \"{col}\"")
+
+    where = []
+    low, high = key_range
+    if low:
+        where.append(f"\"id\" >= '{low}'")
+    if high:
+        where.append(f"\"id\" < '{high}'")
+    if opts.sample < 100:
+        if table == "User":
+            where.append(f"{_bucket(chr(34) + 'id' + chr(34))} < {opts.sample}")
+        elif table == "Generation":
+            where.append(f"{_bucket(chr(34) + 'userId' + chr(34))} < {opts.sample}")
+    sql = f'SELECT {", ".join(exprs)} FROM "{table}"'
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql
+
+
+def _quote(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+# ---------------- 内存管道 ----------------
+
+class Pipe:
+    """
+    两条 COPY 之间的内存管道：源端 write、目标端 read。
+    队列有界，目标库写得慢时源端阻塞（背压），内存占用不超过 PIPE_DEPTH × PIPE_CHUNK。
+    """
+
+    def __init__(self, depth=PIPE_DEPTH, chunk=PIPE_CHUNK):
+        self._queue = queue.Queue(maxsize=depth)
+        self._chunk = chunk
+        self._out = []
+        self._out_size = 0
+        self._pending = b""
+        self._eof = False
+        self.aborted = threading.Event()
+        self.bytes = 0
+
+    # 源端（psycopg2 copy_expert 的 file.write）
+    def write(self, data):
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        self._out.append(data)
+        self._out_size += len(data)
+        self.bytes += len(data)
+        if self._out_size >= self._chunk:
+            self._put(b"".join(self._out))
+            self._out, self._out_size = [], 0
+        return len(data)
+
+    def _put(self, item):
+        while True:
+            if self.aborted.is_set():
+                raise CloneError("目标端已中止")
+            try:
+                self._queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def close(self, error=None):
+        """源端结束；error 不为空时让目标端的 COPY 失败回滚"""
+        if error is not None:
+            self._put(error)
+            return
+        if self._out:
+            self._put(b"".join(self._out))
+            self._out, self._out_size = [], 0
+        self._put(None)
+
+    # 目标端（psycopg2 copy_expert 的 file.read）
+    def read(self, size=-1):
+        while not self._pending and not self._eof:
+            try:
+                item = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if self.aborted.is_set():
+                    raise CloneError("源端已中止")
+                continue
+            if item is None:
+                self._eof = True
+            elif isinstance(item, BaseException):
+                raise CloneError(f"源端失败: {item}")
+            else:
+                self._pending = item
+        if size is None or size < 0:
+            size = len(self._pending)
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+    readline = read
+
+
+# ---------------- 二进制 COPY 元组改写（imageUrls 压缩） ----------------
+
+class TupleRewriter:
+    """
+    流式解析二进制 COPY（签名 + 头 + 逐行 [int16 列数][int32 长度 + 数据]... + 结尾 -1），
+    对指定列调用 transform(bytes) 后重新编码，写入下游。一次只缓存一行。
+    """
+
+    def __init__(self, downstream, column, transform):
+        self.downstream = downstream
+        self.column = column
+        self.transform = transform
+        self.buf = bytearray()
+        self.header_done = False
+        self.rows = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def write(self, data):
+        self.buf += data
+        self.bytes_in += len(data)
+        if not self.header_done:
+            if len(self.buf) < 19:
+                return len(data)
+            if bytes(self.buf[:11]) != COPY_SIGNATURE:
+                raise CloneError("不是二进制 COPY 数据")
+            ext = struct.unpack("!I", self.buf[15:19])[0]
+            if len(self.buf) < 19 + ext:
+                return len(data)
+            self._emit(bytes(self.buf[:19 + ext]))
+            del self.buf[:19 + ext]
+            self.header_done = True
+        while self._next_tuple():
+            pass
+        return len(data)
+
+    def _next_tuple(self):
+        buf = self.buf
+        if len(buf) < 2:
+            return False
+        count = struct.unpack_from("!h", buf, 0)[0]
+        if count == -1:
+            self._emit(bytes(buf[:2]))
+            del buf[:2]
+            return False
+        pos, fields = 2, []
+        for _ in range(count):
+            if len(buf) < pos + 4:
+                return False
+            size = struct.unpack_from("!i", buf, pos)[0]
+            pos += 4
+            if size < 0:
+                fields.append(None)
+                continue
+            if len(buf) < pos + size:
+                return False
+            fields.append(bytes(buf[pos:pos + size]))
+            pos += size
+        del buf[:pos]
+        if fields[self.column] is not None:
+            fields[self.column] = self.transform(fields[self.column])
+        out = [struct.pack("!h", count)]
+        for value in fields:
+            if value is None:
+                out.append(struct.pack("!i", -1))
+            else:
+                out.append(struct.pack("!i", len(value)))
+                out.append(value)
+        self._emit(b"".join(out))
+        self.rows += 1
+        return True
+
+    def _emit(self, data):
+        self.bytes_out += len(data)
+        self.downstream.write(data)
+
+
+def compress_image_urls(value):
+    """imageUrls（JSON 数组）里的 data URL 图片缩成 THUMB_SIZE 的 JPEG 缩略图；普通 URL 原样保留"""
+    try:
+        urls = json.loads(value)
+    except ValueError:
+        return value
+    if not isinstance(urls, list):
+        return value
+    changed = False
+    for i, url in enumerate(urls):
+        if isinstance(url, str) and url.startswith("data:image/"):
+            thumb = _thumbnail(url)
+            if thumb and len(thumb) < len(url):
+                urls[i] = thumb
+                changed = True
+    if not changed:
+        return value
+    return json.dumps(urls, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _thumbnail(data_url):
+    from PIL import Image
+
+    try:
+        raw = base64.b64decode(data_url.split(",", 1)[1])
+        with Image.open(io.BytesIO(raw)) as img:
+            img.thumbnail((THUMB_SIZE, THUMB_SIZE))
+            out = io.BytesIO()
+            img.convert("RGB").save(out, "JPEG", quality=THUMB_QUALITY, optimize=True)
+    except Exception:
+        return None
+    return "data:image/jpeg;base64," + base64.b64encode(out.getvalue()).decode()
+
+
+# ---------------- 克隆 ----------------
+
+def _connect(url):
+    try:
+        import psycopg2
+    except ImportError:
+        print("❌ 缺少依赖 psycopg2，请先执行: pip install psycopg2-binary")
+        sys.exit(1)
+    return psycopg2.connect(libpq_url(url))
+
+
+def copy_stream(source_url, target_url, table, key_range, opts, snapshot=None):
+    """一段数据：源 COPY TO → 管道 →（可选改写）→ 目标 COPY FROM；各自一个事务"""
+    started = time.perf_counter()
+    select = select_sql(table, opts, key_range)
+    columns = ", ".join(f'"{c}"' for c in TABLES[table]["columns"])
+    pipe = Pipe()
+    source = _connect(source_url)
+    target = _connect(target_url)
+    rewriter = None
+    sink = pipe
+    if table == "Generation" and opts.image_urls == "compress":
+        rewriter = sink = TupleRewriter(pipe, TABLES[table]["columns"].index("imageUrls"), compress_image_urls)
+
+    def produce():
+        try:
+            with source.cursor() as cur:
+                # 所有流共用协调连接导出的快照（与 pg_dump -j 相同），各段、各表看到同一时刻的数据
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+                if snapshot:
+                    cur.execute(f"SET TRANSACTION SNAPSHOT {_quote(snapshot)}")
+                cur.copy_expert(f"COPY ({select}) TO STDOUT (FORMAT binary)", sink, size=PIPE_CHUNK)
+            pipe.close()
+        except BaseException as e:
+            try:
+                pipe.close(e)
+            except CloneError:
+                pass
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        with target.cursor() as cur:
+            cur.copy_expert(f'COPY "{table}" ({columns}) FROM STDIN (FORMAT binary)', pipe, size=PIPE_CHUNK)
+            rows = cur.rowcount
+        target.commit()
+    except BaseException:
+        pipe.aborted.set()
+        target.rollback()
+        raise
+    finally:
+        producer.join()
+        source.close()
+        target.close()
+    return {
+        "table": table,
+        "range": key_range,
+        "rows": rows,
+        "bytes": pipe.bytes,
+        "source_bytes": rewriter.bytes_in if rewriter else pipe.bytes,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def prepare_target(target_url, truncate):
+    conn = _connect(target_url)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('\"Generation\"') IS NOT NULL")
+            if not cur.fetchone()[0]:
+                raise CloneError("目标库没有表结构，请先执行: python3 db_migrate.py --database-url <目标库>")
+            if truncate:
+                cur.execute(TRUNCATE_SQL)
+            else:
+                for table in TABLES:
+                    cur.execute(f'SELECT EXISTS (SELECT 1 FROM "{table}")')
+                    if cur.fetchone()[0]:
+                        raise CloneError(f"目标库 {table} 表不为空，加 --truncate 先清空（会一并清空 GenerationJob）")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def export_snapshot(source_url):
+    """打开一个可重复读事务并导出快照；返回 (连接, 快照 ID)，连接需保持到所有流开始读取之后"""
+    conn = _connect(source_url)
+    with conn.cursor() as cur:
+        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        cur.execute("SELECT pg_export_snapshot()")
+        return conn, cur.fetchone()[0]
+
+
+def clone(source_url, target_url, opts):
+    prepare_target(target_url, opts.truncate)
+    holder, snapshot = export_snapshot(source_url)
+    try:
+        return _clone_phases(source_url, target_url, opts, snapshot)
+    finally:
+        holder.rollback()
+        holder.close()
+
+
+def _clone_phases(source_url, target_url, opts, snapshot):
+    results = []
+    phases = sorted({TABLES[t]["phase"] for t in opts.tables})
+    for phase in phases:
+        streams = [(t, r) for t in opts.tables if TABLES[t]["phase"] == phase
+                   for r in (key_ranges(opts.jobs) if t != "SystemConfig" else [(None, None)])]
+        with ThreadPoolExecutor(max_workers=opts.parallel) as pool:
+            futures = {pool.submit(copy_stream, source_url, target_url, t, r, opts, snapshot): (t, r) for t, r in streams}
+            for future in as_completed(futures):
+                table, key_range = futures[future]
+                try:
+                    r = future.result()
+                except Exception as e:
+                    for f in futures:
+                        f.cancel()
+                    raise CloneError(f"{table} {_range_label(key_range)} 失败: {e}")
+                results.append(r)
+                mb = r["bytes"] / 1e6
+                print(f"   ✅ {table:<12} {_range_label(key_range):<9} {r['rows']:>9} 行 {mb:9.1f} MB "
+                      f"{r['seconds']:6.1f}s（{mb / max(r['seconds'], 1e-6):.1f} MB/s）")
+    return results
+
+
+def _range_label(key_range):
+    low, high = key_range
+    if not low and not high:
+        return "全部"
+    return f"{low or '00'}-{high or 'ff'}"
+
+
+def print_summary(results, wall):
+    print("\n" + "=" * 60)
+    print("📊 克隆汇总")
+    print("=" * 60)
+    by_table = {}
+    for r in results:
+        t = by_table.setdefault(r["table"], {"rows": 0, "bytes": 0, "source_bytes": 0, "streams": 0})
+        t["rows"] += r["rows"]
+        t["bytes"] += r["bytes"]
+        t["source_bytes"] += r["source_bytes"]
+        t["streams"] += 1
+    for name, t in by_table.items():
+        shrink = f"（压缩前 {t['source_bytes'] / 1e6:.1f} MB）" if t["source_bytes"] != t["bytes"] else ""
+        print(f"   {name:<12} {t['rows']:>9} 行  {t['bytes'] / 1e6:9.1f} MB{shrink}  {t['streams']} 条流")
+    total = sum(r["bytes"] for r in results)
+    print(f"\n   ⏱️  墙钟 {wall:.1f}s，共 {total / 1e6:.1f} MB（{total / 1e6 / max(wall, 1e-6):.1f} MB/s）")
+
+
+def _source_url(args):
+    if args.from_zeabur:
+        import zeabur_api
+        found = zeabur_api.discover()
+        if not found["database_url"]:
+            print("❌ Zeabur 项目中没有找到 PostgreSQL 的 DATABASE_URL")
+            sys.exit(1)
+        return found["database_url"]
+    url = args.source_url or os.getenv("DATABASE_URL")
+    if not url:
+        print("❌ 缺少源库地址（--source-url、DATABASE_URL 或 --from-zeabur）")
+        sys.exit(1)
+    return url
+
+
+def cmd_clone(args):
+    if not args.target_url:
+        print("❌ 缺少 --target-url（或环境变量 CLONE_TARGET_URL）")
+        return 1
+    source_url = _source_url(args)
+    if source_url.split("?")[0] == args.target_url.split("?")[0]:
+        print("❌ 源库与目标库相同，拒绝执行")
+        return 1
+    if args.image_urls == "compress":
+        try:
+            import PIL  # noqa: F401
+        except ImportError:
+            print("❌ --image-urls compress 需要 Pillow，请先执行: pip install Pillow")
+            return 1
+    args.tables = [t for t in TABLES if t in args.tables]
+    print(f"🧬 克隆 {redact(source_url)} → {redact(args.target_url)}")
+    print(f"   表 {', '.join(args.tables)}；每表 {args.jobs} 段，同时 {args.parallel} 条流；"
+          f"抽样 {args.sample}%；手机号{'脱敏' if args.mask_phones else '原样'}；imageUrls {args.image_urls}")
+    started = time.perf_counter()
+    try:
+        results = clone(source_url, args.target_url, args)
+    except CloneError as e:
+        print(f"❌ {e}")
+        print("💡 已完成的段已提交，修复后加 --truncate 重新执行")
+        return 1
+    print_summary(results, time.perf_counter() - started)
+    return 0
+
+
+def cmd_bench(args):
+    """离线：合成 Generation 的二进制 COPY 流，测 TupleRewriter + 管道的吞吐与峰值内存"""
+    import tracemalloc
+    from PIL import Image
+
+    # 噪点图：PNG 体积接近真实生成图（约 1-2 MB），而不是纯色图的几 KB
+    img = Image.merge("RGB", [Image.effect_noise((1024, 1365), 40)] * 3)
+    out = io.BytesIO()
+    img.save(out, "PNG")
+    data_url = "data:image/png;base64," + base64.b64encode(out.getvalue()).decode()
+    image_urls = json.dumps([data_url] * args.images).encode()
+
+    def row(i):
+        fields = [f"{i:08x}-0000-4000-8000-000000000000".encode(), b"u" * 36, "商品".encode(), None,
+                  "文案".encode() * 50, image_urls, struct.pack("!q", 0)]
+        parts = [struct.pack("!h", len(fields))]
+        for f in fields:
+            parts.append(struct.pack("!i", -1) if f is None else struct.pack("!i", len(f)) + f)
+        return b"".join(parts)
+
+    header = COPY_SIGNATURE + struct.pack("!II", 0, 0)
+    pipe = Pipe()
+    rewriter = TupleRewriter(pipe, TABLES["Generation"]["columns"].index("imageUrls"), compress_image_urls)
+    received = {"bytes": 0}
+
+    def consume():
+        while True:
+            chunk = pipe.read(PIPE_CHUNK)
+            if not chunk:
+                return
+            received["bytes"] += len(chunk)
+
+    tracemalloc.start()
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    started = time.perf_counter()
+    rewriter.write(header)
+    for i in range(args.rows):
+        # 按 64KB 切块写入，模拟网络上收到的 CopyData
+        data = row(i)
+        for pos in range(0, len(data), 65536):
+            rewriter.write(data[pos:pos + 65536])
+    rewriter.write(struct.pack("!h", -1))
+    pipe.close()
+    consumer.join()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"🧪 {args.rows} 行 Generation（每行 {args.images} 张 data URL 图片，{len(image_urls) / 1e6:.2f} MB）")
+    print(f"   输入 {rewriter.bytes_in / 1e6:.1f} MB → 输出 {received['bytes'] / 1e6:.1f} MB，"
+          f"{elapsed:.2f}s（{rewriter.bytes_in / 1e6 / elapsed:.1f} MB/s 输入）")
+    print(f"   峰值内存 {peak / 1e6:.1f} MB（与总数据量无关，约为管道容量 + 单行大小）")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="并行二进制 COPY 克隆数据库（脱敏 / 抽样 / 压缩图片）")
+    sub = parser.add_subparsers(dest="command")
+    bench = sub.add_parser("bench", help="离线测 imageUrls 压缩路径的吞吐与内存")
+    bench.add_argument("--rows", type=int, default=40)
+    bench.add_argument("--images", type=int, default=3)
+    bench.set_defaults(func=cmd_bench)
+
+    parser.add_argument("--source-url", help="源库，默认读取环境变量 DATABASE_URL")
+    parser.add_argument("--from-zeabur", action="store_true", help="从 Zeabur 项目的 PostgreSQL 服务读取源库地址")
+    parser.add_argument("--target-url", default=os.getenv("CLONE_TARGET_URL"), help="目标库（需已执行迁移）")
+    parser.add_argument("--truncate", action="store_true", help="导入前清空目标库的这几张表")
+    parser.add_argument("--tables", nargs="+", default=list(TABLES), choices=list(TABLES))
+    parser.add_argument("--jobs", type=int, default=4, help="每张表按主键切成几段")
+    parser.add_argument("--parallel", type=int, default=8, help="同时进行的 COPY 流数")
+    parser.add_argument("--sample", type=int, default=100, help="按用户抽样的百分比（1-100）")
+    parser.add_argument("--mask-phones", action="store_true", help="手机号脱敏（保留号段、仍唯一），并清空密码")
+    parser.add_argument("--mask-salt", default=os.getenv("CLONE_MASK_SALT", "xhs"), help="脱敏哈希的盐")
+    parser.add_argument("--image-urls", choices=("keep", "drop", "compress"), default="keep",
+                        help="Generation.imageUrls：原样 / 清空 / data URL 图片缩成缩略图")
+    parser.add_argument("--scrub-secrets", action="store_true", help="SystemConfig 中密钥类配置置空")
+    parser.set_defaults(func=cmd_clone)
+    args = parser.parse_args(argv)
+    if not 1 <= getattr(args, "sample", 100) <= 100:
+        parser.error("--sample 取值 1-100")
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
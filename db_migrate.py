@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+发布前数据库迁移（每个版本只跑一次）
+
+容器启动不再执行 prisma migrate deploy；改由部署脚本在触发部署前调用本模块：
+  - 计算 web 2/prisma/migrations 的内容哈希（迁移哈希）
+  - 与本地记录（.deploy_state.json，按数据库区分）比对，相同则跳过
+  - 不同则用 prisma CLI 执行 migrate deploy，成功后记录哈希与耗时
+
+记录下来的耗时就是以前每次容器冷启动都要多付出的时间。
+
+用法：
+  export DATABASE_URL='postgresql://...'
+  python3 db_migrate.py             # 需要时执行迁移
+  python3 db_migrate.py --status    # 只查看迁移哈希与记录
+  python3 db_migrate.py --force     # 忽略记录强制执行
+
+需要本机有 Node.js（默认通过 npx 调用 prisma@5.22.0，可用 PRISMA_CLI 覆盖）
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+WEB_DIR = os.path.join(ROOT_DIR, "web 2")
+MIGRATIONS_DIR = os.path.join(WEB_DIR, "prisma", "migrations")
+SCHEMA_PATH = "./prisma/schema.prisma"
+STATE_FILE = os.path.join(ROOT_DIR, ".deploy_state.json")
+# 与 Dockerfile 中固定的版本一致
+DEFAULT_PRISMA_CLI = "npx --yes prisma@5.22.0"
+PLACEHOLDER_MARKERS = ("user:password@host", "@host:port")
+
+
+def migrations_hash(migrations_dir=MIGRATIONS_DIR):
+    """迁移目录的内容哈希：按目录名排序，逐个混入 migration.sql 的内容与 migration_lock.toml"""
+    h = hashlib.sha256()
+    for name in sorted(os.listdir(migrations_dir)):
+        path = os.path.join(migrations_dir, name)
+        sql = os.path.join(path, "migration.sql")
+        if os.path.isdir(path) and os.path.exists(sql):
+            with open(sql, "rb") as f:
+                h.update(name.encode("utf-8") + b"\0" + hashlib.sha256(f.read()).digest())
+        elif name == "migration_lock.toml":
+            with open(path, "rb") as f:
+                h.update(b"lock\0" + f.read())
+    return h.hexdigest()[:16]
+
+
+def migration_names(migrations_dir=MIGRATIONS_DIR):
+    return sorted(n for n in os.listdir(migrations_dir)
+                  if os.path.exists(os.path.join(migrations_dir, n, "migration.sql")))
+
+
+def database_key(database_url):
+    """记录按数据库区分，key 中不含密码"""
+    u = urlparse(database_url)
+    return f"{u.hostname}:{u.port or 5432}{u.path}"
+
+
+def is_placeholder(database_url):
+    return not database_url or any(m in database_url for m in PLACEHOLDER_MARKERS)
+
+
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return {}
+    try:
+        with open(STATE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state):
+    with open(STATE_FILE, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def applied_record(database_url):
+    return load_state().get("migrations", {}).get(database_key(database_url))
+
+
+def run_migrations(database_url, force=False):
+    """
+    执行（或跳过）迁移，返回结果字典：
+      {"hash", "skipped", "seconds", "ok", "error"}
+    """
+    current = migrations_hash()
+    result = {"hash": current, "skipped": False, "seconds": 0.0, "ok": True, "error": ""}
+
+    if is_placeholder(database_url):
+        result.update(skipped=True, ok=False, error="DATABASE_URL 未配置（占位符）")
+        return result
+
+    record = applied_record(database_url)
+    if record and record.get("hash") == current and not force:
+        result["skipped"] = True
+        return result
+
+    cli = shlex.split(os.getenv("PRISMA_CLI", DEFAULT_PRISMA_CLI))
+    env = dict(os.environ, DATABASE_URL=database_url)
+    started = time.perf_counter()
+    try:
+        proc = subprocess.run(cli + ["migrate", "deploy", f"--schema={SCHEMA_PATH}"],
+                              cwd=WEB_DIR, env=env, capture_output=True, text=True, timeout=600)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        result.update(ok=False, error=f"无法执行 prisma: {e}", seconds=time.perf_counter() - started)
+        return result
+    result["seconds"] = round(time.perf_counter() - started, 2)
+
+    if proc.returncode != 0:
+        tail = (proc.stderr or proc.stdout).strip().splitlines()[-5:]
+        result.update(ok=False, error="\n".join(tail))
+        return result
+
+    state = load_state()
+    state.setdefault("migrations", {})[database_key(database_url)] = {
+        "hash": current,
+        "migrations": migration_names(),
+        "appliedAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "seconds": result["seconds"],
+    }
+    save_state(state)
+    return result
+
+
+def report(result):
+    """部署脚本共用的输出格式；返回是否可以继续部署"""
+    if result["ok"] and result["skipped"]:
+        print(f"✅ 迁移哈希 {result['hash']} 已应用过，跳过迁移")
+        return True
+    if result["skipped"]:
+        print(f"⚠️  跳过迁移: {result['error']}")
+        return False
+    if result["ok"]:
+        print(f"✅ 迁移完成（哈希 {result['hash']}，耗时 {result['seconds']}s）")
+        print(f"   💡 容器启动不再执行迁移，每次冷启动约可省下 {result['seconds']}s")
+        return True
+    print(f"❌ 迁移失败: {result['error']}")
+    return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="发布前执行数据库迁移（每个版本只跑一次）")
+    parser.add_argument("--database-url", help="缺省读取环境变量 DATABASE_URL")
+    parser.add_argument("--force", action="store_true", help="忽略本地记录，强制执行 migrate deploy")
+    parser.add_argument("--status", action="store_true", help="只显示迁移哈希与已应用记录")
+    args = parser.parse_args(argv)
+
+    database_url = args.database_url or os.getenv("DATABASE_URL", "")
+    current = migrations_hash()
+    print(f"📦 本地迁移: {len(migration_names())} 个，哈希 {current}")
+
+    if args.status:
+        if is_placeholder(database_url):
+            print("⚠️  未设置 DATABASE_URL，无法查看记录")
+            return 0
+        record = applied_record(database_url)
+        if not record:
+            print("📝 该数据库还没有迁移记录")
+        else:
+            same = "（与本地一致）" if record["hash"] == current else "（需要迁移）"
+            print(f"📝 已应用: {record['hash']} {same}  时间 {record['appliedAt']}  耗时 {record['seconds']}s")
+        return 0
+
+    if is_placeholder(database_url):
+        print("❌ 缺少 DATABASE_URL（可用 --database-url 指定）")
+        return 1
+
+    print("🗄️  检查数据库迁移...")
+    return 0 if report(run_migrations(database_url, force=args.force)) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,951 @@
+#!/usr/bin/env python3
+"""
+Postgres 连接诊断与连接池（PgBouncer 事务模式的本地替身）
+
+应用每个副本里的 Prisma 各自维护一个连接池（默认 CPU 核数×2+1 条），副本一多，
+数据库的 max_connections 很快被占满。本工具用来：
+
+  python3 db_pool.py stats [--watch 5]                     # pg_stat_activity：按实例/应用/状态统计连接数
+  python3 db_pool.py url --connection-limit 5 [--pooler-url URL]
+                                                           # 打印改写后的 DATABASE_URL（connection_limit / pgbouncer=true）
+  python3 db_pool.py pooler --port 6432 --pool-size 20     # 本地/自建：事务级连接池，上游读 DATABASE_URL
+  python3 db_pool.py report --replicas 1,2,4 --connection-limit 5 [--via postgresql://...@127.0.0.1:6432/db]
+                                                           # 模拟 N 个副本压测，记录数据库连接数与查询延迟
+  python3 db_pool.py bench                                 # 离线：内置模拟 Postgres，对比直连与经连接池
+
+连接池按事务复用上游连接：客户端发起查询时借出一条上游连接，收到 ReadyForQuery(空闲) 后归还。
+与 PgBouncer 事务模式的限制相同：不能依赖会话级状态（SET、LISTEN、命名预处理语句），
+所以经连接池时 DATABASE_URL 要带 pgbouncer=true（Prisma 会改用匿名预处理语句）。
+迁移（db_migrate.py）始终直连数据库。
+
+只用标准库实现了协议客户端（支持 trust / 明文 / MD5 / SCRAM-SHA-256 认证），无需 psycopg2。
+"""
+
+import argparse
+import base64
+import collections
+import hashlib
+import hmac
+import os
+import random
+import select
+import socket
+import socketserver
+import ssl
+import struct
+import sys
+import threading
+import time
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit, urlunsplit
+
+from credential_smoke import percentile
+
+DEFAULT_POOLER_PORT = 6432
+PROTOCOL_VERSION = 196608
+SSL_REQUEST = 80877103
+GSSENC_REQUEST = 80877104
+CANCEL_REQUEST = 80877102
+# 会让后端回一条 ReadyForQuery 的客户端消息：Query / Sync / FunctionCall
+SYNC_MESSAGES = (b"Q", b"S", b"F")
+
+STATS_SQL = """
+SELECT coalesce(host(client_addr), 'local') AS addr,
+       coalesce(nullif(application_name, ''), '-') AS app,
+       coalesce(state, '-') AS state,
+       count(*)
+FROM pg_stat_activity
+WHERE datname = current_database() AND pid <> pg_backend_pid()
+GROUP BY 1, 2, 3
+ORDER BY 1, 2, 3
+"""
+# Prisma 认、libpq 不认的 URL 参数
+PRISMA_ONLY_PARAMS = ("connection_limit", "pool_timeout", "pgbouncer", "schema", "socket_timeout",
+                      "statement_cache_size", "sslaccept", "sslidentity")
+COUNT_SQL = "SELECT count(*) FROM pg_stat_activity WHERE datname = current_database() AND pid <> pg_backend_pid()"
+
+
+class PgError(Exception):
+    """数据库返回的错误，或协议/连接错误"""
+
+
+# ---------------- URL 改写 ----------------
+
+def pooled_database_url(url, connection_limit=None, pgbouncer=False, pool_timeout=None):
+    """
+    给 DATABASE_URL 加上 Prisma 连接池参数：connection_limit（每个副本的连接数上限）、
+    pgbouncer=true（经事务级连接池时必须）、pool_timeout（等待空闲连接的秒数）。
+    """
+    if not url or "://" not in url:
+        return url
+    parts = urlsplit(url)
+    params = dict(parse_qsl(parts.query, keep_blank_values=True))
+    if connection_limit:
+        params["connection_limit"] = str(int(connection_limit))
+    if pgbouncer:
+        params["pgbouncer"] = "true"
+    if pool_timeout is not None:
+        params["pool_timeout"] = str(int(pool_timeout))
+    return urlunsplit(parts._replace(query=urlencode(params)))
+
+
+def libpq_url(url):
+    """
+    去掉 Prisma 专用的查询参数，供 psycopg2 / libpq 连接。应用的 DATABASE_URL 可能带 connection_limit、
+    pgbouncer=true 等参数（见 pooled_database_url），libpq 遇到不认识的参数会直接报
+    invalid URI query parameter，worker 等 Python 工具与应用共用同一个 DATABASE_URL 时要先过一遍。
+    """
+    if not url or "://" not in url:
+        return url
+    parts = urlsplit(url)
+    params = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in PRISMA_ONLY_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(params)))
+
+
+def redact(url):
+    parts = urlsplit(url)
+    if parts.password:
+        netloc = parts.netloc.replace(":" + parts.password + "@", ":***@")
+        return urlunsplit(parts._replace(netloc=netloc))
+    return url
+
+
+# ---------------- 协议基础 ----------------
+
+def _message(kind, payload=b""):
+    return kind + struct.pack("!I", len(payload) + 4) + payload
+
+
+def _cstr(value):
+    return value.encode("utf-8") + b"\0"
+
+
+def _error_fields(payload):
+    fields = {}
+    for part in payload.split(b"\0"):
+        if part:
+            fields[chr(part[0])] = part[1:].decode("utf-8", "replace")
+    return fields
+
+
+def _error_response(message, code="08006", severity="FATAL"):
+    payload = b"".join(k.encode() + _cstr(v) for k, v in (("S", severity), ("V", severity), ("C", code),
+                                                           ("M", message))) + b"\0"
+    return _message(b"E", payload)
+
+
+class _Stream:
+    """在 socket 上按消息切分（类型 1 字节 + 长度 4 字节）"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buf = b""
+
+    def _fill(self):
+        try:
+            chunk = self.sock.recv(65536)
+        except (ConnectionError, ssl.SSLError):
+            chunk = b""
+        if not chunk:
+            return False
+        self.buf += chunk
+        return True
+
+    def _take(self):
+        if len(self.buf) < 5:
+            return None
+        size = struct.unpack("!I", self.buf[1:5])[0] + 1
+        if len(self.buf) < size:
+            return None
+        raw, self.buf = self.buf[:size], self.buf[size:]
+        return raw
+
+    def recv(self):
+        """阻塞读一条消息，返回 (类型, 内容)；连接断开抛 PgError"""
+        while True:
+            raw = self._take()
+            if raw is not None:
+                return raw[:1], raw[5:]
+            if not self._fill():
+                raise PgError("连接已断开")
+
+    def read_available(self):
+        """读一次 socket，返回已完整的原始消息列表；对端关闭返回 None"""
+        if not self._fill():
+            return None
+        while isinstance(self.sock, ssl.SSLSocket) and self.sock.pending():
+            self._fill()
+        out = []
+        while True:
+            raw = self._take()
+            if raw is None:
+                return out
+            out.append(raw)
+
+    def pending(self):
+        return isinstance(self.sock, ssl.SSLSocket) and self.sock.pending() > 0
+
+
+# ---------------- 客户端 ----------------
+
+class PgConn:
+    """最小的 Postgres 协议客户端：建连认证 + 简单查询；连接池也用它连上游"""
+
+    def __init__(self, url, application_name="db_pool", timeout=10):
+        parts = urlsplit(url)
+        params = dict(parse_qsl(parts.query))
+        self.user = unquote(parts.username or "postgres")
+        password = unquote(parts.password or "")
+        database = unquote(parts.path.lstrip("/")) or self.user
+        sock = socket.create_connection((parts.hostname or "127.0.0.1", parts.port or 5432), timeout=timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if params.get("sslmode") in ("require", "verify-ca", "verify-full"):
+            sock.sendall(struct.pack("!II", 8, SSL_REQUEST))
+            if sock.recv(1) != b"S":
+                sock.close()
+                raise PgError("服务器不支持 SSL，但 URL 要求 sslmode=" + params["sslmode"])
+            context = ssl.create_default_context()
+            if params["sslmode"] != "verify-full":
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            sock = context.wrap_socket(sock, server_hostname=parts.hostname)
+        sock.settimeout(None)
+        self.sock = sock
+        self.stream = _Stream(sock)
+        self.parameters = {}
+        self.backend_key = None
+
+        startup = {"user": self.user, "database": database, "application_name": application_name,
+                   "client_encoding": "UTF8"}
+        payload = struct.pack("!I", PROTOCOL_VERSION) + b"".join(_cstr(k) + _cstr(v) for k, v in startup.items()) + b"\0"
+        try:
+            sock.sendall(struct.pack("!I", len(payload) + 4) + payload)
+            self._authenticate(password)
+            self._read_until_ready()
+        except Exception:
+            self.close()
+            raise
+
+    def _authenticate(self, password):
+        scram = None
+        while True:
+            kind, payload = self.stream.recv()
+            if kind == b"E":
+                raise PgError(_error_fields(payload).get("M", "认证失败"))
+            if kind != b"R":
+                raise PgError(f"认证阶段收到意外消息 {kind!r}")
+            code = struct.unpack("!I", payload[:4])[0]
+            if code == 0:
+                return
+            if code == 3:
+                self.sock.sendall(_message(b"p", _cstr(password)))
+            elif code == 5:
+                inner = hashlib.md5((password + self.user).encode()).hexdigest()
+                digest = "md5" + hashlib.md5(inner.encode() + payload[4:8]).hexdigest()
+                self.sock.sendall(_message(b"p", _cstr(digest)))
+            elif code == 10:
+                mechanisms = payload[4:].split(b"\0")
+                if b"SCRAM-SHA-256" not in mechanisms:
+                    raise PgError(f"不支持的认证方式: {mechanisms}")
+                scram = _Scram(password)
+                first = scram.client_first().encode()
+                self.sock.sendall(_message(b"p", _cstr("SCRAM-SHA-256") + struct.pack("!I", len(first)) + first))
+            elif code == 11:
+                self.sock.sendall(_message(b"p", scram.client_final(payload[4:].decode()).encode()))
+            elif code == 12:
+                scram.verify(payload[4:].decode())
+            else:
+                raise PgError(f"不支持的认证方式（代码 {code}）")
+
+    def _read_until_ready(self):
+        error = None
+        columns, rows, status = [], [], None
+        while True:
+            kind, payload = self.stream.recv()
+            if kind == b"S":
+                name, value = payload.split(b"\0")[:2]
+                self.parameters[name.decode()] = value.decode()
+            elif kind == b"K":
+                self.backend_key = payload
+            elif kind == b"T":
+                count = struct.unpack("!H", payload[:2])[0]
+                pos = 2
+                for _ in range(count):
+                    end = payload.index(b"\0", pos)
+                    columns.append(payload[pos:end].decode())
+                    pos = end + 1 + 18
+            elif kind == b"D":
+                rows.append(_data_row(payload))
+            elif kind == b"E":
+                error = PgError(_error_fields(payload).get("M", "查询失败"))
+            elif kind == b"Z":
+                status = payload[:1]
+                break
+        if error:
+            raise error
+        return columns, rows, status
+
+    def query(self, sql):
+        """简单查询协议；返回 (列名, 行列表)，值都是字符串或 None"""
+        self.sock.sendall(_message(b"Q", _cstr(sql)))
+        columns, rows, _ = self._read_until_ready()
+        return columns, rows
+
+    def close(self):
+        try:
+            self.sock.sendall(_message(b"X"))
+        except OSError:
+            pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+def _data_row(payload):
+    count = struct.unpack("!H", payload[:2])[0]
+    pos, values = 2, []
+    for _ in range(count):
+        size = struct.unpack("!i", payload[pos:pos + 4])[0]
+        pos += 4
+        if size < 0:
+            values.append(None)
+        else:
+            values.append(payload[pos:pos + size].decode("utf-8", "replace"))
+            pos += size
+    return tuple(values)
+
+
+class _Scram:
+    """SCRAM-SHA-256（RFC 5802/7677），Postgres 10+ 默认的密码认证方式"""
+
+    def __init__(self, password):
+        self.password = password.encode("utf-8")
+        self.nonce = base64.b64encode(os.urandom(18)).decode()
+        self.first_bare = f"n=,r={self.nonce}"
+        self.auth_message = None
+        self.salted = None
+
+    def client_first(self):
+        return "n,," + self.first_bare
+
+    def client_final(self, server_first):
+        attrs = dict(item.split("=", 1) for item in server_first.split(","))
+        if not attrs["r"].startswith(self.nonce):
+            raise PgError("SCRAM 随机数不匹配")
+        self.salted = hashlib.pbkdf2_hmac("sha256", self.password, base64.b64decode(attrs["s"]), int(attrs["i"]))
+        client_key = hmac.new(self.salted, b"Client Key", hashlib.sha256).digest()
+        without_proof = f"c=biws,r={attrs['r']}"
+        self.auth_message = f"{self.first_bare},{server_first},{without_proof}".encode()
+        signature = hmac.new(hashlib.sha256(client_key).digest(), self.auth_message, hashlib.sha256).digest()
+        proof = bytes(a ^ b for a, b in zip(client_key, signature))
+        return f"{without_proof},p={base64.b64encode(proof).decode()}"
+
+    def verify(self, server_final):
+        attrs = dict(item.split("=", 1) for item in server_final.split(","))
+        server_key = hmac.new(self.salted, b"Server Key", hashlib.sha256).digest()
+        expected = hmac.new(server_key, self.auth_message, hashlib.sha256).digest()
+        if base64.b64decode(attrs.get("v", "")) != expected:
+            raise PgError("SCRAM 服务端签名校验失败")
+
+
+# ---------------- 事务级连接池 ----------------
+
+class _Waiter:
+    __slots__ = ("event", "conn", "slot")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.conn = None
+        self.slot = False
+
+
+class Pool:
+    """上游连接池：最多 size 条；借不到时按先来后到排队，归还的连接直接交给排在最前的等待者"""
+
+    def __init__(self, upstream_url, size=20, acquire_timeout=30.0):
+        self.upstream_url = upstream_url
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self._idle = []
+        self._waiters = collections.deque()
+        self._total = 0
+        self._cond = threading.Condition()
+        self.stats = {"clients": 0, "clients_total": 0, "transactions": 0, "waiting": 0,
+                      "waits": 0, "wait_ms_max": 0.0, "server_opened": 0, "server_dropped": 0, "errors": 0}
+        # 预先建一条，既验证上游可用，也拿到要转告客户端的 ParameterStatus
+        first = self._open()
+        self.parameters = dict(first.parameters)
+        self._idle.append(first)
+        self._total = 1
+
+    def _open(self):
+        conn = PgConn(self.upstream_url, application_name="db_pool")
+        self.stats["server_opened"] += 1
+        return conn
+
+    def acquire(self):
+        started = time.perf_counter()
+        with self._cond:
+            if self._idle:
+                return self._idle.pop()
+            if self._total < self.size:
+                self._total += 1
+                return self._open_slot()
+            waiter = _Waiter()
+            self._waiters.append(waiter)
+            self.stats["waiting"] += 1
+        handed = waiter.event.wait(self.acquire_timeout)
+        with self._cond:
+            self.stats["waiting"] -= 1
+            if not handed and not waiter.event.is_set():
+                self._waiters.remove(waiter)
+                raise PgError(f"等待上游连接超时（{self.acquire_timeout:.0f}s，连接池 {self.size} 条已用满）")
+            wait_ms = (time.perf_counter() - started) * 1000
+            self.stats["waits"] += 1
+            self.stats["wait_ms_max"] = max(self.stats["wait_ms_max"], wait_ms)
+        return waiter.conn if not waiter.slot else self._open_slot()
+
+    def _open_slot(self):
+        """名额已占好，建一条新的上游连接；失败时把名额还回去"""
+        try:
+            return self._open()
+        except Exception:
+            self._give_back(None)
+            raise
+
+    def _give_back(self, conn):
+        with self._cond:
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.conn, waiter.slot = conn, conn is None
+                waiter.event.set()
+            elif conn is not None:
+                self._idle.append(conn)
+            else:
+                self._total -= 1
+
+    def release(self, conn, reusable=True):
+        with self._cond:
+            if reusable:
+                self.stats["transactions"] += 1
+            else:
+                self.stats["server_dropped"] += 1
+        if reusable:
+            self._give_back(conn)
+        else:
+            conn.close()
+            self._give_back(None)
+
+    def snapshot(self):
+        with self._cond:
+            return dict(self.stats, server_total=self._total, server_idle=len(self._idle), size=self.size)
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+        for conn in idle:
+            conn.close()
+
+
+class _ClientHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        pool = self.server.pool
+        sock = self.request
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with pool._cond:
+            pool.stats["clients"] += 1
+            pool.stats["clients_total"] += 1
+        try:
+            if self._startup(sock, pool):
+                self._relay(sock, pool)
+        finally:
+            with pool._cond:
+                pool.stats["clients"] -= 1
+
+    def _startup(self, sock, pool):
+        """完成客户端握手（连接池自己应答认证，只监听本机/内网）"""
+        while True:
+            head = _recv_exact(sock, 4)
+            if not head:
+                return False
+            body = _recv_exact(sock, struct.unpack("!I", head)[0] - 4)
+            if body is None:
+                return False
+            code = struct.unpack("!I", body[:4])[0]
+            if code in (SSL_REQUEST, GSSENC_REQUEST):
+                sock.sendall(b"N")
+                continue
+            if code == CANCEL_REQUEST:
+                return False
+            if code != PROTOCOL_VERSION:
+                sock.sendall(_error_response(f"不支持的协议版本 {code}"))
+                return False
+            break
+        out = [_message(b"R", struct.pack("!I", 0))]
+        for name, value in pool.parameters.items():
+            out.append(_message(b"S", _cstr(name) + _cstr(value)))
+        out.append(_message(b"K", struct.pack("!II", os.getpid(), random.getrandbits(31))))
+        out.append(_message(b"Z", b"I"))
+        sock.sendall(b"".join(out))
+        return True
+
+    def _relay(self, sock, pool):
+        client = _Stream(sock)
+        server = None
+        outstanding = 0  # 已转发、还没等到 ReadyForQuery 的同步点
+        try:
+            while True:
+                watch = [sock] + ([server.sock] if server else [])
+                if not (server and server.stream.pending()):
+                    readable, _, _ = select.select(watch, [], [])
+                else:
+                    readable = [server.sock]
+                if sock in readable:
+                    messages = client.read_available()
+                    if messages is None:
+                        return
+                    if any(raw[:1] == b"X" for raw in messages):
+                        return
+                    if messages:
+                        if server is None:
+                            try:
+                                server = pool.acquire()
+                            except PgError as e:
+                                pool.stats["errors"] += 1
+                                sock.sendall(_error_response(str(e), code="53300"))
+                                return
+                        outstanding += sum(1 for raw in messages if raw[:1] in SYNC_MESSAGES)
+                        server.sock.sendall(b"".join(messages))
+                if server and server.sock in readable:
+                    messages = server.stream.read_available()
+                    if messages is None:
+                        pool.stats["errors"] += 1
+                        sock.sendall(_error_response("上游数据库连接已断开"))
+                        pool.release(server, reusable=False)
+                        server = None
+                        return
+                    status = None
+                    for raw in messages:
+                        if raw[:1] == b"Z":
+                            outstanding -= 1
+                            status = raw[5:6]
+                    if messages:
+                        sock.sendall(b"".join(messages))
+                    if status == b"I" and outstanding <= 0 and not server.stream.buf:
+                        pool.release(server)
+                        server = None
+                        outstanding = 0
+        except OSError:
+            return
+        finally:
+            if server is not None:
+                # 客户端在事务中途离开：丢弃这条上游连接，数据库会自动回滚
+                pool.release(server, reusable=False)
+
+
+def _recv_exact(sock, size):
+    data = b""
+    while len(data) < size:
+        try:
+            chunk = sock.recv(size - len(data))
+        except OSError:
+            return None
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+class PoolerServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, pool):
+        self.pool = pool
+        super().__init__(address, _ClientHandler)
+
+
+def start_pooler(upstream_url, port=0, host="127.0.0.1", pool_size=20, acquire_timeout=30.0):
+    """启动连接池，返回 (server, 客户端应使用的 DATABASE_URL)"""
+    pool = Pool(upstream_url, size=pool_size, acquire_timeout=acquire_timeout)
+    server = PoolerServer((host, port), pool)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    parts = urlsplit(upstream_url)
+    auth = parts.netloc.rsplit("@", 1)[0] + "@" if "@" in parts.netloc else ""
+    netloc = f"{auth}{host}:{server.server_address[1]}"
+    url = pooled_database_url(urlunsplit(parts._replace(netloc=netloc, query="")), pgbouncer=True)
+    return server, url
+
+
+# ---------------- 连接统计 ----------------
+
+def activity(conn):
+    """pg_stat_activity 快照：[(地址, 应用名, 状态, 连接数)]，以及 max_connections"""
+    _, rows = conn.query(STATS_SQL)
+    _, limit = conn.query("SHOW max_connections")
+    return [(a, app, state, int(n)) for a, app, state, n in rows], int(limit[0][0])
+
+
+def print_activity(rows, max_connections):
+    total = sum(r[3] for r in rows)
+    by_addr = {}
+    for addr, app, state, count in rows:
+        entry = by_addr.setdefault((addr, app), {})
+        entry[state] = entry.get(state, 0) + count
+    print(f"🔌 {time.strftime('%H:%M:%S')}  当前库连接 {total} / max_connections {max_connections}"
+          f"（{total / max_connections:.0%}）")
+    print(f"   {'实例地址':<18} {'应用':<22} {'合计':>5}  状态")
+    for (addr, app), states in sorted(by_addr.items(), key=lambda kv: -sum(kv[1].values())):
+        detail = "  ".join(f"{s}={n}" for s, n in sorted(states.items()))
+        print(f"   {addr:<22} {app[:22]:<24} {sum(states.values()):>5}  {detail}")
+    print(f"   共 {len(set(a for a, _ in by_addr))} 个来源地址（每个应用副本一个）")
+
+
+def _database_url(args):
+    url = args.database_url or os.getenv("DATABASE_URL")
+    if not url:
+        print("❌ 缺少 DATABASE_URL（可用 --database-url 指定，或从 PostgreSQL 服务复制后导出）")
+        sys.exit(1)
+    return url
+
+
+def cmd_stats(args):
+    conn = PgConn(_database_url(args), application_name="db_pool-stats")
+    try:
+        while True:
+            rows, limit = activity(conn)
+            print_activity(rows, limit)
+            if not args.watch:
+                return 0
+            time.sleep(args.watch)
+            print()
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        conn.close()
+
+
+def cmd_url(args):
+    url = args.pooler_url or _database_url(args)
+    print(pooled_database_url(url, connection_limit=args.connection_limit, pgbouncer=bool(args.pooler_url),
+                              pool_timeout=args.pool_timeout))
+    return 0
+
+
+def cmd_pooler(args):
+    upstream = _database_url(args)
+    try:
+        server, url = start_pooler(upstream, port=args.port, host=args.host, pool_size=args.pool_size,
+                                   acquire_timeout=args.acquire_timeout)
+    except (OSError, PgError) as e:
+        print(f"❌ 无法连接上游数据库 {redact(upstream)}: {e}")
+        return 1
+    print(f"🏊 连接池已启动: {args.host}:{server.server_address[1]} → {redact(upstream)}（最多 {args.pool_size} 条上游连接）")
+    print(f"   应用使用: DATABASE_URL={redact(pooled_database_url(url, connection_limit=args.client_limit))}")
+    try:
+        while True:
+            time.sleep(args.stats_interval)
+            s = server.pool.snapshot()
+            print(f"   📈 客户端 {s['clients']}，上游 {s['server_total']}（空闲 {s['server_idle']}），"
+                  f"排队 {s['waiting']}，事务 {s['transactions']}，最长等待 {s['wait_ms_max']:.0f}ms，错误 {s['errors']}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.pool.close()
+    return 0
+
+
+# ---------------- 副本扩展压测 ----------------
+
+class _AppPool:
+    """模拟一个副本里 Prisma 的连接池：固定几条连接，请求先来先得"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._free = []
+        self._waiters = collections.deque()
+
+    def get(self):
+        with self._lock:
+            if self._free:
+                return self._free.pop()
+            waiter = _Waiter()
+            self._waiters.append(waiter)
+        waiter.event.wait()
+        return waiter.conn
+
+    def put(self, conn):
+        with self._lock:
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.conn = conn
+                waiter.event.set()
+            else:
+                self._free.append(conn)
+
+def simulate_replicas(url, replicas, connection_limit, concurrency, queries, sql, monitor=None):
+    """
+    模拟 replicas 个应用副本：每个副本一个 connection_limit 条的连接池（相当于 Prisma 的池），
+    concurrency 个并发请求在池上排队执行 sql。返回延迟、错误与数据库侧连接峰值。
+    """
+    latencies, errors, lock = [], [], threading.Lock()
+    peak = {"connections": 0}
+    stop = threading.Event()
+
+    def sample():
+        while not stop.is_set():
+            try:
+                peak["connections"] = max(peak["connections"], monitor())
+            except Exception:
+                pass
+            stop.wait(0.05)
+
+    def replica(index):
+        pool, opened = _AppPool(), []
+        for _ in range(connection_limit):
+            try:
+                conn = PgConn(url, application_name=f"replica-{index}")
+            except (OSError, PgError) as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            opened.append(conn)
+            pool.put(conn)
+        if not opened:
+            return
+        counter = iter(range(queries))
+        counter_lock = threading.Lock()
+
+        def worker():
+            while True:
+                with counter_lock:
+                    if next(counter, None) is None:
+                        return
+                started = time.perf_counter()
+                conn = pool.get()
+                try:
+                    conn.query(sql)
+                    ms = (time.perf_counter() - started) * 1000
+                    with lock:
+                        latencies.append(ms)
+                except (OSError, PgError) as e:
+                    with lock:
+                        errors.append(str(e))
+                finally:
+                    pool.put(conn)
+
+        workers = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        for conn in opened:
+            conn.close()
+
+    sampler = threading.Thread(target=sample, daemon=True) if monitor else None
+    if sampler:
+        sampler.start()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=replica, args=(i,)) for i in range(replicas)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+    stop.set()
+    if sampler:
+        sampler.join()
+    return {
+        "replicas": replicas,
+        "client_connections": replicas * connection_limit,
+        "server_peak": peak["connections"],
+        "ok": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "qps": len(latencies) / wall if wall else 0.0,
+    }
+
+
+def print_scaling(title, results):
+    print(f"\n📊 {title}")
+    print(f"   {'副本':>4} {'应用侧连接':>10} {'库连接峰值':>10} {'成功':>7} {'失败':>5} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'QPS':>8}")
+    for r in results:
+        fmt = lambda v: f"{v:8.1f}" if v is not None else f"{'-':>8}"
+        print(f"   {r['replicas']:>4} {r['client_connections']:>14} {r['server_peak']:>14} {r['ok']:>9} {r['errors']:>6} "
+              f"{fmt(r['p50'])} {fmt(r['p95'])} {fmt(r['p99'])} {r['qps']:8.0f}")
+        if r["first_error"]:
+            print(f"        ⚠️  {r['first_error'][:100]}")
+
+
+def cmd_report(args):
+    direct = _database_url(args)
+    target = args.via or direct
+    monitor_conn = PgConn(direct, application_name="db_pool-monitor")
+    monitor_lock = threading.Lock()
+
+    def monitor():
+        with monitor_lock:
+            return int(monitor_conn.query(COUNT_SQL)[1][0][0])
+
+    try:
+        _, limit = activity(monitor_conn)
+        print(f"🧪 目标 {redact(target)}（{'经连接池' if args.via else '直连'}），max_connections {limit}")
+        print(f"   每副本 connection_limit={args.connection_limit}，并发 {args.concurrency}，每副本 {args.queries} 次查询")
+        results = [simulate_replicas(target, n, args.connection_limit, args.concurrency, args.queries, args.sql, monitor)
+                   for n in args.replicas]
+    finally:
+        monitor_conn.close()
+    print_scaling("副本数扩展时的数据库连接数与查询延迟", results)
+    return 0
+
+
+# ---------------- 离线压测：模拟 Postgres ----------------
+
+class FakePostgres(socketserver.ThreadingTCPServer):
+    """
+    模拟数据库：trust 认证，每条查询耗时 query_ms；同时执行的查询超过 cores 时按比例变慢，
+    连接数超过 max_connections 时像真实数据库一样拒绝（too many clients）。
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, query_ms=4.0, cores=4, max_connections=100):
+        self.query_ms = query_ms
+        self.cores = cores
+        self.max_connections = max_connections
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.peak = 0
+        self.active = 0
+        self.refused = 0
+        super().__init__(("127.0.0.1", 0), _FakeBackend)
+
+
+class _FakeBackend(socketserver.BaseRequestHandler):
+    def handle(self):
+        db, sock = self.server, self.request
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        head = _recv_exact(sock, 4)
+        if not head or _recv_exact(sock, struct.unpack("!I", head)[0] - 4) is None:
+            return
+        with db.lock:
+            if db.connections >= db.max_connections:
+                db.refused += 1
+                sock.sendall(_error_response("sorry, too many clients already", code="53300"))
+                return
+            db.connections += 1
+            db.peak = max(db.peak, db.connections)
+        try:
+            sock.sendall(_message(b"R", struct.pack("!I", 0)) + _message(b"S", _cstr("server_version") + _cstr("16.0"))
+                         + _message(b"K", struct.pack("!II", 1, 1)) + _message(b"Z", b"I"))
+            stream = _Stream(sock)
+            while True:
+                kind, _ = stream.recv()
+                if kind == b"X":
+                    return
+                if kind == b"Q":
+                    with db.lock:
+                        db.active += 1
+                        slowdown = max(1.0, db.active / db.cores)
+                    time.sleep(db.query_ms / 1000 * slowdown)
+                    with db.lock:
+                        db.active -= 1
+                    sock.sendall(_message(b"T", struct.pack("!H", 1) + _cstr("n") + b"\0" * 18)
+                                 + _message(b"D", struct.pack("!Hi", 1, 1) + b"1")
+                                 + _message(b"C", _cstr("SELECT 1")) + _message(b"Z", b"I"))
+        except (PgError, OSError):
+            return
+        finally:
+            with db.lock:
+                db.connections -= 1
+
+
+def cmd_bench(args):
+    results = {}
+    for mode in ("direct", "pooler"):
+        rows = []
+        for n in args.replicas:
+            db = FakePostgres(query_ms=args.query_ms, cores=args.cores, max_connections=args.max_connections)
+            threading.Thread(target=db.serve_forever, daemon=True).start()
+            upstream = f"postgresql://app@127.0.0.1:{db.server_address[1]}/app"
+            target, pooler = upstream, None
+            if mode == "pooler":
+                pooler, target = start_pooler(upstream, pool_size=args.pool_size)
+            r = simulate_replicas(target, n, args.connection_limit, args.concurrency, args.queries, "SELECT 1",
+                                  monitor=lambda: db.connections)
+            r["server_peak"] = max(r["server_peak"], db.peak)
+            rows.append(r)
+            if pooler:
+                pooler.shutdown()
+                pooler.pool.close()
+            db.shutdown()
+            db.server_close()
+        results[mode] = rows
+    print(f"🧪 模拟数据库：max_connections {args.max_connections}，{args.cores} 核，单查询 {args.query_ms}ms；"
+          f"每副本 connection_limit={args.connection_limit}、并发 {args.concurrency}")
+    print_scaling("直连（每个副本各自一个 Prisma 连接池）", results["direct"])
+    print_scaling(f"经事务级连接池（上游最多 {args.pool_size} 条）", results["pooler"])
+    return 0
+
+
+def _replica_list(text):
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Postgres 连接诊断与事务级连接池")
+    parser.add_argument("--database-url", help="默认读取环境变量 DATABASE_URL（直连数据库）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("stats", help="pg_stat_activity：按实例/应用/状态统计连接数")
+    p.add_argument("--watch", type=float, help="每 N 秒刷新一次")
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("url", help="打印改写后的 DATABASE_URL")
+    p.add_argument("--connection-limit", type=int, help="每个副本的 Prisma 连接数上限")
+    p.add_argument("--pool-timeout", type=int, help="等待空闲连接的秒数（Prisma 默认 10）")
+    p.add_argument("--pooler-url", help="连接池地址；给出时加 pgbouncer=true")
+    p.set_defaults(func=cmd_url)
+
+    p = sub.add_parser("pooler", help="启动事务级连接池（PgBouncer 替身）")
+    p.add_argument("--host", default="127.0.0.1", help="监听地址（连接池不校验客户端密码，只在本机/内网监听）")
+    p.add_argument("--port", type=int, default=DEFAULT_POOLER_PORT)
+    p.add_argument("--pool-size", type=int, default=int(os.getenv("DB_POOL_SIZE", "20")), help="上游连接数上限")
+    p.add_argument("--acquire-timeout", type=float, default=30.0, help="等待上游连接的超时（秒）")
+    p.add_argument("--client-limit", type=int, default=10, help="提示给应用的 connection_limit")
+    p.add_argument("--stats-interval", type=float, default=30.0)
+    p.set_defaults(func=cmd_pooler)
+
+    p = sub.add_parser("report", help="模拟多副本压测，记录连接数与延迟")
+    p.add_argument("--replicas", type=_replica_list, default=[1, 2, 4], help="逗号分隔，如 1,2,4,8")
+    p.add_argument("--connection-limit", type=int, default=5)
+    p.add_argument("--concurrency", type=int, default=10, help="每个副本的并发请求数")
+    p.add_argument("--queries", type=int, default=200, help="每个副本的查询次数")
+    p.add_argument("--sql", default='SELECT count(*) FROM "User"', help="压测用的查询")
+    p.add_argument("--via", help="经连接池压测时的地址（连接数仍从 --database-url 直连统计）")
+    p.set_defaults(func=cmd_report)
+
+    p = sub.add_parser("bench", help="离线：模拟数据库，对比直连与经连接池")
+    p.add_argument("--replicas", type=_replica_list, default=[1, 2, 4, 8])
+    p.add_argument("--connection-limit", type=int, default=9, help="默认相当于 4 核机器上 Prisma 的默认池大小")
+    p.add_argument("--concurrency", type=int, default=12)
+    p.add_argument("--queries", type=int, default=150)
+    p.add_argument("--pool-size", type=int, default=12)
+    p.add_argument("--max-connections", type=int, default=40)
+    p.add_argument("--cores", type=int, default=4)
+    p.add_argument("--query-ms", type=float, default=4.0)
+    p.set_defaults(func=cmd_bench)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+应用服务的目标环境变量
+
+deploy_zeabur.py 与发布流水线（release.py）共用同一份清单，避免两处维护。
+API 密钥一律从本地环境变量读取，不要硬编码。
+"""
+
+import os
+
+DEFAULT_SNAPSHOT_FILE = "config_snapshot.json"
+# 未设置时填入的占位值：合并模式下不会覆盖线上已有的真实值
+PLACEHOLDER_PREFIX = "请设置"
+
+
+def app_database_url(database_url, pooler_url=None, connection_limit=None):
+    """
+    应用实际使用的 DATABASE_URL：配置了连接池（DB_POOLER_URL）时换成连接池地址并加 pgbouncer=true，
+    配置了 DB_CONNECTION_LIMIT 时限制每个副本的 Prisma 连接数。迁移仍使用原始地址直连。
+    """
+    pooler_url = pooler_url or os.getenv("DB_POOLER_URL", "")
+    connection_limit = connection_limit or os.getenv("DB_CONNECTION_LIMIT")
+    if is_placeholder(database_url) or not (pooler_url or connection_limit):
+        return database_url
+    from db_pool import pooled_database_url
+    return pooled_database_url(pooler_url or database_url, connection_limit=connection_limit,
+                               pgbouncer=bool(pooler_url))
+
+
+def build_envs(database_url, migration_hash=None, snapshot_file=None, kv_url=None, verbose=True):
+    """返回 Zeabur replaceVariables 所需的 [{name, value}] 列表"""
+    envs = [
+        {"name": "DATABASE_URL", "value": app_database_url(database_url)},
+        {"name": "JWT_SECRET", "value": os.getenv("JWT_SECRET", "请设置JWT_SECRET环境变量")},
+        {"name": "NODE_ENV", "value": "production"},
+        {"name": "PORT", "value": "3000"},
+
+        # 管理员配置
+        {"name": "ADMIN_USERNAME", "value": os.getenv("ADMIN_USERNAME", "admin")},
+        {"name": "ADMIN_PASSWORD", "value": os.getenv("ADMIN_PASSWORD", "请设置ADMIN_PASSWORD环境变量")},
+
+        # Google API 配置（文案生成）
+        {"name": "COPY_ENGINE_VENDOR", "value": "google"},
+        {"name": "COPY_ENGINE_MODEL_ID", "value": "gemini-1.5-pro-latest"},
+        {"name": "COPY_ENGINE_BASE_URL", "value": "https://gitaigc.com/v1"},
+        {"name": "GOOGLE_API_KEY", "value": os.getenv("GOOGLE_API_KEY", "请设置GOOGLE_API_KEY环境变量")},
+
+        # Google API 配置（图片生成）
+        {"name": "IMAGE_ENGINE_VENDOR", "value": "google"},
+        {"name": "IMAGE_ENGINE_MODEL_ID", "value": "gemini-2.5-flash-image"},
+        {"name": "IMAGE_ENGINE_BASE_URL", "value": "https://gitaigc.com/v1"},
+
+        # 阿里云配置（可选，用于抠图）
+        {"name": "DASHSCOPE_API_KEY", "value": os.getenv("DASHSCOPE_API_KEY", "")},
+        {"name": "DASHSCOPE_BASE_URL", "value": "https://dashscope.aliyuncs.com/api/v1"},
+    ]
+    if migration_hash:
+        envs.append({"name": "PRISMA_MIGRATIONS_HASH", "value": migration_hash})
+    # 共享 KV（验证码、临时图片）：多副本部署时必须配置，否则各副本各存各的
+    kv_url = kv_url or os.getenv("KV_URL", "")
+    if kv_url:
+        envs.append({"name": "KV_URL", "value": kv_url})
+
+    # SystemConfig 快照（可选）：先执行 python3 config_snapshot.py render 生成
+    snapshot_file = snapshot_file or os.getenv("SYSTEM_CONFIG_SNAPSHOT_FILE", DEFAULT_SNAPSHOT_FILE)
+    if os.path.exists(snapshot_file):
+        from config_snapshot import snapshot_env_vars
+        snapshot_envs = snapshot_env_vars(snapshot_file)
+        envs.extend(snapshot_envs)
+        if verbose:
+            print(f"📦 附带配置快照: {snapshot_file} (版本 {snapshot_envs[1]['value']})")
+    elif verbose:
+        print("💡 未找到配置快照，应用将直接查库（可执行 python3 config_snapshot.py render 生成）")
+    return envs
+
+
+def is_placeholder(value):
+    return not value or str(value).startswith(PLACEHOLDER_PREFIX)
+
+
+def merge_envs(live, desired):
+    """
+    合并模式：以线上变量为底，目标清单覆盖；目标值是空/占位符时保留线上的真实值。
+    live 为 {name: value}，desired 为 [{name, value}]，返回 [{name, value}]
+    """
+    merged = dict(live)
+    for e in desired:
+        if is_placeholder(e["value"]) and not is_placeholder(live.get(e["name"])):
+            continue
+        merged[e["name"]] = e["value"]
+    return [{"name": k, "value": v} for k, v in merged.items()]
+
+
+def diff_envs(live, desired):
+    """返回 (新增, 删除, 变更) 的变量名列表，desired 为 [{name, value}]"""
+    target = {e["name"]: e["value"] for e in desired}
+    added = sorted(set(target) - set(live))
+    removed = sorted(set(live) - set(target))
+    changed = sorted(k for k in set(target) & set(live) if target[k] != live[k])
+    return added, removed, changed
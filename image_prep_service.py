@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+参考图预处理服务：缩小发给 DashScope / Gemini 的图片体积
+
+用户上传的参考图（手机原图常见 4000×3000、数 MB）原样以 base64 塞进 JSON，一次生图要发 6 遍。
+本服务在发出前统一处理：
+
+  - 按 EXIF 方向摆正后丢弃全部元数据（EXIF / GPS / XMP），ICC 色彩转换到 sRGB
+  - 长边缩到目标模型的最大有效分辨率（见 TARGETS，超过的像素模型也会自己缩掉）
+  - 有透明通道（抠图结果）→ 优化 PNG；不透明 → JPEG（默认 q=90）
+  - 处理后反而更大且无需缩放时原样返回
+  - 结果按 sha256(原图) + 目标 + 参数版本缓存（内存 LRU + 磁盘），同一张图只处理一次
+  - 指标：GET /__metrics，命中率、输入/输出字节、处理耗时分位数
+
+接口：
+  POST /prepare  {"imageBase64": "...", "target": "dashscope" | "google"}
+    → {"imageBase64", "mimeType", "width", "height", "bytesIn", "bytesOut", "cache": "memory|disk|miss|passthrough"}
+
+应用侧设置 IMAGE_PREP_SERVICE_URL=http://<服务地址>:8791 后，/api/generate/images 与 lib/google.ts 发出的参考图都会先经过本服务；
+未配置或服务不可用时发原图。依赖 Pillow（pip install pillow）。
+
+用法：
+  python3 image_prep_service.py
+  python3 image_prep_service.py --bench                  # 离线：对比原图 / 预处理后的上行字节与端到端耗时
+  python3 image_prep_service.py --bench --uplink-mbps 10
+"""
+
+import argparse
+import base64
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from credential_smoke import percentile
+
+DEFAULT_PORT = 8791
+DEFAULT_CACHE_DIR = ".image_prep_cache"
+# 各模型的最大有效分辨率（长边像素）
+TARGETS = {
+    "dashscope": {"max_edge": 1536},   # qwen-image-edit 输出约 1K～1.3K，输入再大只会被模型缩小
+    "google": {"max_edge": 1536},      # Gemini 图像按 768 切块，1536 已覆盖 2×2 块
+    "default": {"max_edge": 2048},
+}
+SETTINGS_VERSION = "1"
+
+
+def _require_pillow():
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        print("❌ 参考图预处理需要 Pillow，请先执行: pip install pillow")
+        sys.exit(1)
+    return Image, ImageOps
+
+
+def _to_srgb(img):
+    icc = img.info.get("icc_profile")
+    if not icc:
+        return img
+    try:
+        from PIL import ImageCms
+        src = ImageCms.ImageCmsProfile(io.BytesIO(icc))
+        return ImageCms.profileToProfile(img, src, ImageCms.createProfile("sRGB"),
+                                         outputMode="RGBA" if img.mode == "RGBA" else "RGB")
+    except Exception:
+        return img
+
+
+def prepare(data, target="default", jpeg_quality=90):
+    """返回 (输出字节, mime, 宽, 高)；不需要处理时返回原字节"""
+    Image, ImageOps = _require_pillow()
+    max_edge = TARGETS.get(target, TARGETS["default"])["max_edge"]
+    with Image.open(io.BytesIO(data)) as src:
+        src_format = src.format
+        img = ImageOps.exif_transpose(src)
+        has_meta = bool(src.info.get("exif") or src.info.get("xmp") or src.getexif())
+        img = _to_srgb(img)
+        if img.mode in ("P", "LA", "PA") or "transparency" in img.info:
+            img = img.convert("RGBA")
+        has_alpha = img.mode == "RGBA" and img.getchannel("A").getextrema()[0] < 255
+        img = img.convert("RGBA" if has_alpha else "RGB")
+        resized = max(img.size) > max_edge
+        if resized:
+            img.thumbnail((max_edge, max_edge), Image.LANCZOS, reducing_gap=3.0)
+        out = io.BytesIO()
+        if has_alpha:
+            img.save(out, format="PNG", optimize=True)
+            mime = "image/png"
+        else:
+            img.save(out, format="JPEG", quality=jpeg_quality, optimize=True)
+            mime = "image/jpeg"
+        width, height = img.size
+    encoded = out.getvalue()
+    if not resized and not has_meta and len(encoded) >= len(data) and src_format in ("PNG", "JPEG"):
+        return data, f"image/{src_format.lower()}", width, height
+    return encoded, mime, width, height
+
+
+class PrepCache:
+    """内存 LRU（按字节上限）+ 磁盘：<dir>/<key[:2]>/<key>.bin 与 .json 元数据"""
+
+    def __init__(self, directory=None, max_bytes=128 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key[:2], key)
+        return base + ".bin", base + ".json"
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry, "memory"
+        if not self.directory:
+            return None, None
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(data_path, "rb") as f:
+                meta["data"] = f.read()
+        except (OSError, ValueError):
+            return None, None
+        self._remember(key, meta)
+        return meta, "disk"
+
+    def put(self, key, entry):
+        self._remember(key, entry)
+        if not self.directory:
+            return
+        data_path, meta_path = self._paths(key)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        for path, payload, mode in ((data_path, entry["data"], "wb"),
+                                    (meta_path, json.dumps({k: v for k, v in entry.items() if k != "data"}), "w")):
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, mode) as f:
+                f.write(payload)
+            os.replace(tmp, path)
+
+    def _remember(self, key, entry):
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = entry
+            self.bytes += len(entry["data"])
+            while self.bytes > self.max_bytes and self.entries:
+                _, old = self.entries.popitem(last=False)
+                self.bytes -= len(old["data"])
+
+
+class PrepService:
+    def __init__(self, cache, jpeg_quality=90):
+        self.cache = cache
+        self.jpeg_quality = jpeg_quality
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "memory": 0, "disk": 0, "miss": 0, "passthrough": 0, "errors": 0}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.encode_ms = []
+
+    def handle(self, data, target):
+        key = hashlib.sha256(f"{SETTINGS_VERSION}:{target}:{self.jpeg_quality}:".encode("utf-8") + data).hexdigest()
+        entry, kind = self.cache.get(key)
+        if entry is None:
+            started = time.perf_counter()
+            out, mime, width, height = prepare(data, target, self.jpeg_quality)
+            ms = (time.perf_counter() - started) * 1000
+            kind = "passthrough" if out is data else "miss"
+            entry = {"data": out, "mimeType": mime, "width": width, "height": height}
+            self.cache.put(key, entry)
+            with self.lock:
+                self.encode_ms.append(ms)
+                if len(self.encode_ms) > 2000:
+                    del self.encode_ms[:1000]
+        with self.lock:
+            self.counters["requests"] += 1
+            self.counters[kind] += 1
+            self.bytes_in += len(data)
+            self.bytes_out += len(entry["data"])
+        return entry, kind
+
+    def metrics(self):
+        with self.lock:
+            hits = self.counters["memory"] + self.counters["disk"]
+            return {
+                "counters": dict(self.counters),
+                "hit_ratio": round(hits / self.counters["requests"], 4) if self.counters["requests"] else None,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "ratio": round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else None,
+                "encode_ms": {"p50": percentile(self.encode_ms, 50), "p95": percentile(self.encode_ms, 95),
+                              "count": len(self.encode_ms)},
+                "memory": {"entries": len(self.cache.entries), "bytes": self.cache.bytes},
+            }
+
+
+class PrepHandler(BaseHTTPRequestHandler):
+    server_version = "xhs-image-prep/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            sys.stderr.write("[image-prep] " + (fmt % args) + "\n")
+
+    def _send_json(self, status, obj):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _fail(self, status, message):
+        with self.service.lock:
+            self.service.counters["errors"] += 1
+        self._send_json(status, {"error": message})
+
+    def do_GET(self):
+        if self.path.split("?")[0] == "/__metrics":
+            self._send_json(200, self.service.metrics())
+            return
+        self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path.split("?")[0] != "/prepare":
+            self._send_json(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length).decode("utf-8")) if length else {}
+            raw = body.get("imageBase64") or ""
+            data = base64.b64decode(raw.split("base64,", 1)[-1])
+        except (ValueError, UnicodeDecodeError, AttributeError):
+            self._send_json(400, {"error": "imageBase64 无效"})
+            return
+        if not data:
+            self._send_json(400, {"error": "缺少 imageBase64"})
+            return
+        target = body.get("target") or "default"
+        if not isinstance(target, str):
+            self._send_json(400, {"error": "target 无效"})
+            return
+        Image, _ = _require_pillow()
+        try:
+            entry, kind = self.service.handle(data, target)
+        except Image.DecompressionBombError as e:
+            self._fail(422, f"图片像素过多: {e}")
+            return
+        except OSError as e:  # 含 UnidentifiedImageError
+            self._fail(400, f"无法解析图片: {e}")
+            return
+        except (ValueError, SyntaxError) as e:  # Pillow 对损坏/不支持的图片也会抛这两种
+            self._fail(422, f"无法处理图片: {e}")
+            return
+        self._send_json(200, {
+            "imageBase64": base64.b64encode(entry["data"]).decode("ascii"),
+            "mimeType": entry["mimeType"],
+            "width": entry["width"],
+            "height": entry["height"],
+            "bytesIn": len(data),
+            "bytesOut": len(entry["data"]),
+            "cache": kind,
+        })
+
+
+def start_service(service, port=0, host="127.0.0.1", verbose=False):
+    """后台线程启动服务，返回 (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), PrepHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def _throttled_post(host, port, path, body, headers, mbps):
+    """按给定上行带宽分块发送请求体，返回 (状态码, 耗时秒)"""
+    import http.client
+    conn = http.client.HTTPConnection(host, port, timeout=300)
+    started = time.perf_counter()
+    conn.putrequest("POST", path)
+    for k, v in headers.items():
+        conn.putheader(k, v)
+    conn.putheader("Content-Length", str(len(body)))
+    conn.endheaders()
+    chunk = 64 * 1024
+    per_chunk = chunk * 8 / (mbps * 1_000_000) if mbps else 0
+    for i in range(0, len(body), chunk):
+        conn.send(body[i:i + chunk])
+        if per_chunk:
+            time.sleep(per_chunk)
+    resp = conn.getresponse()
+    resp.read()
+    conn.close()
+    return resp.status, time.perf_counter() - started
+
+
+def bench(args):
+    """手机原图（JPEG + EXIF）与大尺寸抠图 PNG，各发 6 次生图请求到桩服务，对比上行字节与耗时"""
+    import tempfile
+    from urllib.parse import urlparse
+    from stub_vendors import StubConfig, start_stub_server, stub_base_urls
+
+    Image, _ = _require_pillow()
+
+    def phone_photo():
+        noise = Image.effect_noise((4032, 3024), 24).convert("RGB")
+        base = Image.linear_gradient("L").resize((4032, 3024)).convert("RGB")
+        img = Image.blend(base, noise, 0.35)
+        img.paste((40, 90, 160), (1500, 700, 2500, 2500))
+        exif = Image.Exif()
+        exif[0x0112] = 1
+        exif[0x010F] = "PhoneMaker"
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=95, exif=exif.tobytes())
+        return out.getvalue()
+
+    def big_cutout():
+        img = Image.new("RGBA", (2400, 3000), (0, 0, 0, 0))
+        texture = Image.effect_noise((1200, 2000), 18).convert("RGBA")
+        img.paste(texture, (600, 500))
+        out = io.BytesIO()
+        img.save(out, format="PNG")
+        return out.getvalue()
+
+    stub, stub_url = start_stub_server(config=StubConfig(latency={"dashscope": args.model_latency}, jitter=0, seed=1))
+    endpoint = urlparse(stub_base_urls(stub_url)["dashscope"] + "/services/aigc/multimodal-generation/generation")
+    with tempfile.TemporaryDirectory() as tmp:
+        service = PrepService(PrepCache(tmp), args.jpeg_quality)
+        print(f"🧪 每张参考图发 {args.calls} 次生图请求，上行 {args.uplink_mbps:g} Mbps，模型延迟 ~{args.model_latency}s\n")
+        photo = phone_photo()
+        for label, data in (("手机原图 JPEG", photo), ("抠图 PNG", big_cutout())):
+            rows = []
+            prep_started = time.perf_counter()
+            entry, _ = service.handle(data, "dashscope")
+            prep_ms = (time.perf_counter() - prep_started) * 1000
+            for name, payload_img, mime in (("原图", data, "image/png"), ("预处理", entry["data"], entry["mimeType"])):
+                ref = f"data:{mime};base64,{base64.b64encode(payload_img).decode('ascii')}"
+                body = json.dumps({"model": "qwen-image-edit-plus", "input": {"messages": [
+                    {"role": "user", "content": [{"image": ref}, {"text": "产品在桌面，自然光"}]}]}}).encode("utf-8")
+                total = 0.0
+                for _ in range(args.calls):
+                    status, seconds = _throttled_post(endpoint.hostname, endpoint.port, endpoint.path, body, {
+                        "Content-Type": "application/json", "Authorization": "Bearer sk-bench"}, args.uplink_mbps)
+                    total += seconds
+                rows.append((name, len(body) * args.calls, total))
+            print(f"   {label}（{len(data) / 1024:.0f}KB → {len(entry['data']) / 1024:.0f}KB，"
+                  f"{entry['width']}×{entry['height']} {entry['mimeType']}，处理 {prep_ms:.0f}ms）")
+            for name, wire, total in rows:
+                print(f"      {name:<4} 上行 {wire / 1024 / 1024:7.2f}MB   端到端 {total:6.2f}s")
+        again_started = time.perf_counter()
+        _, kind = service.handle(photo, "dashscope")
+        print(f"\n   同一张原图再次预处理（{kind}）: {(time.perf_counter() - again_started) * 1000:.1f}ms")
+        print(f"   指标: {json.dumps(service.metrics()['counters'], ensure_ascii=False)}")
+    stub.shutdown()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="参考图预处理服务（缩放、去元数据、重新编码、按内容缓存）")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", DEFAULT_PORT)))
+    parser.add_argument("--cache-dir", default=os.getenv("IMAGE_PREP_CACHE_DIR", DEFAULT_CACHE_DIR))
+    parser.add_argument("--no-disk", action="store_true", help="只用内存缓存")
+    parser.add_argument("--max-memory-mb", type=int, default=128, help="内存缓存上限（默认 128MB）")
+    parser.add_argument("--jpeg-quality", type=int, default=90, help="不透明图片的 JPEG 质量（默认 90）")
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--bench", action="store_true", help="离线对比原图 / 预处理后的上行字节与耗时")
+    parser.add_argument("--calls", type=int, default=6, help="--bench 每张图的生图请求数（默认 6）")
+    parser.add_argument("--uplink-mbps", type=float, default=20.0, help="--bench 模拟上行带宽（默认 20Mbps，0 不限速）")
+    parser.add_argument("--model-latency", type=float, default=0.5, help="--bench 桩服务模型延迟秒数")
+    args = parser.parse_args(argv)
+
+    _require_pillow()
+    if args.bench:
+        return bench(args)
+
+    cache = PrepCache(None if args.no_disk else args.cache_dir, args.max_memory_mb * 1024 * 1024)
+    service = PrepService(cache, args.jpeg_quality)
+    server = ThreadingHTTPServer((args.host, args.port), PrepHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = args.verbose
+    print(f"🖼️  参考图预处理服务已启动: http://{args.host}:{server.server_address[1]}")
+    for name, spec in TARGETS.items():
+        print(f"   - {name}: 长边 ≤ {spec['max_edge']}px")
+    print(f"   指标: http://{args.host}:{server.server_address[1]}/__metrics")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 已停止")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,910 @@
+#!/usr/bin/env python3
+"""
+镜像提升：源码只构建一次，同一个镜像依次发布到 staging / prod
+
+原来的每条部署路径（deploy_zeabur.py、trigger_redeploy.py、zeabur_deploy.py、手动上传 tar 包）
+都让平台从 web 2/Dockerfile 重新构建：npm ci、prisma generate、next build，staging 和 prod 各来一遍，
+两次构建的产物也不保证一致。这里改为：
+
+  1. build    按 web 2/.dockerignore 过滤后的源码清单算哈希，镜像打标签 src-<哈希前 12 位>；
+              registry 里已有同名标签就直接复用，不再构建
+  2. promote  把该镜像（按 digest 固定）提升到某个环境：registry 上移动 <环境> 标签，
+              把对应 Zeabur 服务的镜像指向它并重新部署。只复制一份 manifest，几秒完成
+  3. status   当前源码对应的标签、各环境正在使用的镜像、最近的提升记录
+
+本地联调不需要真的 registry：
+  python3 image_promote.py registry                 # 最小 Docker Registry v2 替身，默认 127.0.0.1:5000，数据在 .registry/
+  python3 image_promote.py bench                    # 离线演示：推一个合成镜像，再提升到 staging / prod，对比耗时
+
+用法：
+  export IMAGE_REPO=localhost:5000/xhs/web          # 或 registry.example.com/xhs/web（需要 REGISTRY_USER / REGISTRY_PASSWORD）
+  python3 image_promote.py hash
+  python3 image_promote.py build
+  python3 image_promote.py promote --to staging --service xhs-web-staging
+  python3 image_promote.py promote --to prod --from staging     # 把 staging 正在用的镜像原样提升到 prod
+  python3 image_promote.py promote --to prod --rollback         # 回到 prod 上一次的镜像（再执行一次继续往前退）
+  python3 image_promote.py status
+
+注意：NEXT_PUBLIC_* 变量在 next build 时写死进镜像，同一镜像在各环境里取值相同；
+需要按环境区分的地址请用运行时读取的变量（如 APP_BASE_URL），build 时会列出仍依赖 NEXT_PUBLIC_* 的位置。
+"""
+
+import argparse
+import base64
+import hashlib
+import http.server
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+CONTEXT_DIR = os.path.join(ROOT_DIR, "web 2")
+REGISTRY_DIR = os.path.join(ROOT_DIR, ".registry")
+HISTORY_FILE = os.path.join(ROOT_DIR, ".promote_history.jsonl")
+DEFAULT_REGISTRY_PORT = 5000
+TAG_PREFIX = "src-"
+MANIFEST_TYPES = (
+    "application/vnd.oci.image.index.v1+json",
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+    "application/vnd.oci.image.manifest.v1+json",
+    "application/vnd.docker.distribution.manifest.v2+json",
+)
+DIGEST_RE = re.compile(r"^sha256:[0-9a-f]{64}$")
+ENV_READ_RE = re.compile(r"process\.env\.([A-Z0-9_]+)")
+
+
+# ---------------------------------------------------------------------------
+# 源码清单哈希（与 docker build 实际发送的上下文一致）
+# ---------------------------------------------------------------------------
+
+def _pattern_regex(pattern):
+    """.dockerignore 单条模式 → 正则：* 不跨目录，** 跨任意层目录，路径相对上下文根目录"""
+    out = ""
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**", i):
+            i += 2
+            if pattern.startswith("/", i):
+                out += "(?:.*/)?"
+                i += 1
+            else:
+                out += ".*"
+            continue
+        if c == "*":
+            out += "[^/]*"
+        elif c == "?":
+            out += "[^/]"
+        elif c == "[":
+            end = pattern.find("]", i + 1)
+            if end < 0:
+                out += re.escape(c)
+            else:
+                body = pattern[i + 1:end]
+                out += "[" + ("^" + body[1:] if body.startswith("!") else body) + "]"
+                i = end
+        elif c == "\\" and i + 1 < len(pattern):
+            i += 1
+            out += re.escape(pattern[i])
+        else:
+            out += re.escape(c)
+        i += 1
+    return re.compile(out + r"\Z")
+
+
+def load_dockerignore(context_dir=CONTEXT_DIR):
+    """解析 .dockerignore → [(正则, 是否为 ! 例外)]，顺序即优先级（后面的覆盖前面的）"""
+    path = os.path.join(context_dir, ".dockerignore")
+    rules = []
+    if not os.path.exists(path):
+        return rules
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:].strip()
+            line = os.path.normpath(line).replace(os.sep, "/").lstrip("/")
+            if line and line != ".":
+                rules.append((_pattern_regex(line), negate))
+    return rules
+
+
+def is_ignored(rel_path, rules):
+    """与 Docker 相同：路径本身或任一上级目录命中模式即排除，最后命中的规则生效"""
+    parts = rel_path.split("/")
+    candidates = ["/".join(parts[:i]) for i in range(1, len(parts) + 1)]
+    ignored = False
+    for regex, negate in rules:
+        if any(regex.match(c) for c in candidates):
+            ignored = not negate
+    return ignored
+
+
+def context_files(context_dir=CONTEXT_DIR, rules=None):
+    """构建上下文里的文件（相对路径，已排序）；被排除的目录只要没有 ! 例外就不再深入"""
+    if rules is None:
+        rules = load_dockerignore(context_dir)
+    has_exceptions = any(negate for _, negate in rules)
+    files = []
+    for dirpath, dirnames, filenames in os.walk(context_dir):
+        rel_dir = os.path.relpath(dirpath, context_dir).replace(os.sep, "/")
+        prefix = "" if rel_dir == "." else rel_dir + "/"
+        if not has_exceptions:
+            dirnames[:] = [d for d in dirnames if not is_ignored(prefix + d, rules)]
+        for name in filenames:
+            rel = prefix + name
+            if not is_ignored(rel, rules):
+                files.append(rel)
+    return sorted(files)
+
+
+def manifest_hash(context_dir=CONTEXT_DIR):
+    """源码清单哈希：每个文件的路径、可执行位与内容摘要；返回 (sha256 十六进制, 文件数, 总字节)"""
+    digest = hashlib.sha256()
+    total = 0
+    files = context_files(context_dir)
+    for rel in files:
+        path = os.path.join(context_dir, rel)
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+                total += len(chunk)
+        mode = "x" if os.access(path, os.X_OK) else "-"
+        digest.update(f"{rel}\0{mode}\0{h.hexdigest()}\n".encode("utf-8"))
+    return digest.hexdigest(), len(files), total
+
+
+def source_tag(context_dir=CONTEXT_DIR):
+    return TAG_PREFIX + manifest_hash(context_dir)[0][:12]
+
+
+def build_time_env_reads(context_dir=CONTEXT_DIR):
+    """只依赖 NEXT_PUBLIC_* 的读取（没有运行时变量兜底）：[(相对路径, 行号, 变量名)]"""
+    found = []
+    src = os.path.join(context_dir, "src")
+    for dirpath, _, filenames in os.walk(src):
+        for name in filenames:
+            if not name.endswith((".ts", ".tsx", ".js", ".jsx")):
+                continue
+            path = os.path.join(dirpath, name)
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                for lineno, line in enumerate(f, 1):
+                    names = ENV_READ_RE.findall(line)
+                    if names and names[0].startswith("NEXT_PUBLIC_"):
+                        found.append((os.path.relpath(path, context_dir), lineno, names[0]))
+    return found
+
+
+# ---------------------------------------------------------------------------
+# Registry 客户端（Docker Registry HTTP API v2）
+# ---------------------------------------------------------------------------
+
+class RegistryError(Exception):
+    """registry 请求失败"""
+
+
+def parse_image(image):
+    """localhost:5000/xhs/web[:tag] → (host, repo, tag)；没有 host 时视为 Docker Hub"""
+    tag = None
+    name = image
+    if "@" in name:
+        raise RegistryError(f"镜像名不要带 digest: {image}")
+    last = name.rsplit("/", 1)[-1]
+    if ":" in last:
+        name, tag = name.rsplit(":", 1)
+    first, _, rest = name.partition("/")
+    if rest and ("." in first or ":" in first or first == "localhost"):
+        return first, rest, tag
+    return "registry-1.docker.io", name if "/" in name else "library/" + name, tag
+
+
+class Registry:
+    def __init__(self, host, user=None, password=None, timeout=60):
+        self.host = host
+        insecure = os.getenv("REGISTRY_INSECURE") == "1" or host.startswith(("localhost", "127.", "[::1]"))
+        self.base = ("http://" if insecure else "https://") + host
+        self.user = user if user is not None else os.getenv("REGISTRY_USER", "")
+        self.password = password if password is not None else os.getenv("REGISTRY_PASSWORD", "")
+        self.timeout = timeout
+        self._auth = {}
+
+    def _basic(self):
+        raw = f"{self.user}:{self.password}".encode("utf-8")
+        return "Basic " + base64.b64encode(raw).decode("ascii")
+
+    def _token(self, challenge, scope):
+        """按 WWW-Authenticate 挑战换取凭证：Bearer 走 token 服务，Basic 直接用账号密码"""
+        scheme, _, params = challenge.partition(" ")
+        if scheme.lower() == "basic":
+            if not self.user:
+                raise RegistryError("registry 需要账号密码（设置 REGISTRY_USER / REGISTRY_PASSWORD）")
+            return self._basic()
+        fields = dict(re.findall(r'(\w+)="([^"]*)"', params))
+        query = {"service": fields.get("service", "")}
+        query["scope"] = fields.get("scope") or scope
+        url = fields["realm"] + "?" + urllib.parse.urlencode({k: v for k, v in query.items() if v})
+        req = urllib.request.Request(url)
+        if self.user:
+            req.add_header("Authorization", self._basic())
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                data = json.loads(resp.read())
+        except urllib.error.URLError as e:
+            raise RegistryError(f"获取 registry token 失败: {e}")
+        return "Bearer " + (data.get("token") or data.get("access_token") or "")
+
+    def request(self, method, path, repo, data=None, headers=None, ok=(200,)):
+        """返回 (状态码, 响应头, 响应体)；404 原样返回，其它非预期状态抛 RegistryError"""
+        scope = f"repository:{repo}:pull,push" if repo else ""
+        for attempt in range(2):
+            req = urllib.request.Request(self.base + path, data=data, method=method)
+            for key, value in (headers or {}).items():
+                req.add_header(key, value)
+            if self._auth.get(scope):
+                req.add_header("Authorization", self._auth[scope])
+            try:
+                with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                    return resp.status, resp.headers, resp.read()
+            except urllib.error.HTTPError as e:
+                body = e.read()
+                if e.code == 401 and attempt == 0 and e.headers.get("WWW-Authenticate"):
+                    self._auth[scope] = self._token(e.headers["WWW-Authenticate"], scope)
+                    continue
+                if e.code in ok or e.code == 404:
+                    return e.code, e.headers, body
+                raise RegistryError(f"{method} {path} → HTTP {e.code}: {body[:300].decode('utf-8', 'replace')}")
+            except urllib.error.URLError as e:
+                raise RegistryError(f"无法连接 registry {self.base}: {e.reason}")
+        raise RegistryError(f"{method} {path} 鉴权失败")
+
+    def ping(self):
+        self.request("GET", "/v2/", None)
+
+    def manifest_digest(self, repo, ref):
+        """标签/digest 对应的 manifest digest；不存在返回 None"""
+        status, headers, body = self.request(
+            "HEAD", f"/v2/{repo}/manifests/{ref}", repo, headers={"Accept": ", ".join(MANIFEST_TYPES)})
+        if status == 404:
+            return None
+        return headers.get("Docker-Content-Digest") or ("sha256:" + hashlib.sha256(body).hexdigest() if body else None)
+
+    def get_manifest(self, repo, ref):
+        status, headers, body = self.request(
+            "GET", f"/v2/{repo}/manifests/{ref}", repo, headers={"Accept": ", ".join(MANIFEST_TYPES)})
+        if status == 404:
+            raise RegistryError(f"{repo}:{ref} 不存在")
+        return body, headers.get("Content-Type", MANIFEST_TYPES[-1])
+
+    def put_manifest(self, repo, tag, body, content_type):
+        _, headers, _ = self.request(
+            "PUT", f"/v2/{repo}/manifests/{tag}", repo, data=body,
+            headers={"Content-Type": content_type}, ok=(201, 202))
+        return headers.get("Docker-Content-Digest") or "sha256:" + hashlib.sha256(body).hexdigest()
+
+    def retag(self, repo, src_ref, tag):
+        """把 src_ref 的 manifest 原样写到 tag：不复制任何层，digest 不变"""
+        body, content_type = self.get_manifest(repo, src_ref)
+        return self.put_manifest(repo, tag, body, content_type)
+
+    def tags(self, repo):
+        status, _, body = self.request("GET", f"/v2/{repo}/tags/list", repo)
+        if status == 404:
+            return []
+        return json.loads(body or b"{}").get("tags") or []
+
+    def push_blob(self, repo, data):
+        digest = "sha256:" + hashlib.sha256(data).hexdigest()
+        status, _, _ = self.request("HEAD", f"/v2/{repo}/blobs/{digest}", repo)
+        if status == 200:
+            return digest
+        _, headers, _ = self.request("POST", f"/v2/{repo}/blobs/uploads/", repo, data=b"", ok=(202,))
+        location = urllib.parse.urljoin(self.base + "/", headers["Location"])
+        sep = "&" if "?" in location else "?"
+        path = location[len(self.base):] + sep + urllib.parse.urlencode({"digest": digest})
+        self.request("PUT", path, repo, data=data,
+                     headers={"Content-Type": "application/octet-stream"}, ok=(201,))
+        return digest
+
+
+def registry_from_image(image):
+    host, repo, tag = parse_image(image)
+    return Registry(host), repo, tag
+
+
+# ---------------------------------------------------------------------------
+# Registry 替身（本地联调用，docker push / pull 都能直接用）
+# ---------------------------------------------------------------------------
+
+class RegistryStore:
+    """blob 与 manifest 按 digest 存文件，标签是 repos/<仓库>/tags/<标签> 里的一行 digest"""
+
+    def __init__(self, root=REGISTRY_DIR):
+        self.root = root
+        for sub in ("blobs", "uploads", "repos"):
+            os.makedirs(os.path.join(root, sub), exist_ok=True)
+        self.lock = threading.Lock()
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, "blobs", digest.replace(":", "_"))
+
+    def has_blob(self, digest):
+        return DIGEST_RE.match(digest) is not None and os.path.exists(self.blob_path(digest))
+
+    def upload_path(self, upload_id):
+        if not re.fullmatch(r"[0-9a-f]{32}", upload_id):
+            raise KeyError(upload_id)
+        return os.path.join(self.root, "uploads", upload_id)
+
+    def new_upload(self):
+        upload_id = uuid.uuid4().hex
+        open(self.upload_path(upload_id), "wb").close()
+        return upload_id
+
+    def finish_upload(self, upload_id, digest):
+        path = self.upload_path(upload_id)
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        if "sha256:" + h.hexdigest() != digest:
+            os.remove(path)
+            return False
+        os.replace(path, self.blob_path(digest))
+        return True
+
+    def tag_path(self, repo, tag):
+        return os.path.join(self.root, "repos", repo, "tags", tag)
+
+    def resolve(self, repo, ref):
+        if DIGEST_RE.match(ref):
+            return ref if os.path.exists(self.blob_path(ref) + ".type") else None
+        try:
+            with open(self.tag_path(repo, ref), "r") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def put_manifest(self, repo, ref, body, content_type):
+        digest = "sha256:" + hashlib.sha256(body).hexdigest()
+        with self.lock:
+            with open(self.blob_path(digest), "wb") as f:
+                f.write(body)
+            with open(self.blob_path(digest) + ".type", "w") as f:
+                f.write(content_type)
+            if not DIGEST_RE.match(ref):
+                os.makedirs(os.path.dirname(self.tag_path(repo, ref)), exist_ok=True)
+                tmp = self.tag_path(repo, ref) + ".tmp"
+                with open(tmp, "w") as f:
+                    f.write(digest)
+                os.replace(tmp, self.tag_path(repo, ref))
+        return digest
+
+    def manifest(self, digest):
+        with open(self.blob_path(digest), "rb") as f:
+            body = f.read()
+        with open(self.blob_path(digest) + ".type", "r") as f:
+            return body, f.read()
+
+    def tags(self, repo):
+        directory = os.path.join(self.root, "repos", repo, "tags")
+        if not os.path.isdir(directory):
+            return None
+        return sorted(t for t in os.listdir(directory) if not t.endswith(".tmp"))
+
+
+def _manifest_refs(body):
+    """manifest 引用的 digest：单平台为 config + layers，多平台索引为各子 manifest"""
+    doc = json.loads(body)
+    if "manifests" in doc:
+        return [m["digest"] for m in doc["manifests"]], True
+    refs = [layer["digest"] for layer in doc.get("layers", [])]
+    if doc.get("config"):
+        refs.append(doc["config"]["digest"])
+    return refs, False
+
+
+class RegistryHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "xhs-registry/1.0"
+    store = None
+    quiet = True
+
+    ROUTE_RE = re.compile(r"^/v2/(?P<repo>.+?)/(?:(?P<kind>blobs/uploads|blobs|manifests|tags)/?(?P<ref>[^/]*))$")
+
+    def log_message(self, fmt, *args):
+        if not self.quiet:
+            super().log_message(fmt, *args)
+
+    def _send(self, status, body=b"", headers=None, head=False):
+        self.send_response(status)
+        self.send_header("Docker-Distribution-API-Version", "registry/2.0")
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        if "Content-Length" not in (headers or {}):
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and not head:
+            self.wfile.write(body)
+
+    def _error(self, status, code, message):
+        body = json.dumps({"errors": [{"code": code, "message": message}]}).encode("utf-8")
+        self._send(status, body, {"Content-Type": "application/json"})
+
+    def _read_body(self, out=None):
+        """读请求体（支持 chunked，docker push 的 PATCH 就是 chunked）；out 为文件时边读边写"""
+        chunks = []
+        write = out.write if out else chunks.append
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                remaining = size
+                while remaining:
+                    data = self.rfile.read(min(remaining, 1 << 20))
+                    if not data:
+                        raise ConnectionError("请求体提前结束")
+                    write(data)
+                    remaining -= len(data)
+                self.rfile.readline()
+        else:
+            remaining = int(self.headers.get("Content-Length") or 0)
+            while remaining:
+                data = self.rfile.read(min(remaining, 1 << 20))
+                if not data:
+                    raise ConnectionError("请求体提前结束")
+                write(data)
+                remaining -= len(data)
+        return b"".join(chunks)
+
+    def _route(self):
+        parsed = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(parsed.query))
+        if parsed.path in ("/v2", "/v2/"):
+            return "base", None, None, query
+        m = self.ROUTE_RE.match(parsed.path)
+        if not m or ".." in m.group("repo").split("/"):
+            return None, None, None, query
+        return m.group("kind"), m.group("repo"), urllib.parse.unquote(m.group("ref")), query
+
+    def do_GET(self, head=False):
+        kind, repo, ref, _ = self._route()
+        store = self.store
+        if kind == "base":
+            return self._send(200, b"{}", {"Content-Type": "application/json"}, head)
+        if kind == "blobs":
+            if not store.has_blob(ref):
+                return self._error(404, "BLOB_UNKNOWN", ref)
+            path = store.blob_path(ref)
+            size = os.path.getsize(path)
+            self.send_response(200)
+            self.send_header("Docker-Distribution-API-Version", "registry/2.0")
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(size))
+            self.send_header("Docker-Content-Digest", ref)
+            self.end_headers()
+            if not head:
+                with open(path, "rb") as f:
+                    shutil.copyfileobj(f, self.wfile, 1 << 20)
+            return
+        if kind == "manifests":
+            digest = store.resolve(repo, ref)
+            if not digest:
+                return self._error(404, "MANIFEST_UNKNOWN", f"{repo}:{ref}")
+            body, content_type = store.manifest(digest)
+            return self._send(200, body, {"Content-Type": content_type, "Docker-Content-Digest": digest,
+                                          "Content-Length": str(len(body))}, head)
+        if kind == "tags" and ref == "list":
+            tags = store.tags(repo)
+            if tags is None:
+                return self._error(404, "NAME_UNKNOWN", repo)
+            body = json.dumps({"name": repo, "tags": tags}).encode("utf-8")
+            return self._send(200, body, {"Content-Type": "application/json"}, head)
+        self._error(404, "UNSUPPORTED", self.path)
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+    def do_POST(self):
+        kind, repo, ref, query = self._route()
+        store = self.store
+        if kind != "blobs/uploads" or ref:
+            self._read_body()
+            return self._error(404, "UNSUPPORTED", self.path)
+        mounted = query.get("mount")
+        if mounted and store.has_blob(mounted):
+            self._read_body()
+            return self._send(201, headers={"Location": f"/v2/{repo}/blobs/{mounted}",
+                                            "Docker-Content-Digest": mounted})
+        upload_id = store.new_upload()
+        with open(store.upload_path(upload_id), "ab") as f:
+            self._read_body(f)
+        if query.get("digest"):
+            return self._finish(repo, upload_id, query["digest"])
+        self._send(202, headers={"Location": f"/v2/{repo}/blobs/uploads/{upload_id}",
+                                 "Docker-Upload-UUID": upload_id, "Range": "0-0"})
+
+    def do_PATCH(self):
+        kind, repo, ref, _ = self._route()
+        try:
+            path = self.store.upload_path(ref or "")
+        except KeyError:
+            path = None
+        if kind != "blobs/uploads" or not path or not os.path.exists(path):
+            self._read_body()
+            return self._error(404, "BLOB_UPLOAD_UNKNOWN", ref or "")
+        with open(path, "ab") as f:
+            self._read_body(f)
+        size = os.path.getsize(path)
+        self._send(202, headers={"Location": f"/v2/{repo}/blobs/uploads/{ref}", "Docker-Upload-UUID": ref,
+                                 "Range": f"0-{max(size - 1, 0)}"})
+
+    def do_PUT(self):
+        kind, repo, ref, query = self._route()
+        store = self.store
+        if kind == "blobs/uploads":
+            try:
+                path = store.upload_path(ref or "")
+            except KeyError:
+                path = None
+            if not path or not os.path.exists(path):
+                self._read_body()
+                return self._error(404, "BLOB_UPLOAD_UNKNOWN", ref or "")
+            with open(path, "ab") as f:
+                self._read_body(f)
+            return self._finish(repo, ref, query.get("digest", ""))
+        if kind == "manifests" and ref:
+            body = self._read_body()
+            content_type = self.headers.get("Content-Type", MANIFEST_TYPES[-1]).split(";")[0]
+            try:
+                refs, is_index = _manifest_refs(body)
+            except (ValueError, KeyError, TypeError):
+                return self._error(400, "MANIFEST_INVALID", "manifest 不是合法的 JSON")
+            missing = [d for d in refs
+                       if not (store.resolve(repo, d) if is_index else store.has_blob(d))]
+            if missing:
+                return self._error(400, "MANIFEST_BLOB_UNKNOWN", ", ".join(missing[:3]))
+            digest = store.put_manifest(repo, ref, body, content_type)
+            return self._send(201, headers={"Location": f"/v2/{repo}/manifests/{digest}",
+                                            "Docker-Content-Digest": digest})
+        self._read_body()
+        self._error(404, "UNSUPPORTED", self.path)
+
+    def _finish(self, repo, upload_id, digest):
+        if not DIGEST_RE.match(digest):
+            return self._error(400, "DIGEST_INVALID", digest or "缺少 digest")
+        if not self.store.finish_upload(upload_id, digest):
+            return self._error(400, "DIGEST_INVALID", f"内容与 {digest} 不符")
+        self._send(201, headers={"Location": f"/v2/{repo}/blobs/{digest}", "Docker-Content-Digest": digest})
+
+
+def start_registry(root=REGISTRY_DIR, port=DEFAULT_REGISTRY_PORT, host="127.0.0.1", quiet=True):
+    """后台线程启动 registry 替身，返回 (server, "host:port")"""
+    handler = type("Handler", (RegistryHandler,), {"store": RegistryStore(root), "quiet": quiet})
+    server = http.server.ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{'localhost' if host in ('127.0.0.1', '0.0.0.0') else host}:{server.server_address[1]}"
+
+
+# ---------------------------------------------------------------------------
+# 提升记录
+# ---------------------------------------------------------------------------
+
+def load_history(env=None):
+    if not os.path.exists(HISTORY_FILE):
+        return []
+    entries = []
+    with open(HISTORY_FILE, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if env is None or entry.get("env") == env:
+                entries.append(entry)
+    return entries
+
+
+def rollback_target(entries):
+    """
+    按提升记录推算回滚目标：每次普通提升把它替换掉的镜像压栈，每次回滚弹出一个。
+    这样连续回滚会一步步往回退，而不是在最近两个镜像之间来回切换
+    """
+    stack = []
+    for entry in entries:
+        if entry.get("source") == "rollback":
+            if stack:
+                stack.pop()
+        else:
+            stack.append(entry.get("previous"))
+    return stack[-1] if stack else None
+
+
+def record(entry):
+    with open(HISTORY_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+# ---------------------------------------------------------------------------
+# 子命令
+# ---------------------------------------------------------------------------
+
+def _image_arg(args):
+    image = args.image or os.getenv("IMAGE_REPO", "")
+    if not image:
+        raise RegistryError("未指定镜像仓库：传 --image 或设置 IMAGE_REPO（如 localhost:5000/xhs/web）")
+    return image
+
+
+def cmd_hash(args):
+    digest, count, size = manifest_hash(args.context)
+    print(f"{TAG_PREFIX}{digest[:12]}")
+    if args.verbose:
+        print(f"   源码清单 sha256:{digest}（{count} 个文件，{size / 1024 / 1024:.1f} MB）", file=sys.stderr)
+    return 0
+
+
+def cmd_build(args):
+    registry, repo, _ = registry_from_image(_image_arg(args))
+    started = time.time()
+    digest, count, size = manifest_hash(args.context)
+    tag = TAG_PREFIX + digest[:12]
+    ref = f"{registry.host}/{repo}:{tag}"
+    print(f"🧾 源码清单: {count} 个文件，{size / 1024 / 1024:.1f} MB → {tag}")
+
+    for rel, lineno, name in build_time_env_reads(args.context):
+        print(f"   ⚠️  {rel}:{lineno} 读取 {name}：构建时写死，各环境取值相同")
+
+    existing = registry.manifest_digest(repo, tag)
+    if existing and not args.force:
+        print(f"♻️  registry 已有 {ref}（{existing[:19]}），跳过构建")
+        return 0
+
+    docker = shutil.which("docker")
+    if not docker:
+        print("❌ 未找到 docker 命令：请在装有 Docker 的机器（或 CI）上运行 build")
+        return 1
+    labels = {
+        "org.opencontainers.image.revision": digest,
+        "org.opencontainers.image.created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "org.opencontainers.image.source": "web 2",
+    }
+    command = [docker, "build", "-t", ref, "-f", os.path.join(args.context, "Dockerfile")]
+    if args.platform:
+        command += ["--platform", args.platform]
+    for key, value in labels.items():
+        command += ["--label", f"{key}={value}"]
+    command.append(args.context)
+    print(f"🔨 {' '.join(command[1:3])} {ref}")
+    if subprocess.call(command) != 0:
+        print("❌ docker build 失败")
+        return 1
+    if subprocess.call([docker, "push", ref]) != 0:
+        print("❌ docker push 失败（registry 需要登录时先 docker login）")
+        return 1
+    pushed = registry.manifest_digest(repo, tag)
+    print(f"✅ 已推送 {ref}（{(pushed or '')[:19]}，{time.time() - started:.0f}s）")
+    return 0
+
+
+def _find_env_service(services, env, name=None):
+    import zeabur_api
+
+    if name:
+        return next((s for s in services if s["name"] == name), None)
+    if env == "prod":
+        return zeabur_api.find_app_service(services)
+    return next((s for s in services if s["name"].endswith(f"-{env}")), None)
+
+
+def cmd_promote(args):
+    registry, repo, _ = registry_from_image(_image_arg(args))
+    started = time.time()
+    env = args.to
+    previous = registry.manifest_digest(repo, env)
+
+    if args.rollback:
+        digest = rollback_target(load_history(env))
+        if not digest:
+            print(f"❌ 没有 {env} 更早的提升记录，无法回滚")
+            return 1
+        source = "rollback"
+    elif args.source_env:
+        source = args.source_env
+        digest = registry.manifest_digest(repo, source)
+    else:
+        source = args.tag or source_tag(args.context)
+        digest = registry.manifest_digest(repo, source)
+    if not digest:
+        print(f"❌ registry 里没有 {repo}:{source}，先运行: python3 image_promote.py build")
+        return 1
+    if digest == previous and not args.force:
+        print(f"✅ {env} 已经是 {digest[:19]}，无需提升")
+        return 0
+
+    registry.retag(repo, digest, env)
+    pinned = f"{registry.host}/{repo}@{digest}"
+    print(f"🏷️  {repo}:{env} → {digest[:19]}（来自 {source}，{time.time() - started:.1f}s）")
+
+    service_name = None
+    if not args.registry_only:
+        import zeabur_api
+
+        try:
+            project = zeabur_api.find_project(args.project)
+            services = zeabur_api.list_services(project["_id"])
+            service = _find_env_service(services, env, args.service)
+            if not service:
+                print(f"❌ 未找到 {env} 环境的服务（用 --service 指定），可用: {[s['name'] for s in services]}")
+                return 1
+            service_name = service["name"]
+            zeabur_api.set_service_image(project["_id"], service["_id"], pinned)
+            zeabur_api.redeploy_service(service["_id"])
+        except zeabur_api.ZeaburError as e:
+            print(f"❌ {e}")
+            print(f"   registry 标签已移动，可稍后重试，或回滚: python3 image_promote.py promote --to {env} --rollback")
+            return 1
+        print(f"🚀 {service_name} 已切换到 {pinned}，正在重新部署（不重新构建）")
+
+    elapsed = time.time() - started
+    record({
+        "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "env": env,
+        "source": source,
+        "digest": digest,
+        "previous": previous,
+        "image": pinned,
+        "service": service_name,
+        "seconds": round(elapsed, 2),
+    })
+    print(f"✅ 提升完成，用时 {elapsed:.1f}s")
+    return 0
+
+
+def cmd_status(args):
+    registry, repo, _ = registry_from_image(_image_arg(args))
+    tag = source_tag(args.context)
+    current = registry.manifest_digest(repo, tag)
+    print(f"📦 {registry.host}/{repo}")
+    print(f"   当前源码: {tag}  {'已构建 ' + current[:19] if current else '未构建'}")
+
+    tags = registry.tags(repo)
+    by_digest = {}
+    for t in sorted(t for t in tags if t.startswith(TAG_PREFIX))[-args.limit:]:
+        by_digest.setdefault(registry.manifest_digest(repo, t), t)
+    envs = sorted(t for t in tags if not t.startswith(TAG_PREFIX))
+    for env in envs:
+        digest = registry.manifest_digest(repo, env)
+        origin = by_digest.get(digest, "?")
+        marker = "（当前源码）" if digest == current else ""
+        print(f"   {env:<12} {(digest or '')[:19]}  {origin}{marker}")
+
+    history = load_history()[-args.limit:]
+    if history:
+        print("🕑 最近提升:")
+        for e in history:
+            print(f"   {e['at']}  {e['env']:<10} {e['digest'][:19]}  来自 {e['source']:<18} {e['seconds']}s")
+    return 0
+
+
+def cmd_registry(args):
+    server, address = start_registry(args.root, args.port, args.host, quiet=not args.verbose)
+    print(f"🗃️  Registry 替身已启动: {address}（数据目录 {os.path.relpath(args.root, ROOT_DIR)}）")
+    print(f"   export IMAGE_REPO={address}/xhs/web")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print("\n👋 已停止")
+    return 0
+
+
+def cmd_bench(args):
+    """离线演示：向临时 registry 替身推一个合成镜像（模拟 build），再依次提升到 staging / prod"""
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as root:
+        server, address = start_registry(os.path.join(root, "registry"), port=0)
+        registry = Registry(address)
+        repo = "xhs/web"
+        tag = source_tag(args.context)
+
+        started = time.time()
+        layers = [os.urandom(args.layer_mb << 20) for _ in range(args.layers)]
+        descriptors = [{"mediaType": "application/vnd.oci.image.layer.v1.tar+gzip",
+                        "digest": registry.push_blob(repo, data), "size": len(data)} for data in layers]
+        config = json.dumps({"architecture": "amd64", "os": "linux",
+                             "config": {"Labels": {"org.opencontainers.image.revision": tag}}}).encode("utf-8")
+        manifest = json.dumps({
+            "schemaVersion": 2,
+            "mediaType": MANIFEST_TYPES[2],
+            "config": {"mediaType": "application/vnd.oci.image.config.v1+json",
+                       "digest": registry.push_blob(repo, config), "size": len(config)},
+            "layers": descriptors,
+        }).encode("utf-8")
+        digest = registry.put_manifest(repo, tag, manifest, MANIFEST_TYPES[2])
+        push_seconds = time.time() - started
+        total_mb = args.layers * args.layer_mb
+        print(f"📤 推送 {repo}:{tag}（{args.layers} 层共 {total_mb} MB）: {push_seconds:.2f}s"
+              f"  （真实构建还要加上 npm ci + prisma generate + next build）")
+
+        for env, source in (("staging", tag), ("prod", "staging")):
+            t0 = time.time()
+            registry.retag(repo, source, env)
+            got = registry.manifest_digest(repo, env)
+            ok = "✅" if got == digest else "❌"
+            print(f"{ok} 提升到 {env:<8}（来自 {source}）: {(time.time() - t0) * 1000:.1f}ms  {got[:19]}")
+        server.shutdown()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="镜像只构建一次，按源码清单哈希打标签并提升到各环境")
+    parser.add_argument("--image", help="镜像仓库（默认读 IMAGE_REPO，如 localhost:5000/xhs/web）")
+    parser.add_argument("--context", default=CONTEXT_DIR, help="构建上下文目录（默认 web 2）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("hash", help="打印当前源码对应的镜像标签")
+    p.add_argument("--verbose", "-v", action="store_true")
+    p.set_defaults(func=cmd_hash)
+
+    p = sub.add_parser("build", help="构建并推送镜像（已有同一标签则跳过）")
+    p.add_argument("--force", action="store_true", help="标签已存在也重新构建")
+    p.add_argument("--platform", default="linux/amd64", help="目标平台（默认 linux/amd64，与 Zeabur 一致）")
+    p.set_defaults(func=cmd_build)
+
+    p = sub.add_parser("promote", help="把镜像提升到某个环境")
+    p.add_argument("--to", required=True, help="目标环境（如 staging、prod）")
+    group = p.add_mutually_exclusive_group()
+    group.add_argument("--tag", help="要提升的镜像标签（默认当前源码的 src-<哈希>）")
+    group.add_argument("--from", dest="source_env", help="提升另一个环境正在使用的镜像（如 --from staging）")
+    group.add_argument("--rollback", action="store_true", help="回到该环境上一次提升前的镜像（连续回滚会继续往前退）")
+    p.add_argument("--project", help="Zeabur 项目名")
+    p.add_argument("--service", help="目标服务名（默认 prod 为应用服务，其它环境为 <名称>-<环境>）")
+    p.add_argument("--registry-only", action="store_true", help="只移动 registry 标签，不改 Zeabur 服务")
+    p.add_argument("--force", action="store_true", help="镜像未变也重新提升")
+    p.set_defaults(func=cmd_promote)
+
+    p = sub.add_parser("status", help="各环境正在使用的镜像与最近的提升记录")
+    p.add_argument("--limit", type=int, default=10)
+    p.set_defaults(func=cmd_status)
+
+    p = sub.add_parser("registry", help="启动本地 Docker Registry v2 替身")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=int(os.getenv("REGISTRY_PORT", DEFAULT_REGISTRY_PORT)))
+    p.add_argument("--root", default=REGISTRY_DIR, help="数据目录（默认 .registry/）")
+    p.add_argument("--verbose", "-v", action="store_true", help="打印每个请求")
+    p.set_defaults(func=cmd_registry)
+
+    p = sub.add_parser("bench", help="离线演示：推送合成镜像并提升，对比耗时")
+    p.add_argument("--layers", type=int, default=4)
+    p.add_argument("--layer-mb", type=int, default=32)
+    p.set_defaults(func=cmd_bench)
+
+    args = parser.parse_args(argv)
+    try:
+        return args.func(args)
+    except RegistryError as e:
+        print(f"❌ {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,648 @@
+#!/usr/bin/env python3
+"""
+生图任务 worker：从 Postgres 队列领取任务，按供应商限流并发生图
+
+/api/generate/images 在队列模式下（请求体 async: true 或 IMAGE_JOB_QUEUE=1）只生成提示词、
+抠图，然后写入 "GenerationJob" 并立即返回任务 ID。本 worker：
+  - 用 SELECT … FOR UPDATE SKIP LOCKED 领取任务，多个 worker 进程可同时运行互不抢占
+  - 同一任务的 6 张图并发生成；每个供应商一个线程池，池大小即该供应商的并发上限
+    （多进程部署时总并发 = 进程数 × 上限）
+  - 每完成一张就把结果写回 "Generation"."imageUrls"（JSON 数组），前端轮询
+    /api/generate/images/jobs/<id> 或 ?stream=1 即可逐张拿到
+  - 任务持有租约（lockedAt 心跳），worker 崩溃后超过租约时间会被其它 worker 接手，
+    已完成的图不会重复生成；超过最大尝试次数标记为 failed
+  - --meter：每次生图调用（含失败重试）按供应商 / 模型 / 用户计入 UsageDaily / UsageUserDaily（见 usage_meter.py）；
+    不加时在请求头里带上 X-Meter-Route / X-Meter-User，由 vendor_gateway.py --meter 代为计量
+    （只在供应商地址指向 VENDOR_GATEWAY_URL 时带，直连供应商不把用户 ID 发给第三方）
+
+用法：
+  export DATABASE_URL='postgresql://...'
+  python3 image_worker.py                               # 常驻运行
+  python3 image_worker.py --once                        # 处理完当前队列后退出
+  python3 image_worker.py --limits dashscope=4,volc=2   # 供应商并发上限
+  python3 image_worker.py --status                      # 查看队列状态
+  python3 image_worker.py --stub                        # 供应商指向本地桩服务（联调）
+  python3 image_worker.py --meter                       # 计量生图调用与成本
+  python3 image_worker.py --bench --jobs 8              # 离线压测：内存队列 + 桩服务，对比串行生图
+
+依赖：pip install psycopg2-binary（--bench 不需要）
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from urllib import error as urlerror
+from urllib import request as urlrequest
+
+from credential_smoke import percentile
+
+DEFAULT_LIMITS = {"dashscope": 4, "volc": 4}
+DEFAULT_BASE_URLS = {
+    "dashscope": "https://dashscope.aliyuncs.com/api/v1",
+    "volc": "https://ark.cn-beijing.volces.com/api/v3",
+}
+# Prisma 的 DateTime 以 UTC 存在 timestamp(3) 里
+NOW_UTC = "(now() AT TIME ZONE 'UTC')"
+JOB_COLUMNS = ('j.id, j."generationId", j.vendor, j.model, j."credProfile", j."refImage", '
+               'j.renders, j.results, j.total, j.attempts, '
+               '(SELECT g."userId" FROM "Generation" g WHERE g.id = j."generationId")')
+METER_ROUTE = "images-queue"
+
+
+class RenderError(Exception):
+    """单张图生成失败（上游报错或返回内容无法解析）"""
+
+
+class LeaseLost(Exception):
+    """任务租约已被其它 worker 接手，当前 worker 应放弃该任务"""
+
+
+class Job:
+    def __init__(self, id, generation_id, vendor, model, cred_profile, ref_image, renders, results, total,
+                 attempts=0, user_id=None):
+        self.id = id
+        self.generation_id = generation_id
+        self.vendor = vendor
+        self.model = model
+        self.cred_profile = cred_profile
+        self.ref_image = ref_image
+        self.renders = renders
+        self.results = {r["index"]: r for r in results}
+        self.total = total
+        self.attempts = attempts
+        self.user_id = user_id
+        self.meter_headers = {}
+        self.lock = threading.Lock()
+        self.created = time.perf_counter()
+        self.first_image_at = None
+        self.finished_at = None
+
+    @classmethod
+    def from_row(cls, row):
+        id, generation_id, vendor, model, profile, ref_image, renders, results, total, attempts, user_id = row
+        return cls(id, generation_id, vendor, model, profile, ref_image, json.loads(renders or "[]"),
+                   json.loads(results or "[]"), total, attempts, user_id)
+
+    def pending(self):
+        """还没有成功结果的序号（上次失败的也会重试）"""
+        return [i for i in range(len(self.renders)) if not self.results.get(i, {}).get("url")]
+
+    def image_urls(self):
+        return [self.results[i]["url"] for i in sorted(self.results) if self.results[i].get("url")]
+
+    def counts(self):
+        done = sum(1 for r in self.results.values() if r.get("url"))
+        return done, sum(1 for r in self.results.values() if r.get("error"))
+
+
+# ---------- 供应商 ----------
+
+def _api_key(prefix, fallbacks, profile):
+    """规则同 web 2/src/lib/credentials.ts：非 default 的 profile 优先取 <PREFIX>_<PROFILE>"""
+    if profile and profile != "default" and os.getenv(f"{prefix}_{profile}"):
+        return os.getenv(f"{prefix}_{profile}")
+    for name in (prefix, *fallbacks):
+        if os.getenv(name):
+            return os.getenv(name)
+    return ""
+
+
+def dashscope_api_key(profile):
+    return _api_key("DASHSCOPE_API_KEY", ("IMAGE_API_KEY",), profile)
+
+
+def volc_api_key(profile):
+    return _api_key("VOLC_API_KEY", ("AI_API_KEY", "TEXT_API_KEY"), profile)
+
+
+def via_gateway(base_url):
+    """供应商地址是否指向 VENDOR_GATEWAY_URL（逗号分隔，与应用 lib/metering.ts 相同）"""
+    base = (base_url or "").rstrip("/")
+    gateways = [u.strip().rstrip("/") for u in os.getenv("VENDOR_GATEWAY_URL", "").split(",") if u.strip()]
+    return any(base == g or base.startswith(g + "/") for g in gateways)
+
+
+def vendor_base_urls():
+    return {
+        "dashscope": os.getenv("DASHSCOPE_BASE_URL") or os.getenv("IMAGE_BASE_URL") or DEFAULT_BASE_URLS["dashscope"],
+        "volc": os.getenv("VOLC_BASE_URL") or os.getenv("AI_BASE_URL") or os.getenv("TEXT_BASE_URL")
+        or DEFAULT_BASE_URLS["volc"],
+    }
+
+
+def _post_json(url, api_key, body, timeout, extra_headers=None):
+    req = urlrequest.Request(url, data=json.dumps(body).encode("utf-8"), method="POST", headers={
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key.strip()}",
+        **(extra_headers or {}),
+    })
+    try:
+        with urlrequest.urlopen(req, timeout=timeout) as resp:
+            status, raw = resp.status, resp.read()
+    except urlerror.HTTPError as e:
+        status, raw = e.code, e.read()
+    except (urlerror.URLError, OSError) as e:
+        raise RenderError(f"网络错误: {e}")
+    try:
+        data = json.loads(raw.decode("utf-8"))
+    except (ValueError, UnicodeDecodeError):
+        data = {}
+    if status != 200:
+        message = data.get("message") or (data.get("error") or {}).get("message") or raw[:200].decode("utf-8", "replace")
+        raise RenderError(f"HTTP {status}: {data.get('code', '')} {message}".strip())
+    return data
+
+
+def render_dashscope(job, spec, base_url, timeout):
+    """与 /api/generate/images 同步生图的请求体一致（qwen-image-edit-plus）"""
+    api_key = dashscope_api_key(job.cred_profile)
+    if not api_key:
+        raise RenderError("缺少配图引擎密钥（DASHSCOPE_API_KEY...）")
+    data = _post_json(f"{base_url}/services/aigc/multimodal-generation/generation", api_key, {
+        "model": job.model,
+        "input": {"messages": [{"role": "user", "content": [{"image": job.ref_image}, {"text": spec["prompt"]}]}]},
+        "parameters": {
+            "n": 1,
+            "negative_prompt": spec.get("negativePrompt", ""),
+            "prompt_extend": bool(spec.get("promptExtend")),
+            "watermark": False,
+        },
+    }, timeout, job.meter_headers)
+    try:
+        return data["output"]["choices"][0]["message"]["content"][0]["image"]
+    except (KeyError, IndexError, TypeError):
+        raise RenderError(f"响应中没有图片: {json.dumps(data, ensure_ascii=False)[:200]}")
+
+
+def render_volc(job, spec, base_url, timeout):
+    """火山方舟 Seedream 图生图（OpenAI images 接口）"""
+    api_key = volc_api_key(job.cred_profile)
+    if not api_key:
+        raise RenderError("缺少文案引擎密钥（VOLC_API_KEY...）")
+    data = _post_json(f"{base_url}/images/generations", api_key, {
+        "model": job.model,
+        "prompt": spec["prompt"],
+        "image": job.ref_image,
+        "size": "2048x2048",
+        "response_format": "url",
+        "watermark": False,
+    }, timeout, job.meter_headers)
+    try:
+        return data["data"][0]["url"]
+    except (KeyError, IndexError, TypeError):
+        raise RenderError(f"响应中没有图片: {json.dumps(data, ensure_ascii=False)[:200]}")
+
+
+RENDERERS = {"dashscope": render_dashscope, "volc": render_volc}
+
+
+# ---------- 队列存储 ----------
+
+class PostgresStore:
+    """"GenerationJob" 表上的队列操作；连接池按线程取用"""
+
+    def __init__(self, database_url, max_connections=8):
+        try:
+            import psycopg2.pool
+        except ImportError:
+            print("❌ 缺少依赖 psycopg2，请先执行: pip install psycopg2-binary")
+            sys.exit(1)
+        from db_pool import libpq_url
+        self.pool = psycopg2.pool.ThreadedConnectionPool(1, max_connections, libpq_url(database_url))
+
+    def _execute(self, sql_list):
+        """在一个事务里依次执行 [(sql, params)]，返回 (最后一条的 rows, 各条 rowcount)"""
+        conn = self.pool.getconn()
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    rows, counts = [], []
+                    for sql, params in sql_list:
+                        cur.execute(sql, params)
+                        counts.append(cur.rowcount)
+                        rows = cur.fetchall() if cur.description else []
+            return rows, counts
+        finally:
+            self.pool.putconn(conn)
+
+    def claim(self, worker_id, limit, lease_seconds, max_attempts):
+        expire = (f'''
+            UPDATE "GenerationJob" SET status = 'failed', error = '超过最大尝试次数', "lockedBy" = NULL,
+                   "updatedAt" = {NOW_UTC}
+            WHERE status = 'running' AND "lockedAt" < {NOW_UTC} - make_interval(secs => %s) AND attempts >= %s
+        ''', (lease_seconds, max_attempts))
+        pick = (f'''
+            WITH picked AS (
+                SELECT id FROM "GenerationJob"
+                WHERE status = 'queued'
+                   OR (status = 'running' AND "lockedAt" < {NOW_UTC} - make_interval(secs => %s) AND attempts < %s)
+                ORDER BY "createdAt"
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE "GenerationJob" j
+            SET status = 'running', "lockedBy" = %s, "lockedAt" = {NOW_UTC}, attempts = j.attempts + 1,
+                "updatedAt" = {NOW_UTC}
+            FROM picked WHERE j.id = picked.id
+            RETURNING {JOB_COLUMNS}
+        ''', (lease_seconds, max_attempts, limit, worker_id))
+        rows, _ = self._execute([expire, pick])
+        return [Job.from_row(r) for r in rows]
+
+    def save_progress(self, job, worker_id):
+        done, failed = job.counts()
+        results = json.dumps([job.results[i] for i in sorted(job.results)], ensure_ascii=False)
+        _, counts = self._execute([
+            (f'''UPDATE "GenerationJob" SET results = %s, done = %s, failed = %s, "lockedAt" = {NOW_UTC},
+                     "updatedAt" = {NOW_UTC}
+                 WHERE id = %s AND "lockedBy" = %s AND status = 'running' ''',
+             (results, done, failed, job.id, worker_id)),
+            ('UPDATE "Generation" SET "imageUrls" = %s WHERE id = %s',
+             (json.dumps(job.image_urls(), ensure_ascii=False), job.generation_id)),
+        ])
+        if counts[0] == 0:
+            raise LeaseLost(job.id)
+
+    def finish(self, job, worker_id, status, error=None):
+        self._execute([(f'''
+            UPDATE "GenerationJob" SET status = %s, error = %s, "lockedBy" = NULL, "updatedAt" = {NOW_UTC}
+            WHERE id = %s AND "lockedBy" = %s
+        ''', (status, error, job.id, worker_id))])
+
+    def release(self, job, worker_id, error):
+        """放回队列，让任意 worker 立即重新领取（已完成的张数保留在 results 里）"""
+        self._execute([(f'''
+            UPDATE "GenerationJob" SET status = 'queued', error = %s, "lockedBy" = NULL, "updatedAt" = {NOW_UTC}
+            WHERE id = %s AND "lockedBy" = %s
+        ''', (error, job.id, worker_id))])
+
+    def heartbeat(self, job_ids, worker_id):
+        if job_ids:
+            self._execute([(f'''
+                UPDATE "GenerationJob" SET "lockedAt" = {NOW_UTC}
+                WHERE id = ANY(%s) AND "lockedBy" = %s AND status = 'running'
+            ''', (list(job_ids), worker_id))])
+
+    def status(self):
+        rows, _ = self._execute([('''
+            SELECT status, count(*), min("createdAt"), coalesce(sum(done), 0), coalesce(sum(total), 0)
+            FROM "GenerationJob" GROUP BY status ORDER BY status
+        ''', None)])
+        return rows
+
+
+class MemoryStore:
+    """内存队列，接口与 PostgresStore 相同，只用于 --bench"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queued = []
+        self.jobs = {}
+        self.image_urls = {}
+
+    def enqueue(self, job):
+        with self.lock:
+            self.queued.append(job)
+            self.jobs[job.id] = job
+
+    def claim(self, worker_id, limit, lease_seconds, max_attempts):
+        with self.lock:
+            picked, self.queued = self.queued[:limit], self.queued[limit:]
+        for job in picked:
+            job.attempts += 1
+        return picked
+
+    def save_progress(self, job, worker_id):
+        with self.lock:
+            self.image_urls[job.generation_id] = job.image_urls()
+
+    def finish(self, job, worker_id, status, error=None):
+        job.status = status
+
+    def release(self, job, worker_id, error):
+        job.status = "queued"
+        self.enqueue(job)
+
+    def heartbeat(self, job_ids, worker_id):
+        pass
+
+
+# ---------- worker ----------
+
+class Worker:
+    def __init__(self, store, limits, base_urls, max_jobs=4, poll_interval=1.0, lease_seconds=300,
+                 max_attempts=3, render_retries=2, timeout=120, worker_id=None, verbose=True, meter=None):
+        self.store = store
+        self.meter = meter
+        self.limits = limits
+        self.base_urls = base_urls
+        self.max_jobs = max_jobs
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.render_retries = render_retries
+        self.timeout = timeout
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.verbose = verbose
+        # 每个供应商一个线程池：池大小就是该供应商的并发上限
+        self.pools = {v: ThreadPoolExecutor(max_workers=n, thread_name_prefix=f"render-{v}") for v, n in limits.items()}
+        self.job_pool = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix="job")
+        self.active = {}
+        self.active_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.completed = []
+
+    def log(self, msg):
+        if self.verbose:
+            print(msg, flush=True)
+
+    def render_one(self, job, index):
+        spec = job.renders[index]
+        renderer = RENDERERS[job.vendor]
+        last = ""
+        for attempt in range(self.render_retries + 1):
+            started = time.perf_counter()
+            try:
+                url = renderer(job, spec, self.base_urls[job.vendor], self.timeout)
+                self._meter(job, True, started)
+                return url
+            except RenderError as e:
+                self._meter(job, False, started)
+                last = str(e)
+                if attempt < self.render_retries:
+                    time.sleep(1.5 * (attempt + 1))
+        raise RenderError(last)
+
+    def _meter(self, job, ok, started):
+        if self.meter is not None:
+            self.meter.record(job.vendor, job.model, profile=job.cred_profile, route=METER_ROUTE, user=job.user_id,
+                              ok=ok, latency_ms=(time.perf_counter() - started) * 1000, images=1 if ok else 0)
+
+    def process(self, job):
+        # 自己计量时让网关跳过；否则把用户与接口交给网关计量；不经网关时一个计量头都不带
+        if not via_gateway(self.base_urls.get(job.vendor)):
+            job.meter_headers = {}
+        elif self.meter is not None:
+            job.meter_headers = {"X-Meter-Skip": "1"}
+        else:
+            job.meter_headers = {"X-Meter-Route": METER_ROUTE, **({"X-Meter-User": job.user_id} if job.user_id else {})}
+        if job.vendor not in RENDERERS or job.vendor not in self.pools:
+            self.store.finish(job, self.worker_id, "failed", f"不支持的供应商: {job.vendor}")
+            return
+        pending = job.pending()
+        self.log(f"🎨 任务 {job.id[:8]} 开始（第 {job.attempts} 次，{len(pending)}/{job.total} 张待生成）")
+        futures = {self.pools[job.vendor].submit(self.render_one, job, i): i for i in pending}
+        try:
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    result = {"index": index, "url": future.result()}
+                    self.log(f"   ✅ {job.id[:8]} 第 {index + 1} 张完成")
+                except RenderError as e:
+                    result = {"index": index, "error": str(e)[:300]}
+                    self.log(f"   ❌ {job.id[:8]} 第 {index + 1} 张失败: {e}")
+                with job.lock:
+                    job.results[index] = result
+                    if result.get("url") and job.first_image_at is None:
+                        job.first_image_at = time.perf_counter()
+                    self.store.save_progress(job, self.worker_id)
+            done, failed = job.counts()
+            job.finished_at = time.perf_counter()
+            status = "done" if done else "failed"
+            error = f"{failed} 张失败" if failed else None
+            self.store.finish(job, self.worker_id, status, error)
+        except LeaseLost:
+            self.log(f"⚠️  任务 {job.id[:8]} 的租约已被其它 worker 接手，放弃")
+            for future in futures:
+                future.cancel()
+            return
+        except Exception as e:
+            # 写库或渲染出了意料之外的错：没开始的渲染取消，已在跑的等它结束（不和接手的 worker 重复出图），
+            # 再把任务放回队列或标记失败，不让客户端看着一个 running 的任务干等到租约过期
+            for future in futures:
+                future.cancel()
+            wait(futures)
+            self._abandon(job, e)
+            return
+        self.completed.append(job)
+        self.log(f"🏁 任务 {job.id[:8]} {status}: {done}/{job.total}")
+
+    def _abandon(self, job, error):
+        """还有尝试次数就放回队列，否则标记失败；连状态都写不回去时只能等租约过期"""
+        message = f"{type(error).__name__}: {error}"[:300]
+        retry = job.attempts < self.max_attempts
+        self.log(f"💥 任务 {job.id[:8]} 异常（{'放回队列重试' if retry else '已达最大尝试次数，标记失败'}）: {message}")
+        try:
+            if retry:
+                self.store.release(job, self.worker_id, message)
+            else:
+                self.store.finish(job, self.worker_id, "failed", message)
+        except Exception as e:
+            self.log(f"⚠️  任务 {job.id[:8]} 状态写回失败，租约过期后会被重新领取: {e}")
+
+    def _run_job(self, job):
+        try:
+            self.process(job)
+        except Exception as e:
+            # process 已自行放回/标记失败；走到这里说明连这一步都出错了，租约过期后会被重新领取
+            self.log(f"💥 任务 {job.id[:8]} 异常: {type(e).__name__}: {e}")
+        finally:
+            with self.active_lock:
+                self.active.pop(job.id, None)
+
+    def _heartbeat_loop(self):
+        interval = max(1.0, self.lease_seconds / 3)
+        while not self.stop_event.wait(interval):
+            with self.active_lock:
+                ids = list(self.active)
+            try:
+                self.store.heartbeat(ids, self.worker_id)
+            except Exception as e:
+                self.log(f"⚠️  心跳失败: {e}")
+
+    def run(self, once=False):
+        threading.Thread(target=self._heartbeat_loop, daemon=True).start()
+        idle = self.poll_interval
+        try:
+            while not self.stop_event.is_set():
+                with self.active_lock:
+                    free = self.max_jobs - len(self.active)
+                jobs = []
+                if free > 0:
+                    jobs = self.store.claim(self.worker_id, free, self.lease_seconds, self.max_attempts)
+                for job in jobs:
+                    with self.active_lock:
+                        self.active[job.id] = job
+                    self.job_pool.submit(self._run_job, job)
+                if jobs:
+                    idle = self.poll_interval
+                    continue
+                with self.active_lock:
+                    busy = bool(self.active)
+                if once and not busy:
+                    break
+                # 队列空闲时逐步放慢轮询，最多 5 倍间隔
+                self.stop_event.wait(idle)
+                idle = min(idle * 1.5, self.poll_interval * 5) if not busy else self.poll_interval
+        finally:
+            self.stop_event.set()
+            self.job_pool.shutdown(wait=True)
+            for pool in self.pools.values():
+                pool.shutdown(wait=True)
+
+
+# ---------- 命令行 ----------
+
+def parse_limits(text):
+    limits = dict(DEFAULT_LIMITS)
+    for item in (text or "").split(","):
+        if not item.strip():
+            continue
+        name, sep, value = item.partition("=")
+        if not sep or not value.strip().isdigit() or int(value) < 1:
+            raise SystemExit(f"❌ --limits 格式应为 vendor=并发数，例如 dashscope=4,volc=2: {item}")
+        limits[name.strip()] = int(value)
+    return limits
+
+
+def print_status(store):
+    rows = store.status()
+    if not rows:
+        print("📭 队列为空")
+        return
+    print(f"{'状态':<10}{'任务数':>8}{'已出图':>10}   最早入队")
+    for status, count, oldest, done, total in rows:
+        print(f"{status:<10}{count:>8}{f'{done}/{total}':>10}   {oldest}")
+
+
+def bench(args, limits):
+    """内存队列 + 桩服务：同样的任务分别按旧的串行方式和 worker 并发方式跑一遍"""
+    from stub_vendors import StubConfig, start_stub_server, stub_base_urls
+
+    config = StubConfig(latency={"dashscope": args.render_latency, "volc": args.render_latency}, seed=7)
+    server, base_url = start_stub_server(config=config)
+    base_urls = stub_base_urls(base_url)
+    os.environ.setdefault("DASHSCOPE_API_KEY", "sk-bench")
+    renders = [{"prompt": f"bench prompt {i}", "negativePrompt": "", "promptExtend": False} for i in range(6)]
+
+    def make_jobs():
+        return [Job(f"bench-{n}-{uuid.uuid4().hex[:6]}", f"gen-{n}", "dashscope", "qwen-image-edit-plus",
+                    "default", "data:image/png;base64,AAAA", renders, [], len(renders)) for n in range(args.jobs)]
+
+    print(f"🧪 压测：{args.jobs} 个任务 × {len(renders)} 张，桩服务单张延迟 ~{args.render_latency}s，"
+          f"并发上限 {limits}，同时处理 {args.max_jobs} 个任务\n")
+
+    # 旧方式：一个请求里串行生成 6 张，每张之后固定等待 --serial-gap 秒；请求之间按 max_jobs 并发
+    serial_jobs = make_jobs()
+    started = time.perf_counter()
+
+    def serial(job):
+        for i in range(len(renders)):
+            job.results[i] = {"index": i, "url": render_dashscope(job, renders[i], base_urls["dashscope"], 60)}
+            job.first_image_at = job.first_image_at or time.perf_counter()
+            time.sleep(args.serial_gap)
+        job.finished_at = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=args.max_jobs) as pool:
+        list(pool.map(serial, serial_jobs))
+    serial_wall = time.perf_counter() - started
+
+    config.counters.clear()
+    store = MemoryStore()
+    queued_jobs = make_jobs()
+    for job in queued_jobs:
+        store.enqueue(job)
+        job.created = time.perf_counter()
+    worker = Worker(store, limits, base_urls, max_jobs=args.max_jobs, poll_interval=0.05, verbose=False)
+    started = time.perf_counter()
+    worker.run(once=True)
+    queue_wall = time.perf_counter() - started
+    peak = config.counters.get("peak:dashscope", 0)
+    server.shutdown()
+
+    def row(label, jobs, wall):
+        first = [j.first_image_at - j.created for j in jobs if j.first_image_at]
+        total = [j.finished_at - j.created for j in jobs if j.finished_at]
+        images = sum(len(j.image_urls()) for j in jobs)
+        print(f"   {label:<12} 总耗时 {wall:6.2f}s   首图 p50 {percentile(first, 50):5.2f}s   "
+              f"任务完成 p50 {percentile(total, 50):6.2f}s  p95 {percentile(total, 95):6.2f}s   出图 {images}")
+
+    row("串行（旧）", serial_jobs, serial_wall)
+    row("worker 池", queued_jobs, queue_wall)
+    print(f"\n   百炼最大并发: {peak}（上限 {limits.get('dashscope')}）")
+    print(f"   ⚡ 总耗时缩短 {serial_wall / queue_wall:.1f} 倍" if queue_wall else "")
+    return 0 if peak <= limits.get("dashscope", 0) else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生图任务 worker（Postgres 队列 + 按供应商限流的并发生图）")
+    parser.add_argument("--database-url", help="缺省读取环境变量 DATABASE_URL")
+    parser.add_argument("--limits", default=os.getenv("IMAGE_WORKER_LIMITS", ""),
+                        help="供应商并发上限，如 dashscope=4,volc=2（缺省 IMAGE_WORKER_LIMITS）")
+    parser.add_argument("--max-jobs", type=int, default=int(os.getenv("IMAGE_WORKER_MAX_JOBS", "4")),
+                        help="同时处理的任务数（默认 4）")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="队列轮询间隔秒数（默认 1）")
+    parser.add_argument("--lease", type=int, default=300, help="任务租约秒数，超时未心跳会被其它 worker 接手（默认 300）")
+    parser.add_argument("--max-attempts", type=int, default=3, help="任务最大领取次数（默认 3）")
+    parser.add_argument("--render-retries", type=int, default=2, help="单张图失败重试次数（默认 2）")
+    parser.add_argument("--timeout", type=int, default=120, help="单次生图请求超时秒数（默认 120）")
+    parser.add_argument("--once", action="store_true", help="处理完当前队列后退出")
+    parser.add_argument("--status", action="store_true", help="查看队列状态后退出")
+    parser.add_argument("--stub", action="store_true", help="启动本地桩服务并把供应商指向它")
+    parser.add_argument("--meter", action="store_true", help="计量每次生图调用（写入 DATABASE_URL 的 UsageDaily 等表）")
+    parser.add_argument("--bench", action="store_true", help="离线压测（内存队列 + 桩服务），不需要数据库")
+    parser.add_argument("--jobs", type=int, default=8, help="--bench 的任务数（默认 8）")
+    parser.add_argument("--render-latency", type=float, default=1.5, help="--bench 桩服务单张延迟秒数（默认 1.5）")
+    parser.add_argument("--serial-gap", type=float, default=1.5, help="--bench 串行基线每张后的等待（同旧接口，默认 1.5）")
+    args = parser.parse_args(argv)
+
+    limits = parse_limits(args.limits)
+    if args.bench:
+        return bench(args, limits)
+
+    database_url = args.database_url or os.getenv("DATABASE_URL", "")
+    if not database_url:
+        print("❌ 缺少 DATABASE_URL（可用 --database-url 指定）")
+        return 1
+    store = PostgresStore(database_url, max_connections=args.max_jobs + 2)
+    if args.status:
+        print_status(store)
+        return 0
+
+    base_urls = vendor_base_urls()
+    if args.stub:
+        from stub_vendors import start_stub_server, stub_base_urls
+
+        _, stub_url = start_stub_server()
+        base_urls = {v: stub_base_urls(stub_url)[v] for v in base_urls}
+        print(f"🧪 供应商已指向本地桩服务: {stub_url}")
+
+    meter = None
+    if args.meter:
+        from usage_meter import UsageMeter, PostgresSink
+        meter = UsageMeter(PostgresSink(database_url)).start()
+
+    worker = Worker(store, limits, base_urls, max_jobs=args.max_jobs, poll_interval=args.poll_interval,
+                    lease_seconds=args.lease, max_attempts=args.max_attempts, render_retries=args.render_retries,
+                    timeout=args.timeout, meter=meter)
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop_event.set())
+    print(f"👷 worker {worker.worker_id} 已启动，并发上限 {limits}，同时处理 {args.max_jobs} 个任务")
+    try:
+        worker.run(once=args.once)
+    except KeyboardInterrupt:
+        worker.stop_event.set()
+    if meter is not None:
+        meter.close()
+    print(f"👋 已退出，本次完成 {len(worker.completed)} 个任务")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,559 @@
+#!/usr/bin/env python3
+"""
+共享临时状态存储：带 TTL 与容量上限的键值服务，说 Redis 协议（RESP2）的一个子集
+
+应用里原本放在进程内 Map 的临时状态（短信验证码、抠图用的临时图片）改为存到这里，
+多个应用副本共享同一份数据，web 服务才能水平扩容：
+  KV_URL=redis://:<密码>@<地址>:6379        （web 2/src/lib/kv.ts 读取；未设置时退回进程内存储，只适合单副本）
+
+生产环境可以直接用 Zeabur 的 Redis 服务（release.py --provision-kv 会自动创建并注入 KV_URL）；
+本服务是本地联调 / 自建部署的替身，redis-cli 与应用都能直接连：
+  - 支持命令：PING ECHO AUTH SELECT GET SET(EX/PX/NX/XX/GET) GETDEL DEL UNLINK EXISTS EXPIRE PEXPIRE
+    TTL PTTL PERSIST INCR INCRBY DECR MGET DBSIZE FLUSHDB FLUSHALL INFO CLIENT COMMAND QUIT
+  - 过期：读取时惰性删除 + 后台按到期时间堆定期清理
+  - 容量：超过 --max-memory 字节或 --max-keys 个键时按 LRU 淘汰（--policy noeviction 则拒绝写入）
+  - 数据只在内存里，重启即清空（存放的都是几分钟内有效的临时数据）
+
+用法：
+  python3 kv_store.py                              # 监听 0.0.0.0:6379
+  python3 kv_store.py --port 6380 --max-memory 256mb --requirepass xxx
+  python3 kv_store.py --bench                      # 离线压测：验证码 / 临时图片混合读写
+"""
+
+import argparse
+import heapq
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from credential_smoke import percentile
+
+DEFAULT_PORT = 6379
+# 每个键的固定开销估算（字典项、OrderedDict 链表节点、过期堆项）
+ENTRY_OVERHEAD = 96
+
+
+class RespError(Exception):
+    """返回给客户端的错误回复（-ERR ...）；code 为错误前缀，与 Redis 一致（NOAUTH、OOM 等）"""
+
+    def __init__(self, message, code="ERR"):
+        super().__init__(message)
+        self.code = code
+
+
+def parse_size(text):
+    """'256mb' / '1g' / '1048576' → 字节数"""
+    text = str(text).strip().lower()
+    units = {"kb": 1 << 10, "k": 1 << 10, "mb": 1 << 20, "m": 1 << 20, "gb": 1 << 30, "g": 1 << 30, "b": 1}
+    for suffix, factor in units.items():
+        if text.endswith(suffix):
+            return int(float(text[:-len(suffix)]) * factor)
+    return int(text)
+
+
+class KVStore:
+    """线程安全的键值表：LRU 顺序 + 到期时间最小堆"""
+
+    def __init__(self, max_memory=256 << 20, max_keys=1_000_000, policy="allkeys-lru"):
+        self.max_memory = max_memory
+        self.max_keys = max_keys
+        self.policy = policy
+        self.data = OrderedDict()  # key → (value, expires_at 或 None)
+        self.expiry = []  # [(expires_at, key)]，可能有过期的旧项，弹出时再核对
+        self.used = 0
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0, "commands": 0, "rejected": 0}
+
+    @staticmethod
+    def _size(key, value):
+        return len(key) + len(value) + ENTRY_OVERHEAD
+
+    def _drop(self, key):
+        value, _ = self.data.pop(key)
+        self.used -= self._size(key, value)
+
+    def _live(self, key, now):
+        """取未过期的条目（过期的顺手删掉）；调用方需持有锁"""
+        item = self.data.get(key)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] <= now:
+            self._drop(key)
+            self.stats["expired"] += 1
+            return None
+        return item
+
+    def _make_room(self, incoming):
+        while self.data and (self.used + incoming > self.max_memory or len(self.data) >= self.max_keys):
+            if self.policy == "noeviction":
+                self.stats["rejected"] += 1
+                raise RespError("command not allowed when used memory > 'maxmemory'", code="OOM")
+            oldest = next(iter(self.data))
+            self._drop(oldest)
+            self.stats["evicted"] += 1
+        if incoming > self.max_memory:
+            self.stats["rejected"] += 1
+            raise RespError("value larger than maxmemory", code="OOM")
+
+    def get(self, key, touch=True):
+        now = time.time()
+        with self.lock:
+            item = self._live(key, now)
+            if item is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            if touch:
+                self.data.move_to_end(key)
+            return item[0]
+
+    def set(self, key, value, ttl=None, nx=False, xx=False, keep_ttl=False, get=False):
+        """返回 (是否写入, 旧值)；ttl 为秒（浮点）"""
+        now = time.time()
+        with self.lock:
+            old = self._live(key, now)
+            if (nx and old is not None) or (xx and old is None):
+                return False, old[0] if old else None
+            expires_at = now + ttl if ttl is not None else (old[1] if keep_ttl and old else None)
+            if old is not None:
+                self._drop(key)
+            self._make_room(self._size(key, value))
+            self.data[key] = (value, expires_at)
+            self.used += self._size(key, value)
+            if expires_at is not None:
+                heapq.heappush(self.expiry, (expires_at, key))
+            return True, old[0] if (get and old) else None
+
+    def delete(self, keys):
+        now = time.time()
+        n = 0
+        with self.lock:
+            for key in keys:
+                if self._live(key, now) is not None:
+                    self._drop(key)
+                    n += 1
+        return n
+
+    def getdel(self, key):
+        now = time.time()
+        with self.lock:
+            item = self._live(key, now)
+            if item is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            self._drop(key)
+            return item[0]
+
+    def expire(self, key, ttl):
+        now = time.time()
+        with self.lock:
+            item = self._live(key, now)
+            if item is None:
+                return 0
+            expires_at = now + ttl if ttl is not None else None
+            self.data[key] = (item[0], expires_at)
+            if expires_at is not None:
+                heapq.heappush(self.expiry, (expires_at, key))
+            return 1
+
+    def pttl(self, key):
+        """毫秒；-2 不存在，-1 永不过期"""
+        now = time.time()
+        with self.lock:
+            item = self._live(key, now)
+            if item is None:
+                return -2
+            return -1 if item[1] is None else max(0, int((item[1] - now) * 1000))
+
+    def incrby(self, key, delta):
+        now = time.time()
+        with self.lock:
+            item = self._live(key, now)
+            try:
+                current = int(item[0]) if item else 0
+            except ValueError:
+                raise RespError("value is not an integer or out of range")
+            value = str(current + delta).encode()
+            expires_at = item[1] if item else None
+            if item is not None:
+                self._drop(key)
+            self._make_room(self._size(key, value))
+            self.data[key] = (value, expires_at)
+            self.used += self._size(key, value)
+            return current + delta
+
+    def flush(self):
+        with self.lock:
+            self.data.clear()
+            self.expiry.clear()
+            self.used = 0
+
+    def sweep(self, budget=1000):
+        """清理已到期的键；堆里的旧项（键已删除或续期）直接丢弃"""
+        now = time.time()
+        removed = 0
+        with self.lock:
+            while self.expiry and self.expiry[0][0] <= now and budget > 0:
+                expires_at, key = heapq.heappop(self.expiry)
+                budget -= 1
+                item = self.data.get(key)
+                if item is not None and item[1] == expires_at:
+                    self._drop(key)
+                    self.stats["expired"] += 1
+                    removed += 1
+            # 堆里旧项太多时重建，避免频繁续期的键把堆撑大
+            if len(self.expiry) > 4 * len(self.data) + 1024:
+                self.expiry = [(item[1], k) for k, item in self.data.items() if item[1] is not None]
+                heapq.heapify(self.expiry)
+        return removed
+
+    def info(self):
+        with self.lock:
+            keys, used, volatile = len(self.data), self.used, sum(1 for _, e in self.data.values() if e is not None)
+        return {
+            "used_memory": used,
+            "maxmemory": self.max_memory,
+            "maxmemory_policy": self.policy,
+            "db0_keys": keys,
+            "db0_expires": volatile,
+            "keyspace_hits": self.stats["hits"],
+            "keyspace_misses": self.stats["misses"],
+            "expired_keys": self.stats["expired"],
+            "evicted_keys": self.stats["evicted"],
+            "rejected_writes": self.stats["rejected"],
+            "total_commands_processed": self.stats["commands"],
+        }
+
+
+# ---------- RESP 协议 ----------
+
+def encode(value):
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, RespError):
+        return f"-{value.code} {value}\r\n".encode()
+    if isinstance(value, bool):
+        return b":1\r\n" if value else b":0\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        return f"+{value}\r\n".encode()
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, (list, tuple)):
+        return b"*%d\r\n" % len(value) + b"".join(encode(v) for v in value)
+    raise TypeError(type(value))
+
+
+def read_command(rfile):
+    """读取一条命令（多条批量字符串数组，或 redis-cli / telnet 的内联命令）；连接关闭返回 None"""
+    line = rfile.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.strip().split()
+    count = int(line[1:].strip())
+    args = []
+    for _ in range(count):
+        header = rfile.readline()
+        if not header.startswith(b"$"):
+            raise RespError("Protocol error: expected '$'")
+        size = int(header[1:].strip())
+        data = rfile.read(size + 2)
+        if len(data) < size + 2:
+            return None
+        args.append(data[:size])
+    return args
+
+
+def _int(arg):
+    try:
+        return int(arg)
+    except ValueError:
+        raise RespError("value is not an integer or out of range")
+
+
+def execute(store, args, session):
+    """执行一条命令，返回要编码的回复值"""
+    if not args:
+        return RespError("empty command")
+    name = args[0].decode("utf-8", "replace").upper()
+    argv = args[1:]
+    store.stats["commands"] += 1
+
+    if name == "AUTH":
+        password = argv[-1].decode("utf-8", "replace") if argv else ""
+        if not session["password"]:
+            return RespError("AUTH <password> called without any password configured")
+        if password != session["password"]:
+            return RespError("invalid password")
+        session["authed"] = True
+        return "OK"
+    if name == "QUIT":
+        session["quit"] = True
+        return "OK"
+    if session["password"] and not session["authed"]:
+        return RespError("Authentication required.", code="NOAUTH")
+
+    if name == "PING":
+        return argv[0] if argv else "PONG"
+    if name == "ECHO":
+        return argv[0]
+    if name == "SELECT":
+        return "OK" if argv and argv[0] == b"0" else RespError("DB index is out of range")
+    if name in ("CLIENT", "READONLY"):
+        return "OK"
+    if name == "COMMAND":
+        return []
+    if name == "GET":
+        return store.get(argv[0])
+    if name == "SET":
+        if len(argv) < 2:
+            raise RespError("wrong number of arguments for 'set' command")
+        key, value, opts = argv[0], argv[1], [a.upper() for a in argv[2:]]
+        ttl, nx, xx, keep, get = None, False, False, False, False
+        i = 0
+        while i < len(opts):
+            opt = opts[i]
+            if opt in (b"EX", b"PX") and i + 1 < len(opts):
+                n = _int(opts[i + 1])
+                if n <= 0:
+                    raise RespError("invalid expire time in 'set' command")
+                ttl = n if opt == b"EX" else n / 1000.0
+                i += 2
+                continue
+            if opt == b"NX":
+                nx = True
+            elif opt == b"XX":
+                xx = True
+            elif opt == b"KEEPTTL":
+                keep = True
+            elif opt == b"GET":
+                get = True
+            else:
+                raise RespError("syntax error")
+            i += 1
+        written, old = store.set(key, value, ttl=ttl, nx=nx, xx=xx, keep_ttl=keep, get=get)
+        if get:
+            return old
+        return "OK" if written else None
+    if name == "GETDEL":
+        return store.getdel(argv[0])
+    if name in ("DEL", "UNLINK"):
+        return store.delete(argv)
+    if name == "EXISTS":
+        return sum(1 for k in argv if store.get(k, touch=False) is not None)
+    if name in ("EXPIRE", "PEXPIRE"):
+        n = _int(argv[1])
+        return store.expire(argv[0], n if name == "EXPIRE" else n / 1000.0)
+    if name == "PERSIST":
+        return store.expire(argv[0], None)
+    if name == "PTTL":
+        return store.pttl(argv[0])
+    if name == "TTL":
+        ms = store.pttl(argv[0])
+        return ms if ms < 0 else (ms + 999) // 1000
+    if name in ("INCR", "DECR", "INCRBY", "DECRBY"):
+        delta = _int(argv[1]) if name in ("INCRBY", "DECRBY") else 1
+        return store.incrby(argv[0], -delta if name.startswith("DECR") else delta)
+    if name == "MGET":
+        return [store.get(k) for k in argv]
+    if name == "DBSIZE":
+        return store.info()["db0_keys"]
+    if name in ("FLUSHDB", "FLUSHALL"):
+        store.flush()
+        return "OK"
+    if name == "INFO":
+        info = store.info()
+        lines = ["# Server", "redis_version:7.0.0-xhs-kv", "# Memory"]
+        lines += [f"{k}:{v}" for k, v in info.items() if k.startswith(("used", "max"))]
+        lines += ["# Stats"] + [f"{k}:{v}" for k, v in info.items() if k.endswith(("hits", "misses", "keys", "writes", "processed"))
+                                and not k.startswith("db0")]
+        lines += ["# Keyspace", f"db0:keys={info['db0_keys']},expires={info['db0_expires']},avg_ttl=0"]
+        return ("\r\n".join(lines) + "\r\n").encode()
+    return RespError(f"unknown command '{name.lower()}'")
+
+
+class KVHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        session = {"password": self.server.password, "authed": False, "quit": False}
+        try:
+            while not session["quit"]:
+                try:
+                    args = read_command(self.rfile)
+                except (RespError, ValueError) as e:
+                    self.wfile.write(encode(RespError(str(e))))
+                    return
+                if args is None:
+                    return
+                if not args:
+                    continue
+                try:
+                    reply = execute(self.server.store, args, session)
+                except RespError as e:
+                    reply = e
+                except IndexError:
+                    reply = RespError(f"wrong number of arguments for '{args[0].decode('utf-8', 'replace').lower()}' command")
+                self.wfile.write(encode(reply))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class KVServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def start_kv_server(store, port=0, host="127.0.0.1", password="", sweep_interval=0.1):
+    """后台线程启动服务（含过期清理线程），返回 (server, redis URL)"""
+    server = KVServer((host, port), KVHandler)
+    server.store = store
+    server.password = password
+
+    def sweeper():
+        while True:
+            time.sleep(sweep_interval)
+            store.sweep()
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    threading.Thread(target=sweeper, daemon=True).start()
+    auth = f":{password}@" if password else ""
+    return server, f"redis://{auth}{host}:{server.server_address[1]}"
+
+
+class MiniClient:
+    """压测用的最小 RESP 客户端（单连接，同步请求）"""
+
+    def __init__(self, host, port):
+        self.sock = socket.create_connection((host, port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.rfile = self.sock.makefile("rb")
+
+    def call(self, *args):
+        parts = [a if isinstance(a, bytes) else str(a).encode() for a in args]
+        self.sock.sendall(b"*%d\r\n" % len(parts) + b"".join(b"$%d\r\n%s\r\n" % (len(p), p) for p in parts))
+        return self._read()
+
+    def _read(self):
+        line = self.rfile.readline()
+        kind, rest = line[:1], line[1:-2]
+        if kind in (b"+", b"-"):
+            return rest.decode()
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            n = int(rest)
+            return None if n < 0 else self.rfile.read(n + 2)[:-2]
+        if kind == b"*":
+            return [self._read() for _ in range(int(rest))]
+        raise RespError(f"unexpected reply {line!r}")
+
+    def close(self):
+        self.sock.close()
+
+
+def bench(args):
+    """多连接混合读写（验证码 SET NX / GET / DEL，临时图片 SET PX / GET），再验证跨连接可见性与 TTL"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    store = KVStore(max_memory=parse_size(args.max_memory), policy=args.policy)
+    server, url = start_kv_server(store)
+    host, port = server.server_address
+    image = os.urandom(args.image_kb * 1024)
+    per_thread = args.ops // args.concurrency
+    latencies = {"code": [], "image": []}
+    lock = threading.Lock()
+    mismatched = [0]
+
+    def worker(t):
+        client = MiniClient(host, port)
+        local = {"code": [], "image": []}
+        for i in range(per_thread):
+            phone = f"1380000{t:02d}{i % 100:02d}"
+            started = time.perf_counter()
+            if i % 4 == 3:
+                key = f"tmpimg:{t}:{i}"
+                client.call("SET", key, image, "PX", 30 * 60 * 1000)
+                got = client.call("GET", key)
+                local["image"].append((time.perf_counter() - started) * 1000)
+                if got != image:
+                    mismatched[0] += 1
+            else:
+                client.call("SET", f"sms:cooldown:{phone}", "1", "PX", 60000, "NX")
+                client.call("SET", f"sms:code:{phone}", "4821", "PX", 300000)
+                if client.call("GET", f"sms:code:{phone}") == b"4821":
+                    client.call("DEL", f"sms:code:{phone}")
+                local["code"].append((time.perf_counter() - started) * 1000)
+        client.close()
+        with lock:
+            for k in latencies:
+                latencies[k].extend(local[k])
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(worker, range(args.concurrency)))
+    wall = time.perf_counter() - started
+
+    # 跨连接可见性 + TTL
+    a, b = MiniClient(host, port), MiniClient(host, port)
+    a.call("SET", "sms:code:13800000000", "1234", "PX", 300)
+    visible = b.call("GET", "sms:code:13800000000") == b"1234"
+    time.sleep(0.5)
+    expired = b.call("GET", "sms:code:13800000000") is None
+    info = store.info()
+    a.close()
+    b.close()
+    server.shutdown()
+
+    total = sum(len(v) for v in latencies.values())
+    print(f"🧪 {args.concurrency} 个连接，{total} 组操作，用时 {wall:.2f}s（{total / wall:,.0f} 组/秒）")
+    for name, label in (("code", "验证码 SET NX+SET+GET+DEL"), ("image", f"临时图片 {args.image_kb}KB SET+GET")):
+        values = latencies[name]
+        if values:
+            print(f"   {label:<28} p50 {percentile(values, 50):6.2f}ms  p99 {percentile(values, 99):6.2f}ms")
+    print(f"   另一连接立即可读: {'✅' if visible else '❌'}   TTL 到期后读取为空: {'✅' if expired else '❌'}"
+          f"   数据不一致: {mismatched[0]}")
+    print(f"   内存 {info['used_memory'] / (1 << 20):.1f}MB / {info['maxmemory'] / (1 << 20):.0f}MB，"
+          f"LRU 淘汰 {info['evicted_keys']} 个键，过期 {info['expired_keys']} 个")
+    return 0 if visible and expired and not mismatched[0] else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="共享临时状态存储（Redis 协议子集）")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", DEFAULT_PORT)))
+    parser.add_argument("--max-memory", default=os.getenv("KV_MAX_MEMORY", "256mb"), help="内存上限（默认 256mb）")
+    parser.add_argument("--max-keys", type=int, default=1_000_000, help="键数量上限（默认 100 万）")
+    parser.add_argument("--policy", choices=("allkeys-lru", "noeviction"), default="allkeys-lru",
+                        help="超出上限时的处理（默认按 LRU 淘汰）")
+    parser.add_argument("--requirepass", default=os.getenv("KV_PASSWORD", ""), help="连接密码（默认读 KV_PASSWORD）")
+    parser.add_argument("--bench", action="store_true", help="离线压测")
+    parser.add_argument("--ops", type=int, default=20000, help="--bench 操作组数")
+    parser.add_argument("--concurrency", type=int, default=8, help="--bench 连接数")
+    parser.add_argument("--image-kb", type=int, default=256, help="--bench 临时图片大小（KB）")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        return bench(args)
+
+    store = KVStore(max_memory=parse_size(args.max_memory), max_keys=args.max_keys, policy=args.policy)
+    server, _ = start_kv_server(store, port=args.port, host=args.host, password=args.requirepass)
+    print(f"🗄️  共享状态存储已启动: redis://{args.host}:{server.server_address[1]}"
+          f"（内存上限 {store.max_memory >> 20}MB，{args.policy}{'，需要密码' if args.requirepass else ''}）")
+    print(f"   应用配置: KV_URL=redis://{':<密码>@' if args.requirepass else ''}<地址>:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print("\n👋 已停止")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
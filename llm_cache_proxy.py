@@ -0,0 +1,520 @@
+#!/usr/bin/env python3
+"""
+文案引擎（OpenAI 兼容接口）响应缓存代理
+
+把应用的 COPY_ENGINE_BASE_URL / VOLC_BASE_URL 指向本代理，相同的 模型 + messages + 参数
+直接返回缓存结果（毫秒级），不再花 10–30 秒重新调用大模型。
+
+  - 缓存键：sha256(上游 + 路径 + 规范化后的请求体 + API Key 指纹)，请求体按 key 排序序列化，
+    所以字段顺序不同的相同请求命中同一条缓存
+  - 内存层：有界 LRU（条数 + 字节数上限）+ TTL
+  - 磁盘层：<cache-dir>/<前两位>/<key>.json，内存淘汰后仍可命中，重启后依然有效
+  - 并发的相同请求只打一次上游（single-flight）
+  - 只缓存 POST …/chat/completions 的非流式 200 响应；stream=true 原样透传
+  - 按路由关闭：应用在请求头带 X-LLM-Cache-Route（copy / image-prompts / images），
+    --bypass-route 指定的路由不走缓存；请求头 X-LLM-Cache: bypass 跳过、refresh 强制刷新
+  - 指标：GET /__metrics（JSON），响应头 X-LLM-Cache: HIT-MEMORY / HIT-DISK / MISS / BYPASS
+
+用法：
+  python3 llm_cache_proxy.py --upstream https://ark.cn-beijing.volces.com/api/v3
+      → 应用设置 VOLC_BASE_URL=http://127.0.0.1:8787
+  python3 llm_cache_proxy.py --upstream volc=https://ark.cn-beijing.volces.com/api/v3 \\
+                             --upstream google=https://gitaigc.com/v1
+      → 应用设置 VOLC_BASE_URL=http://127.0.0.1:8787/volc、GOOGLE_BASE_URL=http://127.0.0.1:8787/google
+  python3 llm_cache_proxy.py --bench        # 离线：桩服务 + 代理，对比未命中与命中的延迟
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import error as urlerror
+from urllib import request as urlrequest
+
+from credential_smoke import percentile
+
+DEFAULT_PORT = 8787
+DEFAULT_TTL = 24 * 3600
+DEFAULT_CACHE_DIR = ".llm_cache"
+CACHEABLE_SUFFIXES = ("/chat/completions",)
+# 不影响生成结果、不应进入缓存键的字段
+KEY_IGNORED_FIELDS = ("user", "stream_options")
+HOP_BY_HOP = {"connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te", "trailers",
+              "transfer-encoding", "upgrade", "host", "content-length", "accept-encoding"}
+ROUTE_HEADER = "X-LLM-Cache-Route"
+CONTROL_HEADER = "X-LLM-Cache"
+
+
+def cache_key(upstream_name, path, body, authorization="", share_across_keys=False):
+    """规范化请求体后取 sha256；默认混入 API Key 指纹，不同 Key 之间不共享缓存"""
+    canonical = {k: v for k, v in body.items() if k not in KEY_IGNORED_FIELDS}
+    h = hashlib.sha256()
+    h.update(f"{upstream_name}\0{path}\0".encode("utf-8"))
+    h.update(json.dumps(canonical, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8"))
+    if not share_across_keys:
+        h.update(b"\0" + hashlib.sha256(authorization.encode("utf-8")).digest()[:8])
+    return h.hexdigest()
+
+
+class MemoryCache:
+    """有界 LRU + TTL：超过条数或字节数上限时淘汰最久未用的条目"""
+
+    def __init__(self, max_entries=1000, max_bytes=64 * 1024 * 1024, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry["created"] > self.ttl:
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        size = len(entry["body"])
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = entry
+            self.bytes += size
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                oldest = next(iter(self.entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.bytes -= len(entry["body"])
+
+
+class DiskCache:
+    """每条缓存一个 JSON 文件；超过容量上限时按修改时间删除最旧的文件"""
+
+    def __init__(self, directory, ttl=DEFAULT_TTL, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.writes = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - record.get("created", 0) > self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        record["body"] = record["body"].encode("utf-8")
+        return record
+
+    def put(self, key, entry):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        record = dict(entry, body=entry["body"].decode("utf-8"))
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        with self.lock:
+            self.writes += 1
+            prune = self.writes % 100 == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in files)
+        now = time.time()
+        for mtime, size, path in sorted(files):
+            if total <= self.max_bytes and now - mtime <= self.ttl:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.routes = {}
+        self.latency = {"hit": [], "miss": []}
+
+    def record(self, outcome, route, seconds=None):
+        with self.lock:
+            self.counters[outcome] = self.counters.get(outcome, 0) + 1
+            per_route = self.routes.setdefault(route or "-", {})
+            per_route[outcome] = per_route.get(outcome, 0) + 1
+            bucket = "hit" if outcome.startswith("hit") else "miss" if outcome == "miss" else None
+            if bucket and seconds is not None:
+                samples = self.latency[bucket]
+                samples.append(seconds * 1000)
+                if len(samples) > 2000:
+                    del samples[:1000]
+
+    def snapshot(self, memory):
+        with self.lock:
+            hits = self.counters.get("hit_memory", 0) + self.counters.get("hit_disk", 0)
+            lookups = hits + self.counters.get("miss", 0)
+            return {
+                "counters": dict(self.counters),
+                "hit_ratio": round(hits / lookups, 4) if lookups else None,
+                "routes": {k: dict(v) for k, v in self.routes.items()},
+                "latency_ms": {
+                    name: {"p50": percentile(v, 50), "p95": percentile(v, 95), "count": len(v)}
+                    for name, v in self.latency.items()
+                },
+                "memory": {"entries": len(memory.entries), "bytes": memory.bytes, "evictions": memory.evictions},
+            }
+
+
+class CacheProxy:
+    def __init__(self, upstreams, memory, disk=None, bypass_routes=(), share_across_keys=False, timeout=180):
+        # upstreams: {路径前缀名: base URL}，名称为 "" 时表示不带前缀
+        self.upstreams = upstreams
+        self.memory = memory
+        self.disk = disk
+        self.bypass_routes = set(bypass_routes)
+        self.share_across_keys = share_across_keys
+        self.timeout = timeout
+        self.metrics = Metrics()
+        self.inflight = {}
+        self.inflight_lock = threading.Lock()
+
+    def resolve(self, path):
+        """把代理路径拆成 (上游名, 上游 URL)"""
+        for name, base in self.upstreams.items():
+            if name and (path == f"/{name}" or path.startswith(f"/{name}/")):
+                return name, base.rstrip("/") + path[len(name) + 1:]
+        if "" in self.upstreams:
+            return "", self.upstreams[""].rstrip("/") + path
+        return None, None
+
+    def lookup(self, key):
+        entry = self.memory.get(key)
+        if entry is not None:
+            return entry, "hit_memory"
+        if self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self.memory.put(key, entry)
+                return entry, "hit_disk"
+        return None, None
+
+    def store(self, key, entry):
+        self.memory.put(key, entry)
+        if self.disk is not None:
+            self.disk.put(key, entry)
+
+    def forward(self, method, url, headers, body):
+        """调用上游，返回 (status, headers, body)"""
+        req = urlrequest.Request(url, data=body, method=method, headers=headers)
+        try:
+            with urlrequest.urlopen(req, timeout=self.timeout) as resp:
+                return resp.status, dict(resp.headers), resp.read()
+        except urlerror.HTTPError as e:
+            return e.code, dict(e.headers), e.read()
+
+    def fetch_once(self, key, method, url, headers, body):
+        """single-flight：同一个 key 只有第一个请求打上游，其余等待其结果"""
+        with self.inflight_lock:
+            waiter = self.inflight.get(key)
+            leader = waiter is None
+            if leader:
+                waiter = self.inflight[key] = {"event": threading.Event(), "result": None}
+        if not leader:
+            waiter["event"].wait(self.timeout)
+            if waiter["result"] is not None:
+                return waiter["result"], True
+        try:
+            result = self.forward(method, url, headers, body)
+            waiter["result"] = result
+            return result, False
+        finally:
+            if leader:
+                waiter["event"].set()
+                with self.inflight_lock:
+                    self.inflight.pop(key, None)
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    server_version = "xhs-llm-cache/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def proxy(self):
+        return self.server.cache_proxy
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            sys.stderr.write("[llm-cache] " + (fmt % args) + "\n")
+
+    def _reply(self, status, headers, body, cache_state=None):
+        self.send_response(status)
+        for name, value in headers.items():
+            if name.lower() not in HOP_BY_HOP and name.lower() != "content-encoding":
+                self.send_header(name, value)
+        if cache_state:
+            self.send_header(CONTROL_HEADER, cache_state)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _upstream_headers(self):
+        return {k: v for k, v in self.headers.items()
+                if k.lower() not in HOP_BY_HOP and k.lower() not in (ROUTE_HEADER.lower(), CONTROL_HEADER.lower())}
+
+    def do_GET(self):
+        if self.path.split("?")[0] == "/__metrics":
+            body = json.dumps(self.proxy.metrics.snapshot(self.proxy.memory), ensure_ascii=False).encode("utf-8")
+            self._reply(200, {"Content-Type": "application/json; charset=utf-8"}, body)
+            return
+        self._passthrough("GET", None)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        path = self.path.split("?")[0]
+        if not path.endswith(CACHEABLE_SUFFIXES):
+            self._passthrough("POST", raw)
+            return
+        try:
+            body = json.loads(raw.decode("utf-8")) if raw else {}
+        except (ValueError, UnicodeDecodeError):
+            body = None
+        route = self.headers.get(ROUTE_HEADER, "")
+        control = (self.headers.get(CONTROL_HEADER) or "").lower()
+        if (not isinstance(body, dict) or body.get("stream") or control == "bypass"
+                or route in self.proxy.bypass_routes):
+            self.proxy.metrics.record("bypass", route)
+            self._passthrough("POST", raw, cache_state="BYPASS")
+            return
+
+        name, url = self.proxy.resolve(self.path)
+        if url is None:
+            self._reply(404, {"Content-Type": "application/json"}, b'{"error":{"message":"llm-cache: unknown upstream"}}')
+            return
+        key = cache_key(name, path, body, self.headers.get("Authorization", ""), self.proxy.share_across_keys)
+        started = time.perf_counter()
+
+        if control != "refresh":
+            entry, outcome = self.proxy.lookup(key)
+            if entry is not None:
+                self._reply(entry["status"], entry["headers"], entry["body"],
+                            "HIT-MEMORY" if outcome == "hit_memory" else "HIT-DISK")
+                self.proxy.metrics.record(outcome, route, time.perf_counter() - started)
+                return
+
+        try:
+            (status, headers, payload), shared = self.proxy.fetch_once(key, "POST", url, self._upstream_headers(), raw)
+        except (urlerror.URLError, OSError) as e:
+            self.proxy.metrics.record("error", route)
+            self._reply(502, {"Content-Type": "application/json"},
+                        json.dumps({"error": {"message": f"llm-cache: upstream error {e}"}}).encode("utf-8"))
+            return
+        if status == 200 and not shared:
+            entry = {"status": status, "created": time.time(), "body": payload,
+                     "headers": {k: v for k, v in headers.items() if k.lower() == "content-type"}}
+            try:
+                json.loads(payload.decode("utf-8"))
+                self.proxy.store(key, entry)
+            except (ValueError, UnicodeDecodeError):
+                pass
+        self.proxy.metrics.record("hit_inflight" if shared else "miss", route, time.perf_counter() - started)
+        self._reply(status, headers, payload, "HIT-INFLIGHT" if shared else "MISS")
+
+    def _passthrough(self, method, raw, cache_state=None):
+        name, url = self.proxy.resolve(self.path)
+        if url is None:
+            self._reply(404, {"Content-Type": "application/json"}, b'{"error":{"message":"llm-cache: unknown upstream"}}')
+            return
+        req = urlrequest.Request(url, data=raw, method=method, headers=self._upstream_headers())
+        try:
+            resp = urlrequest.urlopen(req, timeout=self.proxy.timeout)
+        except urlerror.HTTPError as e:
+            self._reply(e.code, dict(e.headers), e.read(), cache_state)
+            return
+        except (urlerror.URLError, OSError) as e:
+            self._reply(502, {"Content-Type": "application/json"},
+                        json.dumps({"error": {"message": f"llm-cache: upstream error {e}"}}).encode("utf-8"))
+            return
+        with resp:
+            # 流式响应逐块转发（chunked），不缓冲
+            self.send_response(resp.status)
+            for k, v in resp.headers.items():
+                if k.lower() not in HOP_BY_HOP and k.lower() != "content-length":
+                    self.send_header(k, v)
+            if cache_state:
+                self.send_header(CONTROL_HEADER, cache_state)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            while True:
+                chunk = resp.read1(65536)
+                if not chunk:
+                    break
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+
+
+def start_proxy(proxy, port=0, host="127.0.0.1", verbose=False):
+    """后台线程启动代理，返回 (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), ProxyHandler)
+    server.daemon_threads = True
+    server.cache_proxy = proxy
+    server.verbose = verbose
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def parse_upstreams(items):
+    upstreams = {}
+    for item in items or []:
+        name, sep, url = item.partition("=")
+        if sep and not name.startswith("http"):
+            upstreams[name.strip("/")] = url
+        else:
+            upstreams[""] = item
+    return upstreams
+
+
+def bench(args):
+    """桩服务（模拟大模型延迟）+ 代理：每个不同请求先未命中一次，再重复命中"""
+    import tempfile
+    from stub_vendors import StubConfig, start_stub_server, stub_base_urls
+
+    stub, stub_url = start_stub_server(config=StubConfig(latency={"volc": args.llm_latency}, seed=1))
+    with tempfile.TemporaryDirectory() as tmp:
+        proxy = CacheProxy({"volc": stub_base_urls(stub_url)["volc"]}, MemoryCache(ttl=args.ttl),
+                           DiskCache(tmp, ttl=args.ttl))
+        server, base_url = start_proxy(proxy)
+        url = f"{base_url}/volc/chat/completions"
+
+        def call(i, route="copy"):
+            body = {"model": "doubao-seed-1-6-lite-251015", "temperature": 0.9, "max_tokens": 4096,
+                    "messages": [{"role": "user", "content": f"产品 {i}：保温杯，卖点：24 小时保温"}]}
+            req = urlrequest.Request(url, data=json.dumps(body).encode("utf-8"), method="POST", headers={
+                "Content-Type": "application/json", "Authorization": "Bearer sk-bench", ROUTE_HEADER: route})
+            started = time.perf_counter()
+            with urlrequest.urlopen(req, timeout=60) as resp:
+                resp.read()
+                state = resp.headers.get(CONTROL_HEADER)
+            return state, (time.perf_counter() - started) * 1000
+
+        print(f"🧪 压测：{args.unique} 个不同请求，每个重复 {args.repeat} 次，桩服务延迟 ~{args.llm_latency}s\n")
+        for i in range(args.unique):
+            for _ in range(args.repeat):
+                call(i)
+        # 清空内存层，验证磁盘层命中
+        proxy.memory.entries.clear()
+        proxy.memory.bytes = 0
+        for i in range(args.unique):
+            call(i)
+        call(0, route="images")
+        proxy.bypass_routes.add("images")
+        call(0, route="images")
+
+        snap = proxy.metrics.snapshot(proxy.memory)
+        server.shutdown()
+    stub.shutdown()
+    lat = snap["latency_ms"]
+    print(f"   未命中 p50 {lat['miss']['p50']:8.1f}ms   ({lat['miss']['count']} 次)")
+    print(f"   命中   p50 {lat['hit']['p50']:8.1f}ms   p95 {lat['hit']['p95']:.1f}ms   ({lat['hit']['count']} 次)")
+    print(f"   命中率 {snap['hit_ratio']:.0%}   计数 {snap['counters']}")
+    print(f"   按路由 {snap['routes']}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="文案引擎 OpenAI 兼容接口的响应缓存代理")
+    parser.add_argument("--upstream", action="append", metavar="[NAME=]URL",
+                        help="上游 base URL；带 NAME= 时通过 /NAME 前缀访问，可重复")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", DEFAULT_PORT)))
+    parser.add_argument("--ttl", type=int, default=int(os.getenv("LLM_CACHE_TTL", DEFAULT_TTL)), help="缓存有效期秒数（默认 1 天）")
+    parser.add_argument("--max-entries", type=int, default=1000, help="内存层最大条数（默认 1000）")
+    parser.add_argument("--max-memory-mb", type=int, default=64, help="内存层最大占用（默认 64MB）")
+    parser.add_argument("--cache-dir", default=os.getenv("LLM_CACHE_DIR", DEFAULT_CACHE_DIR), help="磁盘层目录")
+    parser.add_argument("--max-disk-mb", type=int, default=512, help="磁盘层最大占用（默认 512MB）")
+    parser.add_argument("--no-disk", action="store_true", help="只用内存层")
+    parser.add_argument("--bypass-route", action="append", default=[],
+                        help=f"不走缓存的应用路由（请求头 {ROUTE_HEADER} 的值），可重复")
+    parser.add_argument("--share-across-keys", action="store_true", help="不同 API Key 之间共享缓存")
+    parser.add_argument("--timeout", type=int, default=180, help="上游超时秒数（默认 180）")
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--bench", action="store_true", help="离线压测（桩服务 + 代理）")
+    parser.add_argument("--unique", type=int, default=5, help="--bench 不同请求数")
+    parser.add_argument("--repeat", type=int, default=4, help="--bench 每个请求重复次数")
+    parser.add_argument("--llm-latency", type=float, default=2.0, help="--bench 桩服务延迟秒数")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        return bench(args)
+
+    upstreams = parse_upstreams(args.upstream or [os.getenv("LLM_CACHE_UPSTREAM", "")])
+    upstreams = {k: v for k, v in upstreams.items() if v}
+    if not upstreams:
+        print("❌ 请用 --upstream 指定上游（或设置 LLM_CACHE_UPSTREAM）")
+        return 1
+
+    bypass = args.bypass_route + [r for r in os.getenv("LLM_CACHE_BYPASS_ROUTES", "").split(",") if r]
+    memory = MemoryCache(args.max_entries, args.max_memory_mb * 1024 * 1024, args.ttl)
+    disk = None if args.no_disk else DiskCache(args.cache_dir, args.ttl, args.max_disk_mb * 1024 * 1024)
+    proxy = CacheProxy(upstreams, memory, disk, bypass, args.share_across_keys, args.timeout)
+
+    server = ThreadingHTTPServer((args.host, args.port), ProxyHandler)
+    server.daemon_threads = True
+    server.cache_proxy = proxy
+    server.verbose = args.verbose
+    print(f"🗄️  LLM 缓存代理已启动: http://{args.host}:{server.server_address[1]}")
+    for name, url in upstreams.items():
+        print(f"   - /{name} → {url}" if name else f"   - / → {url}")
+    if bypass:
+        print(f"   不缓存的路由: {', '.join(bypass)}")
+    print(f"   指标: http://{args.host}:{server.server_address[1]}/__metrics")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 已停止")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
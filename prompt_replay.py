@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+生图提示词离线回放工具
+
+把采集到的 LLM 原始输出（语料）按 /api/generate/images 与 /api/generate/image-prompts
+中 tryParseJsonArray + validatePrompts 的同一套规则重新跑一遍，统计：
+  - 严格解析（线上现状）需要多少次 LLM 调用、多少次走最终兜底
+  - 容错修复提取器能省下多少次重试（= 多少次完整的 LLM 往返）
+
+语料格式（JSONL，每行一个请求）：
+  {"id": "req-1", "route": "images", "attempts": ["第1次原始输出", "第2次原始输出", ...]}
+也兼容单次输出：{"route": "image-prompts", "raw": "..."}
+
+用法：
+  python3 prompt_replay.py corpus/prompt_outputs.sample.jsonl
+  python3 prompt_replay.py corpus.jsonl --call-latency 15 --json report.json
+  python3 prompt_replay.py --emit-spec prompt_rules.json      # 导出校验/修复规范
+  python3 prompt_replay.py corpus.jsonl --spec prompt_rules.json
+"""
+
+import argparse
+import ast
+import json
+import re
+import sys
+from collections import Counter
+
+# 与路由保持一致的规则（修改路由里的校验时请同步这里）
+DEFAULT_SPEC = {
+    "version": 1,
+    "max_attempts": 3,
+    "routes": {
+        # web 2/src/app/api/generate/images/route.ts
+        "images": {
+            "count": 6,
+            "min_length": 24,
+            "max_length": 80,
+            "required_fields": ["主体", "场景", "光线", "风格", "核心元素"],
+        },
+        # web 2/src/app/api/generate/image-prompts/route.ts（放宽版，不强制字段名）
+        "image-prompts": {
+            "count": 6,
+            "min_length": 16,
+            "max_length": 220,
+            "required_fields": [],
+        },
+    },
+    # 容错提取器按顺序尝试，命中即停
+    "repair_steps": [
+        "strict",
+        "balanced_brackets",
+        "trailing_commas",
+        "curly_quotes",
+        "python_literal",
+        "line_items",
+    ],
+    # 解析出的条目超过 count 时，优先挑出合规的前 count 条
+    "select_valid": True,
+}
+
+FENCE_RE = re.compile(r"```json|```")
+GREEDY_ARRAY_RE = re.compile(r"\[[\s\S]*\]")
+TRAILING_COMMA_RE = re.compile(r",\s*([\]}])")
+LINE_ITEM_RE = re.compile(r"^\s*(?:\d{1,2}\s*[.、:：)）]|[-*•·]|[（(]\d{1,2}[)）])\s*(.+?)\s*$")
+ITEM_PREFIX_RE = re.compile(r"^\s*(?:\d{1,2}\s*[.、)）]|图\s*\d{1,2}\s*[:：]|[-*•·])\s*")
+
+
+def js_length(s):
+    """JS 的 String.length 按 UTF-16 码元计数（emoji 算 2），这里保持一致"""
+    return len(s.encode("utf-16-le")) // 2
+
+
+def js_string(x):
+    """模拟 JS 的 String(x)，保证非字符串元素的长度判断与线上一致"""
+    if isinstance(x, str):
+        return x
+    if x is None:
+        return "null"
+    if isinstance(x, bool):
+        return "true" if x else "false"
+    if isinstance(x, float) and x.is_integer():
+        return str(int(x))
+    if isinstance(x, dict):
+        return "[object Object]"
+    if isinstance(x, list):
+        return ",".join("" if v is None else js_string(v) for v in x)
+    return str(x)
+
+
+def strict_parse(text):
+    """等价于路由里的 tryParseJsonArray：去掉代码块标记，贪婪匹配 [...] 后 JSON.parse"""
+    if not text:
+        return None
+    cleaned = FENCE_RE.sub("", text).strip()
+    m = GREEDY_ARRAY_RE.search(cleaned)
+    if not m:
+        return None
+    try:
+        parsed = json.loads(m.group(0))
+    except ValueError:
+        return None
+    if isinstance(parsed, list):
+        return [js_string(x) for x in parsed]
+    return None
+
+
+def validate_one(p, rules):
+    s = (p or "").strip()
+    if not s:
+        return "为空"
+    n = js_length(s)
+    if n < rules["min_length"] or n > rules["max_length"]:
+        return f"长度不合规({n})"
+    missing = [k for k in rules["required_fields"] if k not in s]
+    if missing:
+        return f"缺少字段:{','.join(missing)}"
+    return None
+
+
+def validate(items, rules):
+    """等价于 validatePrompts（入参已是 slice(0, count) 之后的列表）"""
+    errors = []
+    if len(items) != rules["count"]:
+        errors.append(f"数量不等于{rules['count']}(当前{len(items)})")
+    for i, p in enumerate(items[: rules["count"]]):
+        reason = validate_one(p, rules)
+        if reason:
+            errors.append(f"第{i + 1}条:{reason}")
+    return errors
+
+
+# ---------------- 容错提取 ----------------
+
+def _balanced_arrays(text):
+    """按括号配对（忽略字符串内的括号）找出所有顶层 [...] 片段"""
+    out = []
+    depth = 0
+    start = -1
+    in_str = False
+    escape = False
+    for i, ch in enumerate(text):
+        if in_str:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_str = False
+            continue
+        if ch == '"':
+            in_str = True
+        elif ch == "[":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif ch == "]" and depth > 0:
+            depth -= 1
+            if depth == 0:
+                out.append(text[start:i + 1])
+    return out
+
+
+def _loads_list(candidate):
+    try:
+        parsed = json.loads(candidate)
+    except ValueError:
+        return None
+    if isinstance(parsed, list) and parsed:
+        return [js_string(x) for x in parsed]
+    return None
+
+
+def _step_strict(text):
+    return strict_parse(text)
+
+
+def _step_balanced_brackets(text):
+    for cand in _balanced_arrays(FENCE_RE.sub("", text)):
+        parsed = _loads_list(cand)
+        if parsed:
+            return parsed
+    return None
+
+
+def _step_trailing_commas(text):
+    cleaned = TRAILING_COMMA_RE.sub(r"\1", FENCE_RE.sub("", text))
+    for cand in _balanced_arrays(cleaned) or GREEDY_ARRAY_RE.findall(cleaned):
+        parsed = _loads_list(cand)
+        if parsed:
+            return parsed
+    return None
+
+
+def _step_curly_quotes(text):
+    # 只在整段没有 ASCII 双引号时替换，避免破坏字符串内部合法的中文引号
+    cleaned = FENCE_RE.sub("", text)
+    if '"' in cleaned or "“" not in cleaned:
+        return None
+    cleaned = TRAILING_COMMA_RE.sub(r"\1", cleaned.replace("“", '"').replace("”", '"'))
+    for cand in _balanced_arrays(cleaned):
+        parsed = _loads_list(cand)
+        if parsed:
+            return parsed
+    return None
+
+
+def _step_python_literal(text):
+    cleaned = FENCE_RE.sub("", text)
+    m = GREEDY_ARRAY_RE.search(cleaned)
+    if not m:
+        return None
+    try:
+        parsed = ast.literal_eval(m.group(0))
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return None
+    if isinstance(parsed, (list, tuple)) and parsed:
+        return [js_string(x) for x in parsed]
+    return None
+
+
+def _step_line_items(text):
+    items = []
+    for line in FENCE_RE.sub("", text).splitlines():
+        m = LINE_ITEM_RE.match(line)
+        if m:
+            items.append(m.group(1).strip().strip('"“”,，'))
+    return items or None
+
+
+REPAIR_STEPS = {
+    "strict": _step_strict,
+    "balanced_brackets": _step_balanced_brackets,
+    "trailing_commas": _step_trailing_commas,
+    "curly_quotes": _step_curly_quotes,
+    "python_literal": _step_python_literal,
+    "line_items": _step_line_items,
+}
+
+
+def _normalize_items(items):
+    out = []
+    for it in items:
+        s = ITEM_PREFIX_RE.sub("", it.strip()).strip().strip('"“”')
+        if s:
+            out.append(s)
+    return out
+
+
+def _select(items, rules, select_valid):
+    count = rules["count"]
+    if select_valid and len(items) > count:
+        valid = [p for p in items if validate_one(p, rules) is None]
+        if len(valid) >= count:
+            return valid[:count]
+    return items[:count]
+
+
+def repair_parse(text, rules, spec):
+    """容错提取：依次尝试各修复步骤，返回 (条目, 命中的步骤)；首个能通过校验的步骤胜出"""
+    if not text:
+        return None, None
+    fallback = (None, None)
+    for name in spec["repair_steps"]:
+        step = REPAIR_STEPS.get(name)
+        if step is None:
+            raise ValueError(f"未知的修复步骤: {name}")
+        parsed = step(text)
+        if not parsed:
+            continue
+        items = _select(parsed if name == "strict" else _normalize_items(parsed), rules, spec["select_valid"])
+        if not validate(items, rules):
+            return items, name
+        if fallback[0] is None:
+            fallback = (items, name)
+    return fallback
+
+
+# ---------------- 回放 ----------------
+
+def load_corpus(path):
+    cases = []
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{lineno} 不是合法 JSON: {e}")
+            attempts = row.get("attempts")
+            if attempts is None:
+                attempts = [row.get("raw", "")]
+            cases.append({
+                "id": row.get("id") or f"line-{lineno}",
+                "route": row.get("route", "images"),
+                "attempts": [str(a or "") for a in attempts],
+            })
+    return cases
+
+
+def replay_case(case, spec):
+    """按路由的重试循环模拟一次请求：返回严格/容错两种策略下的调用次数与是否兜底"""
+    rules = spec["routes"].get(case["route"])
+    if rules is None:
+        raise ValueError(f"{case['id']}: 未知路由 {case['route']}")
+    max_attempts = spec["max_attempts"]
+    attempts = case["attempts"][:max_attempts]
+
+    def run(parse):
+        reasons = []
+        for i, raw in enumerate(attempts):
+            items = parse(raw)
+            if items is None:
+                reasons.append("解析失败")
+                continue
+            errors = validate(items[: rules["count"]], rules)
+            if not errors:
+                return {"calls": i + 1, "fallback": False, "reasons": reasons}
+            reasons.extend(errors)
+        # 没采集到的后续重试按线上逻辑仍会发生，调用次数计满
+        return {"calls": max_attempts, "fallback": True, "reasons": reasons,
+                "observed": len(attempts)}
+
+    strict = run(strict_parse)
+    steps = Counter()
+
+    def tolerant(raw):
+        items, step = repair_parse(raw, rules, spec)
+        if items is not None and not validate(items, rules):
+            steps[step] += 1
+        return items
+
+    repaired = run(tolerant)
+    return {"id": case["id"], "route": case["route"], "strict": strict, "repair": repaired, "steps": steps}
+
+
+def summarize(results, call_latency):
+    by_route = {}
+    for r in results:
+        s = by_route.setdefault(r["route"], {
+            "requests": 0,
+            "strict_first_pass": 0,
+            "repair_first_pass": 0,
+            "strict_calls": 0,
+            "repair_calls": 0,
+            "strict_fallback": 0,
+            "repair_fallback": 0,
+            "reasons": Counter(),
+            "repair_steps": Counter(),
+        })
+        s["requests"] += 1
+        s["strict_calls"] += r["strict"]["calls"]
+        s["repair_calls"] += r["repair"]["calls"]
+        s["strict_first_pass"] += int(r["strict"]["calls"] == 1 and not r["strict"]["fallback"])
+        s["repair_first_pass"] += int(r["repair"]["calls"] == 1 and not r["repair"]["fallback"])
+        s["strict_fallback"] += int(r["strict"]["fallback"])
+        s["repair_fallback"] += int(r["repair"]["fallback"])
+        for reason in r["strict"]["reasons"]:
+            # 把 “第3条:长度不合规(92)” 归并成 “长度不合规”
+            s["reasons"][re.sub(r"^第\d+条:|\(.*?\)|当前\d+", "", reason).split(":")[0]] += 1
+        s["repair_steps"].update(r["steps"])
+
+    for s in by_route.values():
+        s["saved_calls"] = s["strict_calls"] - s["repair_calls"]
+        s["strict_retry_rate"] = _ratio(s["strict_calls"] - s["requests"], s["requests"])
+        s["repair_retry_rate"] = _ratio(s["repair_calls"] - s["requests"], s["requests"])
+        s["saved_seconds"] = round(s["saved_calls"] * call_latency, 1)
+        s["reasons"] = dict(s["reasons"].most_common())
+        s["repair_steps"] = dict(s["repair_steps"].most_common())
+    return by_route
+
+
+def _ratio(a, b):
+    return round(a / b, 3) if b else 0.0
+
+
+def print_report(summary, call_latency):
+    print("=" * 60)
+    print("📊 提示词解析回放报告")
+    print("=" * 60)
+    for route, s in summary.items():
+        n = s["requests"]
+        print(f"\n📦 路由: /api/generate/{route}  （{n} 个请求）")
+        print(f"   严格解析  首次通过: {s['strict_first_pass']}/{n}   LLM 调用: {s['strict_calls']}"
+              f"   平均重试: {s['strict_retry_rate']}   最终兜底: {s['strict_fallback']}")
+        print(f"   容错修复  首次通过: {s['repair_first_pass']}/{n}   LLM 调用: {s['repair_calls']}"
+              f"   平均重试: {s['repair_retry_rate']}   最终兜底: {s['repair_fallback']}")
+        print(f"   ✅ 可省下 {s['saved_calls']} 次 LLM 往返（按每次 {call_latency}s 估算约 {s['saved_seconds']}s）")
+        if s["reasons"]:
+            print("   🔍 严格解析失败原因:")
+            for reason, c in s["reasons"].items():
+                print(f"      - {reason}: {c}")
+        if s["repair_steps"]:
+            print("   🔧 修复命中步骤:")
+            for step, c in s["repair_steps"].items():
+                print(f"      - {step}: {c}")
+    print("\n" + "=" * 60)
+
+
+def load_spec(path):
+    spec = json.loads(json.dumps(DEFAULT_SPEC))
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            override = json.load(f)
+        spec.update({k: v for k, v in override.items() if k != "routes"})
+        for route, rules in override.get("routes", {}).items():
+            spec["routes"].setdefault(route, {}).update(rules)
+    return spec
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="回放 LLM 原始输出，评估提示词解析的重试率")
+    parser.add_argument("corpus", nargs="?", help="语料 JSONL 文件")
+    parser.add_argument("--spec", help="校验/修复规范 JSON（缺省使用与路由一致的内置规则）")
+    parser.add_argument("--emit-spec", metavar="PATH", help="导出当前生效的规范后退出（- 表示输出到终端）")
+    parser.add_argument("--call-latency", type=float, default=12.0, help="单次 LLM 调用的平均耗时（秒），用于估算节省时间")
+    parser.add_argument("--json", metavar="PATH", help="同时把汇总结果写成 JSON")
+    parser.add_argument("--verbose", action="store_true", help="逐条打印每个请求的回放结果")
+    args = parser.parse_args(argv)
+
+    spec = load_spec(args.spec)
+
+    if args.emit_spec:
+        text = json.dumps(spec, ensure_ascii=False, indent=2)
+        if args.emit_spec == "-":
+            print(text)
+        else:
+            with open(args.emit_spec, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+            print(f"✅ 规范已写入: {args.emit_spec}")
+        return 0
+
+    if not args.corpus:
+        parser.error("需要提供语料文件（或使用 --emit-spec）")
+
+    try:
+        cases = load_corpus(args.corpus)
+        results = [replay_case(c, spec) for c in cases]
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+
+    if not results:
+        print("⚠️  语料为空")
+        return 1
+
+    if args.verbose:
+        for r in results:
+            print(f"  - {r['id']} ({r['route']}): 严格 {r['strict']['calls']} 次"
+                  f"{'（兜底）' if r['strict']['fallback'] else ''} → 容错 {r['repair']['calls']} 次"
+                  f"{'（兜底）' if r['repair']['fallback'] else ''}")
+
+    summary = summarize(results, args.call_latency)
+    print_report(summary, args.call_latency)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"spec": spec, "routes": summary}, f, ensure_ascii=False, indent=2)
+        print(f"📝 汇总已写入: {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
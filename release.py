@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+发布流水线：迁移 → 环境变量对比/同步 → 重新部署 → 等待部署 → 线上验证
+
+各阶段按依赖关系组成 DAG，互不依赖的阶段并发执行（例如打包、渲染环境变量与服务发现同时进行）。
+每个阶段的耗时记录在 .release_state.json，失败后用 --resume 从上次完成的阶段继续；
+每次发布的汇总追加到 .release_history.jsonl，便于对比发布耗时。
+
+  discover ──┬── migrate ──────┬────────────┐
+             ├── kv ──────┐    │            │
+             ├── pooler ──┤    ▼            │
+  render_env ┴────────────┴── env_sync ─────┴── redeploy ── watch ── verify
+  package（独立）
+
+package 只在本地生成 deploy.tar.gz 并记录 sha256，供手动上传或留档核对；
+redeploy 由 Zeabur 从 git 源码重新构建，不使用这个包，因此不依赖 package。
+
+用法：
+  python3 release.py                     # 完整发布
+  python3 release.py --resume            # 从上次失败处继续
+  python3 release.py --dry-run           # 只打包、对比环境变量，不改线上
+  python3 release.py --skip package --url https://xxx.zeabur.app
+  python3 release.py --plan              # 只打印阶段依赖
+  python3 release.py --provision-kv --replicas 2   # 没有 Redis 时先创建，再扩到 2 个副本
+  python3 release.py --provision-pooler --db-connection-limit 5   # 应用经 PgBouncer 访问数据库
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = os.path.join(ROOT_DIR, ".release_state.json")
+HISTORY_FILE = os.path.join(ROOT_DIR, ".release_history.jsonl")
+PACKAGE_SCRIPT = os.path.join(ROOT_DIR, "create_deploy_package.sh")
+PACKAGE_FILE = os.path.join(ROOT_DIR, "deploy.tar.gz")
+
+RUNNING_STATUSES = ("RUNNING",)
+FAILED_STATUSES = ("FAILED", "ERROR", "CRASHED", "REMOVED")
+VERIFY_PATHS = ("/", "/login", "/api/user/me")
+
+
+class StageError(Exception):
+    """阶段执行失败（会终止流水线并保存进度）"""
+
+
+class Stage:
+    """
+    一个发布阶段。persist=False 的阶段输出含敏感信息或很便宜，不写入状态文件，
+    续跑时若有下游阶段需要它会重新执行。
+    """
+
+    def __init__(self, name, deps, func, desc, persist=True):
+        self.name = name
+        self.deps = tuple(deps)
+        self.func = func
+        self.desc = desc
+        self.persist = persist
+
+
+# ---------------- 阶段实现 ----------------
+
+def stage_package(ctx, opts):
+    env = dict(os.environ, COPYFILE_DISABLE="1")  # macOS tar 不要带 ._ 元数据文件
+    proc = subprocess.run(["bash", PACKAGE_SCRIPT], cwd=ROOT_DIR, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise StageError("打包失败: " + (proc.stderr or proc.stdout).strip()[-300:])
+    h = hashlib.sha256()
+    with open(PACKAGE_FILE, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return {"artifact": os.path.basename(PACKAGE_FILE), "bytes": os.path.getsize(PACKAGE_FILE),
+            "sha256": h.hexdigest()[:16]}
+
+
+def stage_discover(ctx, opts):
+    import zeabur_api
+    try:
+        found = zeabur_api.discover()
+    except zeabur_api.ZeaburError as e:
+        raise StageError(str(e))
+    return {
+        "project_id": found["project"]["_id"],
+        "service_id": found["service"]["_id"],
+        "service_name": found["service"]["name"],
+        "database_url": found["database_url"],
+    }
+
+
+def stage_render_env(ctx, opts):
+    from deploy_env import build_envs
+    # DATABASE_URL 在 env_sync 阶段用服务发现的结果填入；PRISMA_MIGRATIONS_HASH 只在迁移成功后由 env_sync 写入
+    return {"envs": build_envs("", verbose=False)}
+
+
+def stage_kv(ctx, opts):
+    """找到项目里的 Redis 服务并取出连接串；多副本部署依赖它共享验证码、临时图片"""
+    import zeabur_api
+    found = ctx["discover"]
+    url = os.getenv("KV_URL", "")
+    service = None
+    if not url:
+        try:
+            service = zeabur_api.find_kv_service(zeabur_api.list_services(found["project_id"]))
+            if not service and opts.provision_kv and not opts.dry_run:
+                print("   🧱 [kv] 项目中没有 Redis 服务，正在创建...")
+                service = zeabur_api.create_prebuilt_service(found["project_id"], "redis", "redis")
+                url = wait_kv_url(zeabur_api, service, opts)
+            elif service and service.get("_id"):
+                url = zeabur_api.kv_url(service["_id"])
+        except zeabur_api.ZeaburError as e:
+            raise StageError(str(e))
+    return {"url": url, "service": (service or {}).get("name")}
+
+
+def wait_kv_url(zeabur_api, service, opts):
+    """新建的 Redis 要等部署完成才有连接串；超时仍没有就失败，而不是带着空 KV_URL 往下走"""
+    deadline = time.monotonic() + opts.kv_timeout
+    while True:
+        url = zeabur_api.kv_url(service["_id"])
+        if url:
+            return url
+        if time.monotonic() >= deadline:
+            raise StageError(f"Redis 服务 {service.get('name')} 已创建，但 {opts.kv_timeout}s 内连接串仍未就绪；"
+                             f"等它在 Zeabur 控制台显示运行中后用 python3 release.py --resume 重新运行")
+        time.sleep(opts.poll_interval)
+
+
+def stage_pooler(ctx, opts):
+    """找到（或创建）PgBouncer 连接池服务，算出应用应使用的 DATABASE_URL；迁移不经过它"""
+    import zeabur_api
+    found = ctx["discover"]
+    url = os.getenv("DB_POOLER_URL", "")
+    service = None
+    if not url and found["database_url"]:
+        try:
+            service = zeabur_api.find_pooler_service(zeabur_api.list_services(found["project_id"]))
+            if not service and opts.provision_pooler and not opts.dry_run:
+                print("   🧱 [pooler] 项目中没有 PgBouncer 服务，正在创建...")
+                service = zeabur_api.create_prebuilt_service(found["project_id"], "pgbouncer", "pgbouncer")
+                zeabur_api.replace_variables(found["project_id"], service["_id"], [
+                    {"name": "DATABASE_URL", "value": found["database_url"]},
+                    {"name": "LISTEN_PORT", "value": str(zeabur_api.POOLER_PORT)},
+                    {"name": "POOL_MODE", "value": "transaction"},
+                    {"name": "AUTH_TYPE", "value": "scram-sha-256"},
+                    {"name": "DEFAULT_POOL_SIZE", "value": str(opts.pooler_size)},
+                    {"name": "MAX_CLIENT_CONN", "value": "1000"},
+                ])
+                zeabur_api.redeploy_service(service["_id"])
+            if service and service.get("_id"):
+                url = zeabur_api.pooler_url(service, found["database_url"])
+        except zeabur_api.ZeaburError as e:
+            raise StageError(str(e))
+    return {"url": url, "service": (service or {}).get("name")}
+
+
+def stage_migrate(ctx, opts):
+    from db_migrate import run_migrations
+    database_url = ctx["discover"]["database_url"]
+    if not database_url:
+        return {"skipped": True, "reason": "未找到 DATABASE_URL"}
+    if opts.dry_run:
+        return {"skipped": True, "reason": "dry-run"}
+    result = run_migrations(database_url)
+    if not result["ok"]:
+        raise StageError(f"迁移失败: {result['error']}")
+    return {"hash": result["hash"], "skipped": result["skipped"], "seconds": result["seconds"]}
+
+
+def stage_env_sync(ctx, opts):
+    import zeabur_api
+    from deploy_env import app_database_url, diff_envs, merge_envs
+
+    found = ctx["discover"]
+    database_url = app_database_url(found["database_url"], pooler_url=(ctx.get("pooler") or {}).get("url"),
+                                    connection_limit=opts.db_connection_limit)
+    desired = [dict(e) for e in ctx["render_env"]["envs"]]
+    for e in desired:
+        if e["name"] == "DATABASE_URL":
+            e["value"] = database_url
+    kv_url = (ctx.get("kv") or {}).get("url")
+    if kv_url and not any(e["name"] == "KV_URL" for e in desired):
+        desired.append({"name": "KV_URL", "value": kv_url})
+    # 迁移被跳过（--skip migrate、dry-run、没有数据库）时不发布哈希，线上保留原值，应用不会误判 schema 已是最新
+    migration_hash = (ctx.get("migrate") or {}).get("hash")
+    if migration_hash:
+        desired.append({"name": "PRISMA_MIGRATIONS_HASH", "value": migration_hash})
+    live = zeabur_api.service_env(found["service_id"])
+    target = merge_envs(live, desired)
+    added, removed, changed = diff_envs(live, target)
+    out = {"added": added, "removed": removed, "changed": changed, "applied": False}
+    if (added or removed or changed) and not opts.dry_run:
+        zeabur_api.replace_variables(found["project_id"], found["service_id"], target)
+        out["applied"] = True
+    return out
+
+
+def stage_redeploy(ctx, opts):
+    import zeabur_api
+    found = ctx["discover"]
+    service_id = found["service_id"]
+    # 在这里而不是 kv 阶段检查：--skip kv 时 ctx["kv"] 为空，只剩 KV_URL 可用
+    if (opts.replicas or 1) > 1 and not (ctx["kv"].get("url") or os.getenv("KV_URL")):
+        raise StageError(f"--replicas {opts.replicas} 需要共享 KV：请加 --provision-kv，"
+                         f"或设置 KV_URL（本地/自建可用 python3 kv_store.py）")
+    before = zeabur_api.service_deployments(service_id).get("deployments") or []
+    if opts.replicas:
+        try:
+            zeabur_api.update_replicas(found["project_id"], service_id, opts.replicas)
+        except zeabur_api.ZeaburError as e:
+            raise StageError(str(e))
+    zeabur_api.redeploy_service(service_id)
+    return {"previous_deployment": before[0]["_id"] if before else None,
+            "replicas": opts.replicas,
+            "triggered_at": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+
+
+def stage_watch(ctx, opts):
+    import zeabur_api
+    service_id = ctx["discover"]["service_id"]
+    previous = ctx["redeploy"]["previous_deployment"]
+    deadline = time.monotonic() + opts.watch_timeout
+    last_status = None
+    while time.monotonic() < deadline:
+        deployments = zeabur_api.service_deployments(service_id).get("deployments") or []
+        latest = deployments[0] if deployments else None
+        if latest and latest["_id"] != previous:
+            status = str(latest.get("status", "")).upper()
+            if status != last_status:
+                print(f"   ⏳ [watch] 部署 {latest['_id'][:8]} 状态: {status}")
+                last_status = status
+            if status in RUNNING_STATUSES:
+                return {"deployment": latest["_id"], "status": status}
+            if status in FAILED_STATUSES:
+                raise StageError(f"部署失败（{status}），请在 Zeabur 控制台查看构建日志")
+        time.sleep(opts.poll_interval)
+    raise StageError(f"等待部署超时（{opts.watch_timeout}s），最后状态: {last_status}")
+
+
+def stage_verify(ctx, opts):
+    url = (opts.url or os.getenv("APP_URL") or "").rstrip("/")
+    if not url:
+        return {"skipped": True, "reason": "未提供 --url / APP_URL"}
+    import requests
+    checks = []
+    for path in VERIFY_PATHS:
+        started = time.perf_counter()
+        try:
+            r = requests.get(url + path, timeout=30, allow_redirects=False)
+            status = r.status_code
+        except requests.exceptions.RequestException as e:
+            raise StageError(f"{path} 请求失败: {str(e)[:100]}")
+        ms = round((time.perf_counter() - started) * 1000)
+        checks.append({"path": path, "status": status, "ms": ms})
+        if status >= 500:
+            raise StageError(f"{path} 返回 {status}")
+    return {"checks": checks}
+
+
+STAGES = [
+    Stage("package", [], stage_package, "创建本地部署包（仅留档，不上传）"),
+    Stage("discover", [], stage_discover, "发现项目/服务/数据库", persist=False),
+    Stage("render_env", [], stage_render_env, "渲染目标环境变量", persist=False),
+    Stage("migrate", ["discover"], stage_migrate, "数据库迁移"),
+    Stage("kv", ["discover"], stage_kv, "查找/创建共享 KV 服务", persist=False),
+    Stage("pooler", ["discover"], stage_pooler, "查找/创建数据库连接池", persist=False),
+    Stage("env_sync", ["discover", "render_env", "migrate", "kv", "pooler"], stage_env_sync, "对比并同步环境变量"),
+    Stage("redeploy", ["migrate", "env_sync", "discover", "kv"], stage_redeploy, "触发重新部署"),
+    Stage("watch", ["redeploy", "discover"], stage_watch, "等待部署完成"),
+    Stage("verify", ["watch"], stage_verify, "线上验证"),
+]
+
+# 可以单独跳过的阶段（其余阶段是下游的输入来源）
+SKIPPABLE = ["package", "migrate", "kv", "pooler", "env_sync", "verify"]
+
+
+# ---------------- DAG 执行 ----------------
+
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return None
+    with open(STATE_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state):
+    tmp = STATE_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, STATE_FILE)
+
+
+def plan(stages, state, skip):
+    """算出本次需要执行的阶段：未完成的 + 它们依赖的不持久化阶段"""
+    by_name = {s.name: s for s in stages}
+    done = {n for n, r in state["stages"].items() if r.get("status") in ("done", "skipped")}
+    todo = {s.name for s in stages if s.name not in done and s.name not in skip}
+    stack = list(todo)
+    while stack:
+        for dep in by_name[stack.pop()].deps:
+            if dep not in todo and not by_name[dep].persist and dep not in skip:
+                todo.add(dep)
+                stack.append(dep)
+    return todo
+
+
+def run_dag(stages, state, opts, skip=(), max_workers=4, saver=save_state):
+    """并发执行 DAG；返回是否全部成功。state 会随进度通过 saver 实时写盘"""
+    by_name = {s.name: s for s in stages}
+    todo = plan(stages, state, set(skip))
+    outputs = {n: r.get("output") for n, r in state["stages"].items() if r.get("status") in ("done", "skipped")}
+    for name in skip:
+        state["stages"].setdefault(name, {"status": "skipped", "output": {}, "seconds": 0})
+        outputs.setdefault(name, {})
+
+    running = {}
+    failed = None
+
+    def ready(name):
+        return all(d in outputs and d not in todo for d in by_name[name].deps)
+
+    def execute(stage, ctx):
+        started = time.perf_counter()
+        out = stage.func(ctx, opts)
+        return out, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            if failed is None:
+                for name in [n for n in sorted(todo) if n not in running and ready(n)]:
+                    stage = by_name[name]
+                    print(f"▶️  [{name}] {stage.desc}...")
+                    ctx = {d: outputs[d] for d in stage.deps}
+                    state["stages"][name] = {"status": "running",
+                                             "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+                    running[name] = pool.submit(execute, stage, ctx)
+                saver(state)
+            if not running:
+                break
+            finished, _ = wait(running.values(), return_when=FIRST_COMPLETED)
+            for name in [n for n, f in running.items() if f in finished]:
+                future = running.pop(name)
+                record = state["stages"][name]
+                try:
+                    out, seconds = future.result()
+                except Exception as e:
+                    record.update(status="failed", error=f"{type(e).__name__}: {e}" if not isinstance(e, StageError)
+                                  else str(e))
+                    print(f"❌ [{name}] {record['error']}")
+                    failed = failed or name
+                    continue
+                record.update(status="done", seconds=round(seconds, 2))
+                record["output"] = out if by_name[name].persist else {"_volatile": True}
+                outputs[name] = out
+                todo.discard(name)
+                print(f"✅ [{name}] 完成（{seconds:.2f}s）")
+            saver(state)
+    return failed is None and not todo
+
+
+def print_summary(stages, state, wall):
+    print("\n" + "=" * 60)
+    print("📊 发布阶段耗时")
+    print("=" * 60)
+    total = 0.0
+    for s in stages:
+        r = state["stages"].get(s.name, {})
+        seconds = r.get("seconds")
+        total += seconds or 0
+        icon = {"done": "✅", "failed": "❌", "skipped": "⏭️ ", "running": "⏳"}.get(r.get("status"), "  ")
+        print(f"   {icon} {s.name:<11} {('%.2fs' % seconds) if seconds is not None else '-':>9}   {s.desc}")
+    print(f"\n   ⏱️  本次墙钟耗时 {wall:.2f}s（各阶段耗时合计 {total:.2f}s，并发节省 {max(0.0, total - wall):.2f}s）")
+
+
+def append_history(state, wall, ok):
+    row = {
+        "release_id": state["release_id"],
+        "finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_rev": state.get("git_rev"),
+        "ok": ok,
+        "wall_seconds": round(wall, 2),
+        "stages": {n: r.get("seconds") for n, r in state["stages"].items()},
+    }
+    with open(HISTORY_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="发布流水线（DAG 并发执行，可续跑）")
+    parser.add_argument("--resume", action="store_true", help="从上次未完成的阶段继续")
+    parser.add_argument("--skip", action="append", default=[], choices=SKIPPABLE,
+                        help="跳过某个阶段（可重复）")
+    parser.add_argument("--dry-run", action="store_true", help="只打包并对比环境变量，不迁移、不改线上")
+    parser.add_argument("--url", help="线上访问地址，用于 verify 阶段（也可设置 APP_URL）")
+    parser.add_argument("--watch-timeout", type=int, default=900, help="等待部署完成的超时（秒）")
+    parser.add_argument("--poll-interval", type=float, default=10.0)
+    parser.add_argument("--plan", action="store_true", help="只打印阶段依赖")
+    parser.add_argument("--provision-kv", action="store_true", help="项目中没有 Redis 服务时自动创建")
+    parser.add_argument("--kv-timeout", type=int, default=300, help="等待新建 Redis 暴露连接串的超时（秒）")
+    parser.add_argument("--replicas", type=int, help="部署前设置应用副本数（>1 时要求已有共享 KV）")
+    parser.add_argument("--provision-pooler", action="store_true", help="项目中没有 PgBouncer 服务时自动创建")
+    parser.add_argument("--pooler-size", type=int, default=20, help="新建连接池时每个库的上游连接数")
+    parser.add_argument("--db-connection-limit", type=int,
+                        help="每个副本的 Prisma 连接数上限（写入 DATABASE_URL 的 connection_limit）")
+    opts = parser.parse_args(argv)
+
+    if opts.plan:
+        for s in STAGES:
+            deps = ", ".join(s.deps) or "-"
+            print(f"   {s.name:<11} ← {deps:<44} {s.desc}")
+        return 0
+
+    skip = list(opts.skip)
+    if opts.dry_run:
+        # 迁移与环境变量阶段自己识别 dry-run（只检查不修改），其后的阶段全部跳过；不写续跑状态
+        skip += ["redeploy", "watch", "verify"]
+        opts.resume = False
+
+    state = load_state() if opts.resume else None
+    if opts.resume and not state:
+        print("⚠️  没有可续跑的发布记录，开始新的发布")
+    if state and all(r.get("status") in ("done", "skipped") for r in state["stages"].values()) \
+            and len(state["stages"]) == len(STAGES):
+        print("✅ 上次发布已全部完成，无需续跑")
+        return 0
+    if not state:
+        state = {"release_id": datetime.now().strftime("%Y%m%d-%H%M%S"), "git_rev": git_rev(), "stages": {}}
+    else:
+        print(f"🔁 续跑发布 {state['release_id']}")
+        for r in state["stages"].values():
+            if r.get("status") in ("failed", "running"):
+                r["status"] = "pending"
+
+    print(f"🚀 发布 {state['release_id']}（git {state.get('git_rev') or 'unknown'}）\n")
+    started = time.perf_counter()
+    ok = run_dag(STAGES, state, opts, skip=skip, saver=(lambda s: None) if opts.dry_run else save_state)
+    wall = time.perf_counter() - started
+    print_summary(STAGES, state, wall)
+    if not opts.dry_run:
+        append_history(state, wall, ok)
+
+    if ok:
+        print("\n✨ 发布完成！")
+        return 0
+    print("\n💡 修复问题后执行 python3 release.py --resume 从失败的阶段继续")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
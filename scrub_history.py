@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+一次性清理 Git 历史中泄露的密钥（替代 cleanup_api_keys.sh）
+
+旧脚本对每个密钥各跑两遍 git filter-branch，其中 --tree-filter 会把每个提交
+检出后再 find + sed，耗时 ≈ 密钥数 × 提交数 × 文件数，仓库稍大就要几个小时。
+
+本脚本只遍历一次历史：
+  git fast-export --all | 替换 | git fast-import --force
+  - 所有密钥编译进同一个 Aho-Corasick 自动机，一遍扫描即可替换全部密钥
+  - 每个 blob 先用 C 实现的正则判断是否命中，未命中的原样透传，
+    只有命中的 blob 才逐字节跑自动机
+  - fast-export 对相同内容的 blob 只输出一次；另外按原始 blob 哈希缓存扫描结果
+    （.git/scrub-cache-<密钥指纹>.json），重复执行时已确认干净的 blob 不再扫描
+  - 提交说明和 tag 说明也会一并替换
+  - 结束后输出报告：每个密钥（打码）命中次数、被改写的 blob / 文件 / 提交
+
+用法：
+  python3 scrub_history.py --detect                         # 只读扫描历史，列出疑似密钥
+  python3 scrub_history.py --detect --write-keys keys.txt   # 把疑似密钥写入文件
+  python3 scrub_history.py --keys-file keys.txt --dry-run   # 只统计，不改写
+  python3 scrub_history.py --keys-file keys.txt             # 改写历史
+  python3 scrub_history.py --key sk-xxx --key sk-yyy --yes  # 跳过确认
+
+⚠️ 会重写 Git 历史，完成后需要强制推送；执行前请先备份并轮换已泄露的密钥。
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import Counter, deque
+
+DEFAULT_REPLACEMENT = "***REMOVED***"
+# --detect 使用的规则：Zeabur / OpenAI 风格的 sk- 密钥、Google API Key、
+# 阿里云 AccessKeyId、带真实密码的 postgres 连接串
+DETECT_PATTERNS = [
+    ("sk-key", rb"\bsk-[A-Za-z0-9]{20,}"),
+    ("google-api-key", rb"\bAIza[0-9A-Za-z_\-]{35}"),
+    ("aliyun-access-key", rb"\bLTAI[0-9A-Za-z]{12,24}"),
+    ("postgres-password", rb"postgres(?:ql)?://[^:\s/@]+:([^@\s'\"]{8,})@"),
+]
+# 文档里的示例值不算泄露
+DETECT_IGNORE = (b"xxx", b"your", b"password", b"...")
+MIN_KEY_LENGTH = 8
+
+
+class ScrubError(Exception):
+    """git 命令失败或参数不合法"""
+
+
+class KeyMatcher:
+    """多模式串匹配（Aho-Corasick），替换时取最左最长、互不重叠的匹配"""
+
+    def __init__(self, keys):
+        self.keys = [k for k in dict.fromkeys(keys) if k]
+        if not self.keys:
+            raise ScrubError("没有要清理的密钥")
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for index, key in enumerate(self.keys):
+            state = 0
+            for byte in key:
+                nxt = self._goto[state].get(byte)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][byte] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append(index)
+        self._build_failure_links()
+        self._prefilter = re.compile(b"|".join(re.escape(k) for k in self.keys))
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for byte, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and byte not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(byte, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def matches(self, data):
+        """返回 [(start, end, key_index)]，包含重叠匹配"""
+        found = []
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for pos, byte in enumerate(data):
+            while state and byte not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(byte, 0)
+            for index in out[state]:
+                found.append((pos + 1 - len(self.keys[index]), pos + 1, index))
+        return found
+
+    def replace(self, data, replacement):
+        """返回 (新内容, Counter{key_index: 次数})；未命中时返回原对象"""
+        counts = Counter()
+        if not self._prefilter.search(data):
+            return data, counts
+        pieces = []
+        cursor = 0
+        for start, end, index in sorted(self.matches(data), key=lambda m: (m[0], -m[1])):
+            if start < cursor:
+                continue
+            pieces.append(data[cursor:start])
+            pieces.append(replacement)
+            cursor = end
+            counts[index] += 1
+        pieces.append(data[cursor:])
+        return b"".join(pieces), counts
+
+
+def mask(key):
+    text = key.decode("utf-8", "replace")
+    if len(text) <= 8:
+        return text[:2] + "***"
+    return f"{text[:6]}***{text[-2:]}"
+
+
+def key_fingerprint(keys, replacement):
+    h = hashlib.sha256(replacement)
+    for key in sorted(keys):
+        h.update(b"\0" + key)
+    return h.hexdigest()[:12]
+
+
+def git(*args, cwd=None):
+    proc = subprocess.run(["git", *args], cwd=cwd, capture_output=True)
+    if proc.returncode != 0:
+        raise ScrubError(f"git {' '.join(args)} 失败: {proc.stderr.decode('utf-8', 'replace').strip()}")
+    return proc.stdout.decode("utf-8", "replace").strip()
+
+
+def load_keys(args):
+    keys = [k.encode("utf-8") for k in args.key or []]
+    for path in args.keys_file or []:
+        with open(path, "rb") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith(b"#"):
+                    keys.append(line)
+    env_keys = os.getenv("SCRUB_KEYS", "")
+    keys.extend(k.strip().encode("utf-8") for k in env_keys.split(",") if k.strip())
+    short = [k for k in keys if len(k) < MIN_KEY_LENGTH]
+    if short:
+        raise ScrubError(f"密钥过短（< {MIN_KEY_LENGTH} 字节）容易误伤正常内容: {[mask(k) for k in short]}")
+    return list(dict.fromkeys(keys))
+
+
+class BlobCache:
+    """按原始 blob 哈希记录扫描结果：干净的 blob 下次直接透传"""
+
+    def __init__(self, path):
+        self.path = path
+        self.clean = set()
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.clean = set(json.load(f).get("clean", []))
+            except (OSError, ValueError):
+                self.clean = set()
+        self.hits = 0
+
+    def is_clean(self, oid):
+        if oid and oid in self.clean:
+            self.hits += 1
+            return True
+        return False
+
+    def save(self):
+        if not self.path:
+            return
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"clean": sorted(self.clean)}, f)
+
+
+class StreamRewriter:
+    """
+    解析 fast-export 流：命令行原样转发，data <n> 块按所属对象（blob/commit/tag）处理。
+    handler(kind, payload, oid, mark) 返回新的 payload；sink 为 None 时只读不写。
+    """
+
+    def __init__(self, source, sink, handler):
+        self.source = source
+        self.sink = sink
+        self.handler = handler
+        self.commits = 0
+
+    def run(self):
+        kind = oid = mark = None
+        readline, read = self.source.readline, self.source.read
+        while True:
+            line = readline()
+            if not line:
+                break
+            if line.startswith(b"data "):
+                size = int(line[5:].strip())
+                payload = read(size)
+                if len(payload) != size:
+                    raise ScrubError("fast-export 输出被截断")
+                payload = self.handler(kind, payload, oid, mark)
+                if self.sink is not None:
+                    self.sink.write(b"data %d\n" % len(payload))
+                    self.sink.write(payload)
+                oid = None
+                continue
+            if line == b"blob\n":
+                kind, oid, mark = "blob", None, None
+            elif line.startswith(b"commit "):
+                kind, oid, mark = "commit", None, None
+                self.commits += 1
+            elif line.startswith(b"tag "):
+                kind, oid, mark = "tag", None, None
+            elif line.startswith(b"mark "):
+                mark = line[5:].strip()
+            elif line.startswith(b"original-oid "):
+                oid = line[13:].strip().decode("ascii")
+            elif kind in ("commit", "inline") and line.startswith(b"M "):
+                kind = "inline" if b" inline " in line else "commit"
+                self.on_modify(line)
+            if self.sink is not None:
+                self.sink.write(line)
+
+    def on_modify(self, line):
+        pass
+
+
+class Scrubber(StreamRewriter):
+    def __init__(self, source, sink, matcher, replacement, cache):
+        super().__init__(source, sink, self.rewrite)
+        self.matcher = matcher
+        self.replacement = replacement
+        self.cache = cache
+        self.counts = Counter()
+        self.blobs_total = 0
+        self.blobs_rewritten = 0
+        self.bytes_scanned = 0
+        self.messages_rewritten = 0
+        self.rewritten_marks = set()
+        self.paths = Counter()
+
+    def rewrite(self, kind, payload, oid, mark):
+        if kind in ("blob", "inline"):
+            self.blobs_total += 1
+            if self.cache.is_clean(oid):
+                return payload
+            self.bytes_scanned += len(payload)
+            new, counts = self.matcher.replace(payload, self.replacement)
+            if counts:
+                self.blobs_rewritten += 1
+                self.counts.update(counts)
+                if kind == "blob" and mark:
+                    self.rewritten_marks.add(mark)
+            elif oid:
+                self.cache.clean.add(oid)
+            return new
+        new, counts = self.matcher.replace(payload, self.replacement)
+        if counts:
+            self.messages_rewritten += 1
+            self.counts.update(counts)
+        return new
+
+    def on_modify(self, line):
+        # M <mode> <:mark> <path>
+        parts = line.rstrip(b"\n").split(b" ", 3)
+        if len(parts) == 4 and parts[2] in self.rewritten_marks:
+            self.paths[parts[3].decode("utf-8", "replace")] += 1
+
+
+def fast_export_args():
+    return ["git", "fast-export", "--all", "--signed-tags=strip", "--tag-of-filtered-object=rewrite",
+            "--show-original-ids", "--reencode=yes", "--fake-missing-tagger"]
+
+
+def scrub(matcher, replacement, cache, dry_run=False):
+    exporter = subprocess.Popen(fast_export_args(), stdout=subprocess.PIPE)
+    importer = None
+    sink = None
+    if not dry_run:
+        importer = subprocess.Popen(["git", "fast-import", "--force", "--quiet"], stdin=subprocess.PIPE)
+        sink = importer.stdin
+    scrubber = Scrubber(exporter.stdout, sink, matcher, replacement, cache)
+    try:
+        scrubber.run()
+    finally:
+        if importer is not None:
+            importer.stdin.close()
+    if exporter.wait() != 0:
+        raise ScrubError("git fast-export 失败")
+    if importer is not None and importer.wait() != 0:
+        raise ScrubError("git fast-import 失败，历史未被修改")
+    return scrubber
+
+
+def detect(limit_bytes=5 * 1024 * 1024):
+    """只读扫描全部历史 blob，返回 {候选值: (规则名, 出现的 blob 数)}"""
+    patterns = [(name, re.compile(p)) for name, p in DETECT_PATTERNS]
+    found = {}
+
+    def handler(kind, payload, oid, mark):
+        if kind in ("blob", "inline") and len(payload) <= limit_bytes:
+            for name, pattern in patterns:
+                for m in pattern.finditer(payload):
+                    value = m.group(m.lastindex or 0)
+                    if len(value) < MIN_KEY_LENGTH or any(w in value.lower() for w in DETECT_IGNORE):
+                        continue
+                    rule, count = found.get(value, (name, 0))
+                    found[value] = (rule, count + 1)
+        return payload
+
+    exporter = subprocess.Popen(fast_export_args(), stdout=subprocess.PIPE)
+    StreamRewriter(exporter.stdout, None, handler).run()
+    if exporter.wait() != 0:
+        raise ScrubError("git fast-export 失败")
+    return found
+
+
+def print_report(scrubber, matcher, cache, seconds, dry_run):
+    print()
+    print("📊 清理报告" + ("（dry-run，未改写）" if dry_run else ""))
+    print(f"   提交: {scrubber.commits}    blob: {scrubber.blobs_total}    "
+          f"扫描 {scrubber.bytes_scanned / 1024 / 1024:.1f} MB    缓存跳过 {cache.hits}")
+    print(f"   改写 blob: {scrubber.blobs_rewritten}    改写提交/tag 说明: {scrubber.messages_rewritten}")
+    print(f"   耗时: {seconds:.2f}s")
+    print()
+    for index, key in enumerate(matcher.keys):
+        hits = scrubber.counts.get(index, 0)
+        print(f"   {'🔑' if hits else '⚪'} {mask(key):<20} {hits} 处")
+    if scrubber.paths:
+        print()
+        print("   涉及文件（文件: 被改写的版本数）:")
+        for path, n in scrubber.paths.most_common(20):
+            print(f"     - {path}: {n}")
+        if len(scrubber.paths) > 20:
+            print(f"     ... 另有 {len(scrubber.paths) - 20} 个文件")
+
+
+def confirm():
+    print("⚠️  警告：此操作会重写 Git 历史！")
+    print("请确保：")
+    print("1. 已备份所有重要数据")
+    print("2. 已通知所有协作者")
+    print("3. 已准备好强制推送")
+    print("")
+    return input("是否继续？(yes/no): ").strip() == "yes"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="单遍清理 Git 历史中的密钥（fast-export + Aho-Corasick）")
+    parser.add_argument("--key", action="append", help="要清理的密钥（可重复）")
+    parser.add_argument("--keys-file", action="append", help="每行一个密钥的文件，# 开头为注释（可重复）")
+    parser.add_argument("--replacement", default=DEFAULT_REPLACEMENT, help=f"替换成的文本（默认 {DEFAULT_REPLACEMENT}）")
+    parser.add_argument("--detect", action="store_true", help="只读扫描历史，列出疑似密钥")
+    parser.add_argument("--write-keys", help="配合 --detect，把疑似密钥写入该文件")
+    parser.add_argument("--dry-run", action="store_true", help="只统计命中情况，不改写历史")
+    parser.add_argument("--no-cache", action="store_true", help="不使用 blob 扫描缓存")
+    parser.add_argument("--yes", action="store_true", help="跳过确认")
+    parser.add_argument("--force", action="store_true", help="工作区有未提交改动时也继续")
+    args = parser.parse_args(argv)
+
+    try:
+        git_dir = git("rev-parse", "--absolute-git-dir")
+        if args.detect:
+            started = time.perf_counter()
+            found = detect()
+            print(f"🔍 扫描完成，耗时 {time.perf_counter() - started:.2f}s，疑似密钥 {len(found)} 个")
+            for value, (rule, count) in sorted(found.items(), key=lambda kv: -kv[1][1]):
+                print(f"   {mask(value):<20} {rule:<18} 出现在 {count} 个 blob")
+            if args.write_keys and found:
+                with open(args.write_keys, "wb") as f:
+                    f.write("# scrub_history.py --detect 生成，请人工核对\n".encode("utf-8"))
+                    f.write(b"".join(v + b"\n" for v in found))
+                print(f"📝 已写入 {args.write_keys}（请人工核对后再用 --keys-file 清理，不要提交该文件）")
+            return 0
+
+        keys = load_keys(args)
+        matcher = KeyMatcher(keys)
+        replacement = args.replacement.encode("utf-8")
+        if any(replacement in k for k in keys):
+            raise ScrubError("替换文本不能是密钥的一部分")
+
+        if not args.dry_run:
+            if git("status", "--porcelain", "--untracked-files=no") and not args.force:
+                raise ScrubError("工作区有未提交的改动，请先提交或暂存（或使用 --force）")
+            if not args.yes and not confirm():
+                print("已取消")
+                return 1
+
+        cache_path = None if args.no_cache else os.path.join(
+            git_dir, f"scrub-cache-{key_fingerprint(matcher.keys, replacement)}.json")
+        cache = BlobCache(cache_path)
+
+        print(f"🧹 清理 {len(matcher.keys)} 个密钥: {', '.join(mask(k) for k in matcher.keys)}")
+        started = time.perf_counter()
+        scrubber = scrub(matcher, replacement, cache, dry_run=args.dry_run)
+        seconds = time.perf_counter() - started
+        cache.save()
+        print_report(scrubber, matcher, cache, seconds, args.dry_run)
+
+        if args.dry_run or not scrubber.blobs_rewritten and not scrubber.messages_rewritten:
+            return 0
+        if git("rev-parse", "--is-bare-repository") == "false":
+            git("reset", "--hard", "--quiet")
+        print()
+        print("✅ 清理完成")
+        print()
+        print("下一步：")
+        print("1. 检查清理结果: git log --all -p | grep -c '<密钥片段>'")
+        print("2. 彻底删除旧对象: git reflog expire --expire=now --all && git gc --prune=now --aggressive")
+        print("3. 如果满意，强制推送: git push origin --force --all && git push origin --force --tags")
+        print("4. ⚠️  注意：强制推送会影响所有协作者，请谨慎操作")
+        return 0
+    except (ScrubError, OSError) as e:
+        print(f"❌ {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
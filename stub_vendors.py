@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+本地供应商桩服务（离线联调/压测用）
+
+在一个端口上模拟应用依赖的几个上游接口，按路径前缀区分供应商：
+  /volc/api/v3        火山方舟（OpenAI 兼容）：/chat/completions、/images/generations、/models
+  /google/v1          第三方 Gemini 网关（OpenAI 兼容）：/chat/completions（图片模型返回 data URL）、/models
+  /dashscope/api/v1   阿里云百炼：/services/aigc/multimodal-generation/generation、/tasks/<id>
+  /imageseg           阿里云图像分割 RPC（?Action=SegmentCommodity 等）
+  /files/<name>.png   桩生成的图片
+
+鉴权只做形式检查：API Key / AccessKeyId 以 "invalid" 开头时返回鉴权失败。
+GET /__stats 返回各供应商请求数（<vendor>）与最大并发（peak:<vendor>），用于验证限流。
+
+用法：
+  python3 stub_vendors.py --port 8900
+  python3 stub_vendors.py --latency volc=0.4 --latency dashscope=3 --key-latency sk-slow=2 --fail-rate 0.05
+  python3 stub_vendors.py --slow-rate 0.05 --slow-factor 10      # 5% 的请求慢 10 倍（长尾）
+  python3 stub_vendors.py --latency volc=0.8 --tokens-per-s 40    # 首 token 0.8s，之后按 40 token/s 吐字（支持 stream=true）
+
+然后把 base URL 指向桩服务，例如 VOLC_BASE_URL=http://127.0.0.1:8900/volc/api/v3
+"""
+
+import argparse
+import base64
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# 1x1 透明 PNG
+TINY_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+)
+
+VENDOR_PREFIXES = {
+    "/volc/api/v3": "volc",
+    "/google/v1": "google",
+    "/dashscope/api/v1": "dashscope",
+    "/imageseg": "aliyun-imageseg",
+}
+
+DEFAULT_LATENCY = {"volc": 0.3, "google": 0.5, "dashscope": 1.5, "aliyun-imageseg": 0.4}
+
+# 小红书文案请求的桩输出：能通过 /api/generate/copy 的 validateCopy，避免每次都触发重试
+COPY_SAMPLES = [
+    {
+        "title": "通勤党必备✨这个真的省心💯",
+        "body": "用了两周来认真说说感受👇\n\n1. 早上出门 3 分钟搞定，比之前省一半时间\n2. 重量很轻，塞进通勤包完全没负担\n3. 价格不到同类一半，性价比很能打\n\n缺点是颜色选择少一点，但日常用完全够了。你们平时通勤最头疼的是什么？评论区聊聊～",
+        "tags": ["好物推荐", "性价比", "实用好物", "通勤好物", "上班族", "省时神器", "测评", "平价好物", "日常分享"],
+    },
+    {
+        "title": "谁懂啊💕下班后的小确幸🌙",
+        "body": "加班到九点回家，本来整个人都是蔫的🥱\n\n打开它的那一刻突然就被治愈了，灯光柔柔的，房间里都是淡淡的香味，坐在沙发上发了好久的呆。生活再忙，也想给自己留一点仪式感✨\n\n你们下班后会用什么方式犒劳自己呀？",
+        "tags": ["好物分享", "生活好物", "种草", "治愈系", "独居生活", "仪式感", "下班日常", "氛围感", "生活方式"],
+    },
+]
+
+
+class StubConfig:
+    """桩服务行为配置：各供应商基础延迟、按 key 覆盖的延迟、抖动比例、随机失败率、长尾慢请求、吐字速度"""
+
+    def __init__(self, latency=None, key_latency=None, jitter=0.2, fail_rate=0.0, seed=None,
+                 slow_rate=0.0, slow_factor=10.0, tokens_per_s=0.0, chars_per_token=2):
+        self.latency = dict(DEFAULT_LATENCY)
+        self.latency.update(latency or {})
+        self.key_latency = dict(key_latency or {})
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        # 以 slow_rate 的概率把延迟放大 slow_factor 倍，模拟上游长尾
+        self.slow_rate = slow_rate
+        self.slow_factor = slow_factor
+        # chat/completions 的生成节奏：基础延迟视为首 token 时间，之后每 token 间隔 1/tokens_per_s（0 = 一次性返回）
+        self.tokens_per_s = tokens_per_s
+        self.chars_per_token = max(1, int(chars_per_token))
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.inflight = {}
+
+    def delay_for(self, vendor, key):
+        base = self.key_latency.get(key, self.latency.get(vendor, 0.0))
+        with self.lock:
+            factor = 1 + self.random.uniform(-self.jitter, self.jitter)
+            fail = self.random.random() < self.fail_rate
+            if self.random.random() < self.slow_rate:
+                factor *= self.slow_factor
+        return max(0.0, base * factor), fail
+
+    def token_gap(self):
+        if self.tokens_per_s <= 0:
+            return 0.0
+        with self.lock:
+            factor = 1 + self.random.uniform(-self.jitter, self.jitter)
+        return max(0.0, factor / self.tokens_per_s)
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def enter(self, vendor):
+        with self.lock:
+            self.inflight[vendor] = self.inflight.get(vendor, 0) + 1
+            peak = f"peak:{vendor}"
+            self.counters[peak] = max(self.counters.get(peak, 0), self.inflight[vendor])
+
+    def leave(self, vendor):
+        with self.lock:
+            self.inflight[vendor] -= 1
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server_version = "xhs-stub/1.0"
+    protocol_version = "HTTP/1.1"
+
+    # ---------- 工具 ----------
+
+    @property
+    def config(self):
+        return self.server.stub_config
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            sys.stderr.write("[stub] " + (fmt % args) + "\n")
+
+    def handle(self):
+        # 客户端提前断开（例如网关取消对冲中落后的请求）属于正常情况，不打印堆栈
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _send_json(self, status, obj):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if not raw:
+            return {}
+        try:
+            return json.loads(raw.decode("utf-8"))
+        except ValueError:
+            return {}
+
+    def _split(self):
+        parsed = urlparse(self.path)
+        for prefix, vendor in VENDOR_PREFIXES.items():
+            if parsed.path == prefix or parsed.path.startswith(prefix + "/"):
+                return vendor, parsed.path[len(prefix):] or "/", parsed
+        return None, parsed.path, parsed
+
+    def _bearer(self):
+        auth = self.headers.get("Authorization", "")
+        return auth[7:].strip() if auth.startswith("Bearer ") else ""
+
+    def _simulate(self, vendor, key):
+        """统一处理延迟与随机失败；返回 False 表示已经回了错误响应"""
+        delay, fail = self.config.delay_for(vendor, key)
+        self.config.enter(vendor)
+        try:
+            time.sleep(delay)
+        finally:
+            self.config.leave(vendor)
+        self.config.count(vendor)
+        if fail:
+            self._send_json(500, {"code": "InternalError", "message": "stub: injected failure"})
+            return False
+        return True
+
+    # ---------- 路由 ----------
+
+    def do_GET(self):
+        vendor, path, parsed = self._split()
+        if parsed.path.startswith("/files/"):
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(TINY_PNG)))
+            self.end_headers()
+            self.wfile.write(TINY_PNG)
+            return
+        if parsed.path == "/__stats":
+            self._send_json(200, dict(self.config.counters))
+            return
+        if vendor == "aliyun-imageseg":
+            self._aliyun_rpc(parse_qs(parsed.query))
+            return
+        if vendor in ("volc", "google") and path == "/models":
+            self._openai_models(vendor)
+            return
+        if vendor == "dashscope" and path.startswith("/tasks/"):
+            self._dashscope_task(path[len("/tasks/"):])
+            return
+        self._send_json(404, {"error": {"message": f"stub: unknown route {parsed.path}"}})
+
+    def do_POST(self):
+        vendor, path, parsed = self._split()
+        if vendor in ("volc", "google") and path == "/chat/completions":
+            self._openai_chat(vendor, self._read_json())
+            return
+        if vendor == "volc" and path == "/images/generations":
+            self._openai_images(vendor, self._read_json())
+            return
+        if vendor == "dashscope" and path == "/services/aigc/multimodal-generation/generation":
+            self._dashscope_generation(self._read_json())
+            return
+        if vendor == "aliyun-imageseg":
+            length = int(self.headers.get("Content-Length") or 0)
+            form = parse_qs(self.rfile.read(length).decode("utf-8")) if length else {}
+            form.update(parse_qs(parsed.query))
+            self._aliyun_rpc(form)
+            return
+        self._send_json(404, {"error": {"message": f"stub: unknown route {parsed.path}"}})
+
+    # ---------- OpenAI 兼容 ----------
+
+    def _check_bearer(self):
+        key = self._bearer()
+        if not key or key.startswith("invalid"):
+            self._send_json(401, {"error": {"message": "Incorrect API key provided", "type": "invalid_request_error"}})
+            return None
+        return key
+
+    def _openai_models(self, vendor):
+        key = self._check_bearer()
+        if key is None or not self._simulate(vendor, key):
+            return
+        self._send_json(200, {"object": "list", "data": [{"id": f"{vendor}-stub-model", "object": "model"}]})
+
+    def _openai_chat(self, vendor, body):
+        key = self._check_bearer()
+        if key is None or not self._simulate(vendor, key):
+            return
+        model = str(body.get("model") or "stub-model")
+        prompt = json.dumps(body.get("messages") or [], ensure_ascii=False)
+        if "image" in model:
+            content = f"![image](data:image/png;base64,{base64.b64encode(TINY_PNG).decode('ascii')})"
+        elif "小红书" in prompt:
+            content = json.dumps(COPY_SAMPLES[1 if "感性" in prompt else 0], ensure_ascii=False)
+        else:
+            content = json.dumps({"title": "桩服务标题", "body": "这是一段来自本地桩服务的正文。", "tags": ["桩服务"]},
+                                 ensure_ascii=False)
+        max_tokens = body.get("max_tokens")
+        if isinstance(max_tokens, int) and max_tokens > 0:
+            content = content[:max_tokens]
+        step = self.config.chars_per_token
+        tokens = [content[i:i + step] for i in range(0, len(content), step)]
+        if body.get("stream"):
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+            self._openai_chat_stream(model, tokens, (len(prompt) // 2, len(content) // 2) if include_usage else None)
+            return
+        if self.config.tokens_per_s > 0:
+            # 非流式也要等整篇生成完，才有真实的"整包返回"延迟
+            time.sleep(sum(self.config.token_gap() for _ in tokens[1:]))
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": len(prompt) // 2,
+                "completion_tokens": len(content) // 2,
+                "total_tokens": len(prompt) // 2 + len(content) // 2,
+            },
+        })
+
+    def _openai_chat_stream(self, model, tokens, usage=None):
+        """
+        stream=true：按 OpenAI chunk 格式逐 token 推 SSE（chunked 编码），节奏由 tokens_per_s 控制；
+        usage=(输入, 输出) 时与 stream_options.include_usage 一样在 [DONE] 前补一个 choices 为空的 usage 块
+        """
+        chat_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        def chunk(delta, finish=None):
+            return {"id": chat_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+
+        def write(payload):
+            data = payload.encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        write(f"data: {json.dumps(chunk({'role': 'assistant', 'content': ''}), ensure_ascii=False)}\n\n")
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.config.token_gap())
+            write(f"data: {json.dumps(chunk({'content': token}), ensure_ascii=False)}\n\n")
+        write(f"data: {json.dumps(chunk({}, 'stop'), ensure_ascii=False)}\n\n")
+        if usage:
+            final = dict(chunk({}), choices=[], usage={"prompt_tokens": usage[0], "completion_tokens": usage[1],
+                                                        "total_tokens": usage[0] + usage[1]})
+            write(f"data: {json.dumps(final, ensure_ascii=False)}\n\n")
+        write("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _openai_images(self, vendor, body):
+        key = self._check_bearer()
+        if key is None or not self._simulate(vendor, key):
+            return
+        host = self.headers.get("Host", "127.0.0.1")
+        self._send_json(200, {
+            "model": str(body.get("model") or "stub-image-model"),
+            "created": int(time.time()),
+            "data": [{"url": f"http://{host}/files/{uuid.uuid4().hex[:8]}.png"}],
+        })
+
+    # ---------- 百炼 ----------
+
+    def _dashscope_generation(self, body):
+        key = self._bearer()
+        if not key or key.startswith("invalid"):
+            self._send_json(401, {"code": "InvalidApiKey", "message": "Invalid API-key provided."})
+            return
+        if not self._simulate("dashscope", key):
+            return
+        host = self.headers.get("Host", "127.0.0.1")
+        self._send_json(200, {
+            "request_id": uuid.uuid4().hex,
+            "output": {"choices": [{"finish_reason": "stop", "message": {
+                "role": "assistant",
+                "content": [{"image": f"http://{host}/files/{uuid.uuid4().hex[:8]}.png"}],
+            }}]},
+            "usage": {"image_count": 1, "width": 1024, "height": 1024},
+        })
+
+    def _dashscope_task(self, task_id):
+        key = self._bearer()
+        if not key or key.startswith("invalid"):
+            self._send_json(401, {"code": "InvalidApiKey", "message": "Invalid API-key provided."})
+            return
+        if not self._simulate("dashscope", key):
+            return
+        self._send_json(200, {"request_id": uuid.uuid4().hex,
+                              "output": {"task_id": task_id, "task_status": "UNKNOWN"}})
+
+    # ---------- 阿里云 RPC ----------
+
+    def _aliyun_rpc(self, params):
+        def first(name):
+            v = params.get(name) or [""]
+            return v[0]
+
+        access_key_id = first("AccessKeyId")
+        if not access_key_id or access_key_id.startswith("invalid"):
+            self._send_json(404, {"RequestId": uuid.uuid4().hex, "Code": "InvalidAccessKeyId.NotFound",
+                                  "Message": "Specified access key is not found."})
+            return
+        if not self._simulate("aliyun-imageseg", access_key_id):
+            return
+        action = first("Action")
+        if action == "SegmentCommodity":
+            host = self.headers.get("Host", "127.0.0.1")
+            self._send_json(200, {"RequestId": uuid.uuid4().hex,
+                                  "Data": {"ImageURL": f"http://{host}/files/cutout-{uuid.uuid4().hex[:8]}.png"}})
+            return
+        self._send_json(400, {"RequestId": uuid.uuid4().hex, "Code": "InvalidParameter",
+                              "Message": f"stub: {action or 'Action'} requires more parameters"})
+
+
+def start_stub_server(port=0, config=None, host="127.0.0.1", verbose=False):
+    """在后台线程启动桩服务，返回 (server, base_url)；其它工具/压测脚本可直接调用"""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.stub_config = config or StubConfig()
+    server.verbose = verbose
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def stub_base_urls(base_url):
+    """各供应商在桩服务上的 base URL"""
+    return {
+        "volc": f"{base_url}/volc/api/v3",
+        "google": f"{base_url}/google/v1",
+        "dashscope": f"{base_url}/dashscope/api/v1",
+        "aliyun-imageseg": f"{base_url}/imageseg",
+    }
+
+
+def _parse_pairs(items, label):
+    out = {}
+    for item in items or []:
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise SystemExit(f"❌ {label} 格式应为 name=seconds: {item}")
+        out[name] = float(value)
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地供应商桩服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", action="append", metavar="VENDOR=SECONDS", help="供应商基础延迟，可重复")
+    parser.add_argument("--key-latency", action="append", metavar="KEY=SECONDS", help="按 API Key/AccessKeyId 覆盖延迟")
+    parser.add_argument("--jitter", type=float, default=0.2, help="延迟抖动比例（默认 ±20%%）")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="随机返回 500 的比例")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="长尾慢请求比例")
+    parser.add_argument("--slow-factor", type=float, default=10.0, help="慢请求延迟倍数（默认 10）")
+    parser.add_argument("--seed", type=int, help="随机种子（复现压测结果）")
+    parser.add_argument("--tokens-per-s", type=float, default=0.0,
+                        help="chat/completions 吐字速度（token/s，默认 0 = 一次性返回）；--latency 即首 token 时间")
+    parser.add_argument("--chars-per-token", type=int, default=2, help="每个 token 折合字符数（默认 2）")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    config = StubConfig(
+        latency=_parse_pairs(args.latency, "--latency"),
+        key_latency=_parse_pairs(args.key_latency, "--key-latency"),
+        jitter=args.jitter,
+        fail_rate=args.fail_rate,
+        seed=args.seed,
+        slow_rate=args.slow_rate,
+        slow_factor=args.slow_factor,
+        tokens_per_s=args.tokens_per_s,
+        chars_per_token=args.chars_per_token,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    server.daemon_threads = True
+    server.stub_config = config
+    server.verbose = args.verbose
+    base_url = f"http://{args.host}:{server.server_address[1]}"
+    print(f"🧪 供应商桩服务已启动: {base_url}")
+    for vendor, url in stub_base_urls(base_url).items():
+        print(f"   - {vendor}: {url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 已停止")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
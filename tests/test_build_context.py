@@ -0,0 +1,33 @@
+"""build_context 对 web 2 构建上下文的取舍"""
+
+import unittest
+
+from build_context import build_needs, why_unneeded
+
+
+class WhyUnneededTest(unittest.TestCase):
+    def test_categories(self):
+        self.assertEqual(why_unneeded("node_modules/next/package.json"), "依赖/构建产物（镜像内重新生成）")
+        self.assertEqual(why_unneeded(".env.local"), "本地环境变量（不应进镜像）")
+        self.assertEqual(why_unneeded("README.md"), "文档")
+        self.assertEqual(why_unneeded("update-user.js"), "一次性脚本（不被构建引用）")
+        self.assertEqual(why_unneeded("src/lib/unused.ts"), "源码：没有任何路由入口引用")
+        self.assertEqual(why_unneeded(".prettierrc"), "工具配置（next build 不读取）")
+
+    def test_build_configs_are_not_tool_configs(self):
+        # next build 的 lint 步骤读 eslint 配置，不能当作“工具配置”排除
+        for name in ("eslint.config.mjs", ".eslintrc.json", "next.config.ts", "postcss.config.mjs"):
+            self.assertNotEqual(why_unneeded(name), "工具配置（next build 不读取）", name)
+
+
+class BuildNeedsTest(unittest.TestCase):
+    def test_web_context_keeps_build_configs(self):
+        needs = build_needs()
+        for name in ("eslint.config.mjs", "next.config.ts", "package.json", "tsconfig.json"):
+            self.assertIn(name, needs)
+        self.assertNotIn("update-user.js", needs)
+        self.assertNotIn("README.md", needs)
+
+
+if __name__ == "__main__":
+    unittest.main()
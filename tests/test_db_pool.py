@@ -0,0 +1,40 @@
+"""db_pool 的 DATABASE_URL 改写：Prisma 连接池参数只加给应用，psycopg2 工具连接前去掉"""
+
+import unittest
+from urllib.parse import parse_qs, urlsplit
+
+from db_pool import libpq_url, pooled_database_url
+
+URL = "postgresql://u:p@db.zeabur.internal:5432/xhs?sslmode=require"
+
+
+def query(url):
+    return parse_qs(urlsplit(url).query)
+
+
+class PooledUrlTest(unittest.TestCase):
+    def test_adds_prisma_params_and_keeps_existing(self):
+        url = pooled_database_url(URL, connection_limit="5", pgbouncer=True, pool_timeout=20)
+        self.assertEqual(query(url), {"sslmode": ["require"], "connection_limit": ["5"], "pgbouncer": ["true"],
+                                      "pool_timeout": ["20"]})
+        self.assertTrue(url.startswith("postgresql://u:p@db.zeabur.internal:5432/xhs?"))
+
+    def test_no_options_keeps_query(self):
+        self.assertEqual(query(pooled_database_url(URL)), {"sslmode": ["require"]})
+
+    def test_placeholder_untouched(self):
+        self.assertEqual(pooled_database_url("请设置DATABASE_URL", connection_limit=5), "请设置DATABASE_URL")
+
+
+class LibpqUrlTest(unittest.TestCase):
+    def test_strips_prisma_only_params(self):
+        pooled = pooled_database_url(URL, connection_limit=5, pgbouncer=True, pool_timeout=20) + "&schema=public"
+        self.assertEqual(libpq_url(pooled), URL)
+
+    def test_plain_url_unchanged(self):
+        self.assertEqual(libpq_url(URL), URL)
+        self.assertEqual(libpq_url("postgresql://u:p@h/db"), "postgresql://u:p@h/db")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+"""image_prep_service 对坏图片一律回 JSON 错误，而不是断开连接"""
+
+import base64
+import io
+import json
+import unittest
+from unittest import mock
+from urllib import error as urlerror
+from urllib import request as urlrequest
+
+try:
+    from PIL import Image
+except ImportError:  # 服务本身依赖 Pillow
+    Image = None
+
+from image_prep_service import PrepCache, PrepService, start_service
+
+
+def png(size=(64, 48)):
+    out = io.BytesIO()
+    Image.new("RGB", size, (200, 80, 40)).save(out, format="PNG")
+    return out.getvalue()
+
+
+@unittest.skipIf(Image is None, "需要 Pillow")
+class PrepareErrorsTest(unittest.TestCase):
+    def setUp(self):
+        self.server, self.base = start_service(PrepService(PrepCache()))
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def post(self, body):
+        req = urlrequest.Request(self.base + "/prepare", data=json.dumps(body).encode("utf-8"), method="POST",
+                                 headers={"Content-Type": "application/json"})
+        try:
+            with urlrequest.urlopen(req, timeout=10) as resp:
+                return resp.status, json.loads(resp.read())
+        except urlerror.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    def test_ok(self):
+        status, body = self.post({"imageBase64": base64.b64encode(png()).decode("ascii")})
+        self.assertEqual(status, 200)
+        self.assertEqual((body["width"], body["height"]), (64, 48))
+
+    def test_not_an_image(self):
+        status, body = self.post({"imageBase64": base64.b64encode(b"not an image").decode("ascii")})
+        self.assertEqual(status, 400)
+        self.assertIn("error", body)
+
+    def test_decompression_bomb(self):
+        data = base64.b64encode(png((400, 400))).decode("ascii")
+        with mock.patch.object(Image, "MAX_IMAGE_PIXELS", 1000):
+            status, body = self.post({"imageBase64": data})
+        self.assertEqual(status, 422)
+        self.assertIn("error", body)
+
+    def test_bad_target(self):
+        status, _ = self.post({"imageBase64": base64.b64encode(png()).decode("ascii"), "target": ["x"]})
+        self.assertEqual(status, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
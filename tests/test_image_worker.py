@@ -0,0 +1,81 @@
+"""image_worker 在写库/渲染意外出错时不把任务卡在 running"""
+
+import threading
+import time
+import unittest
+from unittest import mock
+
+from image_worker import Job, MemoryStore, Worker, via_gateway
+
+
+class FlakyStore(MemoryStore):
+    """第一次写进度就抛数据库错误，记录 finish / release 调用"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def save_progress(self, job, worker_id):
+        raise RuntimeError("connection reset by peer")
+
+    def finish(self, job, worker_id, status, error=None):
+        self.calls.append(("finish", status, error))
+
+    def release(self, job, worker_id, error):
+        self.calls.append(("release", error))
+
+
+def make_job(attempts):
+    renders = [{"prompt": f"p{i}"} for i in range(4)]
+    return Job("job-1", "gen-1", "dashscope", "m", "default", None, renders, [], len(renders), attempts)
+
+
+class ProcessErrorTest(unittest.TestCase):
+    def run_job(self, attempts, max_attempts=3):
+        store = FlakyStore()
+        worker = Worker(store, {"dashscope": 1}, {"dashscope": "http://unused"}, max_attempts=max_attempts,
+                        verbose=False)
+        started = []
+        lock = threading.Lock()
+
+        def render_one(job, index):
+            with lock:
+                started.append(index)
+            time.sleep(0.05)
+            return f"https://img/{index}.png"
+
+        worker.render_one = render_one
+        try:
+            worker.process(make_job(attempts))
+        finally:
+            for pool in worker.pools.values():
+                pool.shutdown(wait=True)
+            worker.job_pool.shutdown(wait=True)
+        return store, started
+
+    def test_released_for_retry_and_pending_renders_cancelled(self):
+        store, started = self.run_job(attempts=1)
+        self.assertEqual(len(store.calls), 1)
+        self.assertEqual(store.calls[0][0], "release")
+        self.assertIn("RuntimeError", store.calls[0][1])
+        # 并发 1：第一张写进度失败后，排队中的渲染被取消，最多再有一张已在跑
+        self.assertLessEqual(len(started), 2)
+
+    def test_marked_failed_after_last_attempt(self):
+        store, _ = self.run_job(attempts=3)
+        self.assertEqual([c[:2] for c in store.calls], [("finish", "failed")])
+
+
+class ViaGatewayTest(unittest.TestCase):
+    def test_meter_headers_only_through_gateway(self):
+        with mock.patch.dict("os.environ", {"VENDOR_GATEWAY_URL": "http://gw:8788, http://cache:8790/"}):
+            self.assertTrue(via_gateway("http://gw:8788/dashscope"))
+            self.assertTrue(via_gateway("http://cache:8790"))
+            self.assertFalse(via_gateway("https://dashscope.aliyuncs.com/api/v1"))
+            self.assertFalse(via_gateway("http://gw:87880/volc"))
+        with mock.patch.dict("os.environ", {"VENDOR_GATEWAY_URL": ""}):
+            self.assertFalse(via_gateway("http://gw:8788/dashscope"))
+
+
+if __name__ == "__main__":
+    unittest.main()
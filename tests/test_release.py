@@ -0,0 +1,129 @@
+"""release.py 的阶段依赖与迁移哈希的发布条件"""
+
+import sys
+import types
+import unittest
+from unittest import mock
+
+import release
+
+
+class FakeZeabur(types.ModuleType):
+    """只记录 replace_variables 写入的变量"""
+
+    class ZeaburError(Exception):
+        pass
+
+    def __init__(self, live):
+        super().__init__("zeabur_api")
+        self.live = live
+        self.written = None
+
+    def service_env(self, service_id):
+        return dict(self.live)
+
+    def replace_variables(self, project_id, service_id, target):
+        self.written = {e["name"]: e["value"] for e in target}
+
+
+def opts(**kw):
+    base = dict(dry_run=False, replicas=None, db_connection_limit=None)
+    base.update(kw)
+    return types.SimpleNamespace(**base)
+
+
+CTX = {
+    "discover": {"project_id": "p", "service_id": "s", "service_name": "xhs", "database_url": ""},
+    "render_env": {"envs": [{"name": "JWT_SECRET", "value": "x"}]},
+    "kv": {},
+    "pooler": {},
+}
+
+
+class StageGraphTest(unittest.TestCase):
+    def setUp(self):
+        self.deps = {s.name: set(s.deps) for s in release.STAGES}
+
+    def test_env_sync_waits_for_migrate(self):
+        self.assertIn("migrate", self.deps["env_sync"])
+
+    def test_redeploy_does_not_need_package(self):
+        self.assertNotIn("package", self.deps["redeploy"])
+        self.assertTrue({"migrate", "env_sync", "kv"} <= self.deps["redeploy"])
+
+    def test_deps_exist_and_acyclic(self):
+        order = []
+        pending = dict(self.deps)
+        while pending:
+            ready = [n for n, deps in pending.items() if deps <= set(order)]
+            self.assertTrue(ready, f"依赖成环或引用了不存在的阶段: {pending}")
+            order += ready
+            for n in ready:
+                del pending[n]
+
+    def test_skippable_stages_exist(self):
+        self.assertTrue(set(release.SKIPPABLE) <= set(self.deps))
+
+
+class MigrationHashTest(unittest.TestCase):
+    def sync(self, migrate):
+        fake = FakeZeabur({"PRISMA_MIGRATIONS_HASH": "old"})
+        with mock.patch.dict(sys.modules, {"zeabur_api": fake}):
+            release.stage_env_sync(dict(CTX, migrate=migrate), opts())
+        return fake.written
+
+    def test_publishes_hash_after_successful_migration(self):
+        self.assertEqual(self.sync({"hash": "new", "skipped": False, "seconds": 1})["PRISMA_MIGRATIONS_HASH"], "new")
+
+    def test_keeps_live_hash_when_migrate_skipped(self):
+        for migrate in ({}, {"skipped": True, "reason": "dry-run"}):
+            self.assertEqual(self.sync(migrate)["PRISMA_MIGRATIONS_HASH"], "old")
+
+
+class SharedKvGuardTest(unittest.TestCase):
+    def test_skip_kv_still_requires_shared_kv(self):
+        with mock.patch.dict(sys.modules, {"zeabur_api": FakeZeabur({})}), \
+                mock.patch.dict("os.environ", {"KV_URL": ""}):
+            with self.assertRaises(release.StageError):
+                release.stage_redeploy({"discover": CTX["discover"], "kv": {}}, opts(replicas=2))
+
+
+class ProvisionKv(FakeZeabur):
+    """项目里没有 Redis；新建后前 ready_after 次查询还没有连接串"""
+
+    def __init__(self, ready_after):
+        super().__init__({})
+        self.ready_after = ready_after
+        self.lookups = 0
+
+    def list_services(self, project_id):
+        return []
+
+    def find_kv_service(self, services):
+        return None
+
+    def create_prebuilt_service(self, project_id, name, template):
+        return {"_id": "kv1", "name": name}
+
+    def kv_url(self, service_id):
+        self.lookups += 1
+        return "redis://kv:6379" if self.lookups > self.ready_after else ""
+
+
+class ProvisionKvTest(unittest.TestCase):
+    def run_kv(self, fake, kv_timeout):
+        with mock.patch.dict(sys.modules, {"zeabur_api": fake}), mock.patch.dict("os.environ", {"KV_URL": ""}):
+            return release.stage_kv(CTX, opts(provision_kv=True, kv_timeout=kv_timeout, poll_interval=0.01))
+
+    def test_waits_for_connection_string(self):
+        fake = ProvisionKv(ready_after=2)
+        self.assertEqual(self.run_kv(fake, kv_timeout=5)["url"], "redis://kv:6379")
+        self.assertEqual(fake.lookups, 3)
+
+    def test_fails_with_resume_hint_when_not_ready(self):
+        with self.assertRaisesRegex(release.StageError, "--resume"):
+            self.run_kv(ProvisionKv(ready_after=10 ** 6), kv_timeout=0.05)
+
+
+if __name__ == "__main__":
+    unittest.main()
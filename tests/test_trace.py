@@ -0,0 +1,40 @@
+"""xhs_ops.trace 的拼接规则：交错请求的分段归属"""
+
+import os
+import unittest
+
+from xhs_ops.trace import read_file, stitch
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def stages(span):
+    return {name: round(seconds, 3) for name, seconds in span.stages}
+
+
+class StitchInterleavedTest(unittest.TestCase):
+    def setUp(self):
+        self.spans = stitch(read_file(os.path.join(FIXTURES, "trace_interleaved.log")))
+
+    def test_every_request_completes(self):
+        self.assertEqual([s.route for s in self.spans], ["images"] * 3)
+        self.assertEqual([s.status for s in self.spans], ["done"] * 3)
+
+    def test_interleaved_requests_keep_their_own_stages(self):
+        first, second, _ = self.spans
+        # 每个请求只拿到一行策划结束与一行抠图结束，不会被先开始的请求吞掉
+        self.assertEqual(stages(first), {"plan": 5.0, "cutout.finish": 3.0, "ref-prep": 1.5,
+                                         "render.gap": 0.5, "render.1": 10.0, "finish": 0.5})
+        self.assertEqual(stages(second), {"plan": 5.0, "cutout.finish": 3.0, "ref-prep": 2.0,
+                                          "render.gap": 0.5, "render.1": 12.0, "finish": 0.5})
+        self.assertAlmostEqual(first.total, 20.5)
+        self.assertAlmostEqual(second.total, 23.0)
+
+    def test_cutout_cache_fallback_is_not_counted_as_planning(self):
+        third = self.spans[2]
+        self.assertEqual(stages(third), {"plan": 4.0, "cutout.cache": 1.5, "cutout.finish": 2.5,
+                                         "ref-prep": 1.0, "render.gap": 0.5, "render.1": 10.0, "finish": 0.5})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+"""user_credits 的手机号匹配与变更合并"""
+
+import os
+import tempfile
+import unittest
+
+from user_credits import below_zero_if_created, load_changes, normalize_phone
+
+
+class NormalizePhoneTest(unittest.TestCase):
+    def test_eleven_digit_mobile(self):
+        self.assertEqual(normalize_phone("13800000000"), "13800000000")
+        self.assertEqual(normalize_phone(" 19912345678 "), "19912345678")
+        self.assertEqual(normalize_phone(13800000000), "13800000000")
+
+    def test_thirteen_digit_account_kept_as_is(self):
+        # 13 位账号原样保留，不能被当成 86 + 11 位改写到另一个用户
+        self.assertEqual(normalize_phone("8613800000000"), "8613800000000")
+        self.assertEqual(normalize_phone("1234567890123"), "1234567890123")
+
+    def test_rejects_what_the_app_rejects(self):
+        for raw in ("12800000000", "+8613800000000", "138-0000-0000", "1380000000", "", None, "abc"):
+            self.assertIsNone(normalize_phone(raw), raw)
+
+
+class LoadChangesTest(unittest.TestCase):
+    def load(self, text):
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        try:
+            return load_changes(path)
+        finally:
+            os.remove(path)
+
+    def test_both_formats_stay_distinct(self):
+        changes, invalid = self.load("phone,freeUsage,tokenBalance,mode\n"
+                                     "13800000000,+10,,\n"
+                                     "8613800000000,+5,,\n"
+                                     "13800000000,,500,set\n")
+        self.assertEqual(invalid, [])
+        self.assertEqual(changes, {"13800000000": [None, 10, 500, 0], "8613800000000": [None, 5, None, 0]})
+
+    def test_below_default_base(self):
+        self.assertTrue(below_zero_if_created([None, -5, None, 0]))
+        self.assertFalse(below_zero_if_created([None, -3, None, 0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+"""vendor_gateway 换 profile（对冲 / 故障转移）时只带一份凭证"""
+
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from vendor_gateway import Gateway, Profile, Upstream, request_secret, with_secret
+
+
+class RecordingUpstream(BaseHTTPRequestHandler):
+    """记录每个请求收到的鉴权头；sk-a 按 mode 变慢或返回 500，其它 Key 立即成功"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        auth = self.headers.get_all("Authorization") or []
+        self.server.seen.append(auth)
+        status = 200
+        if auth == ["Bearer sk-a"]:
+            if self.server.mode == "slow":
+                time.sleep(1.0)
+            else:
+                status = 500
+        body = json.dumps({"auth": auth}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class WithSecretTest(unittest.TestCase):
+    def test_replaces_lowercase_authorization(self):
+        headers, path = with_secret({"authorization": "Bearer sk-a", "Content-Type": "application/json"},
+                                    "/chat/completions", "sk-b")
+        auth = [v for k, v in headers.items() if k.lower() == "authorization"]
+        self.assertEqual(auth, ["Bearer sk-b"])
+        self.assertEqual(path, "/chat/completions")
+
+    def test_google_key_header_and_query(self):
+        headers, path = with_secret({"X-Goog-Api-Key": "g-a"}, "/v1beta/models/m:generateContent?key=g-a&alt=sse",
+                                    "g-b")
+        self.assertEqual(headers, {"x-goog-api-key": "g-b"})
+        self.assertEqual(path, "/v1beta/models/m:generateContent?key=g-b&alt=sse")
+
+    def test_request_secret(self):
+        self.assertEqual(request_secret({"authorization": "Bearer sk-a"}, "/x"), "sk-a")
+        self.assertEqual(request_secret({}, "/x?key=g%2Ba"), "g+a")
+
+
+class HedgeAuthTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), RecordingUpstream)
+        self.server.daemon_threads = True
+        self.server.seen = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        profiles = [Profile("a", "sk-a", base), Profile("b", "sk-b", base)]
+        self.upstream = Upstream("volc", base, profiles, pool_size=2, timeout=10)
+        self.gateway = Gateway({"volc": self.upstream}, hedge_default=0.1, hedge_min=0.05, hedge_budget=1.0,
+                               timeout=10)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def run_once(self, mode):
+        self.server.mode = mode
+        headers = {"authorization": "Bearer sk-a", "Content-Type": "application/json"}
+        return self.gateway.execute(self.upstream, "chat", "POST", "/chat/completions", headers, b"{}", "sk-a")
+
+    def test_hedge_sends_single_auth_header(self):
+        status, _, payload, winner, _ = self.run_once("slow")
+        self.assertEqual(status, 200)
+        self.assertEqual(winner.profile.name, "b")
+        self.assertEqual(json.loads(payload)["auth"], ["Bearer sk-b"])
+        self.assertTrue(all(len(auth) == 1 for auth in self.server.seen), self.server.seen)
+
+    def test_failover_sends_single_auth_header(self):
+        status, _, payload, winner, _ = self.run_once("fail")
+        self.assertEqual(status, 200)
+        self.assertEqual(winner.profile.name, "b")
+        self.assertEqual(json.loads(payload)["auth"], ["Bearer sk-b"])
+        self.assertEqual(self.server.seen, [["Bearer sk-a"], ["Bearer sk-b"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+批量调整用户额度：从 CSV / JSONL 读取 手机号 → 体验次数(freeUsage) / 余额(tokenBalance) 的变更
+
+原来调额度要改 web 2/update-user.js 里写死的手机号逐个执行，或者在后台页面里点（列表只返回 50 个用户）。
+本工具按块批量写库：每块一条 INSERT ... ON CONFLICT + UPDATE ... FROM (VALUES ...) 的集合语句、一个事务，
+一万条充值是十来条 SQL。
+
+  python3 user_credits.py apply topups.csv                  # 默认增减（+100 / -5）
+  python3 user_credits.py apply grants.jsonl --mode set     # 直接设为给定值
+  python3 user_credits.py apply topups.csv --create-missing # 手机号不存在时新建用户
+  python3 user_credits.py apply topups.csv --dry-run        # 每块执行后回滚，只看影响行数
+  python3 user_credits.py export users.csv                  # 按主键分页导出全部用户（.jsonl 则导出 JSONL）
+  python3 user_credits.py sample topups.csv --rows 10000    # 生成测试用的输入文件
+
+输入格式（表头/键名大小写不敏感）：
+  phone,freeUsage,tokenBalance[,mode]
+  13800000000,+100,
+  13800000001,,500,set
+手机号按应用存库的原样匹配：11 位（1[3-9] 开头）或 13 位数字，不去掉 86 / +86 前缀。
+空单元格表示不改；同一手机号出现多次时按文件顺序合并（set 之后的 add 叠加在 set 的值上）。
+增减后小于 0 的行不会写入，按“余额不足”列出。
+
+新建用户用 gen_random_uuid()（PostgreSQL 13+）。数据库默认读 DATABASE_URL，也可 --database-url 指定或 --from-zeabur 从 Zeabur 发现。
+依赖：pip install psycopg2-binary
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import re
+import sys
+import time
+
+from db_pool import libpq_url, redact
+
+DEFAULT_CHUNK = 1000
+DEFAULT_EXPORT_BATCH = 5000
+# 与应用注册/登录的校验一致（auth/{send-code,login,register}/route.ts）：13 位数字或 1[3-9] 开头的 11 位
+PHONE_RE = re.compile(r"^(?:\d{13}|1[3-9]\d{9})$")
+# 与 schema.prisma 的默认值一致（新建用户时作为 add 的基数）
+DEFAULT_FREE_USAGE = 3
+DEFAULT_TOKEN_BALANCE = 0
+FIELD_ALIASES = {
+    "phone": "phone", "手机号": "phone", "mobile": "phone",
+    "freeusage": "free", "free_usage": "free", "free": "free", "次数": "free",
+    "tokenbalance": "token", "token_balance": "token", "tokens": "token", "余额": "token",
+    "mode": "mode", "方式": "mode",
+}
+EXPORT_COLUMNS = ("id", "phone", "freeUsage", "tokenBalance", "createdAt")
+
+APPLY_SQL = """
+WITH input(phone, free_set, free_add, token_set, token_add) AS (VALUES %s),
+{created}
+-- 同一条语句里 UPDATE 看不到 created 刚插入的行，新建的用户不会被再加一次
+updated AS (
+    UPDATE "User" u
+       SET "freeUsage" = COALESCE(i.free_set, u."freeUsage") + i.free_add,
+           "tokenBalance" = COALESCE(i.token_set, u."tokenBalance") + i.token_add
+      FROM input i
+     WHERE u.phone = i.phone
+       AND COALESCE(i.free_set, u."freeUsage") + i.free_add >= 0
+       AND COALESCE(i.token_set, u."tokenBalance") + i.token_add >= 0
+    RETURNING u.phone
+)
+{select}
+"""
+CREATED_CTE = """created AS (
+    INSERT INTO "User" (id, phone, "freeUsage", "tokenBalance")
+    SELECT gen_random_uuid()::text, i.phone,
+           COALESCE(i.free_set, %d) + i.free_add, COALESCE(i.token_set, %d) + i.token_add
+      FROM input i
+     WHERE COALESCE(i.free_set, %d) + i.free_add >= 0
+       AND COALESCE(i.token_set, %d) + i.token_add >= 0
+    ON CONFLICT (phone) DO NOTHING
+    RETURNING phone
+),""" % ((DEFAULT_FREE_USAGE, DEFAULT_TOKEN_BALANCE) * 2)
+VALUES_TEMPLATE = "(%s, %s::int, %s::int, %s::int, %s::int)"
+
+
+class InputError(Exception):
+    """输入文件格式错误（带行号）"""
+
+
+# ---------------- 输入 ----------------
+
+def normalize_phone(raw):
+    """
+    按应用存库的原样匹配手机号：只去掉首尾空白，不做任何改写。
+    13 位账号是真实存在的（不是 86 + 11 位），去掉 86 会把额度记到另一个用户头上
+    """
+    phone = str(raw if raw is not None else "").strip()
+    return phone if PHONE_RE.match(phone) else None
+
+
+def _parse_amount(raw, where):
+    if raw is None:
+        return None
+    text = str(raw).strip()
+    if not text:
+        return None
+    try:
+        return int(text.replace(",", ""))
+    except ValueError:
+        raise InputError(f"{where}: 不是整数: {text!r}")
+
+
+def read_rows(path):
+    """逐行产出 (行号, {phone, free, token, mode})；CSV 与 JSONL 按扩展名区分"""
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if path.endswith((".jsonl", ".ndjson", ".json")):
+            for lineno, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    raise InputError(f"第 {lineno} 行: 不是合法的 JSON")
+                yield lineno, {FIELD_ALIASES.get(str(k).strip().lower()): v for k, v in record.items()}
+        else:
+            reader = csv.DictReader(f)
+            unknown = [h for h in reader.fieldnames or [] if h and h.strip().lower() not in FIELD_ALIASES]
+            if unknown:
+                raise InputError(f"无法识别的列: {unknown}（可用 phone, freeUsage, tokenBalance, mode）")
+            for record in reader:
+                yield reader.line_num, {FIELD_ALIASES[k.strip().lower()]: v for k, v in record.items() if k}
+
+
+def load_changes(path, default_mode="add"):
+    """
+    合并为每个手机号一条变更：phone → [free_set, free_add, token_set, token_add]。
+    set 会清掉它之前累计的 add，之后的 add 继续叠加。返回 (变更字典, 无效行列表)。
+    """
+    changes = {}
+    invalid = []
+    for lineno, row in read_rows(path):
+        where = f"第 {lineno} 行"
+        phone = normalize_phone(row.get("phone"))
+        if not phone:
+            invalid.append((lineno, f"手机号无效: {row.get('phone')!r}"))
+            continue
+        mode = (str(row.get("mode") or "").strip().lower() or default_mode)
+        if mode not in ("add", "set"):
+            invalid.append((lineno, f"mode 只能是 add 或 set: {mode!r}"))
+            continue
+        free = _parse_amount(row.get("free"), where)
+        token = _parse_amount(row.get("token"), where)
+        if free is None and token is None:
+            invalid.append((lineno, "freeUsage 与 tokenBalance 都为空"))
+            continue
+        if mode == "set" and ((free is not None and free < 0) or (token is not None and token < 0)):
+            invalid.append((lineno, "set 的值不能为负"))
+            continue
+        entry = changes.setdefault(phone, [None, 0, None, 0])
+        for index, value in ((0, free), (2, token)):
+            if value is None:
+                continue
+            if mode == "set":
+                entry[index], entry[index + 1] = value, 0
+            else:
+                entry[index + 1] += value
+    return changes, invalid
+
+
+# ---------------- 写库 ----------------
+
+def _connect(url):
+    try:
+        import psycopg2
+    except ImportError:
+        print("❌ 缺少依赖 psycopg2，请先执行: pip install psycopg2-binary")
+        sys.exit(1)
+    return psycopg2.connect(libpq_url(url))
+
+
+def apply_chunk(conn, rows, create_missing, dry_run):
+    """一块变更在一个事务里执行，返回 (新建手机号集合, 更新手机号集合)"""
+    from psycopg2.extras import execute_values
+
+    select = "SELECT 'updated', phone FROM updated"
+    if create_missing:
+        select = "SELECT 'created', phone FROM created UNION ALL " + select
+    sql = APPLY_SQL.format(created=CREATED_CTE if create_missing else "", select=select)
+    with conn.cursor() as cur:
+        result = execute_values(cur, sql, rows, template=VALUES_TEMPLATE, page_size=len(rows), fetch=True)
+    if dry_run:
+        conn.rollback()
+    else:
+        conn.commit()
+    created = {phone for kind, phone in result if kind == "created"}
+    updated = {phone for kind, phone in result if kind == "updated"}
+    return created, updated
+
+
+def below_zero_if_created(entry):
+    """新建用户时以 schema 默认值为基数，判断增减后是否小于 0（与 CREATED_CTE 的过滤条件一致）"""
+    free_set, free_add, token_set, token_add = entry
+    free = (DEFAULT_FREE_USAGE if free_set is None else free_set) + free_add
+    token = (DEFAULT_TOKEN_BALANCE if token_set is None else token_set) + token_add
+    return free < 0 or token < 0
+
+
+def existing_phones(conn, phones):
+    if not phones:
+        return set()
+    with conn.cursor() as cur:
+        cur.execute('SELECT phone FROM "User" WHERE phone = ANY(%s)', (list(phones),))
+        found = {row[0] for row in cur.fetchall()}
+    conn.rollback()
+    return found
+
+
+def _database_url(args):
+    if args.from_zeabur:
+        import zeabur_api
+        found = zeabur_api.discover()
+        if not found["database_url"]:
+            print("❌ Zeabur 项目中没有找到 PostgreSQL 的 DATABASE_URL")
+            sys.exit(1)
+        return found["database_url"]
+    url = args.database_url or os.getenv("DATABASE_URL")
+    if not url:
+        print("❌ 缺少数据库地址（--database-url、DATABASE_URL 或 --from-zeabur）")
+        sys.exit(1)
+    return url
+
+
+def cmd_apply(args):
+    started = time.perf_counter()
+    try:
+        changes, invalid = load_changes(args.file, args.mode)
+    except (InputError, OSError) as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"📄 {args.file}: {len(changes)} 个手机号" + (f"，{len(invalid)} 行无效" if invalid else ""))
+    for lineno, reason in invalid[:10]:
+        print(f"   ⚠️  第 {lineno} 行: {reason}")
+    if invalid and not args.skip_invalid:
+        print("❌ 输入有无效行，修正后重试（或加 --skip-invalid 跳过它们）")
+        return 1
+    if not changes:
+        return 0
+
+    url = _database_url(args)
+    conn = _connect(url)
+    print(f"🗄️  {redact(url)}{'（试运行，每块回滚）' if args.dry_run else ''}")
+    items = [(phone, *entry) for phone, entry in changes.items()]
+    created, updated = set(), set()
+    try:
+        for offset in range(0, len(items), args.chunk):
+            chunk = items[offset:offset + args.chunk]
+            t0 = time.perf_counter()
+            c, u = apply_chunk(conn, chunk, args.create_missing, args.dry_run)
+            created |= c
+            updated |= u
+            print(f"   块 {offset // args.chunk + 1}: {len(chunk)} 条 → 新建 {len(c)}，更新 {len(u)}"
+                  f"（{(time.perf_counter() - t0) * 1000:.0f}ms）")
+        skipped = set(changes) - created - updated
+        found = existing_phones(conn, skipped)
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ 写入失败（当前块已回滚，之前的块已提交）: {e}")
+        return 1
+    finally:
+        conn.close()
+
+    # --create-missing 时没建出来的新手机号是因为按默认值增减后小于 0，算余额不足而不是不存在
+    below = {p for p in skipped - found if args.create_missing and below_zero_if_created(changes[p])}
+    missing = sorted(skipped - found - below)
+    negative = sorted((skipped & found) | below)
+    elapsed = time.perf_counter() - started
+    print(f"{'🧪' if args.dry_run else '✅'} 新建 {len(created)}，更新 {len(updated)}，"
+          f"不存在 {len(missing)}，余额不足 {len(negative)}；用时 {elapsed:.2f}s"
+          f"（{len(items) / max(elapsed, 1e-6):.0f} 条/s）")
+    if missing:
+        print(f"   不存在的手机号（加 --create-missing 新建）: {', '.join(missing[:10])}"
+              f"{' ...' if len(missing) > 10 else ''}")
+    if negative:
+        print(f"   调整后会小于 0、未写入: {', '.join(negative[:10])}{' ...' if len(negative) > 10 else ''}")
+    return 0
+
+
+def iter_users(conn, batch):
+    """
+    按主键 keyset 分页读全部用户（不用 OFFSET，越往后越慢的问题也没有）。
+    所有分页在同一个只读 REPEATABLE READ 事务里读，导出的是开始时刻的一致快照，
+    导出期间的充值/注册不会让某个用户出现两次或前后不一致
+    """
+    last_id = ""
+    columns = ", ".join(f'"{c}"' for c in EXPORT_COLUMNS)
+    conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+    try:
+        while True:
+            with conn.cursor() as cur:
+                cur.execute(f'SELECT {columns} FROM "User" WHERE id > %s ORDER BY id LIMIT %s', (last_id, batch))
+                rows = cur.fetchall()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
+    finally:
+        conn.rollback()
+
+
+def cmd_export(args):
+    started = time.perf_counter()
+    url = _database_url(args)
+    conn = _connect(url)
+    jsonl = args.output.endswith((".jsonl", ".ndjson"))
+    total = 0
+    try:
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            writer = None if jsonl else csv.writer(f)
+            if writer:
+                writer.writerow(EXPORT_COLUMNS)
+            for rows in iter_users(conn, args.batch):
+                for row in rows:
+                    values = [v.isoformat() if hasattr(v, "isoformat") else v for v in row]
+                    if writer:
+                        writer.writerow(values)
+                    else:
+                        f.write(json.dumps(dict(zip(EXPORT_COLUMNS, values)), ensure_ascii=False) + "\n")
+                total += len(rows)
+                print(f"\r   已导出 {total} 个用户", end="", flush=True)
+    finally:
+        conn.close()
+    print(f"\n✅ {args.output}: {total} 个用户，用时 {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+def cmd_sample(args):
+    rng = random.Random(args.seed)
+    with open(args.file, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["phone", "freeUsage", "tokenBalance"])
+        for i in range(args.rows):
+            writer.writerow([f"19{i:09d}", rng.choice((10, 20, 50, 100)), rng.choice(("", 500, 1000))])
+    print(f"✅ 已生成 {args.file}（{args.rows} 行，手机号 19000000000 起）")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量调整用户额度 / 导出全部用户")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_db_args(p):
+        p.add_argument("--database-url", help="数据库地址，默认读取环境变量 DATABASE_URL")
+        p.add_argument("--from-zeabur", action="store_true", help="从 Zeabur 项目的 PostgreSQL 服务获取地址")
+
+    p = sub.add_parser("apply", help="按 CSV / JSONL 批量调整 freeUsage / tokenBalance")
+    p.add_argument("file", help="输入文件（.csv，或 .jsonl 每行一个对象）")
+    p.add_argument("--mode", choices=("add", "set"), default="add", help="没有 mode 列时的方式（默认 add 增减）")
+    p.add_argument("--create-missing", action="store_true", help="手机号不存在时新建用户（以默认额度为基数）")
+    p.add_argument("--chunk", type=int, default=DEFAULT_CHUNK, help=f"每个事务的行数（默认 {DEFAULT_CHUNK}）")
+    p.add_argument("--dry-run", action="store_true", help="执行后回滚，只报告影响行数")
+    p.add_argument("--skip-invalid", action="store_true", help="跳过无效行继续执行")
+    add_db_args(p)
+    p.set_defaults(func=cmd_apply)
+
+    p = sub.add_parser("export", help="按主键分页导出全部用户（单个只读事务，一致快照）")
+    p.add_argument("output", help="输出文件（.csv 或 .jsonl）")
+    p.add_argument("--batch", type=int, default=DEFAULT_EXPORT_BATCH, help=f"每页行数（默认 {DEFAULT_EXPORT_BATCH}）")
+    add_db_args(p)
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("sample", help="生成测试用的充值文件")
+    p.add_argument("file")
+    p.add_argument("--rows", type=int, default=10000)
+    p.add_argument("--seed", type=int, default=1)
+    p.set_defaults(func=cmd_sample)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
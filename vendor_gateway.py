@@ -0,0 +1,740 @@
+#!/usr/bin/env python3
+"""
+供应商网关：连接池 + 对冲请求，压低生图 / 文案调用的长尾延迟
+
+应用把各供应商的 base URL 指向网关（按路径前缀区分供应商）：
+  VOLC_BASE_URL=http://<网关>:8788/volc
+  DASHSCOPE_BASE_URL=http://<网关>:8788/dashscope
+  GOOGLE_BASE_URL=http://<网关>:8788/google
+
+  - 连接池：每个上游保持一组 keep-alive 连接（启动时预热），不再每个请求重新握手 TLS
+  - 对冲：请求用时超过该接口近期 p95（夹在 --hedge-min 与 --hedge-max 之间）仍未返回时，
+    用同一供应商的另一个凭证 profile 再发一份，先成功的返回，落后的一份立即断开连接取消；
+    主请求 5xx / 429 / 网络错误时立即换 profile 重试
+  - 对冲预算：对冲次数不超过请求数的 --hedge-budget（默认 10%），避免上游抖动时流量翻倍
+  - 只对冲同步生成接口（chat/completions、images/generations、multimodal-generation）；
+    流式请求、DashScope 异步任务（X-DashScope-Async）和其它接口原样透传
+  - 指标：GET /__metrics（JSON）与 /metrics（Prometheus 文本），按上游、接口给出延迟直方图与 p50/p95/p99
+  - 计量（--meter）：每次生成调用按响应里的 usage 记 token / 出图张数 / 成本，批量写入 UsageDaily /
+    UsageUserDaily（见 usage_meter.py）；应用用请求头 X-Meter-User / X-Meter-Route 标注用户与接口，
+    X-Meter-Skip 表示调用方自己计量，这三个头不会转发给上游
+
+凭证 profile 与 credential_smoke.py 一致：环境变量 VOLC_API_KEY[_<PROFILE>]、DASHSCOPE_API_KEY[_<PROFILE>]、
+GOOGLE_API_KEY[_<PROFILE>]，以及 --store / --from-db 读取的 API管理中心（API_CREDENTIALS_JSON）。
+应用请求里的 API Key 必须是其中之一，网关才知道可以换哪个 profile 对冲。
+
+用法：
+  python3 vendor_gateway.py
+  python3 vendor_gateway.py --store config_snapshot.json --hedge-budget 0.05
+  python3 vendor_gateway.py --meter        # 计量写入 DATABASE_URL（没有时写 usage_meter.jsonl）
+  python3 vendor_gateway.py --bench        # 离线：长尾桩服务上对比不对冲 / 对冲的 p50/p95/p99
+"""
+
+import argparse
+import http.client
+import json
+import os
+import queue
+import re
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlparse
+
+from credential_smoke import (DEFAULT_BASE_URLS, _store_list_from_file, collect_env_targets,
+                              collect_store_targets, dedupe, percentile)
+from usage_meter import extract_usage_from_body, meter_from_env, request_model
+
+DEFAULT_PORT = 8788
+VENDORS = ("volc", "dashscope", "google")
+# 可对冲的同步生成接口：路径后缀 → 指标里的接口名
+HEDGEABLE = {
+    "/chat/completions": "chat",
+    "/images/generations": "images",
+    "/services/aigc/multimodal-generation/generation": "multimodal",
+}
+# 计量的接口：可对冲的同步接口 + Gemini 原生 generateContent（走透传）
+METERED = dict(HEDGEABLE, **{":generateContent": "generate", ":streamGenerateContent": "generate"})
+METER_HEADERS = {"x-meter-user", "x-meter-route", "x-meter-skip"}
+METER_CAPTURE_LIMIT = 64 * 1024 * 1024
+BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 20000, 30000, 60000, 120000)
+HOP_BY_HOP = {"connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te", "trailers",
+              "transfer-encoding", "upgrade", "host", "content-length", "accept-encoding"}
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+# 携带凭证的请求头（小写比较）；Google 还可能把 Key 放在 ?key= 里
+AUTH_HEADERS = ("authorization", "x-goog-api-key")
+KEY_PARAM_RE = re.compile(r"([?&]key=)[^&]*")
+
+
+def request_secret(headers, path):
+    """从请求头（Bearer / x-goog-api-key）或 ?key= 取出应用使用的 API Key"""
+    for name, value in headers.items():
+        lowered = name.lower()
+        if lowered == "authorization" and value.startswith("Bearer "):
+            return value[7:].strip()
+        if lowered == "x-goog-api-key":
+            return value.strip()
+    match = KEY_PARAM_RE.search(path)
+    return unquote(match.group(0).split("=", 1)[1]) if match else ""
+
+
+def with_secret(headers, path, secret):
+    """
+    换 profile 时改写凭证，返回 (headers, path)。先删掉所有大小写形式的鉴权头再按原来的方式写回一份：
+    Node/undici 发的是小写 authorization，直接加 Authorization 会让上游收到两个 Key
+    """
+    names = {name.lower() for name in headers}
+    out = {k: v for k, v in headers.items() if k.lower() not in AUTH_HEADERS}
+    if "authorization" in names or not ("x-goog-api-key" in names or KEY_PARAM_RE.search(path)):
+        out["Authorization"] = f"Bearer {secret}"
+    if "x-goog-api-key" in names:
+        out["x-goog-api-key"] = secret
+    path = KEY_PARAM_RE.sub(lambda m: m.group(1) + quote(secret, safe=""), path)
+    return out, path
+
+
+class Profile:
+    def __init__(self, name, secret, base_url):
+        self.name = name
+        self.secret = secret
+        self.base_url = base_url.rstrip("/")
+
+
+class ConnectionPool:
+    """单个上游的 keep-alive 连接池：空闲连接后进先出复用，超出上限的直接关闭"""
+
+    def __init__(self, base_url, size=8, timeout=180):
+        parsed = urlparse(base_url)
+        self.https = parsed.scheme == "https"
+        self.host = parsed.hostname
+        self.port = parsed.port or (443 if self.https else 80)
+        self.base_path = parsed.path.rstrip("/")
+        self.size = size
+        self.timeout = timeout
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def _new(self):
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        conn = cls(self.host, self.port, timeout=self.timeout)
+        with self.lock:
+            self.created += 1
+        return conn
+
+    def acquire(self):
+        """返回 (连接, 是否复用)"""
+        try:
+            conn = self.idle.get_nowait()
+            with self.lock:
+                self.reused += 1
+            return conn, True
+        except queue.Empty:
+            return self._new(), False
+
+    def release(self, conn, reusable):
+        if reusable and self.idle.qsize() < self.size:
+            self.idle.put(conn)
+        else:
+            conn.close()
+
+    def warm(self, count):
+        """预先建立连接（含 TLS 握手），失败不影响启动"""
+        opened = 0
+        for _ in range(min(count, self.size)):
+            conn = self._new()
+            try:
+                conn.connect()
+            except OSError:
+                conn.close()
+                break
+            self.idle.put(conn)
+            opened += 1
+        return opened
+
+
+class Attempt:
+    """一次上游调用；cancel() 直接断开 socket，让阻塞中的读取立刻失败"""
+
+    def __init__(self, pool, profile, method, path, headers, body, results, hedge=False):
+        self.pool = pool
+        self.profile = profile
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+        self.results = results
+        self.hedge = hedge
+        self.conn = None
+        self.cancelled = False
+        self.result = None
+        self.error = None
+        self.started = time.perf_counter()
+        self.elapsed = None
+
+    @property
+    def ok(self):
+        return self.result is not None and self.result[0] not in RETRYABLE_STATUS
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def run(self):
+        for retry in range(2):
+            conn, reused = self.pool.acquire()
+            self.conn = conn
+            if self.cancelled:
+                conn.close()
+                break
+            try:
+                conn.request(self.method, self.pool.base_path + self.path, body=self.body, headers=self.headers)
+                resp = conn.getresponse()
+                data = resp.read()
+                self.result = (resp.status, resp.getheaders(), data)
+                self.pool.release(conn, not resp.will_close and not self.cancelled)
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError) as e:
+                conn.close()
+                # 复用的空闲连接可能已被上游关闭，换新连接重试一次
+                if reused and retry == 0 and not self.cancelled:
+                    continue
+                self.error = e
+                break
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                self.error = e
+                break
+        self.elapsed = time.perf_counter() - self.started
+        self.results.put(self)
+
+    def cancel(self):
+        self.cancelled = True
+        conn = self.conn
+        sock = conn.sock if conn is not None else None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class LatencyStats:
+    """固定桶直方图（全量）+ 最近样本窗口（算 p95 对冲阈值）"""
+
+    def __init__(self, window=500):
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, ms):
+        idx = next((i for i, le in enumerate(BUCKETS_MS) if ms <= le), len(BUCKETS_MS))
+        self.buckets[idx] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.recent.append(ms)
+
+    def pct(self, p):
+        return percentile(list(self.recent), p)
+
+    def snapshot(self):
+        cumulative, acc = {}, 0
+        for le, n in zip([str(b) for b in BUCKETS_MS] + ["+Inf"], self.buckets):
+            acc += n
+            cumulative[le] = acc
+        return {"count": self.count, "sum_ms": round(self.total_ms, 1), "p50": self.pct(50), "p95": self.pct(95),
+                "p99": self.pct(99), "buckets_ms": cumulative}
+
+
+class Upstream:
+    """一个供应商：凭证 profile、各 base URL 的连接池、延迟统计与对冲计数"""
+
+    def __init__(self, vendor, base_url, profiles, pool_size, timeout):
+        self.vendor = vendor
+        self.base_url = base_url.rstrip("/")
+        self.profiles = profiles
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.pools = {}
+        self.lock = threading.Lock()
+        self.latency = {}            # 接口 → 端到端延迟（网关视角）
+        self.profile_latency = {}    # profile → 单次上游调用延迟
+        self.counters = {"requests": 0, "hedged": 0, "hedge_wins": 0, "failover": 0, "cancelled": 0, "errors": 0}
+
+    def pool_for(self, base_url=None):
+        base = (base_url or self.base_url).rstrip("/")
+        with self.lock:
+            pool = self.pools.get(base)
+            if pool is None:
+                pool = self.pools[base] = ConnectionPool(base, self.pool_size, self.timeout)
+            return pool
+
+    def profile_by_secret(self, secret):
+        return next((p for p in self.profiles if p.secret == secret), None)
+
+    def alternate(self, exclude):
+        """延迟中位数最低的其它 profile；没有样本的优先（先探一次）"""
+        others = [p for p in self.profiles if p.secret not in exclude]
+        if not others:
+            return None
+        with self.lock:
+            def score(p):
+                stats = self.profile_latency.get(p.name)
+                return stats.pct(50) if stats and stats.recent else -1
+            return min(others, key=score)
+
+    def hedge_delay(self, endpoint, default, lo, hi):
+        with self.lock:
+            stats = self.latency.get(endpoint)
+            if stats is None or len(stats.recent) < 20:
+                return default
+            return min(hi, max(lo, stats.pct(95) / 1000))
+
+    def may_hedge(self, budget):
+        with self.lock:
+            return self.counters["hedged"] < budget * max(1, self.counters["requests"])
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    def observe(self, endpoint, seconds, attempts):
+        with self.lock:
+            self.latency.setdefault(endpoint, LatencyStats()).observe(seconds * 1000)
+            for a in attempts:
+                if a.elapsed is not None and not a.cancelled and a.result is not None:
+                    self.profile_latency.setdefault(a.profile.name, LatencyStats(100)).observe(a.elapsed * 1000)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "base_url": self.base_url,
+                "profiles": [p.name for p in self.profiles],
+                "counters": dict(self.counters),
+                "pools": {base: {"created": pool.created, "reused": pool.reused, "idle": pool.idle.qsize()}
+                          for base, pool in self.pools.items()},
+                "endpoints": {name: stats.snapshot() for name, stats in self.latency.items()},
+                "profile_p50_ms": {name: stats.pct(50) for name, stats in self.profile_latency.items()},
+            }
+
+
+class Gateway:
+    def __init__(self, upstreams, hedge=True, hedge_default=10.0, hedge_min=0.2, hedge_max=60.0,
+                 hedge_budget=0.1, timeout=180, meter=None):
+        self.upstreams = upstreams
+        self.meter = meter
+        self.hedge = hedge
+        self.hedge_default = hedge_default
+        self.hedge_min = hedge_min
+        self.hedge_max = hedge_max
+        self.hedge_budget = hedge_budget
+        self.timeout = timeout
+
+    def split(self, path):
+        """/volc/chat/completions → (Upstream, "/chat/completions")"""
+        vendor, _, rest = path.lstrip("/").partition("/")
+        upstream = self.upstreams.get(vendor)
+        return upstream, "/" + rest if upstream else None
+
+    def execute(self, upstream, endpoint, method, path, headers, body, secret):
+        """发主请求，必要时对冲 / 换 profile 重试；返回 (status, headers, body, 响应来源 Attempt, 被取消的请求数)"""
+        results = queue.Queue()
+        primary_profile = upstream.profile_by_secret(secret) or Profile("request", secret, upstream.base_url)
+        started = time.perf_counter()
+        attempts = [Attempt(upstream.pool_for(primary_profile.base_url), primary_profile, method, path,
+                            headers, body, results).start()]
+        upstream.count("requests")
+
+        def launch(reason):
+            alt = upstream.alternate({a.profile.secret for a in attempts})
+            if alt is None:
+                return False
+            upstream.count(reason)
+            alt_headers, alt_path = with_secret(headers, path, alt.secret)
+            attempts.append(Attempt(upstream.pool_for(alt.base_url), alt, method, alt_path, alt_headers, body,
+                                    results, hedge=True).start())
+            return True
+
+        known = upstream.profile_by_secret(secret) is not None
+        timer_armed = self.hedge and known
+        delay = upstream.hedge_delay(endpoint, self.hedge_default, self.hedge_min, self.hedge_max)
+        finished, winner = [], None
+        deadline = started + self.timeout
+        while winner is None:
+            now = time.perf_counter()
+            wait = deadline - now
+            if timer_armed:
+                wait = min(wait, started + delay - now)
+            try:
+                a = results.get(timeout=max(0.0, wait))
+            except queue.Empty:
+                if time.perf_counter() >= deadline:
+                    winner = finished[-1] if finished else None
+                    break
+                # 主请求超过 p95 仍未返回：在预算内对冲一份
+                timer_armed = False
+                if upstream.may_hedge(self.hedge_budget):
+                    launch("hedged")
+                continue
+            finished.append(a)
+            if a.ok:
+                winner = a
+            elif len(finished) == len(attempts):
+                # 全部失败且还没换过 profile：立即换一个重试
+                if len(attempts) == 1 and known and launch("failover"):
+                    timer_armed = False
+                    continue
+                winner = a
+
+        cancelled = 0
+        for a in attempts:
+            if a is not winner and a not in finished:
+                a.cancel()
+                cancelled += 1
+                upstream.count("cancelled")
+        if winner is not None and winner.hedge and winner.ok:
+            upstream.count("hedge_wins")
+        upstream.observe(endpoint, time.perf_counter() - started, attempts)
+        if winner is None or winner.result is None:
+            upstream.count("errors")
+            err = winner.error if winner is not None else "timeout"
+            status = 502 if winner is not None else 504
+            payload = json.dumps({"error": {"message": f"gateway: upstream error {err}"}}).encode("utf-8")
+            return status, [("Content-Type", "application/json")], payload, winner, cancelled
+        status, resp_headers, payload = winner.result
+        return status, resp_headers, payload, winner, cancelled
+
+    def record_usage(self, vendor, meta, path, body, status, payload, profile, seconds, cancelled=0):
+        """按响应 usage 记账；被取消的对冲请求上游多半已经计费，按同样用量计入（宁多勿少）"""
+        if self.meter is None or meta["skip"]:
+            return
+        match = re.search(r"/models/([^/:?]+)", path)
+        model = request_model(body) or (match.group(1) if match else "")
+        ok = 200 <= status < 300
+        tin, tout, images = extract_usage_from_body(vendor, payload) if ok else (0, 0, 0)
+        for i in range(1 + cancelled):
+            self.meter.record(vendor, model, profile=profile, route=meta["route"], user=meta["user"], ok=ok,
+                              latency_ms=seconds * 1000 if i == 0 else 0,
+                              input_tokens=tin, output_tokens=tout, images=images)
+
+    def snapshot(self):
+        snap = {vendor: up.snapshot() for vendor, up in self.upstreams.items()}
+        if self.meter is not None:
+            snap["meter"] = self.meter.snapshot()
+        return snap
+
+    def prometheus(self):
+        lines = ["# TYPE xhs_gateway_request_duration_seconds histogram"]
+        for vendor, up in self.upstreams.items():
+            snap = up.snapshot()
+            for endpoint, stats in snap["endpoints"].items():
+                labels = f'vendor="{vendor}",endpoint="{endpoint}"'
+                for le, n in stats["buckets_ms"].items():
+                    le_s = le if le == "+Inf" else f"{int(le) / 1000:g}"
+                    lines.append(f'xhs_gateway_request_duration_seconds_bucket{{{labels},le="{le_s}"}} {n}')
+                lines.append(f"xhs_gateway_request_duration_seconds_sum{{{labels}}} {stats['sum_ms'] / 1000:.3f}")
+                lines.append(f"xhs_gateway_request_duration_seconds_count{{{labels}}} {stats['count']}")
+            for name, value in snap["counters"].items():
+                lines.append(f'xhs_gateway_{name}_total{{vendor="{vendor}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+class GatewayHandler(BaseHTTPRequestHandler):
+    server_version = "xhs-gateway/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def gateway(self):
+        return self.server.gateway
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            sys.stderr.write("[gateway] " + (fmt % args) + "\n")
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _reply(self, status, headers, body, extra=None):
+        self.send_response(status)
+        for name, value in headers:
+            if name.lower() not in HOP_BY_HOP and name.lower() != "content-encoding":
+                self.send_header(name, value)
+        for name, value in (extra or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _forward_headers(self):
+        return {k: v for k, v in self.headers.items() if k.lower() not in HOP_BY_HOP and k.lower() not in METER_HEADERS}
+
+    def _meter_meta(self, endpoint):
+        return {
+            "route": self.headers.get("X-Meter-Route") or endpoint,
+            "user": self.headers.get("X-Meter-User") or None,
+            "skip": bool(self.headers.get("X-Meter-Skip")),
+        }
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/__metrics":
+            body = json.dumps(self.gateway.snapshot(), ensure_ascii=False).encode("utf-8")
+            self._reply(200, [("Content-Type", "application/json; charset=utf-8")], body)
+            return
+        if path == "/metrics":
+            self._reply(200, [("Content-Type", "text/plain; version=0.0.4")], self.gateway.prometheus().encode("utf-8"))
+            return
+        self._proxy("GET", None)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self._proxy("POST", self.rfile.read(length) if length else b"")
+
+    def _proxy(self, method, body):
+        upstream, path = self.gateway.split(self.path)
+        if upstream is None:
+            self._reply(404, [("Content-Type", "application/json")], b'{"error":{"message":"gateway: unknown vendor"}}')
+            return
+        endpoint = next((name for suffix, name in HEDGEABLE.items() if path.split("?")[0].endswith(suffix)), None)
+        metered = next((name for suffix, name in METERED.items() if path.split("?")[0].endswith(suffix)), None)
+        streaming = False
+        if body:
+            try:
+                streaming = bool(json.loads(body.decode("utf-8")).get("stream"))
+            except (ValueError, UnicodeDecodeError, AttributeError):
+                pass
+        if method != "POST" or endpoint is None or streaming or self.headers.get("X-DashScope-Async"):
+            self._stream_through(upstream, method, path, body, metered if method == "POST" else None)
+            return
+
+        secret = request_secret(self.headers, path)
+        started = time.perf_counter()
+        status, headers, payload, winner, cancelled = self.gateway.execute(
+            upstream, endpoint, method, path, self._forward_headers(), body, secret)
+        extra = {}
+        if winner is not None:
+            extra["X-Gateway-Profile"] = winner.profile.name
+            extra["X-Gateway-Hedged"] = "1" if winner.hedge else "0"
+        self.gateway.record_usage(upstream.vendor, self._meter_meta(endpoint), path, body, status, payload,
+                                  winner.profile.name if winner is not None else "request",
+                                  time.perf_counter() - started, cancelled)
+        self._reply(status, headers, payload, extra)
+
+    def _stream_through(self, upstream, method, path, body, metered=None):
+        """不对冲的请求：走连接池原样转发，响应逐块写回；需要计量的接口顺带留一份响应体"""
+        pool = upstream.pool_for()
+        capture = [] if metered and self.gateway.meter is not None else None
+        started = time.perf_counter()
+        conn, _ = pool.acquire()
+        try:
+            conn.request(method, pool.base_path + path, body=body, headers=self._forward_headers())
+            resp = conn.getresponse()
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            payload = json.dumps({"error": {"message": f"gateway: upstream error {e}"}}).encode("utf-8")
+            self._reply(502, [("Content-Type", "application/json")], payload)
+            return
+        self.send_response(resp.status)
+        for k, v in resp.getheaders():
+            if k.lower() not in HOP_BY_HOP and k.lower() != "content-length":
+                self.send_header(k, v)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            while True:
+                chunk = resp.read1(65536)
+                if not chunk:
+                    break
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                self.wfile.flush()
+                if capture is not None:
+                    capture.append(chunk)
+                    if sum(map(len, capture)) > METER_CAPTURE_LIMIT:
+                        capture = None
+            self.wfile.write(b"0\r\n\r\n")
+            resp.read()  # read1 读到 Content-Length 末尾不会标记结束，补一次 read() 才能放回连接池
+        finally:
+            pool.release(conn, resp.isclosed() and not resp.will_close)
+        if metered and self.gateway.meter is not None:
+            profile = upstream.profile_by_secret(request_secret(self.headers, path))
+            self.gateway.record_usage(upstream.vendor, self._meter_meta(metered), path, body, resp.status,
+                                      b"".join(capture or []), profile.name if profile else "request",
+                                      time.perf_counter() - started)
+
+
+def build_upstreams(targets, base_overrides, pool_size, timeout):
+    """按供应商归并凭证 profile（同一个 Key 只保留一份）"""
+    upstreams = {}
+    for vendor in VENDORS:
+        base = base_overrides.get(vendor) or DEFAULT_BASE_URLS[vendor]
+        profiles, seen = [], set()
+        for t in targets:
+            if t.vendor != vendor or not isinstance(t.secret, str) or t.secret in seen:
+                continue
+            seen.add(t.secret)
+            profiles.append(Profile(t.profile, t.secret, base_overrides.get(vendor) or t.base_url or base))
+        upstreams[vendor] = Upstream(vendor, base, profiles, pool_size, timeout)
+    return upstreams
+
+
+def start_gateway(gateway, port=0, host="127.0.0.1", verbose=False):
+    """后台线程启动网关，返回 (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), GatewayHandler)
+    server.daemon_threads = True
+    server.gateway = gateway
+    server.verbose = verbose
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def bench(args):
+    """长尾桩服务（默认 2% 请求慢 10 倍）上分别跑不对冲 / 对冲，对比端到端分位数与上游调用量"""
+    from concurrent.futures import ThreadPoolExecutor
+    from credential_smoke import Target
+    from stub_vendors import StubConfig, start_stub_server, stub_base_urls
+
+    targets = [Target("image", "dashscope", "default", "sk-bench-a"), Target("image", "dashscope", "b", "sk-bench-b")]
+    body = json.dumps({"model": "qwen-image-plus", "input": {"messages": [
+        {"role": "user", "content": [{"text": "保温杯，桌面，自然光"}]}]}}).encode("utf-8")
+
+    def run(hedge):
+        stub, stub_url = start_stub_server(config=StubConfig(
+            latency={"dashscope": args.base_latency}, slow_rate=args.slow_rate, slow_factor=args.slow_factor, seed=7))
+        gw = Gateway(build_upstreams(targets, stub_base_urls(stub_url), 16, 60), hedge=hedge,
+                     hedge_default=args.base_latency * 3, hedge_budget=args.hedge_budget)
+        server, base_url = start_gateway(gw)
+
+        def one(_):
+            conn = http.client.HTTPConnection(server.server_address[0], server.server_address[1], timeout=60)
+            started = time.perf_counter()
+            conn.request("POST", "/dashscope/services/aigc/multimodal-generation/generation", body=body,
+                         headers={"Content-Type": "application/json", "Authorization": "Bearer sk-bench-a"})
+            conn.getresponse().read()
+            conn.close()
+            return (time.perf_counter() - started) * 1000
+
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            samples = list(pool.map(one, range(args.requests)))
+        calls = stub.stub_config.counters.get("dashscope", 0)
+        counters = gw.upstreams["dashscope"].snapshot()["counters"]
+        server.shutdown()
+        stub.shutdown()
+        return samples, calls, counters
+
+    print(f"🧪 压测：{args.requests} 个请求，并发 {args.concurrency}，上游 ~{args.base_latency}s，"
+          f"{args.slow_rate:.0%} 的请求慢 {args.slow_factor:g} 倍\n")
+    for label, hedge in (("不对冲", False), ("对冲  ", True)):
+        samples, calls, counters = run(hedge)
+        print(f"   {label} p50 {percentile(samples, 50):7.0f}ms  p95 {percentile(samples, 95):7.0f}ms  "
+              f"p99 {percentile(samples, 99):7.0f}ms  上游完成 {calls} 次  "
+              f"对冲 {counters['hedged']} / 胜出 {counters['hedge_wins']} / 取消 {counters['cancelled']}")
+    return 0
+
+
+def _parse_pairs(items, label):
+    out = {}
+    for item in items or []:
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise SystemExit(f"❌ {label} 格式应为 vendor=url: {item}")
+        out[name] = value
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="供应商网关：连接池 + 对冲请求")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", DEFAULT_PORT)))
+    parser.add_argument("--store", help="API_CREDENTIALS_JSON 来源文件（config_snapshot.json 或 JSON 数组）")
+    parser.add_argument("--from-db", action="store_true", help="直接从 DATABASE_URL 读取 API_CREDENTIALS_JSON")
+    parser.add_argument("--upstream", action="append", metavar="VENDOR=URL", help="覆盖某个供应商的上游 base URL")
+    parser.add_argument("--stub", action="store_true", help="把所有供应商指向本地桩服务（离线联调）")
+    parser.add_argument("--pool-size", type=int, default=16, help="每个上游保留的空闲连接数（默认 16）")
+    parser.add_argument("--warm", type=int, default=4, help="启动时每个上游预热的连接数（默认 4）")
+    parser.add_argument("--no-hedge", action="store_true", help="关闭对冲，只保留连接池与失败换 profile")
+    parser.add_argument("--hedge-default", type=float, default=10.0, help="样本不足 20 个时的对冲等待秒数（默认 10）")
+    parser.add_argument("--hedge-min", type=float, default=0.2, help="对冲等待下限秒数")
+    parser.add_argument("--hedge-max", type=float, default=60.0, help="对冲等待上限秒数")
+    parser.add_argument("--hedge-budget", type=float, default=float(os.getenv("GATEWAY_HEDGE_BUDGET", "0.1")),
+                        help="对冲次数占请求数的上限（默认 0.1）")
+    parser.add_argument("--timeout", type=int, default=180, help="单个请求总超时秒数（默认 180）")
+    parser.add_argument("--meter", action="store_true", help="计量每次生成调用的 token / 图片 / 成本（见 usage_meter.py）")
+    parser.add_argument("--meter-log", help="计量写入该 JSONL 文件而不是 DATABASE_URL")
+    parser.add_argument("--meter-flush", type=float, default=10.0, help="计量批量写入间隔秒数（默认 10）")
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--bench", action="store_true", help="离线压测（长尾桩服务）")
+    parser.add_argument("--requests", type=int, default=300, help="--bench 请求数")
+    parser.add_argument("--concurrency", type=int, default=8, help="--bench 并发")
+    parser.add_argument("--base-latency", type=float, default=0.3, help="--bench 上游基础延迟秒数")
+    parser.add_argument("--slow-rate", type=float, default=0.02, help="--bench 慢请求比例")
+    parser.add_argument("--slow-factor", type=float, default=10.0, help="--bench 慢请求倍数")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        return bench(args)
+
+    targets = collect_env_targets()
+    try:
+        if args.store:
+            targets += collect_store_targets(_store_list_from_file(args.store))
+        if args.from_db:
+            from config_snapshot import fetch_live_config
+            url = os.getenv("DATABASE_URL")
+            if not url:
+                print("❌ --from-db 需要环境变量 DATABASE_URL")
+                return 1
+            raw = fetch_live_config(url).get("API_CREDENTIALS_JSON")
+            targets += collect_store_targets(json.loads(raw) if raw else [])
+    except (OSError, ValueError) as e:
+        print(f"❌ 读取凭证失败: {e}")
+        return 1
+    targets = dedupe(targets)
+
+    base_overrides = _parse_pairs(args.upstream, "--upstream")
+    if args.stub:
+        from stub_vendors import start_stub_server, stub_base_urls
+        _, stub_url = start_stub_server()
+        base_overrides = {**stub_base_urls(stub_url), **base_overrides}
+        print(f"🧪 使用本地桩服务: {stub_url}")
+
+    meter = None
+    if args.meter or args.meter_log:
+        meter, where = meter_from_env(args.meter_log, args.meter_flush)
+        print(f"🧾 调用计量 → {where}")
+
+    upstreams = build_upstreams(targets, base_overrides, args.pool_size, args.timeout)
+    gateway = Gateway(upstreams, hedge=not args.no_hedge, hedge_default=args.hedge_default, hedge_min=args.hedge_min,
+                      hedge_max=args.hedge_max, hedge_budget=args.hedge_budget, timeout=args.timeout, meter=meter)
+
+    server = ThreadingHTTPServer((args.host, args.port), GatewayHandler)
+    server.daemon_threads = True
+    server.gateway = gateway
+    server.verbose = args.verbose
+    print(f"🚦 供应商网关已启动: http://{args.host}:{server.server_address[1]}")
+    for vendor, up in upstreams.items():
+        warmed = up.pool_for().warm(args.warm) if up.profiles else 0
+        names = ", ".join(p.name for p in up.profiles) or "无（只透传）"
+        print(f"   - /{vendor} → {up.base_url}  profile: {names}  预热连接 {warmed}")
+        if len(up.profiles) < 2 and not args.no_hedge:
+            print(f"     ⚠️  {vendor} 只有 {len(up.profiles)} 个 profile，无法对冲")
+    print(f"   指标: http://{args.host}:{server.server_address[1]}/__metrics")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 已停止")
+    finally:
+        if meter is not None:
+            meter.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+-- CreateTable
+CREATE TABLE "GenerationJob" (
+    "id" TEXT NOT NULL,
+    "generationId" TEXT NOT NULL,
+    "status" TEXT NOT NULL DEFAULT 'queued',
+    "vendor" TEXT NOT NULL DEFAULT 'dashscope',
+    "model" TEXT NOT NULL,
+    "credProfile" TEXT NOT NULL DEFAULT 'default',
+    "refImage" TEXT NOT NULL,
+    "renders" TEXT NOT NULL,
+    "results" TEXT NOT NULL DEFAULT '[]',
+    "total" INTEGER NOT NULL,
+    "done" INTEGER NOT NULL DEFAULT 0,
+    "failed" INTEGER NOT NULL DEFAULT 0,
+    "attempts" INTEGER NOT NULL DEFAULT 0,
+    "error" TEXT,
+    "lockedBy" TEXT,
+    "lockedAt" TIMESTAMP(3),
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "updatedAt" TIMESTAMP(3) NOT NULL,
+
+    CONSTRAINT "GenerationJob_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateIndex
+CREATE INDEX "GenerationJob_status_createdAt_idx" ON "GenerationJob"("status", "createdAt");
+
+-- CreateIndex
+CREATE INDEX "GenerationJob_generationId_idx" ON "GenerationJob"("generationId");
+
+-- AddForeignKey
+ALTER TABLE "GenerationJob" ADD CONSTRAINT "GenerationJob_generationId_fkey" FOREIGN KEY ("generationId") REFERENCES "Generation"("id") ON DELETE CASCADE ON UPDATE CASCADE;
@@ -0,0 +1,32 @@
+-- CreateTable
+CREATE TABLE "UsageDaily" (
+    "day" DATE NOT NULL,
+    "vendor" TEXT NOT NULL,
+    "profile" TEXT NOT NULL,
+    "model" TEXT NOT NULL,
+    "route" TEXT NOT NULL,
+    "calls" INTEGER NOT NULL DEFAULT 0,
+    "errors" INTEGER NOT NULL DEFAULT 0,
+    "inputTokens" BIGINT NOT NULL DEFAULT 0,
+    "outputTokens" BIGINT NOT NULL DEFAULT 0,
+    "images" INTEGER NOT NULL DEFAULT 0,
+    "latencyMs" BIGINT NOT NULL DEFAULT 0,
+    "cost" DECIMAL(14,6) NOT NULL DEFAULT 0,
+
+    CONSTRAINT "UsageDaily_pkey" PRIMARY KEY ("day","vendor","profile","model","route")
+);
+
+-- CreateTable
+CREATE TABLE "UsageUserDaily" (
+    "day" DATE NOT NULL,
+    "userId" TEXT NOT NULL,
+    "calls" INTEGER NOT NULL DEFAULT 0,
+    "tokens" BIGINT NOT NULL DEFAULT 0,
+    "images" INTEGER NOT NULL DEFAULT 0,
+    "cost" DECIMAL(14,6) NOT NULL DEFAULT 0,
+
+    CONSTRAINT "UsageUserDaily_pkey" PRIMARY KEY ("day","userId")
+);
+
+-- CreateIndex
+CREATE INDEX "UsageUserDaily_userId_idx" ON "UsageUserDaily"("userId");
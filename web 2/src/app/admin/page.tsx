@@ -13,6 +13,9 @@ interface StatsData {
   totalConsumed: number;
   todayRevenue: number;
   apiCost: number;
+  apiCostTotal: number;
+  apiCallsToday: number;
+  apiCostByVendor: Record<string, number>;
   newUsersChange: number;
   generationsChange: number;
 }
@@ -176,7 +179,7 @@ export default function AdminDashboard() {
           </CardContent>
         </Card>
 
-        {/* API消耗成本（保留，后续计算） */}
+        {/* API消耗成本（usage_meter.py 按调用计量） */}
         <Card>
           <CardHeader className="flex flex-row items-center justify-between space-y-0 pb-2">
             <CardTitle className="text-sm font-medium">API 消耗成本</CardTitle>
@@ -185,7 +188,7 @@ export default function AdminDashboard() {
           <CardContent>
             <div className="text-2xl font-bold">¥ {stats.apiCost.toFixed(2)}</div>
             <p className="text-xs text-muted-foreground">
-              待接入计算
+              今日 {stats.apiCallsToday} 次调用 · 累计 ¥ {stats.apiCostTotal.toFixed(2)}
             </p>
           </CardContent>
         </Card>
@@ -1,10 +1,6 @@
 import { NextResponse } from "next/server";
-import { PrismaClient } from "@prisma/client";
-
-// 创建全局唯一的 Prisma 实例，防止开发环境下连接数过多
-const globalForPrisma = global as unknown as { prisma: PrismaClient };
-const prisma = globalForPrisma.prisma || new PrismaClient();
-if (process.env.NODE_ENV !== "production") globalForPrisma.prisma = prisma;
+import { prisma } from "@/lib/prisma";
+import { invalidateSystemConfig } from "@/lib/system-config";
 
 export async function GET() {
   try {
@@ -35,6 +31,7 @@ export async function POST(req: Request) {
       update: { value: value, description: description },
       create: { key: key, value: value, description: description },
     });
+    invalidateSystemConfig();
 
     return NextResponse.json(config);
   } catch (error) {
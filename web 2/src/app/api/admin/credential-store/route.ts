@@ -1,10 +1,7 @@
 import { NextResponse } from "next/server";
-import { PrismaClient } from "@prisma/client";
+import { prisma } from "@/lib/prisma";
 import { decryptSecret, encryptSecret } from "@/lib/crypto";
-
-const globalForPrisma = global as unknown as { prisma: PrismaClient };
-const prisma = globalForPrisma.prisma || new PrismaClient();
-if (process.env.NODE_ENV !== "production") globalForPrisma.prisma = prisma;
+import { invalidateSystemConfig } from "@/lib/system-config";
 
 const KEY = "API_CREDENTIALS_JSON";
 
@@ -52,6 +49,7 @@ async function setList(list: StoredCredential[]) {
     update: { value: JSON.stringify(list), description: "API管理中心：凭证 profiles（加密存储）" },
     create: { key: KEY, value: JSON.stringify(list), description: "API管理中心：凭证 profiles（加密存储）" },
   });
+  invalidateSystemConfig();
 }
 
 function mask(s: string) {
@@ -164,4 +162,3 @@ export async function DELETE(req: Request) {
   }
 }
 
-
@@ -1,9 +1,6 @@
 import { NextResponse } from "next/server";
-import { PrismaClient } from "@prisma/client";
-
-const globalForPrisma = global as unknown as { prisma: PrismaClient };
-const prisma = globalForPrisma.prisma || new PrismaClient();
-if (process.env.NODE_ENV !== "production") globalForPrisma.prisma = prisma;
+import { prisma } from "@/lib/prisma";
+import { invalidateSystemConfig } from "@/lib/system-config";
 
 const KEY = "API_PROVIDERS_JSON";
 
@@ -43,6 +40,7 @@ async function setProviders(list: ApiProvider[]) {
     update: { value: JSON.stringify(list), description: "供应商API配置（Provider Registry）" },
     create: { key: KEY, value: JSON.stringify(list), description: "供应商API配置（Provider Registry）" },
   });
+  invalidateSystemConfig();
 }
 
 function uuid() {
@@ -115,4 +113,3 @@ export async function DELETE(req: Request) {
   }
 }
 
-
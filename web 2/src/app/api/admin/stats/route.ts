@@ -1,9 +1,5 @@
 import { NextResponse } from "next/server";
-import { PrismaClient } from "@prisma/client";
-
-const globalForPrisma = global as unknown as { prisma: PrismaClient };
-const prisma = globalForPrisma.prisma || new PrismaClient();
-if (process.env.NODE_ENV !== "production") globalForPrisma.prisma = prisma;
+import { prisma } from "@/lib/prisma";
 
 export async function GET() {
   try {
@@ -45,11 +41,26 @@ export async function GET() {
     // 这里假设每次生成消耗1次，实际可能需要根据业务逻辑调整
     const totalConsumed = totalGenerations;
 
-    // 6. 今日收入（保留，后续计算）
+    // 6. 今日收入（还没有充值订单表，暂为 0）
     const todayRevenue = 0;
 
-    // 7. API消耗成本（保留，后续计算）
-    const apiCost = 0;
+    // 7. API消耗成本：读 usage_meter.py 按天汇总的调用成本（网关 / worker 加 --meter 后才有数据）
+    //    UsageDaily.day 按 METER_TZ（默认 Asia/Shanghai）划分，这里用同一时区取“今天”
+    const meterDay = new Date(
+      new Intl.DateTimeFormat("en-CA", { timeZone: process.env.METER_TZ || "Asia/Shanghai" }).format(new Date()) +
+        "T00:00:00Z"
+    );
+    const [usageToday, usageTotal, usageByVendor] = await Promise.all([
+      prisma.usageDaily.aggregate({ where: { day: meterDay }, _sum: { cost: true, calls: true } }),
+      prisma.usageDaily.aggregate({ _sum: { cost: true } }),
+      prisma.usageDaily.groupBy({ by: ["vendor"], where: { day: meterDay }, _sum: { cost: true } }),
+    ]);
+    const apiCost = Number(usageToday._sum.cost ?? 0);
+    const apiCostTotal = Number(usageTotal._sum.cost ?? 0);
+    const apiCallsToday = usageToday._sum.calls ?? 0;
+    const apiCostByVendor = Object.fromEntries(
+      usageByVendor.map((row) => [row.vendor, Number(row._sum.cost ?? 0)])
+    );
 
     // 8. 昨日新增用户数（用于对比）
     const yesterdayStart = new Date(todayStart);
@@ -84,6 +95,9 @@ export async function GET() {
       totalConsumed,
       todayRevenue,
       apiCost,
+      apiCostTotal,
+      apiCallsToday,
+      apiCostByVendor,
       // 对比数据
       newUsersChange: newUsersToday - newUsersYesterday,
       generationsChange: generationsToday - generationsYesterday,
@@ -1,13 +1,9 @@
 import { NextResponse } from "next/server";
 import { encrypt } from "@/lib/auth";
 import { cookies } from "next/headers";
-import { PrismaClient } from "@prisma/client";
+import { prisma } from "@/lib/prisma";
 import { encryptSecret } from "@/lib/crypto";
-
-// 数据库客户端单例
-const globalForPrisma = global as unknown as { prisma: PrismaClient };
-const prisma = globalForPrisma.prisma || new PrismaClient();
-if (process.env.NODE_ENV !== "production") globalForPrisma.prisma = prisma;
+import { invalidateSystemConfig } from "@/lib/system-config";
 
 export async function POST(req: Request) {
   try {
@@ -133,6 +129,7 @@ async function initializeSystemConfigs() {
       create: { key: KEY_ENGINES, value: JSON.stringify(defaultEngines), description: "自动初始化引擎" }
     });
     
+    invalidateSystemConfig();
     console.log(">>> [Init] API 配置已自动初始化同步完成");
   } catch (err) {
     console.error(">>> [Init] 初始化配置失败:", err);
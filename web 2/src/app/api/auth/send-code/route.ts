@@ -1,14 +1,7 @@
 import { NextResponse } from "next/server";
 import { sendVerificationCode, generateVerificationCode } from "@/lib/aliyun-sms";
-import { prisma } from "@/lib/prisma";
-
-// 内存中存储验证码（生产环境建议使用 Redis）
-const codeCache = new Map<string, { code: string; expiresAt: number }>();
-
-// 验证码有效期：5分钟
-const CODE_EXPIRES_IN = 5 * 60 * 1000;
-
-const DEFAULT_CODE = process.env.DEV_FIXED_CODE || "1234";
+import { kv } from "@/lib/kv";
+import { CODE_EXPIRES_IN, DEFAULT_CODE, RESEND_INTERVAL, codeKey, cooldownKey } from "@/lib/verification-code";
 
 export async function POST(req: Request) {
   try {
@@ -22,12 +15,12 @@ export async function POST(req: Request) {
       return NextResponse.json({ error: "请输入有效手机号（支持11位或13位数字）" }, { status: 400 });
     }
 
-    // 2. 检查发送频率（60秒内只能发送一次）
-    const cached = codeCache.get(phone);
-    if (cached && Date.now() < cached.expiresAt - CODE_EXPIRES_IN + 60 * 1000) {
-      const remainingSeconds = Math.ceil(
-        (cached.expiresAt - CODE_EXPIRES_IN + 60 * 1000 - Date.now()) / 1000
-      );
+    // 2. 检查发送频率（60秒内只能发送一次）：SET NX 占位，多副本同时请求也只有一个能发
+    const resendAt = Date.now() + RESEND_INTERVAL;
+    const acquired = await kv.set(cooldownKey(p), String(resendAt), RESEND_INTERVAL, { nx: true });
+    if (!acquired) {
+      const until = Number(await kv.get(cooldownKey(p))) || resendAt;
+      const remainingSeconds = Math.max(1, Math.ceil((until - Date.now()) / 1000));
       return NextResponse.json(
         { error: `请${remainingSeconds}秒后再试` },
         { status: 429 }
@@ -36,7 +29,6 @@ export async function POST(req: Request) {
 
     // 3. 生成验证码（开发默认用固定码，方便测试）
     const code = DEFAULT_CODE || generateVerificationCode();
-    const expiresAt = Date.now() + CODE_EXPIRES_IN;
 
     // 4. 发送短信（如果配置了短信，会尝试真实发送；否则直接走开发模式）
     const sent = await sendVerificationCode({ phone, code });
@@ -46,24 +38,16 @@ export async function POST(req: Request) {
       if (process.env.NODE_ENV === "development") {
         console.warn("⚠️ 开发环境：短信发送失败，但允许继续（验证码:", code, ")");
         // 仍然保存验证码到缓存
-        codeCache.set(phone, { code, expiresAt });
+        await kv.set(codeKey(p), code, CODE_EXPIRES_IN);
         return NextResponse.json({ success: true, message: `验证码已发送（开发模式，默认 ${code}）` });
       }
+      // 没发出去不占用发送频率，允许立即重试
+      await kv.del(cooldownKey(p));
       return NextResponse.json({ error: "验证码发送失败，请稍后重试" }, { status: 500 });
     }
 
-    // 5. 保存验证码到缓存
-    codeCache.set(phone, { code, expiresAt });
-
-    // 6. 清理过期验证码（定期清理）
-    if (codeCache.size > 1000) {
-      const now = Date.now();
-      for (const [key, value] of codeCache.entries()) {
-        if (now > value.expiresAt) {
-          codeCache.delete(key);
-        }
-      }
-    }
+    // 5. 保存验证码到缓存（过期由存储按 TTL 清理）
+    await kv.set(codeKey(p), code, CODE_EXPIRES_IN);
 
     console.log(`✅ 验证码已发送到 ${phone}（开发环境显示: ${code}）`);
 
@@ -76,30 +60,3 @@ export async function POST(req: Request) {
     );
   }
 }
-
-/**
- * 验证验证码（供登录 API 使用）
- */
-export function verifyCode(phone: string, code: string): boolean {
-  if (code === DEFAULT_CODE) return true;
-  const cached = codeCache.get(phone);
-  if (!cached) {
-    return false;
-  }
-
-  // 检查是否过期
-  if (Date.now() > cached.expiresAt) {
-    codeCache.delete(phone);
-    return false;
-  }
-
-  // 验证码匹配
-  if (cached.code !== code) {
-    return false;
-  }
-
-  // 验证成功后删除验证码（一次性使用）
-  codeCache.delete(phone);
-  return true;
-}
-
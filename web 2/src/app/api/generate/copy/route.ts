@@ -1,17 +1,15 @@
 import { NextResponse } from "next/server";
 import OpenAI from "openai";
-import { PrismaClient } from "@prisma/client";
 import { getVolcApiKey, getGoogleApiKey } from "@/lib/credentials";
 import { resolveApiKeyFromStore } from "@/lib/credential-resolver";
+import { getConfig } from "@/lib/system-config";
+import { llmCacheHeaders } from "@/lib/llm-cache";
+import { meterHeaders } from "@/lib/metering";
 
 const DEFAULT_TEXT_BASE_URL = "https://ark.cn-beijing.volces.com/api/v3";
 const DEFAULT_TEXT_MODEL = "doubao-seed-1-6-lite-251015";
 const DEFAULT_GOOGLE_BASE_URL = process.env.GOOGLE_BASE_URL || "https://gitaigc.com/v1";
 
-const globalForPrisma = global as unknown as { prisma: PrismaClient };
-const prisma = globalForPrisma.prisma || new PrismaClient();
-if (process.env.NODE_ENV !== "production") globalForPrisma.prisma = prisma;
-
 function normalizeModelIdForGoogle(modelId: string) {
   const s = String(modelId || "").trim();
   // 兼容：部分网关/版本不支持 `*-latest`，会直接 404
@@ -19,15 +17,6 @@ function normalizeModelIdForGoogle(modelId: string) {
   return s;
 }
 
-async function getConfig(key: string) {
-  try {
-    const row = await prisma.systemConfig.findUnique({ where: { key } });
-    return row?.value ?? null;
-  } catch {
-    return null;
-  }
-}
-
 type CopyOption = {
   title: string;
   body: string;
@@ -152,9 +141,233 @@ function ensureBodyLayout(body: string): string {
   return normalized;
 }
 
+const VARIANT_LABEL = { 1: "第一篇", 2: "第二篇" } as const;
+const DEFAULT_TAGS = {
+  1: ["好物推荐", "性价比", "实用好物"],
+  2: ["好物分享", "生活好物", "种草"],
+} as const;
+const FALLBACK_TITLE = { 1: "好物推荐", 2: "好物分享" } as const;
+
+// 清理模型常见的"开场白/分隔线/文案一二"等噪声，只留下 JSON 或正文本身
+function cleanRaw(raw: string): string {
+  return raw
+    .replace(/^[^]*?(?:好的[，,]没问题[！!]?[^]*?|根据您的[^]*?|我为您[^]*?|精心创作[^]*?|风格迥异[^]*?|一篇偏向[^]*?|另一篇偏向[^]*?)[，,。！!]*\s*/i, "")
+    .replace(/^[^]*?(?:以下[^]*?|现在[^]*?|我将[^]*?|为您[^]*?)[，,。！!]*\s*/i, "")
+    .replace(/###\s*\*\*文案[一二][：:][^\n]*\*\*/g, "")
+    .replace(/---+/g, "")
+    .replace(/\*\*文案[一二][：:][^\n]*\*\*/g, "")
+    .replace(/^(好的[，,]没问题[。.]?|没问题[，,]|好的[，,]|针对这款[^，,。]*[，,。]|我将[^，,。]*[，,。]|为您[^，,。]*[，,。]|以下[^，,。]*[，,。]|现在[^，,。]*[，,。])/i, "")
+    .replace(/^(文案一[：:]|文案二[：:]|第一篇[：:]|第二篇[：:]|###\s*\*\*文案[一二][：:])/i, "")
+    .replace(/^\s*[\*\*]*\s*/g, "")
+    .trim();
+}
+
+function fromParsed(parsed: any): CopyOption {
+  return {
+    title: parsed.title || parsed.Title || "",
+    body: normalizeBody(parsed.body || parsed.Body || parsed.content || parsed.Content || ""),
+    tags: Array.isArray(parsed.tags) ? parsed.tags :
+          Array.isArray(parsed.Tags) ? parsed.Tags :
+          typeof parsed.tags === "string" ? parsed.tags.split(/[，,、\s]+/).filter(Boolean) :
+          [],
+  };
+}
+
+// 解析单篇文案：JSON → 文本字段 → JSON 代码块正则 → 原文兜底，保证总能返回一篇
+function parseCopy(raw: string, which: 1 | 2): CopyOption {
+  const label = VARIANT_LABEL[which];
+  const cleanedRaw = cleanRaw(raw);
+  console.log(`📝 ${label}原始内容（前500字）:`, raw.substring(0, 500));
+  console.log(`📝 ${label}清理后（前500字）:`, cleanedRaw.substring(0, 500));
+
+  const parsed = extractJson(cleanedRaw);
+  console.log(`📝 ${label}解析结果:`, parsed ? "✅ 成功" : "❌ 失败");
+  if (parsed) console.log("  标题:", parsed.title || parsed.Title || "无");
+
+  let copy: CopyOption | null = null;
+
+  if (parsed && (parsed.title || parsed.Title)) {
+    copy = fromParsed(parsed);
+  } else {
+    // 尝试从文本中提取
+    const titleMatch = cleanedRaw.match(/(?:标题|title)[：:]\s*([^\n]+)/i);
+    const bodyMatch = cleanedRaw.match(/(?:正文|body|content)[：:]\s*([\s\S]+?)(?=(?:标签|tags|tag)|$)/i);
+    const tagsMatch = cleanedRaw.match(/(?:标签|tags|tag)[：:]\s*([\s\S]+?)(?=\n\n|\n`{3}|$)/i);
+
+    if (titleMatch) {
+      copy = {
+        title: titleMatch[1].trim(),
+        body: bodyMatch ? bodyMatch[1].trim() : "",
+        tags: tagsMatch ? tagsMatch[1].trim().split(/[，,、\s#]+/).filter(Boolean) : [],
+      };
+    } else {
+      // 如果还是找不到，尝试从 JSON 代码块字符串中提取（即使解析失败）
+      // 支持多行字符串（body 可能包含换行符）
+      const jsonBlockMatch = cleanedRaw.match(/```(?:json)?\s*(\{[\s\S]*?\})\s*```/);
+      if (jsonBlockMatch) {
+        const jsonStr = jsonBlockMatch[1]; // 提取代码块内的内容（不含 ```）
+        console.log("📝 从 JSON 代码块中提取内容（前200字）:", jsonStr.substring(0, 200));
+
+        // 尝试直接解析（可能包含转义字符）
+        try {
+          const block = JSON.parse(jsonStr);
+          if (block.title || block.Title) {
+            copy = fromParsed(block);
+            console.log(`✅ 从 JSON 代码块中解析成功（${label}）`);
+          }
+        } catch (e) {
+          console.warn("⚠️ JSON 代码块解析失败，尝试正则提取:", e);
+          // 如果解析失败，使用正则表达式提取（支持多行字符串）
+          // 使用非贪婪匹配，但需要处理转义的引号和换行符
+          const titleField = jsonStr.match(/"title"\s*:\s*"((?:[^"\\]|\\.)*)"/);
+          const bodyField = jsonStr.match(/"body"\s*:\s*"((?:[^"\\]|\\.)*)"/);
+          const tagsField = jsonStr.match(/"tags"\s*:\s*\[([^\]]+)\]/);
+
+          if (titleField || bodyField) {
+            copy = {
+              title: titleField ? titleField[1].replace(/\\n/g, "\n").replace(/\\"/g, '"').trim() : "文案标题",
+              body: bodyField ? bodyField[1].replace(/\\n/g, "\n").replace(/\\"/g, '"').trim() : "",
+              tags: tagsField ? tagsField[1].split(",").map(t => t.trim().replace(/"/g, "").replace(/\\/g, "")).filter(Boolean) : [],
+            };
+            console.log(`✅ 从 JSON 代码块字符串中提取了${label}文案（正则）`);
+          }
+        }
+      }
+    }
+  }
+
+  // 验证并修复结构
+  if (copy) {
+    if (!copy.title || !copy.body) {
+      console.warn(`⚠️ ${label}文案结构不完整`);
+    }
+    if (!Array.isArray(copy.tags) || copy.tags.length === 0) {
+      copy.tags = [...DEFAULT_TAGS[which]];
+    }
+    return copy;
+  }
+
+  // 如果解析失败，使用兜底方案（但不要显示"文案生成中..."）
+  console.error(`❌ ${label}文案解析失败，使用兜底方案`);
+  const defaultTags = [...DEFAULT_TAGS[which]];
+  const fallbackTitle = FALLBACK_TITLE[which];
+
+  // 尝试从原始内容中提取标题（至少提取第一行作为标题）
+  const firstLine = raw.split('\n')[0]?.trim() || cleanedRaw.split('\n')[0]?.trim() || "";
+  const titleFromRaw = firstLine.length > 50 ? firstLine.substring(0, 50) + "..." : firstLine;
+  const bodyFromRaw = raw.length > 500 ? raw.substring(0, 500) + "..." : raw;
+
+  // 如果 body 包含 JSON 代码块，尝试提取其中的内容
+  let finalBody = bodyFromRaw;
+  const jsonInBody = bodyFromRaw.match(/```(?:json)?\s*\{[\s\S]*?\}\s*```/);
+  if (jsonInBody) {
+    try {
+      const jsonStr = jsonInBody[1] || jsonInBody[0].replace(/```(?:json)?/g, "").replace(/```/g, "").trim();
+      const block = JSON.parse(jsonStr);
+      if (block.body) {
+        finalBody = block.body;
+      }
+      if (block.title && !titleFromRaw) {
+        copy = {
+          title: block.title,
+          body: block.body || finalBody,
+          tags: Array.isArray(block.tags) ? block.tags : defaultTags,
+        };
+      } else {
+        copy = {
+          title: titleFromRaw || block.title || fallbackTitle,
+          body: block.body || finalBody,
+          tags: Array.isArray(block.tags) ? block.tags : defaultTags,
+        };
+      }
+    } catch {
+      copy = {
+        title: titleFromRaw || fallbackTitle,
+        body: finalBody.replace(/```(?:json)?/g, "").replace(/```/g, "").trim(),
+        tags: defaultTags,
+      };
+    }
+  } else {
+    copy = {
+      title: titleFromRaw || fallbackTitle,
+      body: finalBody,
+      tags: defaultTags,
+    };
+  }
+  console.log(`⚠️ ${label}使用兜底方案，标题:`, copy.title.substring(0, 30));
+  return copy;
+}
+
+// 确保两篇文案不同（如果相同，强制差异化后一篇）
+function differentiate(first: CopyOption, second: CopyOption) {
+  if (first.title === second.title && first.body === second.body) {
+    console.warn("⚠️ 检测到两篇文案完全相同，强制差异化...");
+    second.title = second.title.replace(/效果|好用|推荐/g, "场景").replace(/✨/g, "💕");
+    second.body = "谁懂啊！" + second.body;
+    second.tags = ["好物分享", "生活好物", "种草", "生活分享", "种草清单"];
+  }
+}
+
+// 最终清理：确保所有内容都是纯文本，不包含 JSON 代码块或转义字符
+function cleanCopy(copy: CopyOption): CopyOption {
+  let title = copy.title || "";
+  let body = copy.body || "";
+  let tags = Array.isArray(copy.tags) ? copy.tags : [];
+
+  // 清理 title：移除 JSON 代码块标记、转义字符
+  title = title
+    .replace(/```(?:json)?/g, "")
+    .replace(/```/g, "")
+    .replace(/\\n/g, "\n")
+    .replace(/\\"/g, '"')
+    .replace(/\\'/g, "'")
+    .trim();
+
+  // 清理 body：移除 JSON 代码块标记、正确处理转义字符
+  body = body
+    .replace(/```(?:json)?\s*\{[\s\S]*?\}\s*```/g, "") // 移除完整的 JSON 代码块
+    .replace(/```(?:json)?/g, "")
+    .replace(/```/g, "")
+    .replace(/\\n/g, "\n")  // 转义换行符
+    .replace(/\\"/g, '"')   // 转义引号
+    .replace(/\\'/g, "'")   // 转义单引号
+    .replace(/\\t/g, "\t")  // 转义制表符
+    .trim();
+
+  // 如果 body 还包含 JSON 结构，尝试提取其中的 body 字段
+  if (body.includes('"body"') && body.includes('{')) {
+    const bodyMatch = body.match(/"body"\s*:\s*"((?:[^"\\]|\\.)*)"/);
+    if (bodyMatch) {
+      body = bodyMatch[1]
+        .replace(/\\n/g, "\n")
+        .replace(/\\"/g, '"')
+        .replace(/\\'/g, "'")
+        .trim();
+    }
+  }
+
+  // 确保 tags 是字符串数组
+  tags = tags
+    .map(tag =>
+    String(tag)
+      .replace(/^#/, "")  // 移除开头的 #
+      .trim()
+  )
+    .filter(Boolean)
+    .slice(0, 10);
+
+  return { title, body: ensureBodyLayout(body), tags };
+}
+
+// 流式模式：请求体 stream=true 或 Accept: text/event-stream
+function wantsStream(req: Request, stream: unknown): boolean {
+  if (stream === true || stream === "true" || stream === 1) return true;
+  return (req.headers.get("accept") || "").includes("text/event-stream");
+}
+
 export async function POST(req: Request) {
   try {
-    const { productName, description, imageUrl } = await req.json();
+    const { productName, description, imageUrl, stream } = await req.json();
 
     if (!productName || !description) {
       return NextResponse.json({ error: "productName/description 不能为空" }, { status: 400 });
@@ -302,6 +515,7 @@ export async function POST(req: Request) {
     const client = new OpenAI({
       apiKey,
       baseURL: finalBaseURL,
+      defaultHeaders: { ...(await llmCacheHeaders("copy")), ...(await meterHeaders("copy", finalBaseURL)) },
     });
 
     // 基础 System Prompt（单篇文案）
@@ -322,8 +536,6 @@ export async function POST(req: Request) {
    - ✅ 只输出纯 JSON 对象，格式如下：
    {\"title\":\"标题（≤20字，含Emoji）\",\"body\":\"正文（100-200字，至少2段，段落间空行，适量Emoji，结尾互动）\",\"tags\":[\"标签1\",\"标签2\",...]}`;
 
-    // 生成两篇（并行以提速）
-    console.log("📝 开始生成两篇文案（并行）...");
     const prompt1 = `## 产品信息
 **产品名称**：${productName}
 **产品卖点**：${description}
@@ -368,410 +580,28 @@ ${imageUrl ? `**已提供参考图**：请结合图片理解产品外观、使
 
 只返回 JSON，不要其他任何内容。`;
 
-    const [completion1, completion2] = await Promise.all([
-      client.chat.completions.create({
-        messages: [
-          { role: "system", content: singleCopySystemPrompt },
-          { 
-            role: "user", 
-            content: [
-              { type: "text", text: prompt1 },
-              ...(imageUrl ? [{ type: "image_url", image_url: { url: imageUrl } }] : []),
-            ] as any
-          }
-        ],
-        model,
-        temperature: Number.isFinite(temperature) ? temperature : 0.9,
-        max_tokens: Number.isFinite(maxTokens) ? maxTokens : 4096,
-      }),
-      client.chat.completions.create({
-        messages: [
-          { role: "system", content: singleCopySystemPrompt },
-          { 
-            role: "user", 
-            content: [
-              { type: "text", text: prompt2 },
-              ...(imageUrl ? [{ type: "image_url", image_url: { url: imageUrl } }] : []),
-            ] as any
-          }
-        ],
-        model,
-        temperature: Number.isFinite(temperature) ? temperature : 0.9,
-        max_tokens: Number.isFinite(maxTokens) ? maxTokens : 4096,
-      }),
-    ]);
+    const userContent = (text: string) => [
+      { type: "text", text },
+      ...(imageUrl ? [{ type: "image_url", image_url: { url: imageUrl } }] : []),
+    ] as any;
+
+    const requestFor = (prompt: string) => ({
+      messages: [
+        { role: "system" as const, content: singleCopySystemPrompt },
+        { role: "user" as const, content: userContent(prompt) },
+      ],
+      model,
+      temperature: Number.isFinite(temperature) ? temperature : 0.9,
+      max_tokens: Number.isFinite(maxTokens) ? maxTokens : 4096,
+    });
 
-    const raw1 = completion1.choices[0].message.content || "";
-    const raw2 = completion2.choices[0].message.content || "";
-    console.log("📝 第一篇原始输出:", raw1.substring(0, 300) + "...");
-    console.log("📝 第二篇原始输出:", raw2.substring(0, 300) + "...");
-    
-    // 3. 解析两篇文案
-    // 清理并解析第一篇
-    let cleanedRaw1 = raw1;
-    cleanedRaw1 = cleanedRaw1
-      .replace(/^[^]*?(?:好的[，,]没问题[！!]?[^]*?|根据您的[^]*?|我为您[^]*?|精心创作[^]*?|风格迥异[^]*?|一篇偏向[^]*?|另一篇偏向[^]*?)[，,。！!]*\s*/i, "")
-      .replace(/^[^]*?(?:以下[^]*?|现在[^]*?|我将[^]*?|为您[^]*?)[，,。！!]*\s*/i, "")
-      .replace(/###\s*\*\*文案[一二][：:][^\n]*\*\*/g, "")
-      .replace(/---+/g, "")
-      .replace(/\*\*文案[一二][：:][^\n]*\*\*/g, "")
-      .replace(/^(好的[，,]没问题[。.]?|没问题[，,]|好的[，,]|针对这款[^，,。]*[，,。]|我将[^，,。]*[，,。]|为您[^，,。]*[，,。]|以下[^，,。]*[，,。]|现在[^，,。]*[，,。])/i, "")
-      .replace(/^(文案一[：:]|文案二[：:]|第一篇[：:]|第二篇[：:]|###\s*\*\*文案[一二][：:])/i, "")
-      .replace(/^\s*[\*\*]*\s*/g, "")
-      .trim();
-    
-    // 清理并解析第二篇
-    let cleanedRaw2 = raw2;
-    cleanedRaw2 = cleanedRaw2
-      .replace(/^[^]*?(?:好的[，,]没问题[！!]?[^]*?|根据您的[^]*?|我为您[^]*?|精心创作[^]*?|风格迥异[^]*?|一篇偏向[^]*?|另一篇偏向[^]*?)[，,。！!]*\s*/i, "")
-      .replace(/^[^]*?(?:以下[^]*?|现在[^]*?|我将[^]*?|为您[^]*?)[，,。！!]*\s*/i, "")
-      .replace(/###\s*\*\*文案[一二][：:][^\n]*\*\*/g, "")
-      .replace(/---+/g, "")
-      .replace(/\*\*文案[一二][：:][^\n]*\*\*/g, "")
-      .replace(/^(好的[，,]没问题[。.]?|没问题[，,]|好的[，,]|针对这款[^，,。]*[，,。]|我将[^，,。]*[，,。]|为您[^，,。]*[，,。]|以下[^，,。]*[，,。]|现在[^，,。]*[，,。])/i, "")
-      .replace(/^(文案一[：:]|文案二[：:]|第一篇[：:]|第二篇[：:]|###\s*\*\*文案[一二][：:])/i, "")
-      .replace(/^\s*[\*\*]*\s*/g, "")
-      .trim();
-    
-    // 解析第一篇 JSON
-    console.log("📝 第一篇原始内容（前500字）:", raw1.substring(0, 500));
-    console.log("📝 第一篇清理后（前500字）:", cleanedRaw1.substring(0, 500));
-    
-    let parsed1 = extractJson(cleanedRaw1);
-    console.log("📝 第一篇解析结果:", parsed1 ? "✅ 成功" : "❌ 失败");
-    if (parsed1) console.log("  标题:", parsed1.title || parsed1.Title || "无");
-    
-    let copy1: CopyOption | null = null;
-    
-    if (parsed1 && (parsed1.title || parsed1.Title)) {
-      copy1 = {
-        title: parsed1.title || parsed1.Title || "",
-        body: normalizeBody(parsed1.body || parsed1.Body || parsed1.content || parsed1.Content || ""),
-        tags: Array.isArray(parsed1.tags) ? parsed1.tags : 
-              Array.isArray(parsed1.Tags) ? parsed1.Tags :
-              typeof parsed1.tags === "string" ? parsed1.tags.split(/[，,、\s]+/).filter(Boolean) :
-              [],
-      };
-    } else {
-      // 尝试从文本中提取
-      const titleMatch1 = cleanedRaw1.match(/(?:标题|title)[：:]\s*([^\n]+)/i);
-      const bodyMatch1 = cleanedRaw1.match(/(?:正文|body|content)[：:]\s*([\s\S]+?)(?=(?:标签|tags|tag)|$)/i);
-      const tagsMatch1 = cleanedRaw1.match(/(?:标签|tags|tag)[：:]\s*([\s\S]+?)(?=\n\n|\n`{3}|$)/i);
-      
-      if (titleMatch1) {
-        copy1 = {
-          title: titleMatch1[1].trim(),
-          body: bodyMatch1 ? bodyMatch1[1].trim() : "",
-          tags: tagsMatch1 ? tagsMatch1[1].trim().split(/[，,、\s#]+/).filter(Boolean) : [],
-        };
-      } else {
-        // 如果还是找不到，尝试从 JSON 代码块字符串中提取（即使解析失败）
-        // 支持多行字符串（body 可能包含换行符）
-        const jsonBlockMatch = cleanedRaw1.match(/```(?:json)?\s*(\{[\s\S]*?\})\s*```/);
-        if (jsonBlockMatch) {
-          const jsonStr = jsonBlockMatch[1]; // 提取代码块内的内容（不含 ```）
-          console.log("📝 从 JSON 代码块中提取内容（前200字）:", jsonStr.substring(0, 200));
-          
-          // 尝试直接解析（可能包含转义字符）
-          try {
-            const parsed = JSON.parse(jsonStr);
-            if (parsed.title || parsed.Title) {
-          copy1 = {
-                title: parsed.title || parsed.Title || "",
-            body: normalizeBody(parsed.body || parsed.Body || parsed.content || parsed.Content || ""),
-                tags: Array.isArray(parsed.tags) ? parsed.tags : 
-                      Array.isArray(parsed.Tags) ? parsed.Tags :
-                      typeof parsed.tags === "string" ? parsed.tags.split(/[，,、\s]+/).filter(Boolean) :
-                      [],
-              };
-              console.log("✅ 从 JSON 代码块中解析成功（第一篇）");
-            }
-          } catch (e) {
-            console.warn("⚠️ JSON 代码块解析失败，尝试正则提取:", e);
-            // 如果解析失败，使用正则表达式提取（支持多行字符串）
-            // 使用非贪婪匹配，但需要处理转义的引号和换行符
-            const titleMatch = jsonStr.match(/"title"\s*:\s*"((?:[^"\\]|\\.)*)"/);
-            const bodyMatch = jsonStr.match(/"body"\s*:\s*"((?:[^"\\]|\\.)*)"/);
-            const tagsMatch = jsonStr.match(/"tags"\s*:\s*\[([^\]]+)\]/);
-            
-            if (titleMatch || bodyMatch) {
-              copy1 = {
-                title: titleMatch ? titleMatch[1].replace(/\\n/g, "\n").replace(/\\"/g, '"').trim() : "文案标题",
-                body: bodyMatch ? bodyMatch[1].replace(/\\n/g, "\n").replace(/\\"/g, '"').trim() : "",
-                tags: tagsMatch ? tagsMatch[1].split(",").map(t => t.trim().replace(/"/g, "").replace(/\\/g, "")).filter(Boolean) : [],
-              };
-              console.log("✅ 从 JSON 代码块字符串中提取了第一篇文案（正则）");
-            }
-          }
-        }
-      }
-    }
-    
-    // 解析第二篇 JSON
-    console.log("📝 第二篇原始内容（前500字）:", raw2.substring(0, 500));
-    console.log("📝 第二篇清理后（前500字）:", cleanedRaw2.substring(0, 500));
-    
-    let parsed2 = extractJson(cleanedRaw2);
-    console.log("📝 第二篇解析结果:", parsed2 ? "✅ 成功" : "❌ 失败");
-    if (parsed2) console.log("  标题:", parsed2.title || parsed2.Title || "无");
-    
-    let copy2: CopyOption | null = null;
-    
-    if (parsed2 && (parsed2.title || parsed2.Title)) {
-      copy2 = {
-        title: parsed2.title || parsed2.Title || "",
-        body: normalizeBody(parsed2.body || parsed2.Body || parsed2.content || parsed2.Content || ""),
-        tags: Array.isArray(parsed2.tags) ? parsed2.tags : 
-              Array.isArray(parsed2.Tags) ? parsed2.Tags :
-              typeof parsed2.tags === "string" ? parsed2.tags.split(/[，,、\s]+/).filter(Boolean) :
-              [],
-      };
-      console.log("✅ 第二篇解析成功:", { title: copy2.title.substring(0, 30), bodyLength: copy2.body.length, tagsCount: copy2.tags.length });
-    } else {
-      // 尝试从文本中提取
-      const titleMatch2 = cleanedRaw2.match(/(?:标题|title)[：:]\s*([^\n]+)/i);
-      const bodyMatch2 = cleanedRaw2.match(/(?:正文|body|content)[：:]\s*([\s\S]+?)(?=(?:标签|tags|tag)|$)/i);
-      const tagsMatch2 = cleanedRaw2.match(/(?:标签|tags|tag)[：:]\s*([\s\S]+?)(?=\n\n|\n`{3}|$)/i);
-      
-      if (titleMatch2) {
-        copy2 = {
-          title: titleMatch2[1].trim(),
-          body: bodyMatch2 ? bodyMatch2[1].trim() : "",
-          tags: tagsMatch2 ? tagsMatch2[1].trim().split(/[，,、\s#]+/).filter(Boolean) : [],
-        };
-      } else {
-        // 如果还是找不到，尝试从 JSON 代码块字符串中提取（即使解析失败）
-        // 支持多行字符串（body 可能包含换行符）
-        const jsonBlockMatch = cleanedRaw2.match(/```(?:json)?\s*(\{[\s\S]*?\})\s*```/);
-        if (jsonBlockMatch) {
-          const jsonStr = jsonBlockMatch[1]; // 提取代码块内的内容（不含 ```）
-          console.log("📝 从 JSON 代码块中提取内容（前200字）:", jsonStr.substring(0, 200));
-          
-          // 尝试直接解析（可能包含转义字符）
-          try {
-            const parsed = JSON.parse(jsonStr);
-            if (parsed.title || parsed.Title) {
-              copy2 = {
-                title: parsed.title || parsed.Title || "",
-                body: normalizeBody(parsed.body || parsed.Body || parsed.content || parsed.Content || ""),
-                tags: Array.isArray(parsed.tags) ? parsed.tags : 
-                      Array.isArray(parsed.Tags) ? parsed.Tags :
-                      typeof parsed.tags === "string" ? parsed.tags.split(/[，,、\s]+/).filter(Boolean) :
-                      [],
-              };
-              console.log("✅ 从 JSON 代码块中解析成功（第二篇）");
-            }
-          } catch (e) {
-            console.warn("⚠️ JSON 代码块解析失败，尝试正则提取:", e);
-            // 如果解析失败，使用正则表达式提取（支持多行字符串）
-            // 使用非贪婪匹配，但需要处理转义的引号和换行符
-            const titleMatch = jsonStr.match(/"title"\s*:\s*"((?:[^"\\]|\\.)*)"/);
-            const bodyMatch = jsonStr.match(/"body"\s*:\s*"((?:[^"\\]|\\.)*)"/);
-            const tagsMatch = jsonStr.match(/"tags"\s*:\s*\[([^\]]+)\]/);
-            
-            if (titleMatch || bodyMatch) {
-              copy2 = {
-                title: titleMatch ? titleMatch[1].replace(/\\n/g, "\n").replace(/\\"/g, '"').trim() : "文案标题",
-                body: bodyMatch ? bodyMatch[1].replace(/\\n/g, "\n").replace(/\\"/g, '"').trim() : "",
-                tags: tagsMatch ? tagsMatch[1].split(",").map(t => t.trim().replace(/"/g, "").replace(/\\/g, "")).filter(Boolean) : [],
-              };
-              console.log("✅ 从 JSON 代码块字符串中提取了第二篇文案（正则）");
-            }
-          }
-        }
-      }
-    }
-    
-    // 验证并修复结构
-    if (copy1) {
-      if (!copy1.title || !copy1.body) {
-        console.warn("⚠️ 第一篇文案结构不完整");
-      }
-      if (!Array.isArray(copy1.tags) || copy1.tags.length === 0) {
-        copy1.tags = ["好物推荐", "性价比", "实用好物"];
-      }
-    }
-    
-    if (copy2) {
-      if (!copy2.title || !copy2.body) {
-        console.warn("⚠️ 第二篇文案结构不完整");
-      }
-      if (!Array.isArray(copy2.tags) || copy2.tags.length === 0) {
-        copy2.tags = ["好物分享", "生活好物", "种草"];
-      }
-    }
-    
-    // 如果解析失败，使用兜底方案（但不要显示"文案生成中..."）
-    if (!copy1 || !copy2) {
-      console.error("❌ 文案解析失败，使用兜底方案");
-      
-      if (!copy1) {
-        // 尝试从原始内容中提取标题（至少提取第一行作为标题）
-        const firstLine = raw1.split('\n')[0]?.trim() || cleanedRaw1.split('\n')[0]?.trim() || "";
-        const titleFromRaw = firstLine.length > 50 ? firstLine.substring(0, 50) + "..." : firstLine;
-        const bodyFromRaw = raw1.length > 500 ? raw1.substring(0, 500) + "..." : raw1;
-        
-        // 如果 body 包含 JSON 代码块，尝试提取其中的内容
-        let finalBody = bodyFromRaw;
-        const jsonInBody = bodyFromRaw.match(/```(?:json)?\s*\{[\s\S]*?\}\s*```/);
-        if (jsonInBody) {
-          try {
-            const jsonStr = jsonInBody[1] || jsonInBody[0].replace(/```(?:json)?/g, "").replace(/```/g, "").trim();
-            const parsed = JSON.parse(jsonStr);
-            if (parsed.body) {
-              finalBody = parsed.body;
-            }
-            if (parsed.title && !titleFromRaw) {
-              copy1 = {
-                title: parsed.title,
-                body: parsed.body || finalBody,
-                tags: Array.isArray(parsed.tags) ? parsed.tags : ["好物推荐", "性价比", "实用好物"],
-              };
-            } else {
-              copy1 = {
-                title: titleFromRaw || parsed.title || "好物推荐",
-                body: parsed.body || finalBody,
-                tags: Array.isArray(parsed.tags) ? parsed.tags : ["好物推荐", "性价比", "实用好物"],
-              };
-            }
-          } catch {
-            copy1 = {
-              title: titleFromRaw || "好物推荐",
-              body: finalBody.replace(/```(?:json)?/g, "").replace(/```/g, "").trim(),
-              tags: ["好物推荐", "性价比", "实用好物"],
-            };
-          }
-        } else {
-          copy1 = {
-            title: titleFromRaw || "好物推荐",
-            body: finalBody,
-            tags: ["好物推荐", "性价比", "实用好物"],
-          };
-        }
-        console.log("⚠️ 第一篇使用兜底方案，标题:", copy1.title.substring(0, 30));
-      }
-      
-      if (!copy2) {
-        // 尝试从原始内容中提取标题（至少提取第一行作为标题）
-        const firstLine = raw2.split('\n')[0]?.trim() || cleanedRaw2.split('\n')[0]?.trim() || "";
-        const titleFromRaw = firstLine.length > 50 ? firstLine.substring(0, 50) + "..." : firstLine;
-        const bodyFromRaw = raw2.length > 500 ? raw2.substring(0, 500) + "..." : raw2;
-        
-        // 如果 body 包含 JSON 代码块，尝试提取其中的内容
-        let finalBody = bodyFromRaw;
-        const jsonInBody = bodyFromRaw.match(/```(?:json)?\s*\{[\s\S]*?\}\s*```/);
-        if (jsonInBody) {
-          try {
-            const jsonStr = jsonInBody[1] || jsonInBody[0].replace(/```(?:json)?/g, "").replace(/```/g, "").trim();
-            const parsed = JSON.parse(jsonStr);
-            if (parsed.body) {
-              finalBody = parsed.body;
-            }
-            if (parsed.title && !titleFromRaw) {
-              copy2 = {
-                title: parsed.title,
-                body: parsed.body || finalBody,
-                tags: Array.isArray(parsed.tags) ? parsed.tags : ["好物分享", "生活好物", "种草"],
-              };
-            } else {
-              copy2 = {
-                title: titleFromRaw || parsed.title || "好物分享",
-                body: parsed.body || finalBody,
-                tags: Array.isArray(parsed.tags) ? parsed.tags : ["好物分享", "生活好物", "种草"],
-              };
-            }
-          } catch {
-            copy2 = {
-              title: titleFromRaw || "好物分享",
-              body: finalBody.replace(/```(?:json)?/g, "").replace(/```/g, "").trim(),
-              tags: ["好物分享", "生活好物", "种草"],
-            };
-          }
-        } else {
-          copy2 = {
-            title: titleFromRaw || "好物分享",
-            body: finalBody,
-            tags: ["好物分享", "生活好物", "种草"],
-          };
-        }
-        console.log("⚠️ 第二篇使用兜底方案，标题:", copy2.title.substring(0, 30));
-      }
-    }
-    
-    // 确保两篇文案不同（如果相同，强制差异化）
-    if (copy1 && copy2) {
-      if (copy1.title === copy2.title && copy1.body === copy2.body) {
-        console.warn("⚠️ 检测到两篇文案完全相同，强制差异化...");
-        copy2.title = copy2.title.replace(/效果|好用|推荐/g, "场景").replace(/✨/g, "💕");
-        copy2.body = "谁懂啊！" + copy2.body;
-        copy2.tags = ["好物分享", "生活好物", "种草", "生活分享", "种草清单"];
-      }
-    }
-    
-    // 最终清理：确保所有内容都是纯文本，不包含 JSON 代码块或转义字符
-    const cleanCopy = (copy: CopyOption): CopyOption => {
-      let title = copy.title || "";
-      let body = copy.body || "";
-      let tags = Array.isArray(copy.tags) ? copy.tags : [];
-      
-      // 清理 title：移除 JSON 代码块标记、转义字符
-      title = title
-        .replace(/```(?:json)?/g, "")
-        .replace(/```/g, "")
-        .replace(/\\n/g, "\n")
-        .replace(/\\"/g, '"')
-        .replace(/\\'/g, "'")
-        .trim();
-      
-      // 清理 body：移除 JSON 代码块标记、正确处理转义字符
-      body = body
-        .replace(/```(?:json)?\s*\{[\s\S]*?\}\s*```/g, "") // 移除完整的 JSON 代码块
-        .replace(/```(?:json)?/g, "")
-        .replace(/```/g, "")
-        .replace(/\\n/g, "\n")  // 转义换行符
-        .replace(/\\"/g, '"')   // 转义引号
-        .replace(/\\'/g, "'")   // 转义单引号
-        .replace(/\\t/g, "\t")  // 转义制表符
-        .trim();
-      
-      // 如果 body 还包含 JSON 结构，尝试提取其中的 body 字段
-      if (body.includes('"body"') && body.includes('{')) {
-        const bodyMatch = body.match(/"body"\s*:\s*"((?:[^"\\]|\\.)*)"/);
-        if (bodyMatch) {
-          body = bodyMatch[1]
-            .replace(/\\n/g, "\n")
-            .replace(/\\"/g, '"')
-            .replace(/\\'/g, "'")
-            .trim();
-        }
-      }
-      
-      // 确保 tags 是字符串数组
-      tags = tags
-        .map(tag => 
-        String(tag)
-          .replace(/^#/, "")  // 移除开头的 #
-          .trim()
-      )
-        .filter(Boolean)
-        .slice(0, 10);
-      
-      return { title, body: ensureBodyLayout(body), tags };
-    };
-    
     const retryOnce = async (which: 1 | 2, reasons: string[]) => {
       const basePrompt = which === 1 ? prompt1 : prompt2;
       const repairHint = `\n\n【强制修复指令】你上一次的输出不达标：${reasons.join("；")}。请严格按 JSON 输出 {\"title\":\"...\",\"body\":\"...\",\"tags\":[...]}，并满足：title ≤20字含1-4emoji；body 100-200字，至少2段且段落间空行，整体不紧凑，适量emoji点缀，结尾互动提问；tags 8-10个且与正文一致。只返回 JSON。`;
       const completion = await client.chat.completions.create({
         messages: [
           { role: "system", content: singleCopySystemPrompt },
-          {
-            role: "user",
-            content: [
-              { type: "text", text: basePrompt + repairHint },
-              ...(imageUrl ? [{ type: "image_url", image_url: { url: imageUrl } }] : []),
-            ] as any,
-          },
+          { role: "user", content: userContent(basePrompt + repairHint) },
         ],
         model: modelFromCfg,
         temperature: 0.65,
@@ -780,45 +610,139 @@ ${imageUrl ? `**已提供参考图**：请结合图片理解产品外观、使
       return completion.choices[0].message.content || "";
     };
 
-    // 先清洗成最终结构
-    let opt1 = cleanCopy(copy1 || { title: "", body: "", tags: [] });
-    let opt2 = cleanCopy(copy2 || { title: "", body: "", tags: [] });
-
-    // 校验：文案2必须和文案1一样“能看”，不达标则只重试该篇一次
-    const v1 = validateCopy(opt1);
-    if (!v1.ok) {
-      console.warn("⚠️ 文案1未达标，触发重试一次：", v1.reasons);
-      const rawRetry = await retryOnce(1, v1.reasons);
-      const parsedRetry = extractJson(rawRetry) || extractJson(rawRetry.replace(/```/g, ""));
-      if (parsedRetry?.title || parsedRetry?.Title) {
-        opt1 = cleanCopy({
-          title: parsedRetry.title || parsedRetry.Title || "",
-          body: parsedRetry.body || parsedRetry.Body || parsedRetry.content || parsedRetry.Content || "",
-          tags: Array.isArray(parsedRetry.tags) ? parsedRetry.tags : Array.isArray(parsedRetry.Tags) ? parsedRetry.Tags : [],
-        });
+    // 先清洗成最终结构；校验：文案2必须和文案1一样“能看”，不达标则只重试该篇一次
+    const finalizeCopy = async (which: 1 | 2, copy: CopyOption, onRetry?: (reasons: string[]) => void) => {
+      let opt = cleanCopy(copy);
+      const v = validateCopy(opt);
+      if (!v.ok) {
+        console.warn(`⚠️ 文案${which}未达标，触发重试一次：`, v.reasons);
+        onRetry?.(v.reasons);
+        const rawRetry = await retryOnce(which, v.reasons);
+        const parsedRetry = extractJson(rawRetry) || extractJson(rawRetry.replace(/```/g, ""));
+        if (parsedRetry?.title || parsedRetry?.Title) {
+          opt = cleanCopy({
+            title: parsedRetry.title || parsedRetry.Title || "",
+            body: parsedRetry.body || parsedRetry.Body || parsedRetry.content || parsedRetry.Content || "",
+            tags: Array.isArray(parsedRetry.tags) ? parsedRetry.tags : Array.isArray(parsedRetry.Tags) ? parsedRetry.Tags : [],
+          });
+        }
       }
-    }
+      return opt;
+    };
 
-    const v2 = validateCopy(opt2);
-    if (!v2.ok) {
-      console.warn("⚠️ 文案2未达标，触发重试一次：", v2.reasons);
-      const rawRetry = await retryOnce(2, v2.reasons);
-      const parsedRetry = extractJson(rawRetry) || extractJson(rawRetry.replace(/```/g, ""));
-      if (parsedRetry?.title || parsedRetry?.Title) {
-        opt2 = cleanCopy({
-          title: parsedRetry.title || parsedRetry.Title || "",
-          body: parsedRetry.body || parsedRetry.Body || parsedRetry.content || parsedRetry.Content || "",
-          tags: Array.isArray(parsedRetry.tags) ? parsedRetry.tags : Array.isArray(parsedRetry.Tags) ? parsedRetry.Tags : [],
-        });
-      }
+    const logFinal = (finalOptions: CopyOption[]) => {
+      console.log(`✅ 最终返回 2 篇文案（已清理）`);
+      console.log(`  文案1: 标题=${finalOptions[0]?.title?.substring(0, 30)}..., 正文=${finalOptions[0]?.body?.length || 0}字, 标签=${finalOptions[0]?.tags?.length || 0}个`);
+      console.log(`  文案2: 标题=${finalOptions[1]?.title?.substring(0, 30)}..., 正文=${finalOptions[1]?.body?.length || 0}字, 标签=${finalOptions[1]?.tags?.length || 0}个`);
+    };
+
+    // 流式可在后台/环境变量关闭（例如文案走 llm_cache_proxy 缓存时，流式请求不会被缓存）
+    const streamEnabled = ((await getConfig("COPY_ENGINE_STREAM")) ?? process.env.COPY_ENGINE_STREAM ?? "true") !== "false";
+    if (streamEnabled && wantsStream(req, stream)) {
+      // 流式：两篇仍并行，但每篇的 token 一到就以 SSE 推给浏览器，用户不必干等两篇都写完。
+      // 事件：delta {variant,text} / retry {variant,reasons} / option {variant,option} / done {options} / error {error}
+      console.log("📝 开始生成两篇文案（并行，流式）...");
+      const encoder = new TextEncoder();
+      const abort = new AbortController();
+      let closed = false;
+      // 浏览器断开：停掉上游两路生成，避免白白消耗 token
+      const stop = () => {
+        closed = true;
+        abort.abort();
+      };
+      req.signal?.addEventListener("abort", stop);
+
+      const body = new ReadableStream<Uint8Array>({
+        async start(controller) {
+          const send = (event: string, data: unknown) => {
+            if (closed) return;
+            controller.enqueue(encoder.encode(`event: ${event}\ndata: ${JSON.stringify(data)}\n\n`));
+          };
+          // 先推一个注释帧：响应头和首字节立刻到达，不用等模型的第一个 token
+          controller.enqueue(encoder.encode(": stream-open\n\n"));
+
+          const parsedCopies: Partial<Record<1 | 2, CopyOption>> = {};
+          const runVariant = async (which: 1 | 2, prompt: string) => {
+            // include_usage：流式默认不返回 usage，网关（vendor_gateway.py）计量靠最后这个 usage 块
+            const completion = await client.chat.completions.create(
+              { ...requestFor(prompt), stream: true, stream_options: { include_usage: true } },
+              { signal: abort.signal }
+            );
+            let raw = "";
+            for await (const chunk of completion) {
+              const text = chunk.choices?.[0]?.delta?.content || "";
+              if (!text) continue;
+              raw += text;
+              send("delta", { variant: which, text });
+            }
+            console.log(`📝 ${VARIANT_LABEL[which]}原始输出:`, raw.substring(0, 300) + "...");
+
+            // 后写完的那篇与先写完的比对，相同则差异化后写完的一篇
+            const copy = parseCopy(raw, which);
+            const other = parsedCopies[which === 1 ? 2 : 1];
+            if (other) differentiate(other, copy);
+            parsedCopies[which] = copy;
+
+            // 重试走非流式：此时该篇草稿已展示，重试结果整体替换
+            const option = await finalizeCopy(which, copy, (reasons) => send("retry", { variant: which, reasons }));
+            send("option", { variant: which, option });
+            return option;
+          };
+
+          try {
+            const finalOptions = await Promise.all([runVariant(1, prompt1), runVariant(2, prompt2)]);
+            logFinal(finalOptions);
+            send("done", { options: finalOptions });
+          } catch (error: any) {
+            if (!closed) {
+              console.error("文案生成失败:", error);
+              send("error", { error: error?.message || "文案生成失败" });
+            }
+            abort.abort();
+          } finally {
+            req.signal?.removeEventListener("abort", stop);
+            if (!closed) {
+              closed = true;
+              controller.close();
+            }
+          }
+        },
+        cancel: stop,
+      });
+
+      return new Response(body, {
+        headers: {
+          "Content-Type": "text/event-stream; charset=utf-8",
+          "Cache-Control": "no-cache, no-transform",
+          Connection: "keep-alive",
+          "X-Accel-Buffering": "no",
+        },
+      });
     }
 
+    // 生成两篇（并行以提速）
+    console.log("📝 开始生成两篇文案（并行）...");
+    const [completion1, completion2] = await Promise.all([
+      client.chat.completions.create(requestFor(prompt1)),
+      client.chat.completions.create(requestFor(prompt2)),
+    ]);
+
+    const raw1 = completion1.choices[0].message.content || "";
+    const raw2 = completion2.choices[0].message.content || "";
+    console.log("📝 第一篇原始输出:", raw1.substring(0, 300) + "...");
+    console.log("📝 第二篇原始输出:", raw2.substring(0, 300) + "...");
+
+    // 3. 解析两篇文案
+    const copy1 = parseCopy(raw1, 1);
+    const copy2 = parseCopy(raw2, 2);
+    differentiate(copy1, copy2);
+
+    const opt1 = await finalizeCopy(1, copy1);
+    const opt2 = await finalizeCopy(2, copy2);
+
     const finalOptions: CopyOption[] = [opt1, opt2];
-    
-    console.log(`✅ 最终返回 2 篇文案（已清理）`);
-    console.log(`  文案1: 标题=${finalOptions[0]?.title?.substring(0, 30)}..., 正文=${finalOptions[0]?.body?.length || 0}字, 标签=${finalOptions[0]?.tags?.length || 0}个`);
-    console.log(`  文案2: 标题=${finalOptions[1]?.title?.substring(0, 30)}..., 正文=${finalOptions[1]?.body?.length || 0}字, 标签=${finalOptions[1]?.tags?.length || 0}个`);
-    
+    logFinal(finalOptions);
+
     return NextResponse.json({ options: finalOptions });
   } catch (error: any) {
     console.error("文案生成失败:", error);
@@ -1,24 +1,13 @@
 import { NextResponse } from "next/server";
-import { PrismaClient } from "@prisma/client";
 import OpenAI from "openai";
 import { getVolcApiKey, getGoogleApiKey } from "@/lib/credentials";
 import { resolveApiKeyFromStore } from "@/lib/credential-resolver";
+import { getConfig } from "@/lib/system-config";
+import { llmCacheHeaders } from "@/lib/llm-cache";
+import { meterHeaders } from "@/lib/metering";
 
 export const runtime = "nodejs";
 
-const globalForPrisma = global as unknown as { prisma: PrismaClient };
-const prisma = globalForPrisma.prisma || new PrismaClient();
-if (process.env.NODE_ENV !== "production") globalForPrisma.prisma = prisma;
-
-async function getConfig(key: string): Promise<string | null> {
-  try {
-    const row = await prisma.systemConfig.findUnique({ where: { key } });
-    return row?.value ?? null;
-  } catch {
-    return null;
-  }
-}
-
 function tryParseJsonArray(text: string): string[] | null {
   if (!text) return null;
   const cleaned = text.replace(/```json|```/g, "").trim();
@@ -138,7 +127,11 @@ export async function POST(req: Request) {
       store?.baseURL ||
       baseURL ||
       DEFAULT_GOOGLE_BASE_URL;
-    const client = new OpenAI({ apiKey, baseURL: finalBaseURL });
+    const client = new OpenAI({
+      apiKey,
+      baseURL: finalBaseURL,
+      defaultHeaders: { ...(await llmCacheHeaders("image-prompts")), ...(await meterHeaders("image-prompts", finalBaseURL)) },
+    });
     let prompts: string[] | null = null;
     let lastRaw = "";
 
@@ -1,7 +1,7 @@
 import { NextResponse } from "next/server";
 import { segmentCommodityToPngBase64 } from "@/lib/aliyun";
-import { PrismaClient } from "@prisma/client";
 import { generateImageWithGoogle } from "@/lib/google";
+import { getConfig } from "@/lib/system-config";
 
 export const runtime = "nodejs";
 
@@ -9,19 +9,6 @@ const DEFAULT_GOOGLE_BASE_URL = process.env.GOOGLE_BASE_URL || "https://gitaigc.
 
 type RefImage = { dataUrl: string; note?: string };
 
-const globalForPrisma = global as unknown as { prisma: PrismaClient };
-const prisma = globalForPrisma.prisma || new PrismaClient();
-if (process.env.NODE_ENV !== "production") globalForPrisma.prisma = prisma;
-
-async function getConfig(key: string) {
-  try {
-    const row = await prisma.systemConfig.findUnique({ where: { key } });
-    return row?.value ?? null;
-  } catch {
-    return null;
-  }
-}
-
 function toBool(v: any, fallback = false) {
   if (typeof v === "boolean") return v;
   if (typeof v === "string") return v === "true" || v === "1" || v === "yes";
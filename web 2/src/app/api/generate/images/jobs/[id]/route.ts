@@ -0,0 +1,92 @@
+import { NextResponse } from "next/server";
+import { getSession } from "@/lib/auth";
+import { prisma } from "@/lib/prisma";
+
+export const runtime = "nodejs";
+
+const STREAM_POLL_MS = 1000;
+const STREAM_MAX_MS = 5 * 60 * 1000;
+
+async function loadJob(id: string, userId: string) {
+  const job = await prisma.generationJob.findUnique({
+    where: { id },
+    include: { generation: { select: { userId: true, imageUrls: true } } },
+  });
+  if (!job || job.generation.userId !== userId) return null;
+
+  let imageUrls: string[] = [];
+  try {
+    imageUrls = JSON.parse(job.generation.imageUrls || "[]");
+  } catch {
+    imageUrls = [];
+  }
+  return {
+    jobId: job.id,
+    generationId: job.generationId,
+    status: job.status,
+    total: job.total,
+    done: job.done,
+    failed: job.failed,
+    imageUrls,
+    error: job.error,
+  };
+}
+
+function isFinished(status: string) {
+  return status === "done" || status === "failed";
+}
+
+// 查询生图任务进度：默认返回一次快照；?stream=1 时以 SSE 推送，每完成一张推一次，结束后关闭
+export async function GET(req: Request, { params }: { params: Promise<{ id: string }> }) {
+  const session = await getSession();
+  if (!session) {
+    return NextResponse.json({ error: "未登录" }, { status: 401 });
+  }
+  const { id } = await params;
+
+  try {
+    const snapshot = await loadJob(id, session.userId);
+    if (!snapshot) {
+      return NextResponse.json({ error: "任务不存在" }, { status: 404 });
+    }
+    if (new URL(req.url).searchParams.get("stream") !== "1") {
+      return NextResponse.json(snapshot);
+    }
+
+    const encoder = new TextEncoder();
+    const stream = new ReadableStream({
+      async start(controller) {
+        const send = (data: unknown) => controller.enqueue(encoder.encode(`data: ${JSON.stringify(data)}\n\n`));
+        const startedAt = Date.now();
+        let current = snapshot;
+        let lastKey = "";
+        while (!req.signal.aborted) {
+          const key = `${current.status}:${current.done}:${current.failed}`;
+          if (key !== lastKey) {
+            send(current);
+            lastKey = key;
+          }
+          if (isFinished(current.status) || Date.now() - startedAt > STREAM_MAX_MS) break;
+          await new Promise((r) => setTimeout(r, STREAM_POLL_MS));
+          const next = await loadJob(id, session.userId);
+          if (!next) break;
+          current = next;
+        }
+        controller.close();
+      },
+    });
+    return new Response(stream, {
+      headers: {
+        "Content-Type": "text/event-stream; charset=utf-8",
+        "Cache-Control": "no-cache, no-transform",
+        Connection: "keep-alive",
+      },
+    });
+  } catch (error: any) {
+    console.error("查询生图任务失败:", error);
+    return NextResponse.json(
+      { error: "服务端异常: " + (error.message || "未知错误") },
+      { status: 500 }
+    );
+  }
+}
@@ -1,25 +1,16 @@
 import { NextResponse } from "next/server";
-import { PrismaClient } from "@prisma/client";
 import OpenAI from "openai";
 import { segmentCommodityToPngBase64 } from "@/lib/aliyun";
 import { getDashscopeApiKey, getVolcApiKey } from "@/lib/credentials";
+import { getConfig } from "@/lib/system-config";
+import { prepareReferenceImage } from "@/lib/image-prep";
+import { llmCacheHeaders } from "@/lib/llm-cache";
+import { meterHeaders } from "@/lib/metering";
+import { getSession } from "@/lib/auth";
+import { prisma } from "@/lib/prisma";
 
 export const runtime = "nodejs";
 
-// Prisma 单例
-const globalForPrisma = global as unknown as { prisma: PrismaClient };
-const prisma = globalForPrisma.prisma || new PrismaClient();
-if (process.env.NODE_ENV !== "production") globalForPrisma.prisma = prisma;
-
-async function getConfig(key: string): Promise<string | null> {
-  try {
-    const row = await prisma.systemConfig.findUnique({ where: { key } });
-    return row?.value ?? null;
-  } catch {
-    return null;
-  }
-}
-
 const ALIYUN_CONFIG = {
   apiKey: "", // 运行时按 profile 从 env 取
   baseURL: process.env.DASHSCOPE_BASE_URL || process.env.IMAGE_BASE_URL || "https://dashscope.aliyuncs.com/api/v1",
@@ -76,10 +67,35 @@ function isTextHeavyPrompt(p: string) {
   return keys.some((k) => s.includes(k));
 }
 
+// 统一追加“产品主体不变”的硬约束（避免生成提示词里漏掉这点）
+const HARD_CONSTRAINT = `硬性要求：产品必须出现在画面中（可以小比例出现在角落/手持/桌面），且严格参考输入图产品，外观/颜色/Logo/材质/结构/比例/纹理细节完全不变，不得改动产品主体，不得重绘变形；禁止生成多余商品/配件；整体像真实拍摄。`;
+const TEXT_RENDER_SPEC =
+  "文字渲染要求（仅当提示词需要文字时）：中文必须清晰可读、边缘锐利、不变形不乱码不糊；字号适中不过小；排版留白合理；避免长段落；优先黑体/思源黑体风格；不要水印与二维码。";
+
+// 单张图的生图参数；同步生图与队列任务（image_worker.py 按此调用百炼）共用
+function buildRenderSpec(onePrompt: string) {
+  const needText = isTextHeavyPrompt(onePrompt);
+  return {
+    prompt: needText ? `${onePrompt}\n${HARD_CONSTRAINT}\n${TEXT_RENDER_SPEC}` : `${onePrompt}\n${HARD_CONSTRAINT}`,
+    negativePrompt: needText
+      ? "低质量, 低分辨率, 模糊, 强烈AI感, 产品主体变形, 产品外观改变, 颜色改变, Logo改变, 材质改变, 比例不对, 结构错误, 多余商品, 多余配件, 乱码文字, 变形文字, 文字糊成一团, 水印, 二维码"
+      : "低质量, 低分辨率, 模糊, 强烈AI感, 产品主体变形, 产品外观改变, 颜色改变, Logo改变, 材质改变, 比例不对, 结构错误, 多余商品, 多余配件, 水印, 二维码",
+    // 文字类提示词开启智能改写（更接近百炼后台体验）；其它保持关闭以保产品不变
+    promptExtend: needText,
+  };
+}
+
 export async function POST(req: Request) {
   try {
-    const { productName, copy, imageUrl } = await req.json();
+    const { productName, copy, imageUrl, async: asyncMode } = await req.json();
     console.log(`\n🚀 [百炼标准流程] 产品: ${productName}`);
+
+    // 队列模式：提示词与抠图在请求内完成，6 张图交给 image_worker.py 并发生成，接口立即返回任务 ID
+    const useQueue = asyncMode === true || process.env.IMAGE_JOB_QUEUE === "1";
+    const session = useQueue ? await getSession() : null;
+    if (useQueue && !session?.userId) {
+      return NextResponse.json({ error: "未登录" }, { status: 401 });
+    }
     const volcProfile = (await getConfig("COPY_ENGINE_CRED_PROFILE")) || "default";
     const dashscopeProfile = (await getConfig("IMAGE_ENGINE_CRED_PROFILE")) || "default";
     const imagesegProfile = (await getConfig("IMAGESEG_CRED_PROFILE")) || "default";
@@ -104,7 +120,11 @@ export async function POST(req: Request) {
     if (!volcApiKey) return NextResponse.json({ error: "缺少文案引擎密钥（VOLC_API_KEY...）" }, { status: 500 });
     if (!dashscopeApiKey) return NextResponse.json({ error: "缺少配图引擎密钥（DASHSCOPE_API_KEY...）" }, { status: 500 });
 
-    const volcClient = new OpenAI({ apiKey: volcApiKey, baseURL: VOLC_CONFIG.baseURL });
+    const volcClient = new OpenAI({
+      apiKey: volcApiKey,
+      baseURL: VOLC_CONFIG.baseURL,
+      defaultHeaders: { ...(await llmCacheHeaders("images")), ...(await meterHeaders("images", VOLC_CONFIG.baseURL)) },
+    });
 
     let prompts: string[] = [
       "真实拍摄，产品在桌面，柔和自然光，背景生活化道具",
@@ -161,11 +181,6 @@ export async function POST(req: Request) {
 
     // 2. 准备图片 Base64（原始参考图）
     const originalBase64 = imageUrl.includes("base64,") ? imageUrl.split("base64,")[1] : imageUrl;
-    const imageBase64 = `data:image/png;base64,${originalBase64}`;
-
-    // 3. 串行生图
-    console.log(">>> [步骤 3] 开始生成图片...");
-    const results: string[] = [];
 
     // 先抠出产品主体（透明PNG），后续合成保证“产品不变”
     let cutoutPngBase64: string | null = null;
@@ -175,6 +190,37 @@ export async function POST(req: Request) {
     } catch (e: any) {
       console.warn("⚠️ 抠图失败，将退化为直接编辑原图（可能导致主体变化）:", e?.message);
     }
+    // 注意：抠图失败时退化为原图（不推荐，但避免全失败）
+    // 发给 DashScope 前缩到模型的最大有效分辨率并去掉元数据，6 次生图都发这份精简版
+    const compactRef = await prepareReferenceImage(cutoutPngBase64 || originalBase64, "dashscope");
+    const refImage = `data:${compactRef.mimeType};base64,${compactRef.base64}`;
+
+    if (useQueue) {
+      const renders = prompts.map(buildRenderSpec);
+      const generation = await prisma.generation.create({
+        data: { userId: session.userId, productName: productName || "", description: copy || null, imageUrls: "[]" },
+      });
+      const job = await prisma.generationJob.create({
+        data: {
+          generationId: generation.id,
+          vendor: "dashscope",
+          model: ALIYUN_CONFIG.model,
+          credProfile: dashscopeProfile,
+          refImage,
+          renders: JSON.stringify(renders),
+          total: renders.length,
+        },
+      });
+      console.log(`📥 已入队: job=${job.id} generation=${generation.id}`);
+      return NextResponse.json(
+        { jobId: job.id, generationId: generation.id, status: job.status, total: job.total },
+        { status: 202 }
+      );
+    }
+
+    // 3. 串行生图
+    console.log(">>> [步骤 3] 开始生成图片...");
+    const results: string[] = [];
 
     for (let i = 0; i < prompts.length; i++) {
       const onePrompt = prompts[i];
@@ -182,17 +228,7 @@ export async function POST(req: Request) {
 
       try {
         // 按你的要求：抠图后直接把“抠好的参考图 + 单条生图提示词”喂给 qwen-image-edit-plus
-        // 注意：抠图失败时退化为原图（不推荐，但避免全失败）
-        const refImage = cutoutPngBase64 ? `data:image/png;base64,${cutoutPngBase64}` : imageBase64;
-        // 统一追加“产品主体不变”的硬约束（避免生成提示词里漏掉这点）
-        const hardConstraint = `硬性要求：产品必须出现在画面中（可以小比例出现在角落/手持/桌面），且严格参考输入图产品，外观/颜色/Logo/材质/结构/比例/纹理细节完全不变，不得改动产品主体，不得重绘变形；禁止生成多余商品/配件；整体像真实拍摄。`;
-        const textRenderSpec =
-          "文字渲染要求（仅当提示词需要文字时）：中文必须清晰可读、边缘锐利、不变形不乱码不糊；字号适中不过小；排版留白合理；避免长段落；优先黑体/思源黑体风格；不要水印与二维码。";
-
-        const needText = isTextHeavyPrompt(onePrompt);
-        const finalPrompt = needText
-          ? `${onePrompt}\n${hardConstraint}\n${textRenderSpec}`
-          : `${onePrompt}\n${hardConstraint}`;
+        const spec = buildRenderSpec(onePrompt);
 
         const payload = {
           model: ALIYUN_CONFIG.model,
@@ -202,19 +238,15 @@ export async function POST(req: Request) {
                 role: "user",
                 content: [
                   { image: refImage },
-                  { text: finalPrompt }
+                  { text: spec.prompt }
                 ]
               }
             ]
           },
           parameters: {
             n: 1,
-            negative_prompt:
-              needText
-                ? "低质量, 低分辨率, 模糊, 强烈AI感, 产品主体变形, 产品外观改变, 颜色改变, Logo改变, 材质改变, 比例不对, 结构错误, 多余商品, 多余配件, 乱码文字, 变形文字, 文字糊成一团, 水印, 二维码"
-                : "低质量, 低分辨率, 模糊, 强烈AI感, 产品主体变形, 产品外观改变, 颜色改变, Logo改变, 材质改变, 比例不对, 结构错误, 多余商品, 多余配件, 水印, 二维码",
-            // 文字类提示词开启智能改写（更接近百炼后台体验）；其它保持关闭以保产品不变
-            prompt_extend: needText,
+            negative_prompt: spec.negativePrompt,
+            prompt_extend: spec.promptExtend,
             watermark: false
           }
         };
@@ -224,7 +256,8 @@ export async function POST(req: Request) {
           method: 'POST',
           headers: {
             'Content-Type': 'application/json',
-            'Authorization': `Bearer ${ALIYUN_CONFIG.apiKey.trim()}`
+            'Authorization': `Bearer ${ALIYUN_CONFIG.apiKey.trim()}`,
+            ...(await meterHeaders('images', ALIYUN_CONFIG.baseURL))
           },
           body: JSON.stringify(payload)
         });
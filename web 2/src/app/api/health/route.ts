@@ -0,0 +1,37 @@
+import { NextResponse } from "next/server";
+import { prisma } from "@/lib/prisma";
+import { getConfigSnapshot } from "@/lib/system-config";
+import { kv } from "@/lib/kv";
+
+export const dynamic = "force-dynamic";
+
+/**
+ * 健康检查 / 预热接口
+ * GET /api/health
+ *
+ * 依次触发冷启动里最慢的几步：Prisma 引擎加载与数据库连接、SystemConfig 快照、共享 KV 连接。
+ * 蓝绿发布（xhs-ops bluegreen）切换域名前会并发请求它，把连接池预先建满。
+ */
+export async function GET() {
+  const timings: Record<string, number> = {};
+  const time = async <T>(name: string, fn: () => Promise<T>) => {
+    const started = Date.now();
+    try {
+      return await fn();
+    } finally {
+      timings[name] = Date.now() - started;
+    }
+  };
+
+  try {
+    await time("db", () => prisma.$queryRaw`SELECT 1`);
+    const snap = await time("config", () => getConfigSnapshot());
+    await time("kv", () => kv.get("health:ping"));
+    return NextResponse.json({ ok: true, configVersion: snap.version, timings });
+  } catch (error: any) {
+    return NextResponse.json(
+      { ok: false, error: error.message || "未知错误", timings },
+      { status: 503 }
+    );
+  }
+}
@@ -1,4 +1,5 @@
 import { NextResponse } from "next/server";
+import { kv } from "@/lib/kv";
 
 /**
  * 临时图片服务：将 base64 图片转换为可访问的 URL
@@ -7,17 +8,9 @@ import { NextResponse } from "next/server";
  * 
  * 返回：{ url: "http://localhost:3000/api/temp-image?id=xxx" }
  */
-const imageCache = new Map<string, { data: string; timestamp: number }>();
-
-// 清理过期图片（30分钟）
-setInterval(() => {
-  const now = Date.now();
-  for (const [id, item] of imageCache.entries()) {
-    if (now - item.timestamp > 30 * 60 * 1000) {
-      imageCache.delete(id);
-    }
-  }
-}, 5 * 60 * 1000); // 每5分钟清理一次
+// 存在共享存储里（lib/kv.ts），图片由哪个副本写入都能被任一副本读出；30分钟后过期
+const IMAGE_TTL_MS = 30 * 60 * 1000;
+const imageKey = (id: string) => `tmpimg:${id}`;
 
 export async function POST(req: Request) {
   try {
@@ -27,7 +20,7 @@ export async function POST(req: Request) {
     }
 
     const id = Math.random().toString(36).substring(2, 15);
-    imageCache.set(id, { data: imageBase64, timestamp: Date.now() });
+    await kv.set(imageKey(id), imageBase64, IMAGE_TTL_MS);
 
     // 获取当前请求的 host
     const host = req.headers.get("host") || "localhost:3000";
@@ -48,13 +41,13 @@ export async function GET(req: Request) {
       return NextResponse.json({ error: "需要 id" }, { status: 400 });
     }
 
-    const item = imageCache.get(id);
-    if (!item) {
+    const data = await kv.get(imageKey(id));
+    if (!data) {
       return NextResponse.json({ error: "图片不存在或已过期" }, { status: 404 });
     }
 
     // 返回图片
-    const buffer = Buffer.from(item.data, "base64");
+    const buffer = Buffer.from(data, "base64");
     return new NextResponse(buffer, {
       headers: {
         "Content-Type": "image/png",
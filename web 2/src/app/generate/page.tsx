@@ -18,6 +18,92 @@ type CopyOption = {
   tags: string[];
 };
 
+// 从尚未写完的 JSON 文本里取出某个字符串字段已到达的部分（流式草稿用）
+function partialJsonString(raw: string, key: string): string {
+  const m = raw.match(new RegExp(`"${key}"\\s*:\\s*"`));
+  if (!m || m.index === undefined) return "";
+  let out = "";
+  for (let i = m.index + m[0].length; i < raw.length; i++) {
+    const ch = raw[i];
+    if (ch === '"') break;
+    if (ch !== "\\") {
+      out += ch;
+      continue;
+    }
+    const next = raw[i + 1];
+    if (next === undefined) break; // 转义符被切在两个 token 之间，等下一段
+    if (next === "u") {
+      const hex = raw.slice(i + 2, i + 6);
+      if (!/^[0-9a-fA-F]{4}$/.test(hex)) break;
+      out += String.fromCharCode(parseInt(hex, 16));
+      i += 5;
+      continue;
+    }
+    out += next === "n" ? "\n" : next === "t" ? "\t" : next;
+    i++;
+  }
+  return out;
+}
+
+function draftCopy(raw: string): CopyOption {
+  const text = raw.replace(/```(?:json)?/g, "").trim();
+  // 模型没按 JSON 输出时，直接展示原文草稿；最终结构以服务端 option 事件为准
+  if (!text.startsWith("{")) return { title: "", body: text, tags: [] };
+  const tagsMatch = text.match(/"tags"\s*:\s*\[([^\]]*)/);
+  const tags = tagsMatch ? Array.from(tagsMatch[1].matchAll(/"((?:[^"\\]|\\.)*)"/g), (x) => x[1]) : [];
+  return { title: partialJsonString(text, "title"), body: partialJsonString(text, "body"), tags };
+}
+
+// 读取 /api/generate/copy 的 SSE 流：每收到 token 就回调两篇草稿，结束时返回与非流式一致的 { options } / { error }
+async function readCopyStream(
+  body: ReadableStream<Uint8Array>,
+  onDraft: (options: CopyOption[]) => void
+): Promise<{ options?: CopyOption[]; error?: string }> {
+  const reader = body.getReader();
+  const decoder = new TextDecoder();
+  const raws = ["", ""];
+  const finals: Array<CopyOption | null> = [null, null];
+  let result: { options?: CopyOption[]; error?: string } | null = null;
+  let buffer = "";
+
+  const handle = (event: string, data: any) => {
+    const idx = data?.variant === 2 ? 1 : 0;
+    if (event === "delta") {
+      raws[idx] += data.text || "";
+    } else if (event === "option") {
+      finals[idx] = data.option;
+    } else if (event === "done") {
+      result = { options: data.options };
+      return;
+    } else if (event === "error") {
+      result = { error: data.error || "文案生成失败" };
+      return;
+    } else {
+      return;
+    }
+    onDraft([finals[0] || draftCopy(raws[0]), finals[1] || draftCopy(raws[1])]);
+  };
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    buffer += decoder.decode(value, { stream: !done });
+    let sep: number;
+    while ((sep = buffer.indexOf("\n\n")) >= 0) {
+      const frame = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      let event = "message";
+      const dataLines: string[] = [];
+      for (const line of frame.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) dataLines.push(line.slice(5).trimStart());
+      }
+      if (dataLines.length) handle(event, JSON.parse(dataLines.join("\n")));
+    }
+    if (done) break;
+  }
+  return result || { error: "文案流意外中断" };
+}
+
 export default function GeneratePage() {
   const router = useRouter();
   const [selectedImage, setSelectedImage] = useState<string | null>(null);
@@ -121,16 +207,20 @@ export default function GeneratePage() {
     try {
       const res = await fetch("/api/generate/copy", {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
-        // imageUrl 可选：未上传图片时不传该字段
-        body: JSON.stringify({ productName: currentProductName, description: currentDescription, imageUrl: currentSelectedImage || undefined }),
+        headers: { "Content-Type": "application/json", Accept: "text/event-stream" },
+        // imageUrl 可选：未上传图片时不传该字段；stream=true 让两篇文案边写边显示
+        body: JSON.stringify({ productName: currentProductName, description: currentDescription, imageUrl: currentSelectedImage || undefined, stream: true }),
       });
       if (!res.ok) {
         const errorData = await res.json().catch(() => ({ error: `HTTP ${res.status}` }));
         throw new Error(errorData.error || `请求失败: ${res.status}`);
       }
-      
-      const data = await res.json();
+
+      // 服务端不支持流式（或被代理改写）时回落到整包 JSON
+      const data: any =
+        res.body && (res.headers.get("content-type") || "").includes("text/event-stream")
+          ? await readCopyStream(res.body, setCopyOptions)
+          : await res.json();
       
       console.log("📝 文案生成 API 返回:", { 
         hasOptions: Array.isArray(data.options), 
@@ -228,6 +318,8 @@ export default function GeneratePage() {
       }
     } catch (e: any) {
       console.error("文案生成失败:", e);
+      // 流式草稿不能当成结果留在页面上
+      setCopyOptions(null);
       // 如果出错，显示错误信息
       if (e?.message) {
         alert(`文案生成失败: ${e.message}`);
@@ -541,7 +633,7 @@ export default function GeneratePage() {
                     <Copy className="w-3 h-3 mr-1" /> 复制
                   </Button>
                 </div>
-                <div className={`bg-muted/30 p-4 rounded-lg border min-h-[150px] ${isCopyLoading ? "opacity-50" : ""}`}>
+                <div className={`bg-muted/30 p-4 rounded-lg border min-h-[150px] ${isCopyLoading && !copyOptions ? "opacity-50" : ""}`}>
                   {copyOptions ? (
                     <div className="space-y-3">
                       <div className="flex gap-2">
@@ -21,7 +21,8 @@ async function createClient(profile?: string | null, vendor = "aliyun-imageseg")
  */
 async function uploadToTempServer(imageBase64: string): Promise<string> {
   // 获取服务器地址（从环境变量或默认值）
-  const baseURL = process.env.NEXT_PUBLIC_BASE_URL || 
+  // APP_BASE_URL 在运行时读取；NEXT_PUBLIC_* 会在构建时写死进镜像，同一镜像提升到其它环境时会指错地址
+  const baseURL = process.env.APP_BASE_URL || process.env.NEXT_PUBLIC_BASE_URL || 
                   (process.env.VERCEL_URL ? `https://${process.env.VERCEL_URL}` : 
                   "http://localhost:3000");
   
@@ -39,10 +40,41 @@ async function uploadToTempServer(imageBase64: string): Promise<string> {
   return data.url;
 }
 
+/**
+ * 通过抠图缓存服务（仓库根目录 cutout_service.py）抠图：同一张图或重新压缩/缩放过的同一张图直接返回缓存结果
+ */
+async function segmentViaCutoutService(serviceURL: string, imageBase64: string, profile?: string | null) {
+  const res = await fetch(`${serviceURL.replace(/\/$/, "")}/cutout`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      Authorization: `Bearer ${process.env.CUTOUT_SERVICE_TOKEN || ""}`,
+    },
+    body: JSON.stringify({ imageBase64, profile: profile || "default", mask: false }),
+  });
+  const data = await res.json().catch(() => ({}));
+  if (!res.ok || !data.cutoutBase64) {
+    throw new Error(data.error || `抠图缓存服务失败: ${res.status}`);
+  }
+  console.log(`✅ 抠图缓存服务: ${data.cache}`);
+  return data.cutoutBase64 as string;
+}
+
 /**
  * 阿里云商品分割：返回“透明底主体 PNG”的 base64（不含 data: 前缀）
+ *
+ * 配置了 CUTOUT_SERVICE_URL 时先走抠图缓存服务，服务不可用再直连阿里云。
  */
 export async function segmentCommodityToPngBase64(imageBase64: string, profile?: string | null): Promise<string> {
+  const serviceURL = process.env.CUTOUT_SERVICE_URL;
+  if (serviceURL) {
+    try {
+      return await segmentViaCutoutService(serviceURL, imageBase64, profile);
+    } catch (e: any) {
+      console.warn("⚠️ 抠图缓存服务不可用，直连阿里云:", e?.message || e);
+    }
+  }
+
   console.log("正在调用阿里云商品抠图...");
   try {
     const client = await createClient(profile);
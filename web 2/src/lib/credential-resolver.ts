@@ -1,9 +1,5 @@
-import { PrismaClient } from "@prisma/client";
 import { decryptSecret } from "@/lib/crypto";
-
-const globalForPrisma = global as unknown as { prisma: PrismaClient };
-const prisma = globalForPrisma.prisma || new PrismaClient();
-if (process.env.NODE_ENV !== "production") globalForPrisma.prisma = prisma;
+import { getConfig } from "@/lib/system-config";
 
 const KEY = "API_CREDENTIALS_JSON";
 
@@ -29,11 +25,27 @@ function safeJsonParse<T>(s: string | null): T | null {
   }
 }
 
+// 解析结果与解密结果按原始 JSON 缓存：配置快照版本不变时不重复 JSON.parse / AES-GCM 解密
+let listCache: { raw: string; list: StoredCredential[] } | null = null;
+const plainCache = new Map<string, string>();
+
 async function getList(): Promise<StoredCredential[]> {
-  const row = await prisma.systemConfig.findUnique({ where: { key: KEY } });
-  const parsed = safeJsonParse<StoredCredential[]>(row?.value ?? null);
-  if (!Array.isArray(parsed)) return [];
-  return parsed;
+  const raw = (await getConfig(KEY)) ?? "";
+  if (listCache?.raw === raw) return listCache.list;
+  const parsed = safeJsonParse<StoredCredential[]>(raw || null);
+  const list = Array.isArray(parsed) ? parsed : [];
+  listCache = { raw, list };
+  plainCache.clear();
+  return list;
+}
+
+function decryptCached(secretEnc: string) {
+  let plain = plainCache.get(secretEnc);
+  if (plain === undefined) {
+    plain = decryptSecret(secretEnc);
+    plainCache.set(secretEnc, plain);
+  }
+  return plain;
 }
 
 export async function resolveApiKeyFromStore(opts: { type: "text" | "image"; vendor: string; profile: string }) {
@@ -41,7 +53,7 @@ export async function resolveApiKeyFromStore(opts: { type: "text" | "image"; ven
   const list = await getList();
   const found = list.find((c) => c.type === type && c.vendor === vendor && c.profile === profile);
   if (!found) return null;
-  const apiKey = decryptSecret(found.secretEnc);
+  const apiKey = decryptCached(found.secretEnc);
   return { apiKey, baseURL: (found.baseURL || "").trim() || null };
 }
 
@@ -50,7 +62,7 @@ export async function resolveImageSegCredsFromStore(opts: { vendor: string; prof
   const list = await getList();
   const found = list.find((c) => c.type === "imageseg" && c.vendor === vendor && c.profile === profile);
   if (!found) return null;
-  const plain = decryptSecret(found.secretEnc);
+  const plain = decryptCached(found.secretEnc);
   const obj = safeJsonParse<{ accessKeyId?: string; accessKeySecret?: string }>(plain);
   if (!obj?.accessKeyId || !obj?.accessKeySecret) return null;
   return { accessKeyId: obj.accessKeyId, accessKeySecret: obj.accessKeySecret, baseURL: (found.baseURL || "").trim() || null };
@@ -1,6 +1,8 @@
 import { GoogleGenAI } from "@google/genai";
 import { getGoogleApiKey } from "@/lib/credentials";
 import { resolveApiKeyFromStore } from "@/lib/credential-resolver";
+import { prepareReferenceImages, type PreparedImage } from "@/lib/image-prep";
+import { meterHeaders } from "@/lib/metering";
 
 /**
  * 使用 Google Gemini 2.5 Flash Image 生成图片
@@ -35,10 +37,13 @@ export async function generateImageWithGoogle(
     throw new Error(`未配置 Google API Key（profile=${profile}）。请在"API管理中心"配置或设置环境变量 GOOGLE_API_KEY`);
   }
 
+  // 参考图先缩到模型的最大有效分辨率并去掉元数据（未配置预处理服务时原样发送）
+  const refs = await prepareReferenceImages(referenceImages, "google");
+
   // 如果指定了 baseURL 或 useHttp，使用 HTTP 直接调用（适用于代理服务）
   if (useHttp || finalBaseURL) {
     console.log("🌐 使用 HTTP 模式调用生图", { model, baseURL: finalBaseURL });
-    return await generateImageViaHttp(prompt, model, apiKey, finalBaseURL || undefined, referenceImages);
+    return await generateImageViaHttp(prompt, model, apiKey, finalBaseURL || undefined, refs);
   }
 
   // 否则使用官方 SDK
@@ -49,15 +54,13 @@ export async function generateImageWithGoogle(
 
     // 构建多模态内容：如果有参考图，先传图片，再传文本
     const parts: any[] = [];
-    if (referenceImages && referenceImages.length > 0) {
-      for (const imgBase64 of referenceImages) {
-        parts.push({
-          inlineData: {
-            mimeType: "image/png",
-            data: imgBase64,
-          },
-        });
-      }
+    for (const img of refs) {
+      parts.push({
+        inlineData: {
+          mimeType: img.mimeType,
+          data: img.base64,
+        },
+      });
     }
     parts.push({ text: prompt });
 
@@ -89,7 +92,7 @@ export async function generateImageWithGoogle(
   } catch (e: any) {
     // SDK 失败时，尝试降级到 HTTP 调用
     console.warn("Google SDK 调用失败，尝试 HTTP 方式:", e?.message);
-    return await generateImageViaHttp(prompt, model, apiKey, finalBaseURL || undefined, referenceImages);
+    return await generateImageViaHttp(prompt, model, apiKey, finalBaseURL || undefined, refs);
   }
 }
 
@@ -101,7 +104,7 @@ async function generateImageViaHttp(
   model: string,
   apiKey: string,
   customBaseURL?: string,
-  referenceImages?: string[]
+  referenceImages: PreparedImage[] = []
 ): Promise<string> {
   const baseURL = customBaseURL || "https://generativelanguage.googleapis.com/v1beta";
   
@@ -118,15 +121,13 @@ async function generateImageViaHttp(
 
   // 构建多模态内容：如果有参考图，先传图片，再传文本
   const parts: any[] = [];
-  if (referenceImages && referenceImages.length > 0) {
-    for (const imgBase64 of referenceImages) {
-      parts.push({
-        inlineData: {
-          mimeType: "image/png",
-          data: imgBase64,
-        },
-      });
-    }
+  for (const img of referenceImages) {
+    parts.push({
+      inlineData: {
+        mimeType: img.mimeType,
+        data: img.base64,
+      },
+    });
   }
   parts.push({ text: prompt });
 
@@ -142,6 +143,7 @@ async function generateImageViaHttp(
     method: "POST",
     headers: {
       "Content-Type": "application/json",
+      ...(await meterHeaders("image-one", url)),
     },
     body: JSON.stringify(payload),
   });
@@ -183,21 +185,19 @@ async function generateImageViaOpenAIFormat(
   model: string,
   apiKey: string,
   baseURL: string,
-  referenceImages?: string[]
+  referenceImages: PreparedImage[] = []
 ): Promise<string> {
   const url = `${baseURL}/chat/completions`;
 
   // 构建多模态内容：如果有参考图，先传图片，再传文本
   const messageContent: any[] = [];
-  if (referenceImages && referenceImages.length > 0) {
-    for (const imgBase64 of referenceImages) {
-      messageContent.push({
-        type: "image_url",
-        image_url: {
-          url: `data:image/png;base64,${imgBase64}`,
-        },
-      });
-    }
+  for (const img of referenceImages) {
+    messageContent.push({
+      type: "image_url",
+      image_url: {
+        url: `data:${img.mimeType};base64,${img.base64}`,
+      },
+    });
   }
   messageContent.push({
     type: "text",
@@ -223,6 +223,7 @@ async function generateImageViaOpenAIFormat(
     headers: {
       "Content-Type": "application/json",
       "Authorization": `Bearer ${apiKey}`,
+      ...(await meterHeaders("image-one", url)),
     },
     body: JSON.stringify(payload),
   });
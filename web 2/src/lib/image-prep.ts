@@ -0,0 +1,54 @@
+import crypto from "crypto";
+
+/**
+ * 参考图预处理（仓库根目录 image_prep_service.py）：按目标模型缩到最大有效分辨率、去掉 EXIF 等元数据、重新编码。
+ *
+ * 未配置 IMAGE_PREP_SERVICE_URL 或服务不可用时原样返回，并按 PNG 标注（与预处理前的行为一致）。
+ * 同一进程内按内容哈希记住最近的结果，逐张生成时同一张参考图只发给服务一次。
+ */
+export type PreparedImage = { base64: string; mimeType: string };
+
+type PrepTarget = "dashscope" | "google";
+
+const MAX_REMEMBERED = 32;
+const remembered = new Map<string, PreparedImage>();
+
+export async function prepareReferenceImage(base64: string, target: PrepTarget): Promise<PreparedImage> {
+  const original = { base64, mimeType: "image/png" };
+  const serviceURL = process.env.IMAGE_PREP_SERVICE_URL;
+  if (!serviceURL) return original;
+
+  const key = crypto.createHash("sha256").update(target).update(base64).digest("hex");
+  const hit = remembered.get(key);
+  if (hit) return hit;
+
+  try {
+    const res = await fetch(`${serviceURL.replace(/\/$/, "")}/prepare`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ imageBase64: base64, target }),
+      signal: AbortSignal.timeout(15_000),
+    });
+    const data = await res.json().catch(() => ({}));
+    if (!res.ok || !data.imageBase64) {
+      throw new Error(data.error || `预处理服务失败: ${res.status}`);
+    }
+    console.log(
+      `🖼️ 参考图预处理(${target}): ${Math.round(data.bytesIn / 1024)}KB → ${Math.round(data.bytesOut / 1024)}KB（${data.cache}）`
+    );
+    const prepared = { base64: data.imageBase64 as string, mimeType: data.mimeType as string };
+    remembered.set(key, prepared);
+    if (remembered.size > MAX_REMEMBERED) {
+      remembered.delete(remembered.keys().next().value as string);
+    }
+    return prepared;
+  } catch (e: any) {
+    console.warn("⚠️ 参考图预处理失败，发送原图:", e?.message || e);
+    return original;
+  }
+}
+
+export async function prepareReferenceImages(list: string[] | undefined, target: PrepTarget): Promise<PreparedImage[]> {
+  if (!list || list.length === 0) return [];
+  return Promise.all(list.map((b64) => prepareReferenceImage(b64, target)));
+}
@@ -0,0 +1,217 @@
+import net from "node:net";
+import tls from "node:tls";
+
+/**
+ * 共享临时状态存储（验证码、临时图片等几分钟内有效的数据）。
+ *
+ * - 配置了 KV_URL（redis://[:密码@]host:port[/db]，也认 REDIS_URL / REDIS_URI）时，
+ *   所有副本读写同一个 Redis 协议服务：Zeabur 的 Redis，或仓库根目录 kv_store.py 的本地替身
+ * - 未配置时退回进程内 Map（与原来一样，只适合单副本部署）
+ *
+ * 只用到 GET / SET(PX, NX) / DEL，客户端是一个最小的 RESP 实现：单连接、请求按顺序流水线化，
+ * 断线后下一次调用时重连。
+ */
+export interface KvStore {
+  get(key: string): Promise<string | null>;
+  /** 写入并设置过期毫秒数；nx=true 时仅在键不存在时写入，返回是否写入 */
+  set(key: string, value: string, ttlMs: number, opts?: { nx?: boolean }): Promise<boolean>;
+  del(key: string): Promise<void>;
+}
+
+type RespValue = string | number | null | Error | RespValue[];
+
+const COMMAND_TIMEOUT_MS = Number(process.env.KV_TIMEOUT_MS || 3000);
+
+/** 从 buf[offset] 解析一条回复；数据不完整返回 null */
+function parseReply(buf: Buffer, offset: number): [RespValue, number] | null {
+  const lineEnd = buf.indexOf("\r\n", offset);
+  if (lineEnd < 0) return null;
+  const kind = String.fromCharCode(buf[offset]);
+  const line = buf.toString("utf8", offset + 1, lineEnd);
+  const next = lineEnd + 2;
+  switch (kind) {
+    case "+":
+      return [line, next];
+    case "-":
+      return [new Error(line), next];
+    case ":":
+      return [Number(line), next];
+    case "$": {
+      const size = Number(line);
+      if (size < 0) return [null, next];
+      if (buf.length < next + size + 2) return null;
+      return [buf.toString("utf8", next, next + size), next + size + 2];
+    }
+    case "*": {
+      const count = Number(line);
+      if (count < 0) return [null, next];
+      const items: RespValue[] = [];
+      let pos = next;
+      for (let i = 0; i < count; i++) {
+        const parsed = parseReply(buf, pos);
+        if (!parsed) return null;
+        items.push(parsed[0]);
+        pos = parsed[1];
+      }
+      return [items, pos];
+    }
+    default:
+      throw new Error(`KV 协议错误: 意外的回复类型 ${JSON.stringify(kind)}`);
+  }
+}
+
+function encodeCommand(args: string[]): Buffer {
+  const parts: Buffer[] = [Buffer.from(`*${args.length}\r\n`)];
+  for (const arg of args) {
+    const data = Buffer.from(arg, "utf8");
+    parts.push(Buffer.from(`$${data.length}\r\n`), data, Buffer.from("\r\n"));
+  }
+  return Buffer.concat(parts);
+}
+
+class RespKv implements KvStore {
+  private socket: net.Socket | null = null;
+  private ready: Promise<void> | null = null;
+  private buffer = Buffer.alloc(0);
+  private pending: { resolve: (v: RespValue) => void; reject: (e: Error) => void }[] = [];
+
+  constructor(private url: URL) {}
+
+  private connect(): Promise<void> {
+    if (this.ready) return this.ready;
+    const port = Number(this.url.port || 6379);
+    const host = this.url.hostname;
+    const socket =
+      this.url.protocol === "rediss:" ? tls.connect({ host, port, servername: host }) : net.connect({ host, port });
+    socket.setNoDelay(true);
+    this.socket = socket;
+    this.buffer = Buffer.alloc(0);
+
+    socket.on("data", (chunk) => {
+      this.buffer = this.buffer.length ? Buffer.concat([this.buffer, chunk]) : chunk;
+      let offset = 0;
+      while (offset < this.buffer.length && this.pending.length) {
+        const parsed = parseReply(this.buffer, offset);
+        if (!parsed) break;
+        offset = parsed[1];
+        this.pending.shift()!.resolve(parsed[0]);
+      }
+      this.buffer = this.buffer.subarray(offset);
+    });
+    const fail = (err: Error) => {
+      if (this.socket !== socket) return;
+      this.socket = null;
+      this.ready = null;
+      const waiting = this.pending.splice(0);
+      waiting.forEach((p) => p.reject(err));
+    };
+    socket.on("error", fail);
+    socket.on("close", () => fail(new Error("KV 连接已关闭")));
+
+    this.ready = new Promise<void>((resolve, reject) => {
+      socket.once(this.url.protocol === "rediss:" ? "secureConnect" : "connect", resolve);
+      socket.once("error", reject);
+    }).then(async () => {
+      const password = decodeURIComponent(this.url.password || "");
+      const username = decodeURIComponent(this.url.username || "");
+      if (password) await this.send(username && username !== "default" ? ["AUTH", username, password] : ["AUTH", password]);
+      const db = this.url.pathname.replace("/", "");
+      if (db && db !== "0") await this.send(["SELECT", db]);
+    });
+    this.ready.catch((err) => {
+      fail(err instanceof Error ? err : new Error("KV 连接失败"));
+      socket.destroy();
+    });
+    return this.ready;
+  }
+
+  private send(args: string[]): Promise<RespValue> {
+    const socket = this.socket;
+    if (!socket) return Promise.reject(new Error("KV 未连接"));
+    return new Promise<RespValue>((resolve, reject) => {
+      const timer = setTimeout(() => {
+        // 超时后回复顺序无法再对齐，直接断开，下次调用重连
+        socket.destroy(new Error(`KV 命令超时（${COMMAND_TIMEOUT_MS}ms）: ${args[0]}`));
+      }, COMMAND_TIMEOUT_MS);
+      this.pending.push({
+        resolve: (v) => {
+          clearTimeout(timer);
+          if (v instanceof Error) reject(v);
+          else resolve(v);
+        },
+        reject: (e) => {
+          clearTimeout(timer);
+          reject(e);
+        },
+      });
+      socket.write(encodeCommand(args));
+    });
+  }
+
+  private async command(args: string[]): Promise<RespValue> {
+    await this.connect();
+    return this.send(args);
+  }
+
+  async get(key: string) {
+    const v = await this.command(["GET", key]);
+    return typeof v === "string" ? v : null;
+  }
+
+  async set(key: string, value: string, ttlMs: number, opts?: { nx?: boolean }) {
+    const args = ["SET", key, value, "PX", String(Math.max(1, Math.round(ttlMs)))];
+    if (opts?.nx) args.push("NX");
+    return (await this.command(args)) === "OK";
+  }
+
+  async del(key: string) {
+    await this.command(["DEL", key]);
+  }
+}
+
+class MemoryKv implements KvStore {
+  private map = new Map<string, { value: string; expiresAt: number }>();
+
+  async get(key: string) {
+    const item = this.map.get(key);
+    if (!item) return null;
+    if (Date.now() > item.expiresAt) {
+      this.map.delete(key);
+      return null;
+    }
+    return item.value;
+  }
+
+  async set(key: string, value: string, ttlMs: number, opts?: { nx?: boolean }) {
+    if (opts?.nx && (await this.get(key)) !== null) return false;
+    this.map.set(key, { value, expiresAt: Date.now() + ttlMs });
+    // 顺手清理过期项，代替原来的 setInterval 定时清理
+    if (this.map.size > 1000) {
+      const now = Date.now();
+      for (const [k, v] of this.map.entries()) {
+        if (now > v.expiresAt) this.map.delete(k);
+      }
+    }
+    return true;
+  }
+
+  async del(key: string) {
+    this.map.delete(key);
+  }
+}
+
+function createKv(): KvStore {
+  const raw = process.env.KV_URL || process.env.REDIS_URL || process.env.REDIS_URI || "";
+  if (!raw) return new MemoryKv();
+  return new RespKv(new URL(raw));
+}
+
+const globalForKv = globalThis as unknown as {
+  kv: KvStore | undefined;
+};
+
+export const kv = globalForKv.kv ?? createKv();
+if (process.env.NODE_ENV !== "production") globalForKv.kv = kv;
+
+/** 是否配置了共享存储（未配置时只能单副本运行） */
+export const kvShared = Boolean(process.env.KV_URL || process.env.REDIS_URL || process.env.REDIS_URI);
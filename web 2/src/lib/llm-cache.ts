@@ -0,0 +1,22 @@
+import { getConfig } from "@/lib/system-config";
+
+/**
+ * 文案引擎响应缓存代理（仓库根目录 llm_cache_proxy.py）的请求头。
+ *
+ * - X-LLM-Cache-Route：调用方路由名，代理按路由统计命中率、按 --bypass-route 关闭缓存
+ * - X-LLM-Cache: bypass：LLM_CACHE_BYPASS_ROUTES（后台配置或环境变量，逗号分隔）中的路由不读不写缓存
+ *
+ * 没有接代理时直连上游，这两个头会被忽略。
+ */
+export async function llmCacheHeaders(route: string): Promise<Record<string, string>> {
+  const raw = (await getConfig("LLM_CACHE_BYPASS_ROUTES")) ?? process.env.LLM_CACHE_BYPASS_ROUTES ?? "";
+  const bypass = raw
+    .split(",")
+    .map((r) => r.trim())
+    .filter(Boolean);
+  const headers: Record<string, string> = { "X-LLM-Cache-Route": route };
+  if (bypass.includes(route) || bypass.includes("*")) {
+    headers["X-LLM-Cache"] = "bypass";
+  }
+  return headers;
+}
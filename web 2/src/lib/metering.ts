@@ -0,0 +1,27 @@
+import { getSession } from "@/lib/auth";
+
+/**
+ * 调用计量（仓库根目录 vendor_gateway.py --meter / usage_meter.py）的请求头。
+ *
+ * - X-Meter-Route：调用方接口名，成本按接口汇总进 UsageDaily
+ * - X-Meter-User：当前登录用户，成本按用户汇总进 UsageUserDaily
+ *
+ * 网关转发前会去掉这两个头。直连供应商时这两个头会原样发给第三方（含用户 ID），
+ * 所以只有配置了 VENDOR_GATEWAY_URL（网关地址；经文案缓存代理时填代理地址，多个用逗号分隔）
+ * 且本次请求的 baseURL 指向其中之一时才返回，否则返回空对象。
+ */
+export async function meterHeaders(route: string, baseURL?: string): Promise<Record<string, string>> {
+  const gateways = (process.env.VENDOR_GATEWAY_URL || "")
+    .split(",")
+    .map((u) => u.trim().replace(/\/+$/, ""))
+    .filter(Boolean);
+  if (!gateways.length) return {};
+  if (baseURL && !gateways.some((g) => baseURL === g || baseURL.startsWith(`${g}/`))) return {};
+
+  const headers: Record<string, string> = { "X-Meter-Route": route };
+  const session = await getSession().catch(() => null);
+  if (session?.userId) {
+    headers["X-Meter-User"] = String(session.userId);
+  }
+  return headers;
+}
@@ -4,11 +4,12 @@ const globalForPrisma = globalThis as unknown as {
   prisma: PrismaClient | undefined;
 };
 
+// 全进程只用这一个客户端（即一个连接池）；生产环境也缓存到 globalThis，避免不同路由的打包产物各建一个。
+// 连接池大小由 DATABASE_URL 的 connection_limit 控制，经 PgBouncer / db_pool.py 时需带 pgbouncer=true（见 docs/DEPLOY_ENV.md）
 export const prisma =
   globalForPrisma.prisma ??
   new PrismaClient({
     log: process.env.NODE_ENV === "development" ? ["query", "error", "warn"] : ["error"],
   });
 
-if (process.env.NODE_ENV !== "production") globalForPrisma.prisma = prisma;
-
+globalForPrisma.prisma = prisma;
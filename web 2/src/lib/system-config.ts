@@ -0,0 +1,121 @@
+import crypto from "crypto";
+import { prisma } from "@/lib/prisma";
+
+/**
+ * SystemConfig 快照缓存：整张表一次性读成 { key: value }，按版本缓存在进程内。
+ *
+ * 来源优先级：
+ * - 部署时注入的 SYSTEM_CONFIG_SNAPSHOT（base64 JSON，由仓库根目录 config_snapshot.py 生成），冷启动无需查库
+ * - 数据库 findMany（单次查询拿全部 key）
+ *
+ * 缓存过期（SYSTEM_CONFIG_TTL_MS，默认 30s）后在后台刷新，请求不等待数据库；
+ * 后台保存配置的接口会调用 invalidateSystemConfig() 立即失效本进程缓存。
+ */
+
+type Snapshot = {
+  version: string;
+  values: Record<string, string>;
+  source: "env" | "db";
+  expiresAt: number;
+};
+
+const TTL_MS = Number(process.env.SYSTEM_CONFIG_TTL_MS || 30_000);
+
+const globalForConfig = globalThis as unknown as {
+  systemConfigSnapshot?: Snapshot | null;
+  systemConfigLoading?: Promise<Snapshot> | null;
+  systemConfigGeneration?: number;
+};
+
+/** 与 config_snapshot.py 一致：按 key 排序后的紧凑 JSON 取 sha256 前 12 位 */
+export function computeConfigVersion(values: Record<string, string>) {
+  const sorted: Record<string, string> = {};
+  Object.keys(values)
+    .sort()
+    .forEach((k) => {
+      sorted[k] = values[k];
+    });
+  return crypto.createHash("sha256").update(JSON.stringify(sorted), "utf8").digest("hex").slice(0, 12);
+}
+
+function snapshotFromEnv(): Snapshot | null {
+  const raw = process.env.SYSTEM_CONFIG_SNAPSHOT;
+  if (!raw) return null;
+  try {
+    const parsed = JSON.parse(Buffer.from(raw, "base64").toString("utf8")) as {
+      version?: string;
+      values?: Record<string, string>;
+    };
+    if (!parsed?.values || typeof parsed.values !== "object") return null;
+    return {
+      version: parsed.version || computeConfigVersion(parsed.values),
+      values: parsed.values,
+      source: "env",
+      expiresAt: Date.now() + TTL_MS,
+    };
+  } catch (e: any) {
+    console.warn("⚠️ SYSTEM_CONFIG_SNAPSHOT 解析失败，改为查库:", e?.message);
+    return null;
+  }
+}
+
+async function loadFromDb(): Promise<Snapshot> {
+  const rows = await prisma.systemConfig.findMany({ select: { key: true, value: true } });
+  const values: Record<string, string> = {};
+  rows.forEach((r) => {
+    values[r.key] = r.value;
+  });
+  return { version: computeConfigVersion(values), values, source: "db", expiresAt: Date.now() + TTL_MS };
+}
+
+function refresh(): Promise<Snapshot> {
+  // 单飞：并发请求共用同一次查库
+  if (!globalForConfig.systemConfigLoading) {
+    const generation = globalForConfig.systemConfigGeneration || 0;
+    const loading: Promise<Snapshot> = loadFromDb()
+      .then((snap) => {
+        // 加载期间被 invalidate 过：结果可能是旧数据，不写回缓存
+        if ((globalForConfig.systemConfigGeneration || 0) !== generation) return snap;
+        const prev = globalForConfig.systemConfigSnapshot;
+        if (prev && prev.version !== snap.version) {
+          console.log(`🔄 SystemConfig 版本变更: ${prev.version} → ${snap.version}`);
+        }
+        globalForConfig.systemConfigSnapshot = snap;
+        return snap;
+      })
+      .finally(() => {
+        if (globalForConfig.systemConfigLoading === loading) globalForConfig.systemConfigLoading = null;
+      });
+    globalForConfig.systemConfigLoading = loading;
+  }
+  return globalForConfig.systemConfigLoading;
+}
+
+export async function getConfigSnapshot(): Promise<Snapshot> {
+  let snap = globalForConfig.systemConfigSnapshot;
+  if (snap === undefined) {
+    snap = snapshotFromEnv();
+    globalForConfig.systemConfigSnapshot = snap;
+  }
+  if (!snap) return refresh();
+  if (Date.now() > snap.expiresAt) {
+    // 过期：先返回旧快照，后台刷新
+    refresh().catch((e) => console.warn("⚠️ SystemConfig 刷新失败，继续使用旧快照:", e?.message));
+  }
+  return snap;
+}
+
+export async function getConfig(key: string): Promise<string | null> {
+  try {
+    const snap = await getConfigSnapshot();
+    return snap.values[key] ?? null;
+  } catch {
+    return null;
+  }
+}
+
+export function invalidateSystemConfig() {
+  globalForConfig.systemConfigGeneration = (globalForConfig.systemConfigGeneration || 0) + 1;
+  globalForConfig.systemConfigSnapshot = null;
+  globalForConfig.systemConfigLoading = null;
+}
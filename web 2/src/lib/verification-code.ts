@@ -0,0 +1,24 @@
+import { kv } from "@/lib/kv";
+
+// 验证码有效期：5分钟；同一手机号 60 秒内只能发送一次
+export const CODE_EXPIRES_IN = 5 * 60 * 1000;
+export const RESEND_INTERVAL = 60 * 1000;
+
+export const DEFAULT_CODE = process.env.DEV_FIXED_CODE || "1234";
+
+// 存在共享存储里（lib/kv.ts），多副本部署时任一副本发的码都能在其它副本校验
+export const codeKey = (phone: string) => `sms:code:${phone}`;
+export const cooldownKey = (phone: string) => `sms:cooldown:${phone}`;
+
+/**
+ * 验证验证码（供登录 API 使用）；验证成功后删除（一次性使用）
+ */
+export async function verifyCode(phone: string, code: string): Promise<boolean> {
+  if (code === DEFAULT_CODE) return true;
+  const cached = await kv.get(codeKey(phone));
+  if (!cached || cached !== code) {
+    return false;
+  }
+  await kv.del(codeKey(phone));
+  return true;
+}
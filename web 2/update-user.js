@@ -1,3 +1,4 @@
+// 单个用户改额度的旧脚本；批量调整请用仓库根目录的 python3 user_credits.py apply <csv/jsonl>
 const { PrismaClient } = require('@prisma/client');
 const prisma = new PrismaClient();
 
@@ -0,0 +1 @@
+"""小红书内容生成器运维命令（xhs-ops），导入本包没有任何副作用"""
@@ -0,0 +1,307 @@
+"""
+xhs-ops bluegreen：蓝绿发布，预热新部署后再切换域名
+
+普通 redeploy 会先停旧部署，用户随后打到冷启动的新进程（Prisma 引擎加载、首次建连、
+路由模块首次加载）。蓝绿发布改为：
+
+  1. 找到一对应用服务（当前绑定 --domain 的为在线服务，另一个为备用服务）
+  2. 执行发布前迁移，把在线服务的环境变量同步给备用服务，重新部署备用服务并等待运行
+  3. 并发请求 src/app/api 下的 GET 路由和 WARM_POST_ROUTES 里的 POST 路由，逐轮统计 p95，直到连续几轮稳定
+  4. 把域名从在线服务解绑、绑定到备用服务，复测首个请求的延迟
+     （Zeabur 同一域名不能同时绑定两个服务，解绑与绑定之间有一两秒空档；绑定失败会重试，仍失败才改回原服务）
+  5. 等待 --drain 秒后停止旧服务的部署，它成为下一次发布的备用服务
+
+备用服务需要提前在 Zeabur 控制台用同一仓库创建一次（缺省取在线服务名对应的 -blue/-green，
+否则为 <名称>-standby，或用 --standby 指定）。只预热某个地址可用 --warm-only URL。
+"""
+
+import json
+import os
+import re
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import zeabur_api
+from credential_smoke import percentile
+from xhs_ops.common import locate
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_DIR = os.path.join(ROOT_DIR, "web 2", "src", "app", "api")
+# 预热时跳过的路由：会真实调用付费接口
+SKIP_PREFIXES = ("/api/test/",)
+HEALTH_PATH = "/api/health"
+# 允许预热的 POST 路由：处理函数第一步就是在 try 里 await req.json()，发不合法的 JSON 会在解析时
+# 直接进 catch 返回 4xx/5xx，不碰数据库也不调上游。新增路由需确认满足这一点再加进来
+# （例如 /api/user/deduct 不读请求体，绝不能加）。这些路由的任何响应都算"已预热"，不计入失败。
+WARM_POST_ROUTES = (
+    "/api/admin/config",
+    "/api/admin/credential-store",
+    "/api/admin/providers",
+    "/api/admin/users",
+    "/api/auth/admin/login",
+    "/api/auth/login",
+    "/api/auth/register",
+    "/api/auth/send-code",
+    "/api/download/images",
+    "/api/generate/copy",
+    "/api/generate/image-prompts",
+    "/api/generate/images",
+    "/api/temp-image",
+)
+BIND_ATTEMPTS = 3
+BIND_RETRY_DELAY = 2.0
+RUNNING_STATUSES = ("RUNNING",)
+FAILED_STATUSES = ("FAILED", "ERROR", "CRASHED", "REMOVED")
+METHOD_RE = re.compile(r"export\s+(?:async\s+)?function\s+(GET|POST|PUT|PATCH|DELETE)\b")
+
+
+def discover_routes(api_dir=API_DIR):
+    """
+    扫描 route.ts 得到预热请求 [{path, method, body}]：
+    GET 直接请求；POST 只预热 WARM_POST_ROUTES 里的路由，发一个不合法的 JSON；
+    其它 POST 与 PUT/PATCH/DELETE 不预热。动态段 [id] 用 warmup 代替。
+    """
+    routes = []
+    for dirpath, _, files in os.walk(api_dir):
+        if "route.ts" not in files:
+            continue
+        rel = os.path.relpath(dirpath, api_dir).replace(os.sep, "/")
+        path = "/api" + ("" if rel == "." else "/" + re.sub(r"\[\.{0,3}[^\]]+\]", "warmup", rel))
+        if path.startswith(SKIP_PREFIXES):
+            continue
+        with open(os.path.join(dirpath, "route.ts"), "r", encoding="utf-8") as f:
+            methods = set(METHOD_RE.findall(f.read()))
+        if "GET" in methods:
+            routes.append({"path": path, "method": "GET", "body": None})
+        if "POST" in methods and path in WARM_POST_ROUTES:
+            routes.append({"path": path, "method": "POST", "body": b"{"})
+    if not any(r["path"] == HEALTH_PATH for r in routes):
+        routes.append({"path": HEALTH_PATH, "method": "GET", "body": None})
+    return sorted(routes, key=lambda r: (r["path"], r["method"]))
+
+
+def _request(base_url, route, timeout):
+    req = urllib.request.Request(base_url.rstrip("/") + route["path"], data=route["body"], method=route["method"],
+                                 headers={"Content-Type": "application/json", "X-Warmup": "1"})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        status = e.code
+    except (urllib.error.URLError, OSError) as e:
+        return {"route": route, "status": 0, "ms": (time.perf_counter() - started) * 1000, "error": str(e)[:80]}
+    return {"route": route, "status": status, "ms": (time.perf_counter() - started) * 1000}
+
+
+def warm(base_url, routes, concurrency=8, repeat=4, min_rounds=3, max_rounds=12, tolerance=0.15,
+         settle_rounds=2, floor_ms=20.0, timeout=60):
+    """
+    逐轮预热：每轮把每个路由请求 repeat 次、concurrency 路并发；第一轮每个路由的首个请求记为冷启动延迟。
+    失败只算连接失败和 GET 的 5xx：预热 POST 发的是不合法请求体，返回 4xx/5xx 是预期结果。
+    最近 settle_rounds 轮的 p95 相对上一轮变化都不超过 tolerance（或绝对值不超过 floor_ms）时视为稳定。
+    """
+    rounds, first_hits = [], {}
+    settled_streak = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for n in range(1, max_rounds + 1):
+            batch = [r for r in routes for _ in range(repeat)]
+            results = list(pool.map(lambda r: _request(base_url, r, timeout), batch))
+            for res in results:
+                key = (res["route"]["method"], res["route"]["path"])
+                first_hits.setdefault(key, res)
+            latencies = [res["ms"] for res in results if res["status"]]
+            failures = [res for res in results
+                        if not res["status"] or (res["route"]["method"] == "GET" and res["status"] >= 500)]
+            p95 = percentile(latencies, 95) or 0.0
+            prev = rounds[-1]["p95"] if rounds else None
+            change = (p95 - prev) / prev if prev else None
+            stable = change is not None and (abs(change) <= tolerance or abs(p95 - prev) <= floor_ms)
+            settled_streak = settled_streak + 1 if stable else 0
+            rounds.append({"round": n, "p50": percentile(latencies, 50) or 0.0, "p95": p95, "change": change,
+                           "failures": len(failures), "first_failure": failures[0] if failures else None})
+            change_text = f"{change:+.0%}" if change is not None else "-"
+            print(f"   🔥 第 {n} 轮：{len(results)} 个请求，p50 {rounds[-1]['p50']:.0f}ms，p95 {p95:.0f}ms"
+                  f"（较上轮 {change_text}），5xx/失败 {len(failures)}")
+            if n >= min_rounds and settled_streak >= settle_rounds:
+                break
+    return {"rounds": rounds, "settled": settled_streak >= settle_rounds,
+            "steady_p95": rounds[-1]["p95"] if rounds else None,
+            "first_hits": sorted(first_hits.values(), key=lambda r: -r["ms"])}
+
+
+def print_first_hits(first_hits, limit=8):
+    print("   🧊 首个请求最慢的路由：")
+    for res in first_hits[:limit]:
+        route = res["route"]
+        print(f"      {res['ms']:7.0f}ms  {res['status'] or 'ERR':>3}  {route['method']:<4} {route['path']}")
+
+
+def probe(base_url, routes, timeout=60):
+    """切换后每个 GET 路由各请求一次，得到用户真实看到的首个请求延迟"""
+    gets = [r for r in routes if r["method"] == "GET"]
+    with ThreadPoolExecutor(max_workers=max(1, len(gets))) as pool:
+        results = list(pool.map(lambda r: _request(base_url, r, timeout), gets))
+    return [res["ms"] for res in results if res["status"]]
+
+
+# ---------------- Zeabur 编排 ----------------
+
+def standby_name(name):
+    for a, b in (("-blue", "-green"), ("-green", "-blue")):
+        if name.endswith(a):
+            return name[: -len(a)] + b
+    return name + "-standby"
+
+
+def find_pair(services, app, standby=None, domain=None):
+    """返回 (在线服务, 备用服务)：绑定 domain 的是在线服务"""
+    name = standby or os.getenv("ZEABUR_STANDBY_SERVICE") or standby_name(app["name"])
+    other = next((s for s in services if s["name"].lower() == name.lower()), None)
+    if not other:
+        raise zeabur_api.ZeaburError(
+            f"未找到备用服务 '{name}'：请在 Zeabur 控制台用同一仓库创建它（或用 --standby 指定）")
+    if domain and any(d["domain"] == domain for d in zeabur_api.service_domains(other["_id"])):
+        return other, app
+    return app, other
+
+
+def custom_domain(service_id):
+    return next((d["domain"] for d in zeabur_api.service_domains(service_id) if not d.get("isGenerated")), None)
+
+
+def generated_url(service_id):
+    domain = next((d["domain"] for d in zeabur_api.service_domains(service_id) if d.get("isGenerated")), None)
+    return f"https://{domain}" if domain else None
+
+
+def wait_running(service_id, previous, timeout, interval):
+    deadline = time.monotonic() + timeout
+    last_status = None
+    while time.monotonic() < deadline:
+        deployments = zeabur_api.service_deployments(service_id).get("deployments") or []
+        latest = deployments[0] if deployments else None
+        if latest and latest["_id"] != previous:
+            status = str(latest.get("status", "")).upper()
+            if status != last_status:
+                print(f"   ⏳ 部署 {latest['_id'][:8]} 状态: {status}")
+                last_status = status
+            if status in RUNNING_STATUSES:
+                return latest
+            if status in FAILED_STATUSES:
+                raise zeabur_api.ZeaburError(f"备用服务部署失败（{status}），请在 Zeabur 控制台查看构建日志")
+        time.sleep(interval)
+    raise zeabur_api.ZeaburError(f"等待备用服务部署超时（{timeout}s），最后状态: {last_status}")
+
+
+def bind_domain(service_id, domain, attempts=BIND_ATTEMPTS, delay=BIND_RETRY_DELAY):
+    """绑定域名，失败按间隔重试（刚解绑时 Zeabur 侧可能短暂仍占用该域名）"""
+    for attempt in range(1, attempts + 1):
+        try:
+            zeabur_api.add_domain(service_id, domain)
+            return
+        except zeabur_api.ZeaburError as e:
+            if attempt == attempts:
+                raise
+            print(f"   ⚠️  绑定失败（第 {attempt} 次）：{e}，{delay:.0f}s 后重试")
+            time.sleep(delay)
+
+
+def warm_options(args):
+    return dict(concurrency=args.concurrency, repeat=args.repeat, max_rounds=args.max_rounds,
+                tolerance=args.tolerance)
+
+
+def run_warm_only(args, routes):
+    print(f"🔥 预热 {args.warm_only}（{len(routes)} 个路由）")
+    report = warm(args.warm_only, routes, **warm_options(args))
+    print_first_hits(report["first_hits"])
+    after = probe(args.warm_only, routes)
+    print(f"\n   预热后首个请求 p95 {percentile(after, 95) or 0:.0f}ms，稳态 p95 {report['steady_p95']:.0f}ms，"
+          f"{'已稳定' if report['settled'] else '未稳定'}")
+    if args.json:
+        print(json.dumps({"rounds": report["rounds"], "settled": report["settled"],
+                          "probe_p95": percentile(after, 95)}, ensure_ascii=False, default=str))
+    return 0 if report["settled"] else 1
+
+
+def run(args):
+    routes = discover_routes()
+    if args.warm_only:
+        return run_warm_only(args, routes)
+
+    project, services, app = locate(args)
+    domain = args.domain or os.getenv("APP_DOMAIN") or custom_domain(app["_id"])
+    if not domain:
+        raise zeabur_api.ZeaburError("未找到要切换的自定义域名，请用 --domain 指定")
+    live, standby = find_pair(services, app, args.standby, domain)
+    print(f"\n🔵 在线服务: {live['name']}（{domain}）")
+    print(f"🟢 备用服务: {standby['name']}")
+    print(f"📋 预热路由 {len(routes)} 个：" + ", ".join(f"{r['method']} {r['path']}" for r in routes[:6])
+          + (" ..." if len(routes) > 6 else ""))
+    if args.dry_run:
+        print("\nℹ️  dry-run：不迁移、不部署、不切换")
+        return 0
+
+    if not args.skip_migrate:
+        from xhs_ops.redeploy import run_release_migrations
+        print("\n🗄️  检查数据库迁移...")
+        if not run_release_migrations(services):
+            print("💡 迁移失败时不发布，修复后重新执行")
+            return 1
+
+    print("\n🔧 同步环境变量到备用服务...")
+    live_env = zeabur_api.service_env(live["_id"])
+    zeabur_api.replace_variables(project["_id"], standby["_id"],
+                                 [{"name": k, "value": v} for k, v in live_env.items()])
+
+    print("🚀 重新部署备用服务...")
+    before = zeabur_api.service_deployments(standby["_id"]).get("deployments") or []
+    zeabur_api.redeploy_service(standby["_id"])
+    wait_running(standby["_id"], before[0]["_id"] if before else None, args.watch_timeout, args.poll_interval)
+
+    standby_url = args.standby_url or generated_url(standby["_id"])
+    if not standby_url:
+        raise zeabur_api.ZeaburError("备用服务没有 Zeabur 生成的域名，无法预热，请用 --standby-url 指定")
+    print(f"\n🔥 预热 {standby_url}")
+    report = warm(standby_url, routes, **warm_options(args))
+    print_first_hits(report["first_hits"])
+    failing = report["rounds"][-1]["failures"]
+    if not report["settled"] or failing:
+        reason = f"最后一轮仍有 {failing} 个 5xx/失败" if failing else "p95 没有稳定下来"
+        if not args.force:
+            print(f"\n❌ {reason}，不切换域名（在线服务未受影响；确认无误可加 --force）")
+            return 1
+        print(f"\n⚠️  {reason}，按 --force 继续切换")
+
+    # Zeabur 不允许同一域名同时绑定两个服务，只能先解绑再绑定；两步紧挨着执行，空档通常在一两秒内
+    print(f"\n🔀 切换域名 {domain}: {live['name']} → {standby['name']}")
+    unbound_at = time.monotonic()
+    zeabur_api.remove_domain(domain)
+    try:
+        bind_domain(standby["_id"], domain)
+    except zeabur_api.ZeaburError:
+        print("   ↩️  绑定新服务失败，域名改回原服务")
+        bind_domain(live["_id"], domain)
+        raise
+    print(f"   域名未绑定的空档 {time.monotonic() - unbound_at:.1f}s")
+    after = probe(f"https://{domain}", routes)
+    print(f"   切换后首个请求 p95 {percentile(after, 95) or 0:.0f}ms（预热稳态 p95 {report['steady_p95']:.0f}ms）")
+
+    if args.keep_old:
+        print(f"\nℹ️  保留旧服务 {live['name']} 的部署（--keep-old）")
+    else:
+        print(f"\n⏳ 等待 {args.drain}s 让旧服务处理完进行中的请求...")
+        time.sleep(args.drain)
+        running = [d for d in zeabur_api.service_deployments(live["_id"]).get("deployments") or []
+                   if str(d.get("status", "")).upper() in RUNNING_STATUSES]
+        for d in running:
+            zeabur_api.stop_deployment(d["_id"])
+        print(f"🛑 已停止旧服务 {live['name']} 的 {len(running)} 个部署（下次发布时作为备用服务）")
+
+    print(f"\n✨ 蓝绿发布完成！在线服务: {standby['name']}")
+    return 0
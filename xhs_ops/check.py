@@ -0,0 +1,123 @@
+"""xhs-ops check：部署状态检查，--detailed 时附带连通性测试、关键环境变量与问题诊断"""
+
+import zeabur_api
+from xhs_ops.common import locate, mask_value, print_logs
+
+REQUIRED_VARS = ["DATABASE_URL", "JWT_SECRET", "NODE_ENV", "PORT", "GOOGLE_API_KEY"]
+STATUS_ICONS = {"RUNNING": "🟢", "BUILDING": "🟡"}
+
+
+def check_required_vars(envs):
+    """返回缺失（未设置或仍是占位值）的关键变量"""
+    from deploy_env import is_placeholder
+
+    missing = []
+    for var in REQUIRED_VARS:
+        value = envs.get(var, "")
+        if is_placeholder(value) or value == "从PostgreSQL服务复制" or "你的" in value:
+            print(f"     ❌ {var} - 未设置或值无效")
+            missing.append(var)
+        else:
+            print(f"     ✅ {var} = {mask_value(var, value)[:30]}")
+    return missing
+
+
+def print_summary(status, missing):
+    print("\n" + "=" * 60)
+    print("📋 检查总结")
+    print("=" * 60)
+    if status == "RUNNING":
+        print("✅ 服务状态: 运行中")
+        print("✅ 部署应该已经成功！")
+    elif status == "BUILDING":
+        print("🟡 服务状态: 构建中")
+        print("⏳ 请等待构建完成...")
+    elif status in ("FAILED", "ERROR"):
+        print("🔴 服务状态: 失败")
+        print("❌ 部署失败，请检查:")
+        if missing:
+            print(f"   - 缺少环境变量: {', '.join(missing)}")
+        print("   - 执行 xhs-ops logs 查看构建日志")
+        print("   - 检查启动命令是否正确")
+    else:
+        print(f"⚠️  服务状态: {status}")
+
+    print("\n💡 建议:")
+    print("  1. 执行 xhs-ops logs -f 或在 Zeabur 控制台查看详细的构建日志")
+    print("  2. 确认所有环境变量都已正确配置")
+    print("  3. 检查启动命令是否正确")
+    print("  4. 如果构建失败，查看错误信息并修复")
+    print("\n" + "=" * 60)
+
+
+def run(args):
+    if args.detailed:
+        print("=" * 60)
+        print("🔍 Zeabur 部署状态检查")
+        print("=" * 60)
+        print("\n📡 测试 API 连接...")
+        try:
+            zeabur_api.ping()
+        except zeabur_api.ZeaburError as e:
+            print(f"\n❌ 无法连接到 Zeabur API: {e}")
+            print("\n可能的原因:")
+            print("  1. 网络连接问题（防火墙/代理）")
+            print("  2. API 密钥无效或过期")
+            print("  3. Zeabur API 服务暂时不可用")
+            return 1
+        print("  ✅ API 连接成功\n")
+    else:
+        print("🔍 检查部署状态...\n")
+
+    _, services, app = locate(args, fallback_first=args.detailed)
+
+    print(f"\n✅ 找到 {len(services)} 个服务:")
+    for s in services:
+        status = s.get("status", "unknown")
+        icon = STATUS_ICONS.get(status, "🔴") if args.detailed else "-"
+        print(f"  {icon} {s['name']} ({s.get('type')}) - 状态: {status} - ID: {s['_id']}")
+
+    print(f"\n📦 检查应用服务: {app['name']}\n")
+    detail = zeabur_api.service_deployments(app["_id"], with_logs=True)
+    envs = zeabur_api.service_env(app["_id"])
+    status = detail.get("status", "unknown")
+    deployments = detail.get("deployments") or []
+
+    print(f"📊 服务状态: {status}")
+    print(f"📦 部署次数: {len(deployments)}")
+
+    missing = []
+    if args.detailed:
+        print(f"🔧 环境变量数量: {len(envs)}")
+        print("\n  🔍 检查关键环境变量:")
+        missing = check_required_vars(envs)
+        if missing:
+            print(f"\n  ⚠️  缺少关键环境变量: {', '.join(missing)}")
+
+    if deployments:
+        latest = deployments[0]
+        print("\n🕐 最新部署:")
+        print(f"   - ID: {latest.get('_id', 'unknown')}")
+        print(f"   - 状态: {latest.get('status', 'unknown')}")
+        print(f"   - 创建时间: {latest.get('createdAt', 'unknown')}")
+        print(f"   - 更新时间: {latest.get('updatedAt', 'unknown')}")
+        logs = latest.get("logs") or []
+        if logs:
+            print(f"\n📝 最新日志 (最后 {args.log_lines} 条):")
+            print_logs(logs, args.log_lines)
+        else:
+            print("\n⚠️  没有日志记录")
+
+    if not args.detailed:
+        print(f"\n🔧 环境变量数量: {len(envs)}")
+        if envs:
+            print("   已配置的环境变量:")
+            for name, value in list(envs.items())[:10]:
+                print(f"   - {name} = {mask_value(name, value)}")
+            if len(envs) > 10:
+                print(f"   ... 还有 {len(envs) - 10} 个环境变量")
+        print("\n✅ 检查完成！")
+        return 0
+
+    print_summary(status, missing)
+    return 0
@@ -0,0 +1,116 @@
+"""
+xhs-ops 统一运维入口
+
+  xhs-ops deploy      配置环境变量、执行迁移并触发部署（原 deploy_zeabur.py）
+  xhs-ops check       查看部署状态（原 check_deployment.py，--detailed 为详细诊断）
+  xhs-ops redeploy    执行迁移后重新部署（原 trigger_redeploy.py）
+  xhs-ops stop        停止运行中的部署（原 stop_deployments.py）
+  xhs-ops logs        查看 / 跟随最新部署日志
+  xhs-ops trace       从运行日志还原生成请求的分段耗时
+  xhs-ops bluegreen   蓝绿发布：部署备用服务、预热全部接口后切换域名
+
+启动开销：本模块只依赖 argparse / importlib，子命令的实现模块（以及 requests 等
+重依赖）在分发到该子命令时才导入；--help 与参数错误不会触发任何网络库导入。
+启动预算由 bench_startup.py 校验。
+"""
+
+import argparse
+import importlib
+
+# 子命令 → (实现模块, 说明)；模块在执行时才导入，需提供 run(args) -> int
+COMMANDS = {
+    "deploy": ("xhs_ops.deploy", "配置环境变量、执行迁移并触发部署"),
+    "check": ("xhs_ops.check", "查看部署状态与最新日志"),
+    "redeploy": ("xhs_ops.redeploy", "执行迁移后重新部署"),
+    "stop": ("xhs_ops.stop", "停止运行中的部署"),
+    "logs": ("xhs_ops.logs", "查看最新部署日志"),
+    "trace": ("xhs_ops.trace", "从运行日志还原生成请求的分段耗时"),
+    "bluegreen": ("xhs_ops.bluegreen", "蓝绿发布：部署备用服务、预热后切换域名"),
+}
+
+
+def add_global_options(parser, default=None):
+    parser.add_argument("--project", default=default, help="Zeabur 项目名（缺省 ZEABUR_PROJECT 或 xhs）")
+    parser.add_argument("--service", default=default, help="应用服务名（缺省 ZEABUR_SERVICE，或按名称/类型自动识别）")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="xhs-ops", description="小红书内容生成器 Zeabur 运维工具")
+    add_global_options(parser)
+    # 子命令也接受全局参数，兼容入口（check_deployment.py 等）会把子命令放在最前面；
+    # 子命令里用 SUPPRESS，避免没写时用 None 覆盖写在子命令前面的值
+    common = argparse.ArgumentParser(add_help=False)
+    add_global_options(common, default=argparse.SUPPRESS)
+    sub = parser.add_subparsers(dest="command", metavar="<command>")
+
+    def add(name):
+        return sub.add_parser(name, parents=[common], help=COMMANDS[name][1], description=COMMANDS[name][1])
+
+    p = add("deploy")
+    p.add_argument("--merge-env", action="store_true",
+                   help="以线上变量为底合并（默认整体替换，未列出的线上变量会被删除）")
+    p.add_argument("--skip-migrate", action="store_true", help="跳过发布前迁移")
+    p.add_argument("--root-directory", help="同时设置服务的根目录")
+
+    p = add("check")
+    p.add_argument("--detailed", action="store_true", help="详细诊断：API 连通性、关键环境变量、总结建议")
+    p.add_argument("--log-lines", type=int, default=20, help="显示的日志条数（默认 20）")
+
+    p = add("redeploy")
+    p.add_argument("--skip-migrate", action="store_true", help="跳过发布前迁移")
+
+    p = add("stop")
+    p.add_argument("--dry-run", action="store_true", help="只列出运行中的部署，不停止")
+
+    p = add("logs")
+    p.add_argument("--deployment", help="部署 ID（缺省最新一次）")
+    p.add_argument("-n", "--tail", type=int, default=50, help="显示最后 N 条（默认 50）")
+    p.add_argument("-f", "--follow", action="store_true", help="持续轮询新日志，Ctrl+C 退出")
+    p.add_argument("--interval", type=float, default=5.0, help="--follow 的轮询间隔秒数（默认 5）")
+    p.add_argument("--grep", help="只显示包含该文本的日志")
+
+    p = add("trace")
+    p.add_argument("--file", help="读取本地日志文件（xhs-ops logs 的输出或 JSONL），不查询 Zeabur")
+    p.add_argument("--deployment", help="部署 ID（缺省最新一次）")
+    p.add_argument("--route", choices=("images", "copy", "image-one", "generate", "download"), help="只看某个接口")
+    p.add_argument("--slowest", type=int, default=5, help="列出最慢的 N 个请求的时间线（默认 5）")
+    p.add_argument("--json", action="store_true", help="以 JSON 输出汇总")
+
+    p = add("bluegreen")
+    p.add_argument("--domain", help="要切换的自定义域名（缺省 APP_DOMAIN 或应用服务绑定的第一个自定义域名）")
+    p.add_argument("--standby", help="备用服务名（缺省 ZEABUR_STANDBY_SERVICE，或 -blue/-green 对应名、<名称>-standby）")
+    p.add_argument("--standby-url", help="备用服务的访问地址（缺省取 Zeabur 生成的域名）")
+    p.add_argument("--warm-only", metavar="URL", help="只预热该地址并报告延迟，不部署、不切换")
+    p.add_argument("--concurrency", type=int, default=8, help="预热并发数（默认 8）")
+    p.add_argument("--repeat", type=int, default=4, help="每轮每个路由的请求次数（默认 4）")
+    p.add_argument("--max-rounds", type=int, default=12, help="最多预热几轮（默认 12）")
+    p.add_argument("--tolerance", type=float, default=0.15, help="p95 轮间变化不超过该比例视为稳定（默认 0.15）")
+    p.add_argument("--force", action="store_true", help="p95 未稳定也切换")
+    p.add_argument("--drain", type=float, default=30.0, help="切换后等待多少秒再停止旧服务（默认 30）")
+    p.add_argument("--keep-old", action="store_true", help="切换后不停止旧服务")
+    p.add_argument("--skip-migrate", action="store_true", help="跳过发布前迁移")
+    p.add_argument("--watch-timeout", type=int, default=900, help="等待备用服务部署完成的超时（秒）")
+    p.add_argument("--poll-interval", type=float, default=10.0)
+    p.add_argument("--dry-run", action="store_true", help="只显示在线/备用服务与预热路由")
+    p.add_argument("--json", action="store_true", help="--warm-only 时额外输出 JSON")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.command:
+        parser.print_help()
+        return 1
+
+    from zeabur_api import ZeaburError
+
+    module = importlib.import_module(COMMANDS[args.command][0])
+    try:
+        return module.run(args)
+    except ZeaburError as e:
+        print(f"❌ {e}")
+        return 1
+    except KeyboardInterrupt:
+        print("\n已中断")
+        return 130
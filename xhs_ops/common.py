@@ -0,0 +1,50 @@
+"""子命令共用的定位与输出逻辑"""
+
+import zeabur_api
+
+SENSITIVE_MARKERS = ("KEY", "SECRET", "PASSWORD", "TOKEN", "DATABASE_URL")
+
+
+def locate(args, fallback_first=False, verbose=True):
+    """
+    找到项目、全部服务与应用服务，返回 (project, services, app)。
+    fallback_first=True 时找不到匹配的项目/服务就用第一个（与旧的 stop/redeploy 脚本一致）。
+    """
+    if verbose:
+        print("📋 获取项目列表...")
+    project = zeabur_api.find_project(args.project, fallback_first=fallback_first)
+    if verbose:
+        print(f"✅ 找到项目: {project['name']} (ID: {project['_id']})")
+        print("📋 获取服务列表...")
+    services = zeabur_api.list_services(project["_id"])
+    if not services:
+        raise zeabur_api.ZeaburError("项目中没有服务，请先在 Zeabur 控制台创建服务")
+    app = zeabur_api.find_app_service(services, args.service)
+    if not app and fallback_first:
+        app = services[0]
+    if not app:
+        raise zeabur_api.ZeaburError(f"未找到应用服务，可用服务: {[s['name'] for s in services]}")
+    if verbose:
+        print(f"✅ 找到服务: {app['name']} (ID: {app['_id']})")
+    return project, services, app
+
+
+def database_url_for(services):
+    """从 PostgreSQL 服务读取 DATABASE_URL，找不到返回空字符串"""
+    postgres = zeabur_api.find_postgres(services)
+    if not postgres:
+        return ""
+    return zeabur_api.service_env(postgres["_id"]).get("DATABASE_URL", "")
+
+
+def mask_value(name, value):
+    if any(m in name for m in SENSITIVE_MARKERS):
+        return value[:10] + "..." if len(value) > 10 else "***"
+    return value
+
+
+def print_logs(logs, limit, indent="   ", grep=None):
+    if grep:
+        logs = [log for log in logs if grep in (log.get("content") or "")]
+    for log in logs[-limit:] if limit else logs:
+        print(f"{indent}[{log.get('timestamp', '')}] {log.get('content', '')}")
@@ -0,0 +1,44 @@
+"""xhs-ops logs：查看或跟随部署日志"""
+
+import time
+
+import zeabur_api
+from xhs_ops.common import locate, print_logs
+
+
+def fetch(service_id, deployment_id=None):
+    """返回 (deployment, logs)；未指定部署时取最新一次"""
+    deployments = zeabur_api.service_deployments(service_id, with_logs=True).get("deployments") or []
+    if deployment_id:
+        deployments = [d for d in deployments if d["_id"] == deployment_id]
+        if not deployments:
+            raise zeabur_api.ZeaburError(f"未找到部署 {deployment_id}")
+    if not deployments:
+        return None, []
+    return deployments[0], deployments[0].get("logs") or []
+
+
+def run(args):
+    _, _, app = locate(args, verbose=False)
+    deployment, logs = fetch(app["_id"], args.deployment)
+    if not deployment:
+        print("⚠️  没有部署记录")
+        return 0
+
+    print(f"📦 {app['name']} 部署 {deployment['_id']}（{deployment.get('status', 'unknown')}）")
+    if not logs:
+        print("⚠️  没有日志记录")
+    print_logs(logs, args.tail, indent="", grep=args.grep)
+    if not args.follow:
+        return 0
+
+    seen = {(log.get("timestamp"), log.get("content")) for log in logs}
+    while True:
+        time.sleep(args.interval)
+        current, logs = fetch(app["_id"], args.deployment or deployment["_id"])
+        fresh = [log for log in logs if (log.get("timestamp"), log.get("content")) not in seen]
+        seen.update((log.get("timestamp"), log.get("content")) for log in fresh)
+        print_logs(fresh, 0, indent="", grep=args.grep)
+        if current and current.get("status") != deployment.get("status"):
+            deployment = current
+            print(f"📦 部署状态: {deployment.get('status')}")
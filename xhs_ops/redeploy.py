@@ -0,0 +1,44 @@
+"""xhs-ops redeploy：执行发布前迁移后重新部署（会自动停止旧部署并启动新的）"""
+
+import os
+
+import zeabur_api
+from xhs_ops.common import database_url_for, locate
+
+
+def run_release_migrations(services):
+    """从 PostgreSQL 服务读取 DATABASE_URL 并执行迁移；找不到数据库时跳过（返回 True）"""
+    from db_migrate import report, run_migrations
+
+    database_url = os.getenv("DATABASE_URL", "") or database_url_for(services)
+    if not database_url:
+        print("⚠️  未找到 DATABASE_URL，跳过迁移（可导出 DATABASE_URL 后重试）")
+        return True
+    return report(run_migrations(database_url))
+
+
+def run(args):
+    print("🚀 正在触发 Zeabur 重新部署...")
+    print("   这会自动停止旧部署并启动新的部署\n")
+    _, services, app = locate(args, fallback_first=True)
+
+    if not args.skip_migrate:
+        print("🗄️  检查数据库迁移...")
+        if not run_release_migrations(services):
+            print("\n💡 迁移失败时不触发部署，修复后重新执行")
+            return 1
+
+    print("🚀 触发重新部署...")
+    try:
+        zeabur_api.redeploy_service(app["_id"])
+    except zeabur_api.ZeaburError as e:
+        print(f"❌ 失败: {e}")
+        print("\n💡 提示: 由于网络限制，请直接在 Zeabur 控制台点击 'Redeploy' 按钮")
+        return 1
+
+    print("✅ 重新部署已触发！")
+    print("\n📋 下一步:")
+    print("   1. 执行 xhs-ops logs -f 跟随构建日志")
+    print("   2. 新的部署会自动停止旧部署并开始构建")
+    print("   3. 执行 xhs-ops check 确认是否成功")
+    return 0
@@ -0,0 +1,44 @@
+"""xhs-ops stop：停止应用服务所有运行中的部署"""
+
+import zeabur_api
+from xhs_ops.common import locate
+
+
+def is_running(deployment):
+    status = str(deployment.get("status", "")).lower()
+    return "running" in status or status == "active"
+
+
+def run(args):
+    print("🔍 正在连接 Zeabur API...")
+    _, _, app = locate(args, fallback_first=True)
+
+    print("📋 正在获取部署列表...")
+    deployments = zeabur_api.service_deployments(app["_id"]).get("deployments") or []
+    print(f"📋 找到 {len(deployments)} 个部署")
+
+    running = [d for d in deployments if is_running(d)]
+    if not running:
+        print("ℹ️  没有运行中的部署需要停止")
+        return 0
+    if args.dry_run:
+        for d in running:
+            print(f"   - {d['_id']} ({d.get('status')}) 创建于 {d.get('createdAt', 'unknown')}")
+        print(f"ℹ️  dry-run：{len(running)} 个运行中的部署未停止")
+        return 0
+
+    print(f"🛑 找到 {len(running)} 个运行中的部署，正在停止...")
+    stopped = 0
+    for d in running:
+        deployment_id = d["_id"]
+        print(f"🛑 正在停止部署: {deployment_id[:8]}...")
+        try:
+            zeabur_api.stop_deployment(deployment_id)
+        except zeabur_api.ZeaburError as e:
+            print(f"⚠️  停止部署失败: {e}")
+            continue
+        print(f"✅ 已停止部署: {deployment_id[:8]}")
+        stopped += 1
+
+    print(f"\n✅ 操作完成！已停止 {stopped}/{len(running)} 个部署")
+    return 0
@@ -0,0 +1,291 @@
+"""
+xhs-ops trace：从运行日志里还原每个生成请求的分段耗时
+
+生成接口只打进度日志（🚀 [百炼标准流程]、>>> [步骤 3]、[i/6] prompt:、✅ 抠图成功 …），不带耗时。
+这里把同一请求的日志行按路由的阶段顺序拼成一个 span：相邻两个标记之间的时间记给后一个标记
+所结束的阶段（例如「正在调用阿里云商品抠图」结束的是提示词策划，「✅ 图片 3 成功」结束的是第 3 张生图）。
+多个请求交错时，一行日志归给「还没走到这一步」的最早那个请求。
+
+日志来源：
+  - 默认：与 xhs-ops logs 相同的 GraphQL deployments.logs 字段（最新一次部署，或 --deployment）
+  - --file：本地文件，支持 xhs-ops logs 的输出（[时间] 内容）、每行一个 {timestamp, content} 的 JSON，
+    或以 ISO 时间开头的纯文本
+
+限制：只有打了日志的边界才能计时。抠图走 cutout_service.py 时只有一行结果，策划与抠图合并为一段；
+批量下载打包（/api/download/images）成功时不打日志，只能统计失败次数。
+"""
+
+import json
+import re
+import sys
+from datetime import datetime
+
+from credential_smoke import percentile
+
+# 一个请求两行日志之间超过这个秒数仍未结束，视为日志缺失，不再往里拼
+SPAN_IDLE_TIMEOUT = 600
+
+# (路由, 匹配, 阶段名, 类型)；阶段名是「到这一行为止」那一段的名字，{n} 取正则第一个分组。
+# 同一路由内按列表顺序表示先后，拼接时请求只会严格向后推进；只有 retry 类标记和出图循环可以重复出现。
+RULES = [
+    # /api/generate/images（同步出图与队列模式）
+    ("images", r"🚀 \[百炼标准流程\]", "start", "start"),
+    ("images", r"提示词(?:解析|校验)失败（attempt=(\d+)）", "plan.retry", "retry"),
+    ("images", r"提示词最终兜底启用", "plan.fallback", "retry"),
+    ("images", r"抠图缓存服务不可用", "plan", "step"),
+    ("images", r"正在调用阿里云商品抠图", "plan", "step"),
+    ("images", r"📤 上传图片到临时服务器", "cutout.setup", "step"),
+    ("images", r"✅ 临时图片 URL", "cutout.upload", "step"),
+    ("images", r"📥 正在下载抠图结果", "cutout.api", "step"),
+    ("images", r"✅ 抠图成功，图片大小", "cutout.download", "step"),
+    ("images", r"✅ 抠图缓存服务", "plan+cutout", "step"),
+    ("images", r"❌ 抠图过程异常|❌ 阿里云 API|❌ 下载抠图结果失败", "cutout.error", "step"),
+    ("images", r"✅ 抠图成功（主体PNG|⚠️ 抠图失败，将退化", "cutout.finish", "step"),
+    ("images", r"📥 已入队", "enqueue", "end"),
+    ("images", r">>> \[步骤 3\]", "ref-prep", "step"),
+    ("images", r"\[(\d+)/\d+\] prompt:", "render.gap", "step"),
+    ("images", r"(?:✅|❌) 图片 (\d+) (?:成功|失败|异常)", "render.{n}", "step"),
+    ("images", r"🏁 完成", "finish", "end"),
+    ("images", r"💥 失败:", "error", "error"),
+    # /api/generate/copy
+    ("copy", r"📝 开始生成两篇文案", "start", "start"),
+    ("copy", r"📝 第一篇原始输出", "copy.llm", "step"),
+    ("copy", r"文案[12]未达标，触发重试", "copy.parse", "retry"),
+    ("copy", r"✅ 最终返回 2 篇文案", "copy.finish", "end"),
+    ("copy", r"^文案生成失败:", "error", "error"),
+    # /api/generate/image/one（Google）
+    ("image-one", r"🌐 Google 生图调用参数", "start", "start"),
+    ("image-one", r"📸 处理 \d+ 张参考图", "setup", "step"),
+    ("image-one", r"第 (\d+) 张图抠图(?:成功|失败)", "cutout.{n}", "step"),
+    ("image-one", r"调用第三方平台|正在调用 Google GenAI|使用 HTTP 模式调用生图", "ref-prep", "step"),
+    ("image-one", r"Google 生图失败:", "error", "error"),
+    # 旧的一体化接口 /api/generate
+    ("generate", r"=== 开始处理任务", "start", "start"),
+    ("generate", r">>> STEP 1", "setup", "step"),
+    ("generate", r">>> STEP 2", "cutout", "step"),
+    ("generate", r"文案生成完毕", "copy", "step"),
+    ("generate", r">>> STEP 3", "copy.post", "step"),
+    ("generate", r"策划的 Prompts|Prompt 策划解析失败", "plan", "step"),
+    ("generate", r">>> STEP 4", "plan.post", "step"),
+    ("generate", r"=== 全部完成", "render", "end"),
+    ("generate", r"全流程执行失败", "error", "error"),
+    # /api/download/images：成功不打日志
+    ("download", r"批量下载打包失败", "zip.error", "error"),
+]
+# 同一请求里某阶段名已出现过时改记为另一个名字：抠图缓存服务不可用后再直连阿里云，
+# 两行之间是缓存服务失败耗掉的时间，不是第二次策划
+REPEAT_STAGE = {"plan": "cutout.cache"}
+COMPILED = [(route, re.compile(pattern), stage, kind, rank) for rank, (route, pattern, stage, kind) in enumerate(RULES)]
+
+_TS_PREFIX = re.compile(r"^\[?(\d{4}-\d{2}-\d{2}[T ][\d:.]+(?:Z|[+-]\d{2}:?\d{2})?)\]?\s?(.*)$")
+
+
+def parse_ts(text):
+    """ISO 时间（纳秒精度截到微秒）→ 秒级浮点时间戳；解析失败返回 None"""
+    if not text:
+        return None
+    text = str(text).strip().replace(" ", "T", 1)
+    m = re.match(r"^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(?:\.(\d+))?(Z|[+-]\d{2}:?\d{2})?$", text)
+    if not m:
+        return None
+    base, frac, tz = m.groups()
+    tz = "+00:00" if tz in (None, "Z") else tz
+    try:
+        return datetime.fromisoformat(f"{base}.{(frac or '0')[:6].ljust(6, '0')}{tz}").timestamp()
+    except ValueError:
+        return None
+
+
+def read_file(path):
+    """本地日志文件 → [{timestamp, content}]；没有时间的续行并入上一条"""
+    entries = []
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for raw in f:
+            line = raw.rstrip("\n")
+            if not line.strip():
+                continue
+            if line.lstrip().startswith("{"):
+                try:
+                    obj = json.loads(line)
+                    entries.append({"timestamp": obj.get("timestamp") or obj.get("time"),
+                                    "content": obj.get("content") or obj.get("message") or ""})
+                    continue
+                except ValueError:
+                    pass
+            m = _TS_PREFIX.match(line.strip())
+            if m:
+                entries.append({"timestamp": m.group(1), "content": m.group(2)})
+            elif entries:
+                entries[-1]["content"] += "\n" + line
+    return entries
+
+
+class Span:
+    def __init__(self, route, ts):
+        self.route = route
+        self.started = ts
+        self.last_ts = ts
+        self.rank = -1
+        self.render = 0  # 最近一条 [i/N] prompt 的序号
+        self.rendered = 0  # 最近一张有结果的序号
+        self.stages = []  # [(阶段名, 秒)]
+        self.retries = 0
+        self.status = "open"
+
+    def expects(self, stage, rank, n, kind="step"):
+        """这一行能否属于本请求：出图循环按序号对齐，retry 类标记可停在原位，其余阶段只能严格向后推进"""
+        if stage == "render.gap":
+            return self.render == n - 1
+        if stage == "render.{n}":
+            return self.render == n and self.rendered < n
+        if kind == "retry":
+            return self.rank <= rank
+        return self.rank < rank
+
+    def add(self, stage, rank, ts, kind, n=None):
+        if stage == "render.gap":
+            self.render = n
+        elif stage == "render.{n}":
+            self.rendered = n
+        if "{n}" in stage:
+            stage = stage.replace("{n}", str(n))
+        elif stage in REPEAT_STAGE and any(name == stage for name, _ in self.stages):
+            stage = REPEAT_STAGE[stage]
+        self.stages.append((stage, max(0.0, ts - self.last_ts)))
+        self.last_ts = ts
+        self.rank = max(self.rank, rank)
+        if kind == "retry":
+            self.retries += 1
+        if kind == "end":
+            self.status = "done"
+        elif kind == "error":
+            self.status = "error"
+
+    @property
+    def total(self):
+        return self.last_ts - self.started
+
+
+def stitch(entries):
+    """按时间顺序把日志行拼成 span 列表"""
+    rows = []
+    for e in entries:
+        ts = parse_ts(e.get("timestamp"))
+        if ts is not None:
+            rows.append((ts, (e.get("content") or "").strip()))
+    rows.sort(key=lambda r: r[0])
+
+    spans, open_spans = [], []
+    for ts, content in rows:
+        first_line = content.split("\n", 1)[0]
+        for route, pattern, stage, kind, rank in COMPILED:
+            m = pattern.search(first_line)
+            if not m:
+                continue
+            open_spans = [s for s in open_spans if ts - s.last_ts <= SPAN_IDLE_TIMEOUT]
+            if kind == "start":
+                span = Span(route, ts)
+                spans.append(span)
+                open_spans.append(span)
+                break
+            if route == "download":
+                span = Span(route, ts)
+                span.add(stage, rank, ts, kind)
+                spans.append(span)
+                break
+            n = int(m.group(1)) if m.groups() else None
+            candidates = [s for s in open_spans if s.route == route]
+            # 还没走过这一步的最早请求优先；都走过了（日志乱序或重复）就给最早的
+            span = next((s for s in candidates if s.expects(stage, rank, n, kind)), candidates[0] if candidates else None)
+            if span is None:
+                break
+            span.add(stage, rank, ts, kind, n)
+            if span.status != "open":
+                open_spans.remove(span)
+            break
+    return spans
+
+
+def summarize(spans):
+    """{route: {"spans", "done", "error", "open", "retries", "total": [...], "stages": {stage: [秒...]}}}"""
+    out = {}
+    for s in spans:
+        r = out.setdefault(s.route, {"spans": 0, "done": 0, "error": 0, "open": 0, "retries": 0,
+                                     "total": [], "stages": {}})
+        r["spans"] += 1
+        r[s.status] += 1
+        r["retries"] += s.retries
+        if s.status == "done":
+            r["total"].append(s.total)
+        for stage, seconds in s.stages:
+            r["stages"].setdefault(stage, []).append(seconds)
+    return out
+
+
+def print_report(summary, spans, slowest=0):
+    if not summary:
+        print("⚠️  日志里没有找到生成接口的进度行")
+        return
+    for route, r in summary.items():
+        print(f"\n🧭 {route}：{r['spans']} 个请求（完成 {r['done']}，失败 {r['error']}，不完整 {r['open']}），"
+              f"重试 {r['retries']} 次")
+        if r["total"]:
+            print(f"   端到端  p50 {percentile(r['total'], 50):7.2f}s  p95 {percentile(r['total'], 95):7.2f}s  "
+                  f"max {max(r['total']):7.2f}s")
+        grand = sum(sum(v) for v in r["stages"].values()) or 1.0
+        print(f"   {'阶段':<18}{'次数':>6}{'p50':>10}{'p95':>10}{'max':>10}{'占比':>8}")
+        for stage in r["stages"]:  # 按首次出现的顺序，即请求内的先后
+            values = r["stages"][stage]
+            print(f"   {stage:<18}{len(values):>6}{percentile(values, 50):>9.2f}s{percentile(values, 95):>9.2f}s"
+                  f"{max(values):>9.2f}s{sum(values) / grand:>8.0%}")
+    if slowest:
+        done = sorted((s for s in spans if s.status == "done"), key=lambda s: s.total, reverse=True)[:slowest]
+        if done:
+            print(f"\n🐢 最慢的 {len(done)} 个请求")
+        for s in done:
+            started = datetime.fromtimestamp(s.started).isoformat(timespec="seconds")
+            parts = "  ".join(f"{stage} {sec:.1f}s" for stage, sec in s.stages)
+            print(f"   [{started}] {s.route} {s.total:.1f}s  {parts}")
+
+
+def to_json(summary):
+    out = {}
+    for route, r in summary.items():
+        out[route] = {k: r[k] for k in ("spans", "done", "error", "open", "retries")}
+        if r["total"]:
+            out[route]["p50"] = round(percentile(r["total"], 50), 3)
+            out[route]["p95"] = round(percentile(r["total"], 95), 3)
+        out[route]["stages"] = {
+            stage: {"count": len(v), "p50": round(percentile(v, 50), 3), "p95": round(percentile(v, 95), 3),
+                    "max": round(max(v), 3), "sum": round(sum(v), 3)}
+            for stage, v in r["stages"].items()
+        }
+    return out
+
+
+def run(args):
+    if args.file:
+        entries = read_file(args.file)
+        source = args.file
+    else:
+        from xhs_ops.common import locate
+        from xhs_ops.logs import fetch
+
+        _, _, app = locate(args, verbose=False)
+        deployment, entries = fetch(app["_id"], args.deployment)
+        if not deployment:
+            print("⚠️  没有部署记录")
+            return 0
+        source = f"{app['name']} 部署 {deployment['_id']}"
+
+    spans = stitch(entries)
+    if args.route:
+        spans = [s for s in spans if s.route == args.route]
+    summary = summarize(spans)
+    if args.json:
+        json.dump(to_json(summary), sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return 0
+    print(f"📜 {source}：{len(entries)} 行日志，拼出 {len(spans)} 个请求")
+    print_report(summary, spans, args.slowest)
+    return 0
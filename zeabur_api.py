@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Zeabur GraphQL API 公共封装
+
+各部署/检查脚本共用：鉴权、重试、项目/服务查找、环境变量与部署操作。
+requests 在第一次真正发请求时才导入，导入本模块本身没有任何副作用。
+"""
+
+import json
+import os
+import time
+
+ZEABUR_API_URL = "https://gateway.zeabur.com/graphql"
+DEFAULT_PROJECT = "xhs"
+# 应用服务名的匹配顺序（与历史脚本保持兼容）
+APP_SERVICE_HINTS = ("content-generator", "xiaohongshu", "web")
+APP_SERVICE_TYPES = ("DOCKERFILE", "NODEJS", "DOCKER")
+# 共享 KV（Redis）服务的识别方式与连接串变量名（按优先级）
+KV_SERVICE_HINTS = ("redis", "kv")
+KV_URL_KEYS = ("REDIS_CONNECTION_STRING", "REDIS_URI", "REDIS_URL", "KV_URL")
+# Postgres 连接池（PgBouncer）服务
+POOLER_SERVICE_HINTS = ("pgbouncer", "pooler")
+POOLER_PORT = 6432
+
+
+class ZeaburError(Exception):
+    """Zeabur API 调用失败（网络、HTTP 状态码或 GraphQL errors）"""
+
+
+def get_token():
+    return os.getenv("ZEABUR_API_KEY") or os.getenv("ZEABUR_TOKEN") or ""
+
+
+_session = None
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        import requests
+        _session = requests.Session()
+    return _session
+
+
+def query(gql, variables=None, retries=3, timeout=30, verbose=True):
+    """发送 GraphQL 请求，带重试；成功返回 data，失败抛出 ZeaburError"""
+    token = get_token()
+    if not token:
+        raise ZeaburError("缺少环境变量 ZEABUR_API_KEY（或 ZEABUR_TOKEN）")
+
+    import requests
+
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    payload = {"query": gql}
+    if variables:
+        payload["variables"] = variables
+
+    last_error = ""
+    for attempt in range(retries):
+        try:
+            r = _get_session().post(ZEABUR_API_URL, json=payload, headers=headers, timeout=timeout)
+            if r.status_code != 200:
+                last_error = f"HTTP {r.status_code}: {r.text[:200]}"
+            else:
+                result = r.json()
+                if "errors" in result:
+                    last_error = "GraphQL 错误: " + json.dumps(result["errors"], ensure_ascii=False)[:500]
+                else:
+                    return result.get("data") or {}
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            last_error = f"连接错误: {str(e)[:200]}"
+        if attempt < retries - 1:
+            if verbose:
+                print(f"⚠️  {last_error}")
+                print(f"⏳ 重试中... ({attempt + 1}/{retries})")
+            time.sleep(2 ** attempt)
+    raise ZeaburError(last_error)
+
+
+def ping():
+    """只验证 Token 与网络是否可用"""
+    return query("query { __typename }")
+
+
+def list_projects():
+    data = query("""
+    query {
+      projects {
+        _id
+        name
+      }
+    }
+    """)
+    return data.get("projects") or []
+
+
+def find_project(name=None, fallback_first=False):
+    """按名称查找项目（不区分大小写，缺省 ZEABUR_PROJECT 或 xhs）"""
+    name = (name or os.getenv("ZEABUR_PROJECT") or DEFAULT_PROJECT).lower()
+    projects = list_projects()
+    for p in projects:
+        if p["name"].lower() == name:
+            return p
+    for p in projects:
+        if name in p["name"].lower():
+            return p
+    if fallback_first and projects:
+        return projects[0]
+    raise ZeaburError(f"未找到名为 '{name}' 的项目，可用项目: {[p['name'] for p in projects]}")
+
+
+def list_services(project_id):
+    data = query("""
+    query($projectId: ObjectID!) {
+      project(_id: $projectId) {
+        services {
+          _id
+          name
+          type
+          status
+        }
+      }
+    }
+    """, {"projectId": project_id})
+    return (data.get("project") or {}).get("services") or []
+
+
+def find_app_service(services, name=None):
+    """应用服务：优先 ZEABUR_SERVICE 指定的名称，其次按名称提示，最后按服务类型"""
+    name = (name or os.getenv("ZEABUR_SERVICE") or "").lower()
+    if name:
+        for s in services:
+            if s["name"].lower() == name:
+                return s
+    for hint in APP_SERVICE_HINTS:
+        for s in services:
+            if hint in s["name"].lower():
+                return s
+    for s in services:
+        if s.get("type") in APP_SERVICE_TYPES:
+            return s
+    return None
+
+
+def find_postgres(services):
+    return next((s for s in services if s.get("type") == "POSTGRES"), None)
+
+
+def find_kv_service(services):
+    for s in services:
+        if s.get("type") == "REDIS":
+            return s
+    for s in services:
+        if any(hint in s["name"].lower() for hint in KV_SERVICE_HINTS):
+            return s
+    return None
+
+
+def find_pooler_service(services):
+    return next((s for s in services if any(hint in s["name"].lower() for hint in POOLER_SERVICE_HINTS)), None)
+
+
+def pooler_url(service, database_url):
+    """应用经连接池访问数据库的地址：连接池服务的 POOLER_URL，否则用内网域名替换 DATABASE_URL 的主机"""
+    env = service_env(service["_id"])
+    if env.get("POOLER_URL"):
+        return env["POOLER_URL"]
+    from urllib.parse import urlsplit, urlunsplit
+    parts = urlsplit(database_url)
+    auth = parts.netloc.rsplit("@", 1)[0] + "@" if "@" in parts.netloc else ""
+    port = env.get("LISTEN_PORT") or POOLER_PORT
+    return urlunsplit(parts._replace(netloc=f"{auth}{service['name']}.zeabur.internal:{port}"))
+
+
+def kv_url(service_id):
+    """KV 服务对外暴露的连接串（redis://...），没有则返回空字符串"""
+    env = service_env(service_id)
+    return next((env[k] for k in KV_URL_KEYS if env.get(k)), "")
+
+
+def service_env(service_id):
+    """返回 {name: value}"""
+    data = query("""
+    query($serviceId: ObjectID!) {
+      service(_id: $serviceId) {
+        env {
+          name
+          value
+        }
+      }
+    }
+    """, {"serviceId": service_id})
+    envs = (data.get("service") or {}).get("env") or []
+    return {e["name"]: e.get("value", "") for e in envs}
+
+
+def service_deployments(service_id, with_logs=False):
+    logs = """
+      logs {
+        content
+        timestamp
+      }""" if with_logs else ""
+    data = query(f"""
+    query($serviceId: ObjectID!) {{
+      service(_id: $serviceId) {{
+        _id
+        name
+        status
+        deployments {{
+          _id
+          status
+          createdAt
+          updatedAt{logs}
+        }}
+      }}
+    }}
+    """, {"serviceId": service_id})
+    return data.get("service") or {}
+
+
+def replace_variables(project_id, service_id, envs):
+    """整体替换服务的环境变量（envs 为 [{name, value}]，未列出的变量会被删除）"""
+    return query("""
+    mutation($projectId: ObjectID!, $serviceId: ObjectID!, $envs: [VariableInput!]!) {
+      replaceVariables(projectId: $projectId, serviceId: $serviceId, variables: $envs) {
+        _id
+      }
+    }
+    """, {"projectId": project_id, "serviceId": service_id, "envs": envs})
+
+
+def update_root_directory(project_id, service_id, root_directory):
+    return query("""
+    mutation($projectId: ObjectID!, $serviceId: ObjectID!, $rootDirectory: String!) {
+      updateService(_id: $serviceId, projectId: $projectId, rootDirectory: $rootDirectory) {
+        _id
+      }
+    }
+    """, {"projectId": project_id, "serviceId": service_id, "rootDirectory": root_directory})
+
+
+def create_prebuilt_service(project_id, name, template):
+    """从 Zeabur 预置模板创建服务（例如 template="redis"）"""
+    try:
+        data = query("""
+        mutation($projectId: ObjectID!, $name: String!, $template: String!) {
+          createService(projectID: $projectId, name: $name, template: PREBUILT, marketplaceCode: $template) {
+            _id
+            name
+            type
+          }
+        }
+        """, {"projectId": project_id, "name": name, "template": template})
+    except ZeaburError as e:
+        raise ZeaburError(f"创建 {template} 服务失败（可在 Zeabur 控制台 Add Service → Marketplace 手动添加）: {e}")
+    return data.get("createService") or {}
+
+
+def update_replicas(project_id, service_id, replicas):
+    try:
+        return query("""
+        mutation($projectId: ObjectID!, $serviceId: ObjectID!, $replicas: Int!) {
+          updateService(_id: $serviceId, projectId: $projectId, replicas: $replicas) {
+            _id
+          }
+        }
+        """, {"projectId": project_id, "serviceId": service_id, "replicas": replicas})
+    except ZeaburError as e:
+        raise ZeaburError(f"设置副本数失败（可在 Zeabur 控制台服务设置中手动调整）: {e}")
+
+
+def set_service_image(project_id, service_id, image):
+    """把服务改为运行预构建镜像（image_promote.py 提升时调用，image 建议用 @sha256 固定）"""
+    try:
+        return query("""
+        mutation($projectId: ObjectID!, $serviceId: ObjectID!, $image: String!) {
+          updateService(_id: $serviceId, projectId: $projectId, image: $image) {
+            _id
+          }
+        }
+        """, {"projectId": project_id, "serviceId": service_id, "image": image})
+    except ZeaburError as e:
+        raise ZeaburError(f"设置服务镜像失败（可在 Zeabur 控制台服务设置 → Source 改为 Prebuilt Image 填入 {image}）: {e}")
+
+
+def service_domains(service_id):
+    """服务绑定的域名：[{_id, domain, isGenerated}]"""
+    data = query("""
+    query($serviceId: ObjectID!) {
+      service(_id: $serviceId) {
+        domains {
+          _id
+          domain
+          isGenerated
+        }
+      }
+    }
+    """, {"serviceId": service_id})
+    return (data.get("service") or {}).get("domains") or []
+
+
+def add_domain(service_id, domain):
+    try:
+        return query("""
+        mutation($serviceId: ObjectID!, $domain: String!) {
+          addDomain(serviceID: $serviceId, domain: $domain, isGenerated: false) {
+            _id
+            domain
+          }
+        }
+        """, {"serviceId": service_id, "domain": domain})
+    except ZeaburError as e:
+        raise ZeaburError(f"绑定域名 {domain} 失败（可在 Zeabur 控制台 Networking 中手动绑定）: {e}")
+
+
+def remove_domain(domain):
+    try:
+        return query("""
+        mutation($domain: String!) {
+          removeDomain(domain: $domain)
+        }
+        """, {"domain": domain})
+    except ZeaburError as e:
+        raise ZeaburError(f"解绑域名 {domain} 失败（可在 Zeabur 控制台 Networking 中手动解绑）: {e}")
+
+
+def redeploy_service(service_id):
+    return query("""
+    mutation($serviceId: ObjectID!) {
+      redeployService(_id: $serviceId) {
+        _id
+      }
+    }
+    """, {"serviceId": service_id})
+
+
+def stop_deployment(deployment_id):
+    return query("""
+    mutation($deploymentId: ObjectID!) {
+      stopDeployment(_id: $deploymentId) {
+        _id
+        status
+      }
+    }
+    """, {"deploymentId": deployment_id})
+
+
+def discover(project_name=None, service_name=None):
+    """一次拿到部署需要的全部定位信息：项目、应用服务、数据库服务及 DATABASE_URL"""
+    project = find_project(project_name)
+    services = list_services(project["_id"])
+    app = find_app_service(services, service_name)
+    if not app:
+        raise ZeaburError(f"未找到应用服务，可用服务: {[s['name'] for s in services]}")
+    postgres = find_postgres(services)
+    database_url = service_env(postgres["_id"]).get("DATABASE_URL", "") if postgres else ""
+    return {
+        "project": project,
+        "services": services,
+        "service": app,
+        "postgres": postgres,
+        "database_url": database_url,
+    }